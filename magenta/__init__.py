@@ -48,6 +48,7 @@ import magenta.music.testing_lib
 import magenta.pipelines.dag_pipeline
 import magenta.pipelines.drum_pipelines
 import magenta.pipelines.melody_pipelines
+import magenta.pipelines.metrics_exporter
 import magenta.pipelines.pipeline
 import magenta.pipelines.pipelines_common
 import magenta.pipelines.statistics
@@ -15,6 +15,7 @@
 """Imports objects into the top-level common namespace."""
 
 from sequence_example_lib import get_padded_batch
+from sequence_example_lib import get_padding_efficiency
 from sequence_example_lib import make_sequence_example
 
 from tf_lib import HParams
@@ -15,6 +15,12 @@
 
 import tensorflow as tf
 
+from magenta.common import tfrecord_lib
+
+# Graph collection holding, for each input queue, a scalar tensor of the
+# fraction of the queue that is full.
+QUEUE_FILL_FRACTIONS = 'queue_fill_fractions'
+
 
 def make_sequence_example(inputs, labels):
   """Returns a SequenceExample for the given inputs and labels.
@@ -40,30 +46,127 @@ def make_sequence_example(inputs, labels):
   return tf.train.SequenceExample(feature_lists=feature_lists)
 
 
+def _add_queue_summary(queue, name):
+  """Adds a summary of the fraction of `queue` that is full.
+
+  If the queues feeding training are mostly empty, training is input-bound.
+  The fraction is also added to the `QUEUE_FILL_FRACTIONS` collection, in an op
+  named `<name>_fraction_full`, so that it can be monitored during training.
+
+  Args:
+    queue: A tf.QueueBase instance.
+    name: The name of the queue to use in the summary tag.
+  """
+  fraction_full = tf.identity(
+      tf.to_float(queue.size()) / queue.capacity, name=name + '_fraction_full')
+  tf.add_to_collection(QUEUE_FILL_FRACTIONS, fraction_full)
+  tf.scalar_summary(
+      'queue/%s/fraction_of_%d_full' % (name, queue.capacity), fraction_full)
+
+
+def get_padding_efficiency(inputs, lengths):
+  """Returns the fraction of a padded batch that is covered by actual events.
+
+  Args:
+    inputs: A tensor of shape [batch_size, num_steps, input_size], a batch of
+        padded input vectors as returned by `get_padded_batch`.
+    lengths: A tensor of shape [batch_size] of int32s, the lengths of each
+        sequence in the batch before padding.
+
+  Returns:
+    A scalar float32 tensor, the total length of the sequences divided by the
+    number of steps in the padded batch.
+  """
+  batch_shape = tf.shape(inputs)
+  return tf.truediv(tf.to_float(tf.reduce_sum(lengths)),
+                    tf.to_float(batch_shape[0] * batch_shape[1]))
+
+
 def get_padded_batch(file_list, batch_size, input_size,
-                     num_enqueuing_threads=4):
+                     num_enqueuing_threads=4, num_readers=1,
+                     shuffle_buffer_size=0, queue_capacity=None,
+                     bucket_boundaries=None):
   """Reads batches of SequenceExamples from TFRecords and pads them.
 
   Can deal with variable length SequenceExamples by padding each batch to the
   length of the longest sequence with zeros.
 
+  `num_readers` readers read serialized SequenceExamples from the files in
+  parallel into a queue of examples, which is shuffled if `shuffle_buffer_size`
+  is given. `num_enqueuing_threads` threads parse examples from that queue and
+  enqueue them in the padding queue that batches are dequeued from. The fill
+  level of both queues is exported as a summary.
+
+  If `bucket_boundaries` is given, examples are instead grouped into buckets of
+  similar length and each batch is drawn from a single bucket, so much less of
+  each batch is padding.
+
   Args:
-    file_list: A list of paths to TFRecord files containing SequenceExamples.
+    file_list: A list of paths or glob patterns of TFRecord files containing
+        SequenceExamples, e.g. the shards of a sharded dataset. GZIP and ZLIB
+        compressed files are read based on their file name extension, but all
+        files must use the same compression.
     batch_size: The number of SequenceExamples to include in each batch.
     input_size: The size of each input vector. The returned batch of inputs
         will have a shape [batch_size, num_steps, input_size].
-    num_enqueuing_threads: The number of threads to use for enqueuing
-        SequenceExamples.
+    num_enqueuing_threads: The number of threads to use for parsing and
+        enqueuing SequenceExamples.
+    num_readers: The number of TFRecord readers reading in parallel. Each
+        reader reads a different file at a time, so this is most useful with
+        sharded datasets.
+    shuffle_buffer_size: If greater than 0, examples are shuffled in a buffer
+        holding at least this many examples, and files are read in a random
+        order. If 0, examples are read in file order.
+    queue_capacity: The capacity of the queue of examples and of the padding
+        queue. If None, twice the larger of `batch_size` times
+        `num_enqueuing_threads` and 1000 is used. When bucketing, this is split
+        evenly between the buckets.
+    bucket_boundaries: An optional sorted list of sequence lengths. If given,
+        examples with length in [0, b_0), [b_0, b_1), ..., [b_n-1, inf) are
+        batched separately.
 
   Returns:
     inputs: A tensor of shape [batch_size, num_steps, input_size] of floats32s.
     labels: A tensor of shape [batch_size, num_steps] of int64s.
     lengths: A tensor of shape [batch_size] of int32s. The lengths of each
         SequenceExample before padding.
+
+  Raises:
+    ValueError: If the files in `file_list` use different compression types,
+        or if `num_readers` is less than 1.
   """
-  file_queue = tf.train.string_input_producer(file_list)
-  reader = tf.TFRecordReader()
-  _, serialized_example = reader.read(file_queue)
+  if num_readers < 1:
+    raise ValueError('num_readers must be at least 1: %d' % num_readers)
+
+  file_list = tfrecord_lib.expand_file_patterns(file_list)
+  compressions = set(tfrecord_lib.get_compression(path) for path in file_list)
+  if len(compressions) > 1:
+    raise ValueError('TFRecord files have mixed compression types: %s' %
+                     sorted(compressions))
+  compression = compressions.pop() if compressions else None
+  options = tfrecord_lib.get_record_options(compression)
+
+  if queue_capacity is None:
+    queue_capacity = 2 * max(batch_size * num_enqueuing_threads, 1000)
+
+  file_queue = tf.train.string_input_producer(
+      file_list, shuffle=shuffle_buffer_size > 0)
+
+  if shuffle_buffer_size > 0:
+    examples_queue = tf.RandomShuffleQueue(
+        capacity=shuffle_buffer_size + queue_capacity,
+        min_after_dequeue=shuffle_buffer_size,
+        dtypes=[tf.string])
+  else:
+    examples_queue = tf.FIFOQueue(capacity=queue_capacity, dtypes=[tf.string])
+  examples_enqueue_ops = []
+  for _ in range(num_readers):
+    reader = tf.TFRecordReader(options=options)
+    _, serialized_example = reader.read(file_queue)
+    examples_enqueue_ops.append(examples_queue.enqueue([serialized_example]))
+  tf.train.add_queue_runner(
+      tf.train.QueueRunner(examples_queue, examples_enqueue_ops))
+  _add_queue_summary(examples_queue, 'examples')
 
   sequence_features = {
       'inputs': tf.FixedLenSequenceFeature(shape=[input_size],
@@ -71,18 +174,30 @@ def get_padded_batch(file_list, batch_size, input_size,
       'labels': tf.FixedLenSequenceFeature(shape=[],
                                            dtype=tf.int64)}
 
-  _, sequence = tf.parse_single_sequence_example(
-      serialized_example, sequence_features=sequence_features)
-
-  length = tf.shape(sequence['inputs'])[0]
+  if bucket_boundaries:
+    _, sequence = tf.parse_single_sequence_example(
+        examples_queue.dequeue(), sequence_features=sequence_features)
+    length = tf.shape(sequence['inputs'])[0]
+    num_buckets = len(bucket_boundaries) + 1
+    _, batch = tf.contrib.training.bucket_by_sequence_length(
+        length, [sequence['inputs'], sequence['labels'], length], batch_size,
+        bucket_boundaries, num_threads=num_enqueuing_threads,
+        capacity=max(queue_capacity // num_buckets, batch_size),
+        dynamic_pad=True)
+    return batch
 
   queue = tf.PaddingFIFOQueue(
-      capacity=1000,
+      capacity=queue_capacity,
       dtypes=[tf.float32, tf.int64, tf.int32],
       shapes=[(None, input_size), (None,), ()])
 
-  enqueue_ops = [queue.enqueue([sequence['inputs'],
-                                sequence['labels'],
-                                length])] * num_enqueuing_threads
+  enqueue_ops = []
+  for _ in range(num_enqueuing_threads):
+    _, sequence = tf.parse_single_sequence_example(
+        examples_queue.dequeue(), sequence_features=sequence_features)
+    length = tf.shape(sequence['inputs'])[0]
+    enqueue_ops.append(
+        queue.enqueue([sequence['inputs'], sequence['labels'], length]))
   tf.train.add_queue_runner(tf.train.QueueRunner(queue, enqueue_ops))
+  _add_queue_summary(queue, 'padded_examples')
   return queue.dequeue_many(batch_size)
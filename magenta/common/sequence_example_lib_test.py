@@ -0,0 +1,201 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sequence_example_lib."""
+
+import os
+import tempfile
+
+# internal imports
+import numpy as np
+import tensorflow as tf
+
+from magenta.common import sequence_example_lib
+from magenta.common import tfrecord_lib
+
+INPUT_SIZE = 2
+NUM_SEQUENCES = 12
+
+
+class SequenceExampleLibTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    # Sequence i has length i + 1. Each input vector holds the index of its
+    # sequence and its step, and each label is the index of its sequence.
+    self.sequences = []
+    for i in range(NUM_SEQUENCES):
+      inputs = [[float(i), float(step)] for step in range(i + 1)]
+      labels = [i] * (i + 1)
+      self.sequences.append((inputs, labels))
+
+  def writeDataset(self, name, max_records=None, compression=None):
+    """Writes the test sequences to a sharded dataset.
+
+    Args:
+      name: The name of the dataset.
+      max_records: The maximum number of sequences per shard, or None.
+      compression: 'GZIP', 'ZLIB', or None for no compression.
+
+    Returns:
+      A list of the shard paths.
+    """
+    writer = tfrecord_lib.ShardedTFRecordWriter(
+        os.path.join(self.root_dir, name), max_records=max_records,
+        compression=compression)
+    for inputs, labels in self.sequences:
+      writer.write(sequence_example_lib.make_sequence_example(
+          inputs, labels).SerializeToString())
+    return writer.close()
+
+  def readBatches(self, file_list, batch_size, num_batches, **kwargs):
+    """Reads padded batches of the test sequences.
+
+    Args:
+      file_list: A list of paths or glob patterns of the dataset files.
+      batch_size: The number of sequences in each batch.
+      num_batches: The number of batches to read.
+      **kwargs: Additional arguments to `get_padded_batch`.
+
+    Returns:
+      A list of (inputs, labels, lengths) tuples of numpy arrays, one for each
+      batch.
+    """
+    with tf.Graph().as_default():
+      tf.set_random_seed(0)
+      batch = sequence_example_lib.get_padded_batch(
+          file_list, batch_size, INPUT_SIZE, **kwargs)
+      with self.test_session() as sess:
+        coord = tf.train.Coordinator()
+        threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+        batches = [sess.run(batch) for _ in range(num_batches)]
+        coord.request_stop()
+        coord.join(threads)
+    return batches
+
+  def checkBatch(self, inputs, labels, lengths):
+    """Checks that a batch holds correctly padded test sequences.
+
+    Args:
+      inputs: A numpy array of padded input vectors.
+      labels: A numpy array of padded labels.
+      lengths: A numpy array of sequence lengths.
+
+    Returns:
+      A list of the indices of the sequences in the batch.
+    """
+    indices = []
+    self.assertEqual(lengths.max(), inputs.shape[1])
+    for row_inputs, row_labels, length in zip(inputs, labels, lengths):
+      index = int(row_inputs[0, 0])
+      expected_inputs, expected_labels = self.sequences[index]
+      self.assertEqual(len(expected_inputs), length)
+      self.assertAllEqual(expected_inputs, row_inputs[:length])
+      self.assertAllEqual(expected_labels, row_labels[:length])
+      self.assertFalse(row_inputs[length:].any())
+      self.assertFalse(row_labels[length:].any())
+      indices.append(index)
+    return indices
+
+  def testGetPaddedBatch(self):
+    file_list = self.writeDataset('examples')
+    batches = self.readBatches(file_list, batch_size=4, num_batches=3,
+                               num_enqueuing_threads=1)
+
+    indices = []
+    for inputs, labels, lengths in batches:
+      self.assertEqual((4, lengths.max(), INPUT_SIZE), inputs.shape)
+      indices.extend(self.checkBatch(inputs, labels, lengths))
+    # A single reader and enqueuing thread keep the file order.
+    self.assertEqual(range(NUM_SEQUENCES), indices)
+
+  def testGetPaddedBatchParallelReadersCompressedShards(self):
+    file_list = self.writeDataset('examples', max_records=3,
+                                  compression='GZIP')
+    self.assertEqual(4, len(file_list))
+    batches = self.readBatches(
+        [os.path.join(self.root_dir, 'examples-*')], batch_size=4,
+        num_batches=10, num_readers=3)
+
+    indices = []
+    for inputs, labels, lengths in batches:
+      indices.extend(self.checkBatch(inputs, labels, lengths))
+    # Every shard is read.
+    self.assertEqual(set(range(NUM_SEQUENCES)), set(indices))
+
+  def testGetPaddedBatchShuffled(self):
+    file_list = self.writeDataset('examples', max_records=4)
+    batches = self.readBatches(file_list, batch_size=4, num_batches=10,
+                               num_readers=2, shuffle_buffer_size=8)
+
+    indices = []
+    for inputs, labels, lengths in batches:
+      indices.extend(self.checkBatch(inputs, labels, lengths))
+    self.assertEqual(set(range(NUM_SEQUENCES)), set(indices))
+    self.assertNotEqual(range(NUM_SEQUENCES), indices[:NUM_SEQUENCES])
+
+  def testGetPaddedBatchWithBuckets(self):
+    file_list = self.writeDataset('examples')
+    bucket_boundaries = [4, 8]
+    batches = self.readBatches(file_list, batch_size=2, num_batches=12,
+                               bucket_boundaries=bucket_boundaries)
+
+    indices = []
+    for inputs, labels, lengths in batches:
+      self.assertEqual(2, len(lengths))
+      indices.extend(self.checkBatch(inputs, labels, lengths))
+      # All of the sequences in a batch come from the same bucket.
+      self.assertEqual(1, len(set(np.digitize(lengths, bucket_boundaries))))
+    self.assertEqual(set(range(NUM_SEQUENCES)), set(indices))
+
+  def testGetPaddingEfficiency(self):
+    with self.test_session():
+      inputs = tf.zeros([2, 5, INPUT_SIZE])
+      lengths = tf.constant([5, 2])
+      self.assertAllClose(
+          0.7,
+          sequence_example_lib.get_padding_efficiency(inputs, lengths).eval())
+
+  def testGetPaddingEfficiencyOfPaddedBatch(self):
+    file_list = self.writeDataset('examples')
+    with tf.Graph().as_default():
+      inputs, _, lengths = sequence_example_lib.get_padded_batch(
+          file_list, 3, INPUT_SIZE, num_enqueuing_threads=1)
+      padding_efficiency = sequence_example_lib.get_padding_efficiency(
+          inputs, lengths)
+      with self.test_session() as sess:
+        coord = tf.train.Coordinator()
+        threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+        # The first batch holds the sequences of lengths 1, 2, and 3.
+        self.assertAllClose(6.0 / 9.0, sess.run(padding_efficiency))
+        coord.request_stop()
+        coord.join(threads)
+
+  def testGetPaddedBatchMixedCompression(self):
+    plain_file_list = self.writeDataset('plain')
+    compressed_file_list = self.writeDataset('compressed', compression='ZLIB')
+    with tf.Graph().as_default():
+      with self.assertRaises(ValueError):
+        sequence_example_lib.get_padded_batch(
+            plain_file_list + compressed_file_list, 4, INPUT_SIZE)
+
+  def testGetPaddedBatchInvalidNumReaders(self):
+    file_list = self.writeDataset('examples')
+    with tf.Graph().as_default():
+      with self.assertRaises(ValueError):
+        sequence_example_lib.get_padded_batch(
+            file_list, 4, INPUT_SIZE, num_readers=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
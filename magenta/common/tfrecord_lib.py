@@ -0,0 +1,300 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utility functions for reading and writing sharded TFRecord files.
+
+A sharded dataset is written by `ShardedTFRecordWriter` as a set of files named
+`<base>-00000-of-000NN.tfrecord`, plus a JSON manifest listing the shards. Shard
+files may be GZIP or ZLIB compressed, in which case their names end in `.gz` or
+`.zlib` and readers pick the compression from the file name.
+"""
+
+import json
+import os
+import re
+
+# internal imports
+import tensorflow as tf
+
+# Maps compression type names to the file name extension of compressed shards.
+COMPRESSION_EXTENSIONS = {
+    'GZIP': '.gz',
+    'ZLIB': '.zlib',
+}
+
+_COMPRESSION_TYPES = {
+    'GZIP': tf.python_io.TFRecordCompressionType.GZIP,
+    'ZLIB': tf.python_io.TFRecordCompressionType.ZLIB,
+}
+
+# Each TFRecord holds a 64-bit length, two 32-bit CRCs, and the data.
+_RECORD_OVERHEAD_BYTES = 16
+
+
+def get_record_bytes(record):
+  """Returns the number of uncompressed bytes a record takes in a TFRecord."""
+  return len(record) + _RECORD_OVERHEAD_BYTES
+
+
+def get_shard_path(path_base, index, num_shards, compression=None):
+  """Returns the path of a shard of a sharded dataset.
+
+  Args:
+    path_base: Path of the dataset without shard suffix or extension.
+    index: The zero-based index of the shard.
+    num_shards: The total number of shards.
+    compression: 'GZIP', 'ZLIB', or None for no compression.
+
+  Returns:
+    The path `<path_base>-<index>-of-<num_shards>.tfrecord`, followed by the
+    extension of `compression`.
+  """
+  return '%s-%05d-of-%05d.tfrecord%s' % (
+      path_base, index, num_shards, COMPRESSION_EXTENSIONS.get(compression, ''))
+
+
+def get_manifest_path(path_base):
+  """Returns the path of the manifest of a sharded dataset."""
+  return path_base + '.manifest.json'
+
+
+def read_manifest(path_base):
+  """Reads the manifest of a sharded dataset.
+
+  Args:
+    path_base: Path of the dataset without shard suffix or extension.
+
+  Returns:
+    The manifest as a dictionary, or None if the dataset has no manifest.
+  """
+  manifest_path = get_manifest_path(path_base)
+  if not tf.gfile.Exists(manifest_path):
+    return None
+  with tf.gfile.Open(manifest_path) as f:
+    return json.loads(f.read())
+
+
+def write_manifest(path_base, shards, compression=None):
+  """Writes the manifest of a sharded dataset.
+
+  The manifest is written to a temporary file and renamed into place, so a
+  reader never sees a partial manifest.
+
+  Args:
+    path_base: Path of the dataset without shard suffix or extension.
+    shards: A list of dictionaries, one for each shard, holding at least the
+        shard file name as 'path' and its record count as 'num_records'.
+    compression: 'GZIP', 'ZLIB', or None for no compression.
+  """
+  manifest = {
+      'compression': compression,
+      'num_records': sum(shard['num_records'] for shard in shards),
+      'shards': shards,
+  }
+  manifest_path = get_manifest_path(path_base)
+  temp_path = manifest_path + '.tmp'
+  with tf.gfile.Open(temp_path, 'w') as f:
+    f.write(json.dumps(manifest, indent=2, sort_keys=True))
+  tf.gfile.Rename(temp_path, manifest_path, overwrite=True)
+
+
+def delete_shards(path_base):
+  """Deletes the shards, temporary shards, and manifest of a sharded dataset.
+
+  Shard names include the total number of shards, so shards written by an
+  earlier run with a different shard count would not be overwritten, and a
+  glob over the shards would read them too.
+
+  Args:
+    path_base: Path of the dataset without shard suffix or extension.
+
+  Returns:
+    A list of the deleted paths.
+  """
+  shard_re = re.compile(r'%s-(\d{5}-of-\d{5}\.tfrecord(%s)?|\d{5}\.tmp)$' % (
+      re.escape(os.path.basename(path_base)),
+      '|'.join(re.escape(extension)
+               for extension in COMPRESSION_EXTENSIONS.values())))
+  paths = [path for path in tf.gfile.Glob(path_base + '-*')
+           if shard_re.match(os.path.basename(path))]
+  manifest_path = get_manifest_path(path_base)
+  if tf.gfile.Exists(manifest_path):
+    paths.append(manifest_path)
+  for path in paths:
+    tf.gfile.Remove(path)
+  return paths
+
+
+def get_compression(path):
+  """Returns the compression type name implied by a TFRecord file name.
+
+  Args:
+    path: Path to a TFRecord file.
+
+  Returns:
+    'GZIP' or 'ZLIB' if `path` ends with the extension of that compression
+    type, otherwise None.
+  """
+  for compression, extension in COMPRESSION_EXTENSIONS.items():
+    if path.endswith(extension):
+      return compression
+  return None
+
+
+def get_record_options(compression):
+  """Returns TFRecordOptions for a compression type name.
+
+  Args:
+    compression: 'GZIP', 'ZLIB', or None for no compression.
+
+  Returns:
+    A tf.python_io.TFRecordOptions instance, or None if `compression` is None.
+
+  Raises:
+    ValueError: If `compression` is not a known compression type.
+  """
+  if compression is None:
+    return None
+  if compression not in _COMPRESSION_TYPES:
+    raise ValueError('Unknown TFRecord compression type: %s' % compression)
+  return tf.python_io.TFRecordOptions(_COMPRESSION_TYPES[compression])
+
+
+def expand_file_patterns(file_patterns):
+  """Expands a list of file paths and glob patterns into file paths.
+
+  Args:
+    file_patterns: A list of file paths or glob patterns, e.g.
+        `/tmp/training_melodies-*.tfrecord`.
+
+  Returns:
+    A list of file paths. Each pattern is replaced by its sorted matches, or
+    kept as is if it does not match any files.
+  """
+  file_list = []
+  for file_pattern in file_patterns:
+    matches = tf.gfile.Glob(file_pattern)
+    file_list.extend(sorted(matches) if matches else [file_pattern])
+  return file_list
+
+
+def tf_record_iterator(file_pattern):
+  """Iterates over the serialized records of one or more TFRecord files.
+
+  Args:
+    file_pattern: A path or glob pattern matching TFRecord files, e.g. the
+        shards of a sharded dataset. Compression is inferred from each file
+        name.
+
+  Yields:
+    The serialized records of each file, in file name order.
+  """
+  for path in expand_file_patterns([file_pattern]):
+    options = get_record_options(get_compression(path))
+    for record in tf.python_io.tf_record_iterator(path, options):
+      yield record
+
+
+class ShardedTFRecordWriter(object):
+  """Writes records to a sequence of TFRecord shards.
+
+  A new shard is started whenever the current one holds `max_records` records,
+  or when the next record would take it over `max_bytes` bytes. Byte counts are
+  of the uncompressed records. Since the total number of shards is only known
+  at the end, shards are written to temporary files and renamed to
+  `<path_base>-00000-of-000NN.tfrecord` by `close`, which also writes a JSON
+  manifest to `<path_base>.manifest.json` listing each shard with its record
+  and byte counts.
+
+  Any shards, temporary shards, or manifest already at `path_base`, e.g. from
+  an earlier run with a different number of shards, are deleted when the writer
+  is created, so that the directory only holds the new dataset.
+  """
+
+  def __init__(self, path_base, max_records=None, max_bytes=None,
+               compression=None):
+    """Creates a ShardedTFRecordWriter and opens its first shard.
+
+    Existing shards of the dataset are deleted with `delete_shards`.
+
+    Args:
+      path_base: Path of the dataset without shard suffix or extension.
+      max_records: Maximum number of records per shard, or None for no limit.
+      max_bytes: Maximum number of uncompressed bytes per shard, or None for no
+          limit. A single record larger than this gets a shard of its own.
+      compression: 'GZIP', 'ZLIB', or None for no compression.
+
+    Raises:
+      ValueError: If `compression` is not a known compression type, or if
+          `max_records` or `max_bytes` is not positive.
+    """
+    if max_records is not None and max_records <= 0:
+      raise ValueError('max_records must be positive: %d' % max_records)
+    if max_bytes is not None and max_bytes <= 0:
+      raise ValueError('max_bytes must be positive: %d' % max_bytes)
+    self._path_base = path_base
+    self._max_records = max_records
+    self._max_bytes = max_bytes
+    self._compression = compression
+    self._options = get_record_options(compression)
+    self._shards = []
+    self._writer = None
+    delete_shards(path_base)
+    self._open_shard()
+
+  def _temp_path(self, index):
+    return '%s-%05d.tmp' % (self._path_base, index)
+
+  def _open_shard(self):
+    if self._writer is not None:
+      self._writer.close()
+    self._writer = tf.python_io.TFRecordWriter(
+        self._temp_path(len(self._shards)), self._options)
+    self._shards.append({'num_records': 0, 'num_bytes': 0})
+
+  def write(self, record):
+    """Writes a serialized record, starting a new shard if necessary.
+
+    Args:
+      record: The serialized record, a string.
+    """
+    shard = self._shards[-1]
+    record_bytes = get_record_bytes(record)
+    if shard['num_records'] and (
+        (self._max_records is not None and
+         shard['num_records'] >= self._max_records) or
+        (self._max_bytes is not None and
+         shard['num_bytes'] + record_bytes > self._max_bytes)):
+      self._open_shard()
+      shard = self._shards[-1]
+    self._writer.write(record)
+    shard['num_records'] += 1
+    shard['num_bytes'] += record_bytes
+
+  def close(self):
+    """Closes the last shard, renames all shards, and writes the manifest.
+
+    Returns:
+      A list of the final shard paths.
+    """
+    self._writer.close()
+    num_shards = len(self._shards)
+    paths = []
+    for index, shard in enumerate(self._shards):
+      path = get_shard_path(self._path_base, index, num_shards,
+                            self._compression)
+      tf.gfile.Rename(self._temp_path(index), path, overwrite=True)
+      shard['path'] = os.path.basename(path)
+      paths.append(path)
+    write_manifest(self._path_base, self._shards, self._compression)
+    return paths
@@ -0,0 +1,157 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for tfrecord_lib."""
+
+import json
+import os
+import tempfile
+
+# internal imports
+import tensorflow as tf
+
+from magenta.common import tfrecord_lib
+
+
+class TFRecordLibTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    self.path_base = os.path.join(self.root_dir, 'records')
+
+  def testGetCompression(self):
+    self.assertEqual('GZIP', tfrecord_lib.get_compression('a.tfrecord.gz'))
+    self.assertEqual('ZLIB', tfrecord_lib.get_compression('a.tfrecord.zlib'))
+    self.assertEqual(None, tfrecord_lib.get_compression('a.tfrecord'))
+
+  def testGetRecordOptionsUnknownCompression(self):
+    with self.assertRaises(ValueError):
+      tfrecord_lib.get_record_options('LZMA')
+
+  def testGetShardPath(self):
+    self.assertEqual('/tmp/records-00002-of-00010.tfrecord',
+                     tfrecord_lib.get_shard_path('/tmp/records', 2, 10))
+    self.assertEqual('/tmp/records-00000-of-00001.tfrecord.gz',
+                     tfrecord_lib.get_shard_path('/tmp/records', 0, 1, 'GZIP'))
+
+  def testReadManifest(self):
+    self.assertEqual(None, tfrecord_lib.read_manifest(self.path_base))
+    shards = [{'path': 'records-00000-of-00001.tfrecord', 'num_records': 2}]
+    tfrecord_lib.write_manifest(self.path_base, shards)
+    self.assertEqual(
+        {'compression': None, 'num_records': 2, 'shards': shards},
+        tfrecord_lib.read_manifest(self.path_base))
+    self.assertEqual(['records.manifest.json'], os.listdir(self.root_dir))
+
+  def testShardedWriterMaxRecords(self):
+    records = ['record_%d' % i for i in range(7)]
+    writer = tfrecord_lib.ShardedTFRecordWriter(self.path_base, max_records=3)
+    for record in records:
+      writer.write(record)
+    paths = writer.close()
+
+    self.assertEqual(
+        ['records-00000-of-00003.tfrecord',
+         'records-00001-of-00003.tfrecord',
+         'records-00002-of-00003.tfrecord'],
+        [os.path.basename(path) for path in paths])
+    self.assertEqual(
+        [records[:3], records[3:6], records[6:]],
+        [list(tf.python_io.tf_record_iterator(path)) for path in paths])
+    self.assertEqual([], tf.gfile.Glob(self.path_base + '-*.tmp'))
+
+  def testShardedWriterDeletesOldShards(self):
+    writer = tfrecord_lib.ShardedTFRecordWriter(
+        self.path_base, max_records=1, compression='GZIP')
+    for record in ['a', 'b', 'c']:
+      writer.write(record)
+    writer.close()
+    # A crashed run leaves a temporary shard, and another dataset shares the
+    # prefix.
+    for name in ['records-00003.tmp', 'records-eval-00000-of-00001.tfrecord']:
+      with tf.gfile.Open(os.path.join(self.root_dir, name), 'w') as f:
+        f.write('')
+
+    writer = tfrecord_lib.ShardedTFRecordWriter(self.path_base, max_records=2)
+    for record in ['d', 'e', 'f']:
+      writer.write(record)
+    paths = writer.close()
+
+    self.assertEqual(
+        ['records-00000-of-00002.tfrecord',
+         'records-00001-of-00002.tfrecord',
+         'records-eval-00000-of-00001.tfrecord',
+         'records.manifest.json'],
+        sorted(os.listdir(self.root_dir)))
+    self.assertEqual(
+        [['d', 'e'], ['f']],
+        [list(tf.python_io.tf_record_iterator(path)) for path in paths])
+
+  def testShardedWriterMaxBytes(self):
+    # Each record takes 10 bytes of data plus 16 bytes of framing.
+    records = ['%010d' % i for i in range(5)]
+    writer = tfrecord_lib.ShardedTFRecordWriter(self.path_base, max_bytes=60)
+    for record in records:
+      writer.write(record)
+    paths = writer.close()
+
+    self.assertEqual(
+        [records[:2], records[2:4], records[4:]],
+        [list(tf.python_io.tf_record_iterator(path)) for path in paths])
+
+  def testShardedWriterManifest(self):
+    writer = tfrecord_lib.ShardedTFRecordWriter(
+        self.path_base, max_records=2, compression='ZLIB')
+    for record in ['a', 'bb', 'ccc']:
+      writer.write(record)
+    writer.close()
+
+    with tf.gfile.Open(self.path_base + '.manifest.json') as f:
+      manifest = json.loads(f.read())
+    self.assertEqual('ZLIB', manifest['compression'])
+    self.assertEqual(3, manifest['num_records'])
+    self.assertEqual(
+        [{'path': 'records-00000-of-00002.tfrecord.zlib',
+          'num_records': 2, 'num_bytes': 35},
+         {'path': 'records-00001-of-00002.tfrecord.zlib',
+          'num_records': 1, 'num_bytes': 19}],
+        manifest['shards'])
+
+  def testTFRecordIteratorGlobCompressed(self):
+    records = ['record_%d' % i for i in range(5)]
+    writer = tfrecord_lib.ShardedTFRecordWriter(
+        self.path_base, max_records=2, compression='GZIP')
+    for record in records:
+      writer.write(record)
+    writer.close()
+
+    self.assertEqual(
+        records,
+        list(tfrecord_lib.tf_record_iterator(self.path_base + '-*')))
+
+  def testExpandFilePatterns(self):
+    for name in ['b.tfrecord', 'a.tfrecord', 'c.txt']:
+      with tf.gfile.Open(os.path.join(self.root_dir, name), 'w') as f:
+        f.write('')
+    missing = os.path.join(self.root_dir, 'missing.tfrecord')
+
+    self.assertEqual(
+        [os.path.join(self.root_dir, 'a.tfrecord'),
+         os.path.join(self.root_dir, 'b.tfrecord'),
+         missing],
+        tfrecord_lib.expand_file_patterns(
+            [os.path.join(self.root_dir, '*.tfrecord'), missing]))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -21,14 +21,11 @@ import os
 
 # internal imports
 import tensorflow as tf
-import magenta
 
 from magenta.models.melody_rnn import melody_rnn_config_flags
-from magenta.pipelines import dag_pipeline
-from magenta.pipelines import melody_pipelines
+from magenta.models.melody_rnn import melody_rnn_pipeline
+from magenta.pipelines import metrics_exporter as metrics_exporter_lib
 from magenta.pipelines import pipeline
-from magenta.pipelines import pipelines_common
-from magenta.protobuf import music_pb2
 
 FLAGS = tf.app.flags.FLAGS
 
@@ -41,66 +38,60 @@ tf.app.flags.DEFINE_string('output_dir', None,
 tf.app.flags.DEFINE_float('eval_ratio', 0.0,
                           'Fraction of input to set aside for eval set. '
                           'Partition is randomly selected.')
+tf.app.flags.DEFINE_integer('num_processes', 1,
+                            'Number of worker processes used to create the '
+                            'dataset. If greater than 1, inputs are '
+                            'processed in parallel.')
+tf.app.flags.DEFINE_integer('max_records_per_shard', 0,
+                            'If greater than 0, each dataset is written to '
+                            'shards of at most this many records.')
+tf.app.flags.DEFINE_integer('max_bytes_per_shard', 0,
+                            'If greater than 0, each dataset is written to '
+                            'shards of at most this many bytes.')
+tf.app.flags.DEFINE_string('compression', '',
+                           'Compression type for the dataset files, GZIP or '
+                           'ZLIB. Leave empty for no compression.')
+tf.app.flags.DEFINE_bool('instrument_pipeline', False,
+                         'If true, the time taken and outputs produced by '
+                         'each stage of the pipeline are logged with the '
+                         'other statistics.')
+tf.app.flags.DEFINE_string('pipeline_validation', 'full',
+                           'How much of the output of each stage of the '
+                           'pipeline is checked against its output type: '
+                           '`full`, `sampled`, or `off`.')
+tf.app.flags.DEFINE_bool('streaming', False,
+                         'If true, each melody is encoded and written as soon '
+                         'as it is extracted, instead of after all melodies '
+                         'in the input are extracted. Reduces memory use. '
+                         'Only used when `--num_processes` is 1.')
+tf.app.flags.DEFINE_integer('metrics_port', 0,
+                            'If greater than 0, the pipeline statistics are '
+                            'served in the Prometheus text format over HTTP '
+                            'on this port while the dataset is created.')
+tf.app.flags.DEFINE_string('metrics_file', '',
+                           'If given, the pipeline statistics are '
+                           'periodically written to this file in the '
+                           'Prometheus text format.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
 
 
-class EncoderPipeline(pipeline.Pipeline):
-  """A Module that converts monophonic melodies to a model specific encoding."""
-
-  def __init__(self, config):
-    """Constructs an EncoderPipeline.
-
-    Args:
-      config: A MelodyRnnConfig that specifies the encoder/decoder, pitch range,
-          and what key to transpose into.
-    """
-    super(EncoderPipeline, self).__init__(
-        input_type=magenta.music.Melody,
-        output_type=tf.train.SequenceExample)
-    self._melody_encoder_decoder = config.encoder_decoder
-    self._min_note = config.min_note
-    self._max_note = config.max_note
-    self._transpose_to_key = config.transpose_to_key
-
-  def transform(self, melody):
-    melody.squash(
-        self._min_note,
-        self._max_note,
-        self._transpose_to_key)
-    encoded = self._melody_encoder_decoder.encode(melody)
-    return [encoded]
-
-  def get_stats(self):
-    return {}
-
-
 def get_pipeline(config):
   """Returns the Pipeline instance which creates the RNN dataset.
 
+  The eval ratio, instrumentation, and validation are read from flags.
+
   Args:
     config: A MelodyRnnConfig object.
 
   Returns:
     A pipeline.Pipeline instance.
   """
-  quantizer = pipelines_common.Quantizer(steps_per_quarter=4)
-  melody_extractor = melody_pipelines.MelodyExtractor(
-      min_bars=7, max_steps=512, min_unique_pitches=5,
-      gap_bars=1.0, ignore_polyphonic_notes=False)
-  encoder_pipeline = EncoderPipeline(config)
-  partitioner = pipelines_common.RandomPartition(
-      tf.train.SequenceExample,
-      ['eval_melodies', 'training_melodies'],
-      [FLAGS.eval_ratio])
-
-  dag = {quantizer: dag_pipeline.Input(music_pb2.NoteSequence),
-         melody_extractor: quantizer,
-         encoder_pipeline: melody_extractor,
-         partitioner: encoder_pipeline,
-         dag_pipeline.Output(): partitioner}
-  return dag_pipeline.DAGPipeline(dag)
+  return melody_rnn_pipeline.get_pipeline(
+      config, eval_ratio=FLAGS.eval_ratio,
+      instrument=FLAGS.instrument_pipeline,
+      validation=FLAGS.pipeline_validation)
 
 
 def run_from_flags():
@@ -110,10 +101,39 @@ def run_from_flags():
   pipeline_instance = get_pipeline(config)
   FLAGS.input = os.path.expanduser(FLAGS.input)
   FLAGS.output_dir = os.path.expanduser(FLAGS.output_dir)
-  pipeline.run_pipeline_serial(
-      pipeline_instance,
-      pipeline.tf_record_iterator(FLAGS.input, pipeline_instance.input_type),
-      FLAGS.output_dir)
+  input_iterator = pipeline.tf_record_iterator(
+      FLAGS.input, pipeline_instance.input_type)
+  output_options = {
+      'max_records_per_shard': FLAGS.max_records_per_shard or None,
+      'max_bytes_per_shard': FLAGS.max_bytes_per_shard or None,
+      'compression': FLAGS.compression or None,
+  }
+  metrics_exporter = None
+  if FLAGS.metrics_port or FLAGS.metrics_file:
+    metrics_exporter = metrics_exporter_lib.MetricsExporter(
+        port=FLAGS.metrics_port or None,
+        output_file=(os.path.expanduser(FLAGS.metrics_file)
+                     if FLAGS.metrics_file else None))
+  try:
+    if FLAGS.num_processes > 1:
+      pipeline.run_pipeline_parallel(
+          pipeline_instance,
+          input_iterator,
+          FLAGS.output_dir,
+          num_processes=FLAGS.num_processes,
+          metrics_exporter=metrics_exporter,
+          **output_options)
+    else:
+      pipeline.run_pipeline_serial(
+          pipeline_instance,
+          input_iterator,
+          FLAGS.output_dir,
+          streaming=FLAGS.streaming,
+          metrics_exporter=metrics_exporter,
+          **output_options)
+  finally:
+    if metrics_exporter is not None:
+      metrics_exporter.close()
 
 
 def main(unused_argv):
@@ -21,8 +21,6 @@ import os
 import time
 
 # internal imports
-from six.moves import range  # pylint: disable=redefined-builtin
-
 import tensorflow as tf
 import magenta
 
@@ -219,13 +217,13 @@ def run_with_flags(generator):
   tf.logging.debug('input_sequence: %s', input_sequence)
   tf.logging.debug('generator_options: %s', generator_options)
 
-  # Make the generate request num_outputs times and save the output as midi
-  # files.
+  # Generate num_outputs sequences in a single batch and save the output as
+  # midi files.
+  generated_sequences = generator.generate_multiple(
+      input_sequence, generator_options, FLAGS.num_outputs)
   date_and_time = time.strftime('%Y-%m-%d_%H%M%S')
   digits = len(str(FLAGS.num_outputs))
-  for i in range(FLAGS.num_outputs):
-    generated_sequence = generator.generate(input_sequence, generator_options)
-
+  for i, generated_sequence in enumerate(generated_sequences):
     midi_filename = '%s_%s.mid' % (date_and_time, str(i + 1).zfill(digits))
     midi_path = os.path.join(FLAGS.output_dir, midi_filename)
     magenta.music.sequence_proto_to_midi_file(generated_sequence, midi_path)
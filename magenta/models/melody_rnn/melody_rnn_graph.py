@@ -18,7 +18,8 @@ import tensorflow as tf
 import magenta
 
 
-def build_graph(mode, config, sequence_example_file=None):
+def build_graph(mode, config, sequence_example_file=None, num_readers=1,
+                shuffle_buffer_size=0, bucket_boundaries=None):
   """Builds the TensorFlow graph.
 
   Args:
@@ -27,8 +28,14 @@ def build_graph(mode, config, sequence_example_file=None):
     config: A MelodyRnnConfig containing the MelodyEncoderDecoder and HParams to
         use.
     sequence_example_file: A string path to a TFRecord file containing
-        tf.train.SequenceExample protos. Only needed for training and
-        evaluation.
+        tf.train.SequenceExample protos, or a glob pattern matching the shards
+        of a sharded dataset. Only needed for training and evaluation.
+    num_readers: The number of TFRecord readers reading training or evaluation
+        data in parallel.
+    shuffle_buffer_size: If greater than 0, training or evaluation examples are
+        shuffled in a buffer holding at least this many examples.
+    bucket_boundaries: An optional sorted list of sequence lengths used to
+        batch training or evaluation examples of similar length together.
 
   Returns:
     A tf.Graph instance which contains the TF ops.
@@ -57,11 +64,14 @@ def build_graph(mode, config, sequence_example_file=None):
 
     if mode == 'train' or mode == 'eval':
       inputs, labels, lengths = magenta.common.get_padded_batch(
-          [sequence_example_file], hparams.batch_size, input_size)
+          [sequence_example_file], hparams.batch_size, input_size,
+          num_readers=num_readers, shuffle_buffer_size=shuffle_buffer_size,
+          bucket_boundaries=bucket_boundaries)
 
     elif mode == 'generate':
-      inputs = tf.placeholder(tf.float32, [hparams.batch_size, None,
-                                           input_size])
+      # The batch dimension is left unspecified so that any number of event
+      # sequences can be extended in a single run of the graph.
+      inputs = tf.placeholder(tf.float32, [None, None, input_size])
       # If state_is_tuple is True, the output RNN cell state will be a tuple
       # instead of a tensor. During training and evaluation this improves
       # performance. However, during generation, the RNN cell state is fed
@@ -81,7 +91,9 @@ def build_graph(mode, config, sequence_example_file=None):
     if hparams.attn_length:
       cell = tf.contrib.rnn.AttentionCellWrapper(
           cell, hparams.attn_length, state_is_tuple=state_is_tuple)
-    initial_state = cell.zero_state(hparams.batch_size, tf.float32)
+    batch_size = (tf.shape(inputs)[0] if mode == 'generate'
+                  else hparams.batch_size)
+    initial_state = cell.zero_state(batch_size, tf.float32)
 
     outputs, final_state = tf.nn.dynamic_rnn(
         cell, inputs, lengths, initial_state, parallel_iterations=1,
@@ -117,6 +129,10 @@ def build_graph(mode, config, sequence_example_file=None):
           tf.reduce_sum(tf.mul(correct_predictions, no_event_positions)),
           tf.reduce_sum(no_event_positions)) * 100
 
+      # The fraction of the padded batch that is covered by actual events.
+      padding_efficiency = magenta.common.get_padding_efficiency(
+          inputs, lengths)
+
       global_step = tf.Variable(0, trainable=False, name='global_step')
 
       tf.add_to_collection('loss', loss)
@@ -130,6 +146,7 @@ def build_graph(mode, config, sequence_example_file=None):
           tf.scalar_summary('accuracy', accuracy),
           tf.scalar_summary('event_accuracy', event_accuracy),
           tf.scalar_summary('no_event_accuracy', no_event_accuracy),
+          tf.scalar_summary('padding_efficiency', padding_efficiency),
       ]
 
       if mode == 'train':
@@ -157,7 +174,8 @@ def build_graph(mode, config, sequence_example_file=None):
       temperature = tf.placeholder(tf.float32, [])
       softmax_flat = tf.nn.softmax(
           tf.div(logits_flat, tf.fill([num_classes], temperature)))
-      softmax = tf.reshape(softmax_flat, [hparams.batch_size, -1, num_classes])
+      softmax = tf.reshape(softmax_flat,
+                           tf.pack([batch_size, -1, num_classes]))
 
       tf.add_to_collection('inputs', inputs)
       tf.add_to_collection('initial_state', initial_state)
@@ -51,10 +51,29 @@ class MelodyRNNGraphTest(tf.test.TestCase):
         'eval', self.config, sequence_example_file='test')
     self.assertTrue(isinstance(g, tf.Graph))
 
+  def testBuildTrainGraphWithParallelReaders(self):
+    g = melody_rnn_graph.build_graph(
+        'train', self.config, sequence_example_file='test', num_readers=4,
+        shuffle_buffer_size=100)
+    self.assertTrue(isinstance(g, tf.Graph))
+
+  def testBuildTrainGraphWithBuckets(self):
+    g = melody_rnn_graph.build_graph(
+        'train', self.config, sequence_example_file='test',
+        bucket_boundaries=[64, 128, 256])
+    self.assertTrue(isinstance(g, tf.Graph))
+
   def testBuildGenerateGraph(self):
     g = melody_rnn_graph.build_graph('generate', self.config)
     self.assertTrue(isinstance(g, tf.Graph))
 
+  def testGenerateGraphHasDynamicBatchSize(self):
+    g = melody_rnn_graph.build_graph('generate', self.config)
+    inputs = g.get_collection('inputs')[0]
+    initial_state = g.get_collection('initial_state')[0]
+    self.assertEqual(None, inputs.get_shape()[0].value)
+    self.assertEqual(None, initial_state.get_shape()[0].value)
+
   def testBuildGraphWithAttention(self):
     self.config.hparams.attn_length = 10
     g = melody_rnn_graph.build_graph(
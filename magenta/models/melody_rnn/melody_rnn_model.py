@@ -13,6 +13,7 @@
 # limitations under the License.
 """Melody RNN model."""
 
+import collections
 import copy
 import heapq
 
@@ -57,35 +58,63 @@ class MelodyRnnModel(mm.BaseModel):
     # TODO(fjord): once this class supports training, make this step conditional
     # on the usage mode.
     self._config.hparams.dropout_keep_prob = 1.0
-    self._config.hparams.batch_size = 1
 
   def _build_graph_for_generation(self):
     return melody_rnn_graph.build_graph('generate', self._config)
 
+  def _graph_batch_size(self):
+    """Returns the fixed batch size of the generation graph.
+
+    Graphs built by `melody_rnn_graph` have a dynamic batch dimension, but
+    metagraphs from older bundles were built with a fixed batch size.
+
+    Returns:
+      The integer batch size of the graph inputs, or None if the graph accepts
+      batches of any size.
+    """
+    graph_inputs = self._session.graph.get_collection('inputs')[0]
+    return graph_inputs.get_shape()[0].value
+
+  def _get_initial_state(self, inputs):
+    """Returns the initial RNN state for a batch of inputs.
+
+    Args:
+      inputs: A Python list of model inputs, one for each melody.
+
+    Returns:
+      A numpy array containing the initial RNN states, where
+      `initial_state.shape[0]` is equal to the length of `inputs`.
+    """
+    graph_initial_state = self._session.graph.get_collection('initial_state')[0]
+    batch_size = self._graph_batch_size()
+    if batch_size is None:
+      graph_inputs = self._session.graph.get_collection('inputs')[0]
+      return self._session.run(graph_initial_state, {graph_inputs: inputs})
+    return np.tile(self._session.run(graph_initial_state)[0, :],
+                   (len(inputs), 1))
+
   def _generate_step_for_batch(self, melodies, inputs, initial_state,
                                temperature):
     """Extends a batch of melodies by a single step each.
 
-    This method modifies the melodies in place.
+    This method modifies the melodies in place. If the batch has been padded
+    to fit a graph with a fixed batch size, `inputs` and `initial_state` may
+    contain more entries than `melodies`; the extra entries are ignored.
 
     Args:
-      melodies: A list of Melody objects. The list should have length equal to
-          `self._config.hparams.batch_size`.
-      inputs: A Python list of model inputs, with length equal to
-          `self._config.hparams.batch_size`.
+      melodies: A list of list-like melody event sequences.
+      inputs: A Python list of model inputs, with length at least the number of
+          melodies.
       initial_state: A numpy array containing the initial RNN state, where
-          `initial_state.shape[0]` is equal to
-          `self._config.hparams.batch_size`.
+          `initial_state.shape[0]` is equal to the length of `inputs`.
       temperature: The softmax temperature.
 
     Returns:
       final_state: The final RNN state, a numpy array the same size as
           `initial_state`.
-      softmax: The chosen softmax value for each melody, a 1-D numpy array of
-          length `self._config.hparams.batch_size`.
+      softmax: The chosen softmax value for each melody, a 1-D numpy array the
+          same length as `melodies`.
     """
-    assert len(melodies) == self._config.hparams.batch_size
-
     graph_inputs = self._session.graph.get_collection('inputs')[0]
     graph_initial_state = self._session.graph.get_collection('initial_state')[0]
     graph_final_state = self._session.graph.get_collection('final_state')[0]
@@ -107,10 +136,12 @@ class MelodyRnnModel(mm.BaseModel):
   def _generate_step(self, melodies, inputs, initial_state, temperature):
     """Extends a list of melodies by a single step each.
 
-    This method modifies the melodies in place.
+    This method modifies the melodies in place. When the graph has a dynamic
+    batch dimension, all melodies are extended with a single run of the graph.
+    Otherwise the melodies are split into batches of the graph's batch size.
 
     Args:
-      melodies: A list of Melody objects.
+      melodies: A list of list-like melody event sequences.
       inputs: A Python list of model inputs, with length equal to the number of
           melodies.
       initial_state: A numpy array containing the initial RNN states, where
@@ -123,125 +154,153 @@ class MelodyRnnModel(mm.BaseModel):
       softmax: The chosen softmax value for each melody, a 1-D numpy array the
           same length as `melodies`.
     """
-    batch_size = self._config.hparams.batch_size
-    num_full_batches = len(melodies) / batch_size
+    batch_size = self._graph_batch_size()
+    if batch_size is None:
+      return self._generate_step_for_batch(
+          melodies, inputs, initial_state, temperature)
 
     final_state = np.empty((len(melodies), initial_state.shape[1]))
     softmax = np.empty(len(melodies))
 
-    offset = 0
-    for _ in range(num_full_batches):
-      # Generate a single step for one batch of melodies.
-      batch_indices = range(offset, offset + batch_size)
+    for offset in range(0, len(melodies), batch_size):
+      batch_indices = range(offset, min(offset + batch_size, len(melodies)))
+      batch_inputs = [inputs[i] for i in batch_indices]
+      batch_initial_state = initial_state[batch_indices, :]
+      pad_size = batch_size - len(batch_indices)
+      if pad_size:
+        # There's a non-full final batch. Pad the inputs and state with copies
+        # of the final entry; only the real melodies are extended.
+        batch_inputs += [inputs[-1]] * pad_size
+        batch_initial_state = np.append(
+            batch_initial_state,
+            np.tile(initial_state[-1, :], (pad_size, 1)),
+            axis=0)
       batch_final_state, batch_softmax = self._generate_step_for_batch(
-          [melodies[i] for i in batch_indices],
-          [inputs[i] for i in batch_indices],
-          initial_state[batch_indices, :],
-          temperature)
-      final_state[batch_indices, :] = batch_final_state
+          [melodies[i] for i in batch_indices], batch_inputs,
+          batch_initial_state, temperature)
+      final_state[batch_indices, :] = batch_final_state[:len(batch_indices)]
       softmax[batch_indices] = batch_softmax
-      offset += batch_size
-
-    if offset < len(melodies):
-      # There's an extra non-full batch. Pad it with a bunch of copies of the
-      # final melody.
-      num_extra = len(melodies) - offset
-      pad_size = batch_size - num_extra
-      batch_indices = range(offset, len(melodies))
-      batch_final_state, batch_softmax = self._generate_step_for_batch(
-          [melodies[i] for i in batch_indices] + [copy.deepcopy(melodies[-1])
-                                                  for _ in range(pad_size)],
-          [inputs[i] for i in batch_indices] + inputs[-1] * pad_size,
-          np.append(initial_state[batch_indices, :],
-                    np.tile(inputs[-1, :], (pad_size, 1)),
-                    axis=0),
-          temperature)
-      final_state[batch_indices] = batch_final_state[0:num_extra, :]
-      softmax[batch_indices] = batch_softmax[0:num_extra]
 
     return final_state, softmax
 
-  def _generate_branches(self, melodies, loglik, branch_factor, num_steps,
-                         inputs, initial_state, temperature):
+  def _generate_branches(self, melodies, encoder_states, loglik, branch_factor,
+                         num_steps, inputs, initial_state, temperature):
     """Performs a single iteration of branch generation for beam search.
 
     This method generates `branch_factor` branches for each melody in
     `melodies`, where each branch extends the melody by `num_steps` steps.
+    Branches share the history of the melody they extend rather than copying
+    it. The inputs for each step after the first are computed from the encoder
+    state of each branch, which is advanced by one event per step, so they
+    never rescan the melody history.
 
     Args:
-      melodies: A list of Melody objects.
+      melodies: A list of SharedPrefixEventSequence objects.
+      encoder_states: A list of encoder states, one for each melody, each of
+          which covers every event of its melody.
       loglik: A 1-D numpy array of melody log-likelihoods, the same size as
           `melodies`.
       branch_factor: The integer branch factor to use.
       num_steps: The integer number of melody steps to take per branch.
-      inputs: A Python list of model inputs, with length equal to the number of
-          melodies.
+      inputs: A Python list of model inputs for the first step, with length
+          equal to the number of melodies.
       initial_state: A numpy array containing the initial RNN states, where
           `initial_state.shape[0]` is equal to the number of melodies.
       temperature: The softmax temperature.
 
     Returns:
-      all_melodies: A list of Melody objects, with `branch_factor` times as
-          many melodies as the initial list of melodies.
+      all_melodies: A list of SharedPrefixEventSequence objects, with
+          `branch_factor` times as many melodies as the initial list of
+          melodies.
+      all_encoder_states: A list of encoder states, one for each melody in
+          `all_melodies`.
       all_final_state: A numpy array of final RNN states, where
           `final_state.shape[0]` is equal to the length of `all_melodies`.
       all_loglik: A 1-D numpy array of melody log-likelihoods, with length equal
           to the length of `all_melodies`.
     """
-    all_melodies = [copy.deepcopy(melody)
-                    for melody in melodies * branch_factor]
+    encoder_decoder = self._config.encoder_decoder
+    all_melodies = [copy.copy(melody) for melody in melodies * branch_factor]
+    all_encoder_states = [copy.deepcopy(encoder_state)
+                          for encoder_state in encoder_states * branch_factor]
     all_inputs = inputs * branch_factor
     all_final_state = np.tile(initial_state, (branch_factor, 1))
     all_loglik = np.tile(loglik, (branch_factor,))
 
-    for _ in range(num_steps):
+    for i in range(num_steps):
+      if i > 0:
+        # Subsequent steps only need to feed the most recent event.
+        all_inputs = encoder_decoder.get_inputs_batch_incremental(
+            all_melodies, all_encoder_states)
       all_final_state, all_softmax = self._generate_step(
           all_melodies, all_inputs, all_final_state, temperature)
       all_loglik += np.log(all_softmax)
+      for melody, encoder_state in zip(all_melodies, all_encoder_states):
+        encoder_decoder.update_state(encoder_state, melody[-1])
 
-    return all_melodies, all_final_state, all_loglik
+    return all_melodies, all_encoder_states, all_final_state, all_loglik
 
-  def _prune_branches(self, melodies, final_state, loglik, k):
-    """Prune all but `k` melodies.
+  def _prune_branches(self, melodies, encoder_states, final_state, loglik,
+                      beams, k):
+    """Prune all but `k` melodies in each beam.
 
-    This method prunes all but the `k` melodies with highest log-likelihood.
+    This method prunes all but the `k` melodies with highest log-likelihood
+    from each beam.
 
     Args:
-      melodies: A list of Melody objects.
+      melodies: A list of SharedPrefixEventSequence objects.
+      encoder_states: A list of encoder states, one for each melody.
       final_state: A numpy array containing the final RNN states, where
           `final_state.shape[0]` is equal to the number of melodies.
       loglik: A 1-D numpy array of melody log-likelihoods, the same size as
           `melodies`.
-      k: The number of melodies to keep after pruning.
+      beams: A 1-D numpy array of integer beam indices, the same size as
+          `melodies`, identifying the beam each melody belongs to.
+      k: The number of melodies to keep in each beam after pruning.
 
     Returns:
-      melodies: The pruned list of Melody objects, of length `k`.
-      final_state: The pruned numpy array of final RNN states, where
-          `final_state.shape[0]` is equal to `k`.
-      loglik: The pruned melody log-likelihoods, a 1-D numpy array of length
-          `k`.
+      melodies: The pruned list of SharedPrefixEventSequence objects, ordered
+          by beam with `k` melodies per beam.
+      encoder_states: The pruned list of encoder states.
+      final_state: The pruned numpy array of final RNN states.
+      loglik: The pruned melody log-likelihoods, a 1-D numpy array.
+      beams: The pruned beam indices, a 1-D numpy array.
     """
-    indices = heapq.nlargest(k, range(len(melodies)), key=lambda i: loglik[i])
+    indices = []
+    for beam in np.unique(beams):
+      beam_indices = np.flatnonzero(beams == beam)
+      indices.extend(
+          heapq.nlargest(k, beam_indices, key=lambda i: loglik[i]))
 
     melodies = [melodies[i] for i in indices]
+    encoder_states = [encoder_states[i] for i in indices]
     final_state = final_state[indices, :]
     loglik = loglik[indices]
+    beams = beams[indices]
 
-    return melodies, final_state, loglik
+    return melodies, encoder_states, final_state, loglik, beams
 
-  def _beam_search(self, melody, num_steps, temperature, beam_size,
+  def _beam_search(self, melodies, num_steps, temperature, beam_size,
                    branch_factor, steps_per_iteration):
-    """Generates a melody using beam search.
-
-    Initially, the beam is filled with `beam_size` copies of the initial
-    melody.
-
-    Each iteration, the beam is pruned to contain only the `beam_size` melodies
-    with highest likelihood. Then `branch_factor` new melodies are generated
-    for each melody in the beam. These new melodies are formed by extending
-    each melody in the beam by `steps_per_iteration` steps. So between a
-    branching and a pruning phase, there will be `beam_size` * `branch_factor`
-    active melodies.
+    """Generates melodies using beam search.
+
+    A separate beam is searched for each initial melody, but all beams are
+    extended together so that each generation step runs the graph once for
+    every active melody.
+
+    Initially, each beam is filled with `beam_size` copies of its initial
+    melody. During the search melodies are SharedPrefixEventSequence objects,
+    so branching a melody never copies its history; only the winning melody
+    of each beam is converted back to a Melody at the end. Each melody also
+    carries an encoder state, so computing the inputs for the next step never
+    rescans its history either.
+
+    Each iteration, each beam is pruned to contain only the `beam_size`
+    melodies with highest likelihood. Then `branch_factor` new melodies are
+    generated for each melody in the beam. These new melodies are formed by
+    extending each melody in the beam by `steps_per_iteration` steps. So
+    between a branching and a pruning phase, there will be `beam_size` *
+    `branch_factor` active melodies per beam.
 
     Prior to the first "real" iteration, an initial branch generation will take
     place. This is for two reasons:
@@ -252,13 +311,12 @@ class MelodyRnnModel(mm.BaseModel):
        such that all subsequent iterations can generate `steps_per_iteration`
        steps.
 
-    After the final iteration, the single melody in the beam with highest
+    After the final iteration, the single melody in each beam with highest
     likelihood will be returned.
 
     Args:
-      melody: The initial melody.
-      num_steps: The integer length in steps of the final melody, after
-          generation.
+      melodies: A list of initial melodies, all of the same length.
+      num_steps: The integer number of steps to add to each melody.
       temperature: A float specifying how much to divide the logits by
          before computing the softmax. Greater than 1.0 makes melodies more
          random, less than 1.0 makes melodies less random.
@@ -268,43 +326,128 @@ class MelodyRnnModel(mm.BaseModel):
           iteration.
 
     Returns:
-      The highest-likelihood melody as computed by the beam search.
+      A list containing the highest-likelihood melody for each initial melody,
+      as computed by the beam search, in the same order as `melodies`.
     """
-    melodies = [copy.deepcopy(melody) for _ in range(beam_size)]
-    graph_initial_state = self._session.graph.get_collection('initial_state')[0]
-    loglik = np.zeros(beam_size)
+    primer_melodies = melodies
+    primer_inputs = self._config.encoder_decoder.get_inputs_batch(
+        primer_melodies, full_length=True)
+    shared_primer_melodies = [mm.SharedPrefixEventSequence(melody)
+                              for melody in primer_melodies]
+    primer_encoder_states = [self._config.encoder_decoder.get_state(melody)
+                             for melody in primer_melodies]
+
+    beams = np.repeat(np.arange(len(primer_melodies)), beam_size)
+    melodies = [copy.copy(shared_primer_melodies[beam]) for beam in beams]
+    encoder_states = [copy.deepcopy(primer_encoder_states[beam])
+                      for beam in beams]
+    inputs = [primer_inputs[beam] for beam in beams]
+    loglik = np.zeros(len(melodies))
 
     # Choose the number of steps for the first iteration such that subsequent
     # iterations can all take the same number of steps.
     first_iteration_num_steps = (num_steps - 1) % steps_per_iteration + 1
 
-    inputs = self._config.encoder_decoder.get_inputs_batch(
-        melodies, full_length=True)
-    initial_state = np.tile(
-        self._session.run(graph_initial_state), (beam_size, 1))
-    melodies, final_state, loglik = self._generate_branches(
-        melodies, loglik, branch_factor, first_iteration_num_steps, inputs,
-        initial_state, temperature)
+    initial_state = self._get_initial_state(inputs)
+    melodies, encoder_states, final_state, loglik = self._generate_branches(
+        melodies, encoder_states, loglik, branch_factor,
+        first_iteration_num_steps, inputs, initial_state, temperature)
+    beams = np.tile(beams, branch_factor)
 
     num_iterations = (num_steps -
                       first_iteration_num_steps) / steps_per_iteration
 
     for _ in range(num_iterations):
-      melodies, final_state, loglik = self._prune_branches(
-          melodies, final_state, loglik, k=beam_size)
-      inputs = self._config.encoder_decoder.get_inputs_batch(melodies)
-      melodies, final_state, loglik = self._generate_branches(
-          melodies, loglik, branch_factor, steps_per_iteration, inputs,
-          final_state, temperature)
+      melodies, encoder_states, final_state, loglik, beams = (
+          self._prune_branches(melodies, encoder_states, final_state, loglik,
+                               beams, k=beam_size))
+      inputs = self._config.encoder_decoder.get_inputs_batch_incremental(
+          melodies, encoder_states)
+      melodies, encoder_states, final_state, loglik = self._generate_branches(
+          melodies, encoder_states, loglik, branch_factor, steps_per_iteration,
+          inputs, final_state, temperature)
+      beams = np.tile(beams, branch_factor)
+
+    # Prune to a single melody per beam.
+    melodies, _, final_state, loglik, beams = self._prune_branches(
+        melodies, encoder_states, final_state, loglik, beams, k=1)
+
+    generated_melodies = []
+    for melody, melody_loglik, beam in zip(melodies, loglik, beams):
+      tf.logging.info('Beam search yields melody with log-likelihood: %f ',
+                      melody_loglik)
+      generated_melody = copy.deepcopy(primer_melodies[beam])
+      for event in melody[len(generated_melody):]:
+        generated_melody.append(event)
+      generated_melodies.append(generated_melody)
+
+    return generated_melodies
+
+  def generate_melodies(self, num_steps, primer_melodies, temperature=1.0,
+                        beam_size=1, branch_factor=1, steps_per_iteration=1):
+    """Generate melodies from a list of primer melodies.
+
+    Primer melodies of the same length are extended together, with a single
+    run of the graph per generation step for all of them. This is much faster
+    than calling `generate_melody` once per primer, e.g. when generating
+    several outputs from the same primer.
 
-    # Prune to a single melody.
-    melodies, final_state, loglik = self._prune_branches(
-        melodies, final_state, loglik, k=1)
+    Args:
+      num_steps: The integer length in steps of each final melody, after
+          generation. Includes the primer.
+      primer_melodies: A list of primer melodies, Melody objects.
+      temperature: A float specifying how much to divide the logits by
+         before computing the softmax. Greater than 1.0 makes melodies more
+         random, less than 1.0 makes melodies less random.
+      beam_size: An integer, beam size to use when generating melodies via beam
+          search.
+      branch_factor: An integer, beam search branch factor to use.
+      steps_per_iteration: An integer, number of melody steps to take per beam
+          search iteration.
 
-    tf.logging.info('Beam search yields melody with log-likelihood: %f ',
-                    loglik[0])
+    Returns:
+      A list of generated Melody objects, one for each primer melody in the
+      same order as `primer_melodies` (each begins with its primer melody).
 
-    return melodies[0]
+    Raises:
+      MelodyRnnModelException: If any primer melody has zero length or is not
+          shorter than num_steps.
+    """
+    for primer_melody in primer_melodies:
+      if not primer_melody:
+        raise MelodyRnnModelException(
+            'primer melody must have non-zero length')
+      if len(primer_melody) >= num_steps:
+        raise MelodyRnnModelException(
+            'primer melody must be shorter than `num_steps`')
+
+    melodies = [copy.deepcopy(primer_melody)
+                for primer_melody in primer_melodies]
+
+    transpose_amounts = [
+        melody.squash(
+            self._config.min_note,
+            self._config.max_note,
+            self._config.transpose_to_key)
+        for melody in melodies]
+
+    # The model is primed with the full-length inputs of each melody, so only
+    # melodies of the same length can be generated together.
+    indices_by_length = collections.defaultdict(list)
+    for i, melody in enumerate(melodies):
+      indices_by_length[len(melody)].append(i)
+
+    for length, indices in sorted(indices_by_length.items()):
+      generated_melodies = self._beam_search(
+          [melodies[i] for i in indices], num_steps - length, temperature,
+          beam_size, branch_factor, steps_per_iteration)
+      for i, melody in zip(indices, generated_melodies):
+        melodies[i] = melody
+
+    for melody, transpose_amount in zip(melodies, transpose_amounts):
+      melody.transpose(-transpose_amount)
+
+    return melodies
 
   def generate_melody(self, num_steps, primer_melody, temperature=1.0,
                       beam_size=1, branch_factor=1, steps_per_iteration=1):
@@ -331,27 +474,9 @@ class MelodyRnnModel(mm.BaseModel):
       MelodyRnnModelException: If the primer melody has zero
           length or is not shorter than num_steps.
     """
-    if not primer_melody:
-      raise MelodyRnnModelException(
-          'primer melody must have non-zero length')
-    if len(primer_melody) >= num_steps:
-      raise MelodyRnnModelException(
-          'primer melody must be shorter than `num_steps`')
-
-    melody = copy.deepcopy(primer_melody)
-
-    transpose_amount = melody.squash(
-        self._config.min_note,
-        self._config.max_note,
-        self._config.transpose_to_key)
-
-    if num_steps > len(melody):
-      melody = self._beam_search(melody, num_steps - len(melody), temperature,
-                                 beam_size, branch_factor, steps_per_iteration)
-
-    melody.transpose(-transpose_amount)
-
-    return melody
+    return self.generate_melodies(
+        num_steps, [primer_melody], temperature, beam_size, branch_factor,
+        steps_per_iteration)[0]
 
 
 class MelodyRnnConfig(object):
@@ -0,0 +1,220 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for melody_rnn_model."""
+
+# internal imports
+import numpy as np
+import tensorflow as tf
+import magenta
+
+from magenta.models.melody_rnn import melody_rnn_model
+from magenta.models.melody_rnn import melody_rnn_sequence_generator
+from magenta.protobuf import generator_pb2
+from magenta.protobuf import music_pb2
+
+
+def build_fixed_batch_size_graph(config, batch_size):
+  """Builds a generation graph with a fixed batch size, like older bundles."""
+  input_size = config.encoder_decoder.input_size
+  num_classes = config.encoder_decoder.num_classes
+  with tf.Graph().as_default() as graph:
+    inputs = tf.placeholder(tf.float32, [batch_size, None, input_size])
+    cell = tf.nn.rnn_cell.BasicLSTMCell(
+        config.hparams.rnn_layer_sizes[0], state_is_tuple=False)
+    initial_state = cell.zero_state(batch_size, tf.float32)
+    outputs, final_state = tf.nn.dynamic_rnn(
+        cell, inputs, initial_state=initial_state)
+    outputs_flat = tf.reshape(outputs, [-1, config.hparams.rnn_layer_sizes[0]])
+    logits_flat = tf.contrib.layers.linear(outputs_flat, num_classes)
+    softmax = tf.reshape(tf.nn.softmax(logits_flat),
+                         [batch_size, -1, num_classes])
+
+    tf.add_to_collection('inputs', inputs)
+    tf.add_to_collection('initial_state', initial_state)
+    tf.add_to_collection('final_state', final_state)
+    tf.add_to_collection('softmax', softmax)
+  return graph
+
+
+class RecordingMelodyRnnModel(melody_rnn_model.MelodyRnnModel):
+  """A MelodyRnnModel that records the melodies and inputs of each step."""
+
+  def __init__(self, config):
+    super(RecordingMelodyRnnModel, self).__init__(config)
+    self.steps = []
+    self.batches = []
+
+  def _generate_step_for_batch(self, melodies, inputs, initial_state,
+                               temperature):
+    self.batches.append((len(melodies), len(inputs)))
+    return super(RecordingMelodyRnnModel, self)._generate_step_for_batch(
+        melodies, inputs, initial_state, temperature)
+
+  def _generate_step(self, melodies, inputs, initial_state, temperature):
+    self.steps.append(([list(melody) for melody in melodies], inputs))
+    return super(RecordingMelodyRnnModel, self)._generate_step(
+        melodies, inputs, initial_state, temperature)
+
+
+class MelodyRnnModelTest(tf.test.TestCase):
+
+  def setUp(self):
+    np.random.seed(0)
+    tf.set_random_seed(0)
+    self.config = melody_rnn_model.MelodyRnnConfig(
+        None,
+        magenta.music.KeyMelodyEncoderDecoder(
+            melody_rnn_model.DEFAULT_MIN_NOTE,
+            melody_rnn_model.DEFAULT_MAX_NOTE),
+        magenta.common.HParams(
+            batch_size=4,
+            rnn_layer_sizes=[8],
+            dropout_keep_prob=1.0,
+            skip_first_n_losses=0,
+            clip_norm=5,
+            initial_learning_rate=0.01,
+            decay_steps=1000,
+            decay_rate=0.85))
+
+  def initializeModel(self, model, graph=None):
+    """Initializes the model with a tiny generation graph."""
+    if graph is None:
+      graph = model._build_graph_for_generation()
+    with graph.as_default():
+      model._session = tf.Session()
+      model._session.run(tf.initialize_all_variables())
+
+  def testGenerationInputsMatchEventsToInput(self):
+    model = RecordingMelodyRnnModel(self.config)
+    self.initializeModel(model)
+    primer_melodies = [
+        magenta.music.Melody([60, -2, 62, -2, 64, -1]),
+        magenta.music.Melody([67, -2, -2, 65, -2, 64]),
+        magenta.music.Melody([72, -2, 71])]
+    model.generate_melodies(
+        20, primer_melodies, beam_size=2, branch_factor=3,
+        steps_per_iteration=4)
+
+    encoder_decoder = self.config.encoder_decoder
+    self.assertTrue(model.steps)
+    for melodies, inputs in model.steps:
+      self.assertEqual(len(melodies), len(inputs))
+      for events, melody_inputs in zip(melodies, inputs):
+        if len(melody_inputs) > 1:
+          # The model is primed with the inputs of the whole primer melody.
+          self.assertAllClose(encoder_decoder.inputs_array(events),
+                              melody_inputs)
+        else:
+          self.assertAllClose(
+              [encoder_decoder.events_to_input(events, len(events) - 1)],
+              melody_inputs)
+
+  def testBeamSearchKeepsBranchHistories(self):
+    model = RecordingMelodyRnnModel(self.config)
+    self.initializeModel(model)
+    primer_melody = magenta.music.Melody([60, -2, 62, -2])
+    generated_melodies = model._beam_search(
+        [primer_melody], num_steps=7, temperature=1.0, beam_size=2,
+        branch_factor=3, steps_per_iteration=2)
+
+    self.assertEqual(1, len(generated_melodies))
+    generated_events = list(generated_melodies[0])
+    self.assertEqual(11, len(generated_events))
+    self.assertEqual([60, -2, 62, -2], generated_events[:4])
+    self.assertEqual([60, -2, 62, -2], list(primer_melody))
+
+    # Each step extends `beam_size` * `branch_factor` branches. Every prefix of
+    # the winning melody is one of them, so extending a branch never changed
+    # the history of another branch sharing its prefix.
+    self.assertEqual([6] * 7, [len(melodies) for melodies, _ in model.steps])
+    for melodies, _ in model.steps:
+      self.assertIn(generated_events[:len(melodies[0])], melodies)
+
+  def testGenerateMelodiesGroupsByPrimerLength(self):
+    model = RecordingMelodyRnnModel(self.config)
+    self.initializeModel(model)
+    self.assertEqual(None, model._graph_batch_size())
+    primer_melodies = [
+        magenta.music.Melody([60, -2, 62]),
+        magenta.music.Melody([67, -2, 65, -2, 64]),
+        magenta.music.Melody([72, -2, 71])]
+    generated_melodies = model.generate_melodies(12, primer_melodies)
+
+    self.assertEqual(3, len(generated_melodies))
+    for primer_melody, generated_melody in zip(primer_melodies,
+                                               generated_melodies):
+      self.assertEqual(12, len(generated_melody))
+      self.assertEqual(list(primer_melody),
+                       list(generated_melody)[:len(primer_melody)])
+
+    # Primers of the same length are extended together, one group at a time,
+    # with a single run of the graph per step for each group.
+    self.assertEqual([2] * 9 + [1] * 7,
+                     [len(melodies) for melodies, _ in model.steps])
+    self.assertEqual([(2, 2)] * 9 + [(1, 1)] * 7, model.batches)
+    self.assertEqual([3, 5], [len(inputs[0]) for _, inputs in model.steps
+                              if len(inputs[0]) > 1])
+
+  def testGenerateMelodiesWithFixedBatchSize(self):
+    model = RecordingMelodyRnnModel(self.config)
+    self.initializeModel(
+        model, build_fixed_batch_size_graph(self.config, batch_size=2))
+    self.assertEqual(2, model._graph_batch_size())
+    primer_melodies = [magenta.music.Melody([60, -2, 62])] * 3
+    generated_melodies = model.generate_melodies(
+        10, primer_melodies, beam_size=1, branch_factor=1)
+
+    self.assertEqual(3, len(generated_melodies))
+    for generated_melody in generated_melodies:
+      self.assertEqual(10, len(generated_melody))
+      self.assertEqual([60, -2, 62], list(generated_melody)[:3])
+    # The melodies don't fit in a single batch, so each step runs the graph
+    # twice and pads the last batch.
+    self.assertEqual([3] * 7, [len(melodies) for melodies, _ in model.steps])
+    self.assertEqual([(2, 2), (1, 2)] * 7, model.batches)
+
+  def testGenerateMultiple(self):
+    model = RecordingMelodyRnnModel(self.config)
+    self.initializeModel(model)
+    generator = melody_rnn_sequence_generator.MelodyRnnSequenceGenerator(
+        model, generator_pb2.GeneratorDetails(id='test'), checkpoint='test')
+    # The model has already been initialized without a checkpoint.
+    generator._initialized = True
+
+    primer_sequence = music_pb2.NoteSequence()
+    primer_sequence.tempos.add(qpm=120)
+    magenta.music.testing_lib.add_track_to_sequence(
+        primer_sequence, 0, [(60, 100, 0.0, 0.25), (62, 100, 0.25, 0.5),
+                             (64, 100, 0.5, 0.75)])
+    generator_options = generator_pb2.GeneratorOptions()
+    generator_options.generate_sections.add(start_time=1.0, end_time=3.0)
+    generated_sequences = generator.generate_multiple(
+        primer_sequence, generator_options, 4)
+
+    self.assertEqual(4, len(generated_sequences))
+    for generated_sequence in generated_sequences:
+      # The last primer note may be held into the generated section.
+      self.assertEqual(
+          [(60, 0.0), (62, 0.25), (64, 0.5)],
+          [(note.pitch, note.start_time)
+           for note in generated_sequence.notes[:3]])
+      self.assertLessEqual(generated_sequence.total_time, 3.0)
+    # All of the outputs are generated together.
+    self.assertTrue(model.steps)
+    for melodies, _ in model.steps:
+      self.assertEqual(4, len(melodies))
+
+
+if __name__ == '__main__':
+  tf.test.main()
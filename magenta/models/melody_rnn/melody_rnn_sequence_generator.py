@@ -58,6 +58,10 @@ class MelodyRnnSequenceGenerator(mm.BaseSequenceGenerator):
     return int(seconds * (qpm / 60.0) * self._steps_per_quarter)
 
   def _generate(self, input_sequence, generator_options):
+    return self._generate_multiple(input_sequence, generator_options, 1)[0]
+
+  def _generate_multiple(self, input_sequence, generator_options,
+                         num_outputs):
     if len(generator_options.input_sections) > 1:
       raise mm.SequenceGeneratorException(
           'This model supports at most one input_sections message, but got %s' %
@@ -123,11 +127,16 @@ class MelodyRnnSequenceGenerator(mm.BaseSequenceGenerator):
                 for name, value_fn in arg_types.items()
                 if name in generator_options.args)
 
-    generated_melody = self._model.generate_melody(
-        end_step - melody.start_step, melody, **args)
-    generated_sequence = generated_melody.to_sequence(qpm=qpm)
-    assert (generated_sequence.total_time - generate_section.end_time) <= 1e-5
-    return generated_sequence
+    # All outputs are generated from the same primer in a single batch.
+    generated_melodies = self._model.generate_melodies(
+        end_step - melody.start_step, [melody] * num_outputs, **args)
+    generated_sequences = []
+    for generated_melody in generated_melodies:
+      generated_sequence = generated_melody.to_sequence(qpm=qpm)
+      assert ((generated_sequence.total_time - generate_section.end_time) <=
+              1e-5)
+      generated_sequences.append(generated_sequence)
+    return generated_sequences
 
 
 def get_generator_map():
@@ -19,8 +19,11 @@ import time
 # internal imports
 import tensorflow as tf
 
+from magenta.common import sequence_example_lib
 from magenta.models.melody_rnn import melody_rnn_config_flags
 from magenta.models.melody_rnn import melody_rnn_graph
+from magenta.pipelines import metrics_exporter as metrics_exporter_lib
+from magenta.pipelines import statistics
 
 FLAGS = tf.app.flags.FLAGS
 tf.app.flags.DEFINE_string('run_dir', '/tmp/melody_rnn/logdir/run1',
@@ -35,7 +38,21 @@ tf.app.flags.DEFINE_string('run_dir', '/tmp/melody_rnn/logdir/run1',
 tf.app.flags.DEFINE_string('sequence_example_file', '',
                            'Path to TFRecord file containing '
                            'tf.SequenceExample records for training or '
-                           'evaluation.')
+                           'evaluation. May be a glob pattern matching the '
+                           'shards of a sharded dataset.')
+tf.app.flags.DEFINE_integer('num_readers', 1,
+                            'The number of TFRecord readers that read '
+                            '`sequence_example_file` in parallel. Useful when '
+                            'it matches several shards.')
+tf.app.flags.DEFINE_integer('shuffle_buffer_size', 0,
+                            'If greater than 0, training examples are '
+                            'shuffled in a buffer holding at least this many '
+                            'examples.')
+tf.app.flags.DEFINE_string('bucket_boundaries', '',
+                           'A comma-separated list of sequence lengths, e.g. '
+                           '"64,128,256". If given, examples are grouped into '
+                           'buckets split at these lengths and each batch is '
+                           'drawn from a single bucket, reducing padding.')
 tf.app.flags.DEFINE_integer('num_training_steps', 0,
                             'The the number of global training steps your '
                             'model should take before exiting training. '
@@ -51,13 +68,47 @@ tf.app.flags.DEFINE_integer('summary_frequency', 10,
 tf.app.flags.DEFINE_boolean('eval', False,
                             'If True, this process only evaluates the model '
                             'and does not update weights.')
+tf.app.flags.DEFINE_integer('metrics_port', 0,
+                            'If greater than 0, training metrics are served '
+                            'in the Prometheus text format over HTTP on this '
+                            'port.')
+tf.app.flags.DEFINE_string('metrics_file', '',
+                           'If given, training metrics are periodically '
+                           'written to this file in the Prometheus text '
+                           'format.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
 
 
+def _export_training_metrics(metrics_exporter, sess, global_step_,
+                             step_stats, queue_fill_fractions,
+                             examples_per_second):
+  """Publishes training metrics to a metrics exporter.
+
+  Args:
+    metrics_exporter: A `metrics_exporter.MetricsExporter` instance.
+    sess: The training session.
+    global_step_: The current global step.
+    step_stats: A list of `Statistic` objects about the training steps.
+    queue_fill_fractions: A list of scalar tensors, each the fraction of an
+        input queue that is full.
+    examples_per_second: The number of training examples processed per second
+        since the last export, or None if unknown.
+  """
+  metrics_exporter.set_gauge('training_global_step', global_step_)
+  if examples_per_second is not None:
+    metrics_exporter.set_gauge('training_examples_per_second',
+                               examples_per_second)
+  for tensor, fraction_full in zip(queue_fill_fractions,
+                                   sess.run(queue_fill_fractions)):
+    metrics_exporter.set_gauge('training_queue_fraction_full', fraction_full,
+                               {'queue': tensor.op.name})
+  metrics_exporter.set_statistics(step_stats)
+
+
 def run_training(graph, train_dir, num_training_steps=None,
-                 summary_frequency=10):
+                 summary_frequency=10, metrics_exporter=None, batch_size=None):
   """Runs the training loop.
 
   Args:
@@ -67,6 +118,13 @@ def run_training(graph, train_dir, num_training_steps=None,
     num_training_steps: The number of steps to train for before exiting.
     summary_frequency: The number of steps between each summary. A summary is
         when graph values from the last step are logged to the console.
+    metrics_exporter: An optional `metrics_exporter.MetricsExporter` instance.
+        If given, the global step, the time taken by each training step, the
+        number of examples per second, and how full the input queues are, are
+        published to it at most once every `metrics_exporter.refresh_secs`
+        seconds.
+    batch_size: The number of examples in each training batch. Used to compute
+        the number of examples per second for `metrics_exporter`.
   """
   global_step = graph.get_collection('global_step')[0]
   learning_rate = graph.get_collection('learning_rate')[0]
@@ -74,6 +132,10 @@ def run_training(graph, train_dir, num_training_steps=None,
   perplexity = graph.get_collection('perplexity')[0]
   accuracy = graph.get_collection('accuracy')[0]
   train_op = graph.get_collection('train_op')[0]
+  queue_fill_fractions = graph.get_collection(
+      sequence_example_lib.QUEUE_FILL_FRACTIONS)
+  step_timing = statistics.TimingHistogram('training_step_seconds')
+  step_quantiles = statistics.QuantileSketch('training_step_seconds_quantiles')
 
   sv = tf.train.Supervisor(graph=graph, logdir=train_dir, save_model_secs=30,
                            global_step=global_step)
@@ -87,9 +149,12 @@ def run_training(graph, train_dir, num_training_steps=None,
                       global_step_, num_training_steps)
       return
     tf.logging.info('Starting training loop...')
+    last_export_time = time.time()
+    last_export_step = global_step_
     while not num_training_steps or global_step_ < num_training_steps:
       if sv.should_stop():
         break
+      step_start_time = time.time()
       if (global_step_ + 1) % summary_frequency == 0:
         (global_step_, learning_rate_, loss_, perplexity_, accuracy_,
          _) = sess.run([global_step, learning_rate, loss, perplexity, accuracy,
@@ -103,6 +168,22 @@ def run_training(graph, train_dir, num_training_steps=None,
                         accuracy_)
       else:
         global_step_, _ = sess.run([global_step, train_op])
+      if metrics_exporter is not None:
+        now = time.time()
+        step_timing.increment(now - step_start_time)
+        step_quantiles.increment(now - step_start_time)
+        if metrics_exporter.update_due():
+          examples_per_second = None
+          if batch_size:
+            examples_per_second = (batch_size *
+                                   (global_step_ - last_export_step) /
+                                   max(now - last_export_time, 1e-9))
+          _export_training_metrics(
+              metrics_exporter, sess, global_step_,
+              [step_timing, step_quantiles], queue_fill_fractions,
+              examples_per_second)
+          last_export_time = now
+          last_export_step = global_step_
     sv.saver.save(sess, sv.save_path, global_step=sv.global_step)
     tf.logging.info('Training complete.')
 
@@ -188,9 +269,16 @@ def main(unused_argv):
 
   config = melody_rnn_config_flags.config_from_flags()
 
+  bucket_boundaries = None
+  if FLAGS.bucket_boundaries:
+    bucket_boundaries = [int(boundary)
+                         for boundary in FLAGS.bucket_boundaries.split(',')]
+
   mode = 'eval' if FLAGS.eval else 'train'
   graph = melody_rnn_graph.build_graph(
-      mode, config, sequence_example_file)
+      mode, config, sequence_example_file, num_readers=FLAGS.num_readers,
+      shuffle_buffer_size=FLAGS.shuffle_buffer_size,
+      bucket_boundaries=bucket_boundaries)
 
   train_dir = os.path.join(run_dir, 'train')
   if not os.path.exists(train_dir):
@@ -206,8 +294,19 @@ def main(unused_argv):
              FLAGS.summary_frequency)
 
   else:
-    run_training(graph, train_dir, FLAGS.num_training_steps,
-                 FLAGS.summary_frequency)
+    metrics_exporter = None
+    if FLAGS.metrics_port or FLAGS.metrics_file:
+      metrics_exporter = metrics_exporter_lib.MetricsExporter(
+          port=FLAGS.metrics_port or None,
+          output_file=(os.path.expanduser(FLAGS.metrics_file)
+                       if FLAGS.metrics_file else None))
+    try:
+      run_training(graph, train_dir, FLAGS.num_training_steps,
+                   FLAGS.summary_frequency, metrics_exporter,
+                   config.hparams.batch_size)
+    finally:
+      if metrics_exporter is not None:
+        metrics_exporter.close()
 
 
 def console_entry_point():
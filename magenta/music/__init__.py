@@ -28,6 +28,7 @@ from magenta.music.encoder_decoder import OneHotEncoding
 from magenta.music.encoder_decoder import OneHotEventSequenceEncoderDecoder
 
 from magenta.music.events_lib import NonIntegerStepsPerBarException
+from magenta.music.events_lib import SharedPrefixEventSequence
 
 from magenta.music.melodies_lib import BadNoteException
 from magenta.music.melodies_lib import extract_melodies
@@ -40,6 +41,7 @@ from magenta.music.melody_encoder_decoder import MelodyOneHotEncoding
 
 from magenta.music.midi_io import midi_file_to_sequence_proto
 from magenta.music.midi_io import midi_to_sequence_proto
+from magenta.music.midi_io import midi_to_sequence_proto_fast
 from magenta.music.midi_io import MIDIConversionError
 from magenta.music.midi_io import sequence_proto_to_midi_file
 from magenta.music.midi_io import sequence_proto_to_pretty_midi
@@ -51,6 +53,7 @@ from magenta.music.model import BaseModel
 
 from magenta.music.musicxml_parser import MusicXMLDocument
 from magenta.music.musicxml_parser import MusicXMLParseException
+from magenta.music.musicxml_parser import StreamingMusicXMLDocument
 
 from magenta.music.musicxml_reader import musicxml_file_to_sequence_proto
 from magenta.music.musicxml_reader import musicxml_to_sequence_proto
@@ -69,3 +72,4 @@ from magenta.music.sequences_lib import extract_subsequence
 from magenta.music.sequences_lib import MultipleTimeSignatureException
 from magenta.music.sequences_lib import NegativeTimeException
 from magenta.music.sequences_lib import QuantizedSequence
+from magenta.music.sequences_lib import QuantizedTrack
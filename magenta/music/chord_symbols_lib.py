@@ -14,7 +14,10 @@
 """Utility functions for working with chord symbols."""
 
 import abc
-import music21
+import collections
+import json
+import re
+
 import tensorflow as tf
 
 # chord quality enum
@@ -25,10 +28,389 @@ CHORD_QUALITY_DIMINISHED = 3
 CHORD_QUALITY_OTHER = 4
 
 
+# Pitch classes of the natural note letters.
+_LETTER_PITCH_CLASSES = {
+    'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11
+}
+_LETTERS = 'CDEFGAB'
+
+# Number of letter steps spanned by an interval of each size in half steps, used
+# to spell transposed notes (a transposition by 3 half steps is a minor third,
+# by 6 half steps a diminished fifth, etc.).
+_HALF_STEPS_TO_LETTER_STEPS = [0, 1, 1, 2, 2, 3, 4, 4, 5, 5, 6, 6]
+
+# Half steps above the root of each chord degree in a major scale. Both chord
+# kind degrees and added or altered degrees are relative to these.
+_MAJOR_DEGREE_HALF_STEPS = {
+    1: 0, 2: 2, 3: 4, 4: 5, 5: 7, 6: 9, 7: 11, 9: 14, 11: 17, 13: 21
+}
+
+# Chord kinds understood by NativeChordSymbolFunctions, as (abbreviations,
+# degrees) pairs. These are the chord kinds of music21 that can appear in lead
+# sheets, with the same abbreviations and degrees. See
+# NativeChordSymbolFunctions for the figures music21 interprets differently.
+_CHORD_KINDS = [
+    # triads
+    (['', 'M', 'maj'], '1,3,5'),
+    (['m', 'min'], '1,-3,5'),
+    (['+', 'aug'], '1,3,#5'),
+    (['dim', 'o'], '1,-3,-5'),
+    # sevenths
+    (['7', 'dom7'], '1,3,5,-7'),
+    (['maj7', 'M7'], '1,3,5,7'),
+    (['mM7', 'm#7', 'minmaj7'], '1,-3,5,7'),
+    (['m7', 'min7'], '1,-3,5,-7'),
+    (['+M7', 'augmaj7'], '1,3,#5,7'),
+    (['7+', '+7', 'aug7'], '1,3,#5,-7'),
+    (['/o7', 'm7b5'], '1,-3,-5,-7'),
+    (['o7', 'dim7'], '1,-3,-5,--7'),
+    (['dom7dim5'], '1,3,-5,-7'),
+    # sixths
+    (['6'], '1,3,5,6'),
+    (['m6', 'min6'], '1,-3,5,6'),
+    # ninths
+    (['M9', 'Maj9'], '1,3,5,7,9'),
+    (['9', 'dom9'], '1,3,5,-7,9'),
+    (['mM9', 'minmaj9'], '1,-3,5,7,9'),
+    (['m9', 'min9'], '1,-3,5,-7,9'),
+    (['+M9', 'augmaj9'], '1,3,#5,7,9'),
+    (['9#5', '+9', 'aug9'], '1,3,#5,-7,9'),
+    (['/o9'], '1,-3,-5,-7,9'),
+    (['/ob9'], '1,-3,-5,-7,-9'),
+    (['o9', 'dim9'], '1,-3,-5,--7,9'),
+    (['ob9', 'dimb9'], '1,-3,-5,--7,-9'),
+    # elevenths
+    (['11', 'dom11'], '1,3,5,-7,9,11'),
+    (['M11', 'Maj11'], '1,3,5,7,9,11'),
+    (['mM11', 'minmaj11'], '1,-3,5,7,9,11'),
+    (['m11', 'min11'], '1,-3,5,-7,9,11'),
+    (['+M11', 'augmaj11'], '1,3,#5,7,9,11'),
+    (['+11', 'aug11'], '1,3,#5,-7,9,11'),
+    (['/o11'], '1,-3,-5,-7,-9,11'),
+    (['o11', 'dim11'], '1,-3,-5,--7,-9,-11'),
+    # thirteenths
+    (['M13', 'Maj13'], '1,3,5,7,9,11,13'),
+    (['13', 'dom13'], '1,3,5,-7,9,11,13'),
+    (['mM13', 'minmaj13'], '1,-3,5,7,9,11,13'),
+    (['m13', 'min13'], '1,-3,5,-7,9,11,13'),
+    (['+M13', 'augmaj13'], '1,3,#5,7,9,11,13'),
+    (['+13', 'aug13'], '1,3,#5,-7,9,11,13'),
+    (['/o13'], '1,-3,-5,-7,9,11,13'),
+    # other
+    (['sus2'], '1,2,5'),
+    (['sus', 'sus4'], '1,4,5'),
+    (['pedal'], '1'),
+    (['power'], '1,5'),
+]
+
+_ROOT_RE = re.compile(r'([A-G])([#b-]*)')
+_BASS_RE = re.compile(r'/([A-G])([#b-]*)$')
+_ALTERATIONS_RE = re.compile(r'(?:add[#b]*\d+|[#b]+\d+)*$')
+_ALTERATION_RE = re.compile(r'(add)?([#b]*)(\d+)')
+
+# Default maximum number of entries in a ChordSymbolCache.
+DEFAULT_CACHE_MAX_SIZE = 10000
+
+# MIDI pitch of the C at the bottom of the octave in which chord roots are
+# voiced, and the bounds within which chords are shifted by octaves.
+_ROOT_OCTAVE_MIDI_PITCH = 48
+_MAX_VOICING_MIDI_PITCH = 62
+_MIN_VOICING_MIDI_PITCH = 33
+
+
 class ChordSymbolException(Exception):
   pass
 
 
+class ChordSymbolCache(object):
+  """A bounded least-recently-used cache of chord symbol lookups.
+
+  Keys are tuples of strings and integers. Once the cache holds `max_size`
+  entries, adding another evicts the least recently used one, so a corpus with
+  many distinct (e.g. misspelled) figures cannot grow the cache without limit.
+
+  The numbers of hits, misses, and evictions are counted in the `hits`,
+  `misses`, and `evictions` attributes. A cache whose values are JSON
+  serializable can be saved to and loaded from a snapshot file.
+  """
+
+  def __init__(self, max_size=DEFAULT_CACHE_MAX_SIZE):
+    """Constructs a ChordSymbolCache.
+
+    Args:
+      max_size: The maximum number of entries held by the cache.
+    """
+    self._max_size = max_size
+    self._entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def get(self, key):
+    """Looks up `key`, marking it as the most recently used entry.
+
+    Args:
+      key: The key to look up.
+
+    Returns:
+      A (found, value) tuple. `found` is False and `value` is None if `key` is
+      not in the cache.
+    """
+    if key not in self._entries:
+      self.misses += 1
+      return False, None
+    value = self._entries.pop(key)
+    self._entries[key] = value
+    self.hits += 1
+    return True, value
+
+  def put(self, key, value):
+    """Adds an entry, evicting the least recently used entry if full."""
+    if key in self._entries:
+      del self._entries[key]
+    elif len(self._entries) >= self._max_size:
+      self._entries.popitem(last=False)
+      self.evictions += 1
+    self._entries[key] = value
+
+  def hit_rate(self):
+    """Returns the fraction of lookups that were hits, or 0 if none."""
+    lookups = self.hits + self.misses
+    return float(self.hits) / lookups if lookups else 0.0
+
+  def save(self, path):
+    """Writes the entries of the cache to a JSON snapshot file.
+
+    Entries are written from least to most recently used, so loading the
+    snapshot restores their order.
+
+    Args:
+      path: Path of the snapshot file.
+    """
+    with tf.gfile.Open(path, 'w') as f:
+      f.write(json.dumps([[list(key), value]
+                          for key, value in self._entries.items()]))
+
+  def load(self, path):
+    """Adds the entries of a snapshot file written by `save` to the cache.
+
+    To start the worker processes of a parallel pipeline run with a warm
+    cache, pass `load_shared_cache` and the snapshot path as the worker
+    initializer of `pipeline.run_pipeline_parallel`.
+
+    Args:
+      path: Path of the snapshot file.
+    """
+    with tf.gfile.Open(path) as f:
+      entries = json.loads(f.read())
+    for key, value in entries:
+      self.put(tuple(key), value)
+
+
+# The cache shared by the ChordSymbolFunctions returned by
+# `ChordSymbolFunctions.get`.
+_shared_cache = ChordSymbolCache()
+
+
+def get_shared_cache():
+  """Returns the ChordSymbolCache shared by `ChordSymbolFunctions.get`."""
+  return _shared_cache
+
+
+def load_shared_cache(path):
+  """Loads a `ChordSymbolCache.save` snapshot into the shared cache.
+
+  Args:
+    path: Path of the snapshot file.
+  """
+  _shared_cache.load(path)
+
+
+def _parse_degrees(degrees_string):
+  """Parses a comma-separated degree string like '1,-3,#5' into a dictionary.
+
+  Args:
+    degrees_string: The degree string. Each degree is an integer preceded by a
+        '-' for each half step it is lowered or a '#' for each half step it is
+        raised, relative to the major scale.
+
+  Returns:
+    A dictionary mapping chord degree to half steps above the root.
+  """
+  degrees = {}
+  for degree_string in degrees_string.split(','):
+    degree = int(degree_string.lstrip('-#'))
+    degrees[degree] = (_MAJOR_DEGREE_HALF_STEPS[degree] +
+                       degree_string.count('#') - degree_string.count('-'))
+  return degrees
+
+
+# Chord degrees of each chord kind abbreviation, and the abbreviations from
+# longest to shortest so that the longest matching abbreviation is preferred.
+_CHORD_KIND_DEGREES = dict(
+    (abbreviation, _parse_degrees(degrees_string))
+    for abbreviations, degrees_string in _CHORD_KINDS
+    for abbreviation in abbreviations)
+_CHORD_KIND_ABBREVIATIONS = sorted(_CHORD_KIND_DEGREES, key=len, reverse=True)
+
+
+def _note_pitch_class(letter, accidentals):
+  """Returns the pitch class of a note given its letter and accidentals."""
+  return (_LETTER_PITCH_CLASSES[letter] + accidentals.count('#') -
+          accidentals.count('-')) % 12
+
+
+def _transpose_note(letter, accidentals, transpose_amount):
+  """Transposes a spelled note, preserving the interval's letter distance.
+
+  Args:
+    letter: The note letter, one of 'A' through 'G'.
+    accidentals: A string of '#' or '-' characters.
+    transpose_amount: The integer number of half steps to transpose.
+
+  Returns:
+    A (letter, accidentals) tuple for the transposed note.
+  """
+  letter_steps = _HALF_STEPS_TO_LETTER_STEPS[abs(transpose_amount) % 12]
+  if transpose_amount < 0:
+    letter_steps = -letter_steps
+  new_letter = _LETTERS[(_LETTERS.index(letter) + letter_steps) % 7]
+  pitch_class = _note_pitch_class(letter, accidentals) + transpose_amount
+  alteration = (pitch_class - _LETTER_PITCH_CLASSES[new_letter] + 6) % 12 - 6
+  if alteration < 0:
+    return new_letter, '-' * -alteration
+  else:
+    return new_letter, '#' * alteration
+
+
+def _chord_quality(degrees):
+  """Returns the quality of a chord given its degrees, as music21 does."""
+  third = degrees.get(3)
+  fifth = degrees.get(5)
+  if third is None:
+    return CHORD_QUALITY_OTHER
+  elif fifth is None:
+    return {4: CHORD_QUALITY_MAJOR, 3: CHORD_QUALITY_MINOR}.get(
+        third, CHORD_QUALITY_OTHER)
+  else:
+    return {
+        (4, 7): CHORD_QUALITY_MAJOR,
+        (3, 7): CHORD_QUALITY_MINOR,
+        (4, 8): CHORD_QUALITY_AUGMENTED,
+        (3, 6): CHORD_QUALITY_DIMINISHED
+    }.get((third, fifth), CHORD_QUALITY_OTHER)
+
+
+def _chord_midi_pitches(root_pitch_class, degrees, bass_pitch_class):
+  """Voices a chord as a list of MIDI pitches.
+
+  The root is voiced in the octave below middle C with the other degrees
+  stacked above it. If the bass is a chord tone, the chord is inverted so that
+  the bass is lowest; otherwise the bass is added below the chord. The chord is
+  then shifted by octaves to lie around the octave below middle C.
+
+  Args:
+    root_pitch_class: The pitch class of the chord root.
+    degrees: A dictionary mapping chord degree to half steps above the root.
+    bass_pitch_class: The pitch class of the bass note.
+
+  Returns:
+    A sorted list of MIDI pitches.
+  """
+  root_pitch = _ROOT_OCTAVE_MIDI_PITCH + root_pitch_class
+  pitches = sorted(root_pitch + half_steps for half_steps in degrees.values())
+
+  bass_pitches = [pitch for pitch in pitches
+                  if pitch % 12 == bass_pitch_class]
+  if bass_pitches:
+    bass_pitch = bass_pitches[0]
+    pitches = sorted(
+        pitch + 12 * ((bass_pitch - pitch + 11) // 12) for pitch in pitches)
+  else:
+    bass_pitch = root_pitch - 12 + (bass_pitch_class - root_pitch_class) % 12
+    if bass_pitch >= root_pitch:
+      bass_pitch -= 12
+    pitches.insert(0, bass_pitch)
+
+  while pitches[-1] > _MAX_VOICING_MIDI_PITCH:
+    pitches = [pitch - 12 for pitch in pitches]
+  while pitches[0] < _MIN_VOICING_MIDI_PITCH:
+    pitches = [pitch + 12 for pitch in pitches]
+  return pitches
+
+
+# A chord symbol parsed by NativeChordSymbolFunctions. `root` and `bass` are
+# (letter, accidentals) tuples with flats written as '-', with `bass` None if
+# the figure has no bass, and `kind` is the rest of the figure between the root
+# and bass.
+_ParsedChordSymbol = collections.namedtuple(
+    '_ParsedChordSymbol',
+    ['root', 'kind', 'bass', 'root_pitch_class', 'midi_pitches', 'quality'])
+
+
+def _parse_chord_symbol(figure):
+  """Parses a chord symbol figure string without music21.
+
+  Understands figures made of a root, one of the chord kind abbreviations in
+  `_CHORD_KINDS`, any number of added or altered degrees (e.g. "b9", "#11", or
+  "add2"), and an optional bass note (e.g. "/E-"). A "b" directly after the
+  letter of the root or bass is a flat, so "Bb7" is a B-flat seventh chord.
+
+  Args:
+    figure: The chord symbol figure string.
+
+  Returns:
+    A _ParsedChordSymbol, or None if the figure is not understood.
+  """
+  root_match = _ROOT_RE.match(figure)
+  if not root_match:
+    return None
+  root_letter, root_accidentals = root_match.groups()
+  root = root_letter, root_accidentals.replace('b', '-')
+  rest = figure[root_match.end():]
+
+  bass = None
+  bass_match = _BASS_RE.search(rest)
+  if bass_match:
+    bass_letter, bass_accidentals = bass_match.groups()
+    bass = bass_letter, bass_accidentals.replace('b', '-')
+    rest = rest[:bass_match.start()]
+
+  for abbreviation in _CHORD_KIND_ABBREVIATIONS:
+    if (rest.startswith(abbreviation) and
+        _ALTERATIONS_RE.match(rest, len(abbreviation))):
+      break
+  else:
+    return None
+
+  degrees = dict(_CHORD_KIND_DEGREES[abbreviation])
+  for _, accidentals, degree in _ALTERATION_RE.findall(
+      rest[len(abbreviation):]):
+    degree = int(degree)
+    if degree not in _MAJOR_DEGREE_HALF_STEPS:
+      return None
+    degrees[degree] = (_MAJOR_DEGREE_HALF_STEPS[degree] +
+                       accidentals.count('#') - accidentals.count('b'))
+
+  root_pitch_class = _note_pitch_class(*root)
+  bass_pitch_class = (
+      _note_pitch_class(*bass) if bass is not None else root_pitch_class)
+  return _ParsedChordSymbol(
+      root=root,
+      kind=rest,
+      bass=bass,
+      root_pitch_class=root_pitch_class,
+      midi_pitches=_chord_midi_pitches(
+          root_pitch_class, degrees, bass_pitch_class),
+      quality=_chord_quality(degrees))
+
+
 class ChordSymbolFunctions(object):
   """An abstract class for interpreting chord symbol strings.
 
@@ -43,16 +425,41 @@ class ChordSymbolFunctions(object):
   __metaclass__ = abc.ABCMeta
 
   @staticmethod
-  def get():
-    """Returns the default implementation of ChordSymbolFunctions.
+  def get(implementation='music21', use_cache=True):
+    """Returns an implementation of ChordSymbolFunctions.
 
-    Currently the default (and only) implementation of ChordSymbolFunctions is
-    Music21ChordSymbolFunctions.
+    The default implementation is Music21ChordSymbolFunctions.
+    NativeChordSymbolFunctions is much faster, but interprets some figures
+    differently; see its docstring.
+
+    Args:
+      implementation: The name of the implementation to return, either
+          'native' for NativeChordSymbolFunctions or 'music21' for
+          Music21ChordSymbolFunctions.
+      use_cache: If True, results are cached in the cache returned by
+          `get_shared_cache`. Music21ChordSymbolFunctions is wrapped in a
+          CachedChordSymbolFunctions, while NativeChordSymbolFunctions only
+          caches the results of figures it hands to music21, since it
+          memoizes the figures it parses itself.
 
     Returns:
       A ChordSymbolFunctions object.
+
+    Raises:
+      ValueError: If `implementation` is not a known implementation name.
     """
-    return Music21ChordSymbolFunctions()
+    cache = get_shared_cache() if use_cache else None
+    if implementation == 'native':
+      return NativeChordSymbolFunctions(cache)
+    elif implementation == 'music21':
+      chord_symbol_functions = Music21ChordSymbolFunctions()
+      if cache is not None:
+        chord_symbol_functions = CachedChordSymbolFunctions(
+            chord_symbol_functions, cache)
+      return chord_symbol_functions
+    else:
+      raise ValueError(
+          'Unknown ChordSymbolFunctions implementation: %s' % implementation)
 
   @abc.abstractmethod
   def transpose_chord_symbol(self, figure, transpose_amount):
@@ -133,7 +540,10 @@ class Music21ChordSymbolFunctions(ChordSymbolFunctions):
 
   def __init__(self):
     """Construct a Music21ChordSymbolFunctions object."""
-    self._music21_chord_symbol_dict = {}
+    # music21 is slow to import, so only import it once it is needed.
+    import music21  # pylint: disable=g-import-not-at-top
+    self._music21 = music21
+    self._music21_chord_symbol_cache = ChordSymbolCache()
 
   def _to_music21_chord_symbol(self, figure):
     """Return a music21.harmony.ChordSymbol object instantiated with `figure`.
@@ -151,12 +561,13 @@ class Music21ChordSymbolFunctions(ChordSymbolFunctions):
       ChordSymbolException: If the chord fails to be parsed by music21.
     """
 
-    if figure in self._music21_chord_symbol_dict:
-      return self._music21_chord_symbol_dict[figure]
+    found, cs = self._music21_chord_symbol_cache.get(figure)
+    if found:
+      return cs
 
     try:
-      cs = music21.harmony.ChordSymbol(figure)
-      self._music21_chord_symbol_dict[figure] = cs
+      cs = self._music21.harmony.ChordSymbol(figure)
+      self._music21_chord_symbol_cache.put(figure, cs)
       return cs
     except:  # pylint: disable=bare-except
       pass
@@ -166,8 +577,8 @@ class Music21ChordSymbolFunctions(ChordSymbolFunctions):
       # strings it itself produces! It sometimes produces strings like
       # "C7 add b9" or "G7 alter #5", and then can't re-parse them. In these
       # cases, let's try again with just the basic chord.
-      cs = music21.harmony.ChordSymbol(figure.split()[0])
-      self._music21_chord_symbol_dict[figure] = cs
+      cs = self._music21.harmony.ChordSymbol(figure.split()[0])
+      self._music21_chord_symbol_cache.put(figure, cs)
       tf.logging.warn('Failed to parse chord symbol %s, '
                       'interpreting as %s', figure, figure.split()[0])
       return cs
@@ -200,3 +611,162 @@ class Music21ChordSymbolFunctions(ChordSymbolFunctions):
       return CHORD_QUALITY_OTHER
     else:
       return self._music21_chord_quality_mapping[quality_string]
+
+
+class NativeChordSymbolFunctions(ChordSymbolFunctions):
+  """A class that interprets chord symbol strings without music21.
+
+  Figures made of a root, a chord kind, added or altered degrees, and a bass
+  note are parsed directly, and the result is memoized. Any other figure is
+  interpreted with Music21ChordSymbolFunctions, which is created (and music21
+  imported) only when such a figure is first encountered.
+
+  The chord tones of a figure are the same as music21's, and a transposed
+  figure denotes the same chord as music21's transposition, with these
+  intended differences:
+
+  * The root is always the root written in the figure. music21 infers the root
+    from the chord's pitches for sixth chords (A for "C6" and "Cm6"), suspended
+    fourth chords (F for "Csus4"), and most chords with a bass note (E for
+    "C13/E"). The quality is computed from the written root too, so e.g. "Cm6"
+    is minor rather than diminished.
+  * The bass note is always the lowest pitch, and is added below the chord if
+    it is not a chord tone. music21 sometimes drops such a bass note (e.g. the
+    E of "Cm/E") and sometimes voices chord tones below the bass.
+  * "m#7" and "dimb9" include their seventh, which music21 drops.
+  * Transposition keeps the letter distance of the interval and the chord kind
+    as written (e.g. "E-7" up 5 is "A-7" and "Csus4" up 5 is "Fsus4"), while
+    music21 respells the chord from its pitches (e.g. "B-sus/F").
+  * Figures music21 fails to parse, such as "E-9/E", are understood.
+  * A "b" directly after the root letter is a flat, so "Bb7" is a B-flat
+    seventh chord; music21 reads it as a B chord with an added flat seventh.
+
+  Chords are voiced similarly to, but not always identically to, music21.
+  """
+
+  def __init__(self, cache=None):
+    """Construct a NativeChordSymbolFunctions object.
+
+    Args:
+      cache: An optional ChordSymbolCache in which to cache the results of
+          figures interpreted with music21.
+    """
+    self._parsed_chord_symbol_cache = ChordSymbolCache()
+    self._cache = cache
+    self._music21_chord_symbol_functions = None
+
+  def _parse(self, figure):
+    """Returns the parsed `figure`, or None if it is not understood."""
+    found, chord_symbol = self._parsed_chord_symbol_cache.get(figure)
+    if not found:
+      chord_symbol = _parse_chord_symbol(figure)
+      self._parsed_chord_symbol_cache.put(figure, chord_symbol)
+    return chord_symbol
+
+  def _fallback(self):
+    """Returns the Music21ChordSymbolFunctions used for unparsed figures."""
+    if self._music21_chord_symbol_functions is None:
+      self._music21_chord_symbol_functions = Music21ChordSymbolFunctions()
+      if self._cache is not None:
+        self._music21_chord_symbol_functions = CachedChordSymbolFunctions(
+            self._music21_chord_symbol_functions, self._cache)
+    return self._music21_chord_symbol_functions
+
+  def transpose_chord_symbol(self, figure, transpose_amount):
+    chord_symbol = self._parse(figure)
+    if chord_symbol is None:
+      return self._fallback().transpose_chord_symbol(figure, transpose_amount)
+    root_letter, root_accidentals = chord_symbol.root
+    transposed_figure = ''.join(
+        _transpose_note(root_letter, root_accidentals, transpose_amount))
+    transposed_figure += chord_symbol.kind
+    if chord_symbol.bass is not None:
+      bass_letter, bass_accidentals = chord_symbol.bass
+      transposed_figure += '/' + ''.join(
+          _transpose_note(bass_letter, bass_accidentals, transpose_amount))
+    return transposed_figure
+
+  def chord_symbol_midi_pitches(self, figure):
+    chord_symbol = self._parse(figure)
+    if chord_symbol is None:
+      return self._fallback().chord_symbol_midi_pitches(figure)
+    return list(chord_symbol.midi_pitches)
+
+  def chord_symbol_root(self, figure):
+    chord_symbol = self._parse(figure)
+    if chord_symbol is None:
+      return self._fallback().chord_symbol_root(figure)
+    return chord_symbol.root_pitch_class
+
+  def chord_symbol_quality(self, figure):
+    chord_symbol = self._parse(figure)
+    if chord_symbol is None:
+      return self._fallback().chord_symbol_quality(figure)
+    return chord_symbol.quality
+
+
+class CachedChordSymbolFunctions(ChordSymbolFunctions):
+  """A ChordSymbolFunctions that caches the results of another one.
+
+  Roots, qualities, MIDI pitches, and transposed figures are cached in a
+  ChordSymbolCache, keyed by the name of the wrapped implementation, the
+  function, and its arguments. Figures that cannot be interpreted are cached
+  too, so each is only reported once to the wrapped implementation.
+  """
+
+  def __init__(self, chord_symbol_functions, cache=None):
+    """Construct a CachedChordSymbolFunctions object.
+
+    Args:
+      chord_symbol_functions: The ChordSymbolFunctions object whose results are
+          cached.
+      cache: The ChordSymbolCache in which to cache results. If None, a new
+          cache is created.
+    """
+    self._chord_symbol_functions = chord_symbol_functions
+    self._cache = cache if cache is not None else ChordSymbolCache()
+    self._name = type(chord_symbol_functions).__name__
+
+  @property
+  def cache(self):
+    return self._cache
+
+  def _lookup(self, function, *args):
+    """Returns the cached result of calling `function` with `args`.
+
+    Args:
+      function: A method of the wrapped ChordSymbolFunctions object.
+      *args: The arguments with which to call `function`.
+
+    Returns:
+      The result of `function(*args)`.
+
+    Raises:
+      ChordSymbolException: If `function(*args)` raises it.
+    """
+    key = (self._name, function.__name__) + args
+    found, value = self._cache.get(key)
+    if not found:
+      try:
+        value = {'result': function(*args)}
+      except ChordSymbolException as e:
+        value = {'error': str(e)}
+      self._cache.put(key, value)
+    if 'error' in value:
+      raise ChordSymbolException(value['error'])
+    return value['result']
+
+  def transpose_chord_symbol(self, figure, transpose_amount):
+    return self._lookup(self._chord_symbol_functions.transpose_chord_symbol,
+                        figure, transpose_amount)
+
+  def chord_symbol_midi_pitches(self, figure):
+    return list(self._lookup(
+        self._chord_symbol_functions.chord_symbol_midi_pitches, figure))
+
+  def chord_symbol_root(self, figure):
+    return self._lookup(self._chord_symbol_functions.chord_symbol_root, figure)
+
+  def chord_symbol_quality(self, figure):
+    return self._lookup(self._chord_symbol_functions.chord_symbol_quality,
+                        figure)
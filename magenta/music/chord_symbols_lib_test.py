@@ -13,6 +13,9 @@
 # limitations under the License.
 """Tests for chord_symbols_lib."""
 
+import os
+import tempfile
+
 # internal imports
 import tensorflow as tf
 
@@ -117,6 +120,216 @@ class ChordSymbolFunctionsTest(tf.test.TestCase):
     quality = self.chord_symbol_functions.chord_symbol_quality('Dsus')
     self.assertEqual(CHORD_QUALITY_OTHER, quality)
 
+  def testUnknownImplementation(self):
+    with self.assertRaises(ValueError):
+      chord_symbols_lib.ChordSymbolFunctions.get('unknown')
+
+
+class NativeChordSymbolFunctionsTest(ChordSymbolFunctionsTest):
+
+  def setUp(self):
+    self.chord_symbol_functions = chord_symbols_lib.ChordSymbolFunctions.get(
+        'native')
+
+
+class NativeChordSymbolFunctionsParityTest(tf.test.TestCase):
+  """Compares NativeChordSymbolFunctions with music21 over a grid of figures.
+
+  The intended differences are listed in the NativeChordSymbolFunctions
+  docstring, and each is checked here.
+  """
+
+  ROOTS = ['C', 'C#', 'E-', 'B']
+  BASSES = ['', '/E', '/G']
+  KINDS = [abbreviation
+           for abbreviations, _ in chord_symbols_lib._CHORD_KINDS
+           for abbreviation in abbreviations]
+  TRANSPOSE_AMOUNTS = [-3, 5]
+
+  # Chord kinds whose seventh music21 drops.
+  SEVENTH_DROPPED_KINDS = ['m#7', 'dimb9']
+  # Chord kinds for which music21 infers the root from the chord's pitches.
+  INFERRED_ROOT_KINDS = ['6', 'm6', 'min6', 'sus', 'sus4']
+
+  def setUp(self):
+    self.native = chord_symbols_lib.ChordSymbolFunctions.get(
+        'native', use_cache=False)
+    self.music21 = chord_symbols_lib.ChordSymbolFunctions.get(
+        'music21', use_cache=False)
+
+  def figures(self):
+    """Yields (figure, root_pitch_class, kind, bass_pitch_class) tuples."""
+    for root in self.ROOTS:
+      for kind in self.KINDS:
+        for bass in self.BASSES:
+          yield (root + kind + bass,
+                 chord_symbols_lib._note_pitch_class(root[0], root[1:]),
+                 kind,
+                 chord_symbols_lib._note_pitch_class(bass[1], '')
+                 if bass else None)
+
+  def pitchClasses(self, chord_symbol_functions, figure, bass_pitch_class):
+    """Returns the pitch classes of a figure other than its bass note."""
+    return (set(pitch % 12 for pitch in
+                chord_symbol_functions.chord_symbol_midi_pitches(figure)) -
+            set([bass_pitch_class]))
+
+  def testPitchClasses(self):
+    num_compared = 0
+    for figure, _, kind, bass_pitch_class in self.figures():
+      pitches = self.native.chord_symbol_midi_pitches(figure)
+      if bass_pitch_class is not None:
+        self.assertEqual(bass_pitch_class, pitches[0] % 12, figure)
+      try:
+        music21_pitch_classes = self.pitchClasses(
+            self.music21, figure, bass_pitch_class)
+      except chord_symbols_lib.ChordSymbolException:
+        continue
+      pitch_classes = self.pitchClasses(self.native, figure, bass_pitch_class)
+      if kind in self.SEVENTH_DROPPED_KINDS:
+        self.assertLessEqual(music21_pitch_classes, pitch_classes, figure)
+      else:
+        self.assertEqual(music21_pitch_classes, pitch_classes, figure)
+      num_compared += 1
+    # music21 fails to parse only a few figures, e.g. "E-9/E".
+    self.assertGreater(num_compared, 0.9 * len(list(self.figures())))
+
+  def testRootAndQuality(self):
+    for figure, root_pitch_class, kind, bass_pitch_class in self.figures():
+      self.assertEqual(root_pitch_class, self.native.chord_symbol_root(figure))
+      if bass_pitch_class is None and kind not in self.INFERRED_ROOT_KINDS:
+        self.assertEqual(self.music21.chord_symbol_root(figure),
+                         self.native.chord_symbol_root(figure), figure)
+        self.assertEqual(self.music21.chord_symbol_quality(figure),
+                         self.native.chord_symbol_quality(figure), figure)
+
+    self.assertEqual(9, self.music21.chord_symbol_root('Cm6'))
+    self.assertEqual(CHORD_QUALITY_DIMINISHED,
+                     self.music21.chord_symbol_quality('Cm6'))
+    self.assertEqual(CHORD_QUALITY_MINOR,
+                     self.native.chord_symbol_quality('Cm6'))
+    self.assertEqual(5, self.music21.chord_symbol_root('Csus4'))
+    self.assertEqual(4, self.music21.chord_symbol_root('C13/E'))
+
+  def testBassNotInChord(self):
+    self.assertEqual([51, 55, 60],
+                     self.music21.chord_symbol_midi_pitches('Cm/E'))
+    self.assertEqual([40, 48, 51, 55],
+                     self.native.chord_symbol_midi_pitches('Cm/E'))
+
+  def testTranspose(self):
+    for figure, _, kind, bass_pitch_class in self.figures():
+      if kind in self.SEVENTH_DROPPED_KINDS:
+        continue
+      try:
+        music21_pitch_classes = self.pitchClasses(
+            self.music21, figure, bass_pitch_class)
+      except chord_symbols_lib.ChordSymbolException:
+        continue
+      for transpose_amount in self.TRANSPOSE_AMOUNTS:
+        transposed_figure = self.native.transpose_chord_symbol(
+            figure, transpose_amount)
+        transposed_bass_pitch_class = (
+            (bass_pitch_class + transpose_amount) % 12
+            if bass_pitch_class is not None else None)
+        try:
+          transposed_pitch_classes = self.pitchClasses(
+              self.music21, transposed_figure, transposed_bass_pitch_class)
+        except chord_symbols_lib.ChordSymbolException:
+          continue
+        # music21 reads the transposed figure as the transposed chord.
+        self.assertEqual(
+            set((pitch_class + transpose_amount) % 12
+                for pitch_class in music21_pitch_classes),
+            transposed_pitch_classes, (figure, transpose_amount))
+
+    self.assertEqual('A-7', self.native.transpose_chord_symbol('E-7', 5))
+    self.assertEqual('Fsus4', self.native.transpose_chord_symbol('Csus4', 5))
+
+  def testFlatWrittenAsB(self):
+    for figure, music21_figure in [('Bb7', 'B-7'), ('Eb9', 'E-9'),
+                                   ('Ab13', 'A-13'), ('Ebm7', 'E-m7'),
+                                   ('Bbm7/Db', 'B-m7/D-')]:
+      self.assertEqual(self.music21.chord_symbol_root(music21_figure),
+                       self.native.chord_symbol_root(figure), figure)
+      self.assertEqual(self.music21.chord_symbol_quality(music21_figure),
+                       self.native.chord_symbol_quality(figure), figure)
+      self.assertEqual(
+          self.native.chord_symbol_midi_pitches(music21_figure),
+          self.native.chord_symbol_midi_pitches(figure), figure)
+
+    self.assertEqual('C7', self.native.transpose_chord_symbol('Bb7', 2))
+    self.assertEqual('D-9', self.native.transpose_chord_symbol('Eb9', -2))
+    self.assertEqual('F#7b9', self.native.transpose_chord_symbol('E7b9', 2))
+
+
+class ChordSymbolCacheTest(tf.test.TestCase):
+
+  def testEviction(self):
+    cache = chord_symbols_lib.ChordSymbolCache(max_size=2)
+    cache.put(('a',), 1)
+    cache.put(('b',), 2)
+    self.assertEqual((True, 1), cache.get(('a',)))
+    cache.put(('c',), 3)
+    self.assertEqual(2, len(cache))
+    self.assertEqual((False, None), cache.get(('b',)))
+    self.assertEqual((True, 1), cache.get(('a',)))
+    self.assertEqual((True, 3), cache.get(('c',)))
+    self.assertAlmostEqual(0.75, cache.hit_rate())
+    self.assertEqual(3, cache.hits)
+    self.assertEqual(1, cache.misses)
+    self.assertEqual(1, cache.evictions)
+
+  def testCachedChordSymbolFunctions(self):
+    cache = chord_symbols_lib.ChordSymbolCache()
+    chord_symbol_functions = chord_symbols_lib.CachedChordSymbolFunctions(
+        chord_symbols_lib.NativeChordSymbolFunctions(), cache)
+    self.assertEqual(2, chord_symbol_functions.chord_symbol_root('Dm9'))
+    self.assertEqual(2, chord_symbol_functions.chord_symbol_root('Dm9'))
+    self.assertEqual(
+        'G-9/B-', chord_symbol_functions.transpose_chord_symbol('F-9/A-', 2))
+    self.assertEqual(
+        'G-9/B-', chord_symbol_functions.transpose_chord_symbol('F-9/A-', 2))
+    self.assertEqual(0.5, cache.hit_rate())
+
+  def testNativeCachesOnlyMusic21Results(self):
+    cache = chord_symbols_lib.ChordSymbolCache()
+    chord_symbol_functions = chord_symbols_lib.NativeChordSymbolFunctions(
+        cache)
+    self.assertEqual(2, chord_symbol_functions.chord_symbol_root('Dm9'))
+    # Parsed figures are memoized by the native implementation itself.
+    self.assertEqual(0, len(cache))
+    chord_symbol_functions.chord_symbol_midi_pitches('C7 alter #5')
+    chord_symbol_functions.chord_symbol_midi_pitches('C7 alter #5')
+    self.assertEqual(1, len(cache))
+    self.assertEqual(1, cache.hits)
+
+  def testSnapshot(self):
+    chord_symbol_functions = chord_symbols_lib.CachedChordSymbolFunctions(
+        chord_symbols_lib.NativeChordSymbolFunctions())
+    pitches = chord_symbol_functions.chord_symbol_midi_pitches('Am')
+    quality = chord_symbol_functions.chord_symbol_quality('Am')
+    snapshot_path = os.path.join(tempfile.mkdtemp(), 'snapshot.json')
+    chord_symbol_functions.cache.save(snapshot_path)
+
+    cache = chord_symbols_lib.ChordSymbolCache()
+    cache.load(snapshot_path)
+    chord_symbol_functions = chord_symbols_lib.CachedChordSymbolFunctions(
+        chord_symbols_lib.NativeChordSymbolFunctions(), cache)
+    self.assertEqual(
+        pitches, chord_symbol_functions.chord_symbol_midi_pitches('Am'))
+    self.assertEqual(
+        quality, chord_symbol_functions.chord_symbol_quality('Am'))
+    self.assertEqual(1.0, cache.hit_rate())
+
+  def testLoadSharedCache(self):
+    cache = chord_symbols_lib.ChordSymbolCache()
+    cache.put(('test', 'snapshot'), {'result': 1})
+    snapshot_path = os.path.join(tempfile.mkdtemp(), 'snapshot.json')
+    cache.save(snapshot_path)
+    chord_symbols_lib.load_shared_cache(snapshot_path)
+    self.assertIn(('test', 'snapshot'), chord_symbols_lib.get_shared_cache())
+
 
 if __name__ == '__main__':
   tf.test.main()
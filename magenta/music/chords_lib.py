@@ -250,6 +250,44 @@ class ChordProgression(events_lib.SimpleEventSequence):
         self._events[i] = chord_symbol_functions.transpose_chord_symbol(
             self._events[i], transpose_amount % NOTES_PER_OCTAVE)
 
+  def transpositions(self, transpose_amounts, chord_symbol_functions=
+                     chord_symbols_lib.ChordSymbolFunctions.get()):
+    """Returns transposed copies of this ChordProgression.
+
+    Equivalent to deep copying this ChordProgression and calling `transpose` on
+    each copy for each amount, but each distinct chord figure is transposed
+    only once per amount, and the copies are filled from a table of the
+    transposed figures.
+
+    Args:
+      transpose_amounts: A list of the numbers of half steps to transpose this
+          ChordProgression by, one per copy.
+      chord_symbol_functions: ChordSymbolFunctions object with which to perform
+          the actual transposition of chord symbol strings.
+
+    Returns:
+      A python list of ChordProgression instances, one for each amount in
+      `transpose_amounts`.
+
+    Raises:
+      ChordSymbolException: If a chord (other than "no chord") fails to be
+          interpreted by the ChordSymbolFunctions object.
+    """
+    figures = set(self._events)
+    figures.discard(NO_CHORD)
+    chord_progressions = []
+    for transpose_amount in transpose_amounts:
+      transposed_figures = dict(
+          (figure, chord_symbol_functions.transpose_chord_symbol(
+              figure, transpose_amount % NOTES_PER_OCTAVE))
+          for figure in figures)
+      transposed_figures[NO_CHORD] = NO_CHORD
+      chords = copy.copy(self)
+      chords._events = [  # pylint: disable=protected-access
+          transposed_figures[figure] for figure in self._events]
+      chord_progressions.append(chords)
+    return chord_progressions
+
 
 def extract_chords(quantized_sequence, max_steps=None,
                    all_transpositions=False):
@@ -282,12 +320,7 @@ def extract_chords(quantized_sequence, max_steps=None,
       chords.set_length(max_steps)
       stats['chords_truncated'].increment()
   if all_transpositions:
-    chord_progressions = []
-    for amount in range(-6, 6):
-      transposed_chords = copy.deepcopy(chords)
-      transposed_chords.transpose(amount)
-      chord_progressions.append(transposed_chords)
-    return chord_progressions, stats.values()
+    return chords.transpositions(range(-6, 6)), stats.values()
   else:
     return [chords], stats.values()
 
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for chords_lib."""
 
+import copy
+
 # internal imports
 import tensorflow as tf
 
@@ -62,6 +64,19 @@ class ChordsLibTest(tf.test.TestCase):
     with self.assertRaises(chord_symbols_lib.ChordSymbolException):
       chords.transpose(transpose_amount=-4)
 
+  def testTranspositions(self):
+    # Transpositions should agree with transposing copies of the progression.
+    events = ['Cm', 'F', NO_CHORD, 'B-', 'E-', 'Cm']
+    chords = chords_lib.ChordProgression(events)
+    amounts = [-6, -2, 0, 4, 7]
+    chord_progressions = chords.transpositions(amounts)
+    self.assertEqual(len(amounts), len(chord_progressions))
+    for amount, transposed_chords in zip(amounts, chord_progressions):
+      expected = copy.deepcopy(chords)
+      expected.transpose(amount)
+      self.assertEqual(expected, transposed_chords)
+    self.assertEqual(events, list(chords))
+
   def testFromQuantizedSequence(self):
     testing_lib.add_quantized_chords_to_sequence(
         self.quantized_sequence,
@@ -22,7 +22,7 @@ file.
 
 import collections
 import copy
-import operator
+import itertools
 
 # internal imports
 
@@ -41,6 +41,45 @@ DEFAULT_STEPS_PER_QUARTER = constants.DEFAULT_STEPS_PER_QUARTER
 STANDARD_PPQ = constants.STANDARD_PPQ
 
 
+def _group_drum_notes(quantized_sequence):
+  """Groups the drum notes of all tracks by start step.
+
+  Args:
+    quantized_sequence: A sequences_lib.QuantizedSequence instance.
+
+  Returns:
+    A list of (start, pitches) tuples sorted by start step, where `pitches` is
+    a frozenset of the pitches of all nonzero-velocity drum notes that start at
+    step `start`.
+  """
+  grouped_pitches = collections.defaultdict(set)
+  for track in quantized_sequence.tracks.values():
+    mask = track.is_drums & (track.velocities != 0)
+    for start, pitch in zip(track.starts[mask].tolist(),
+                            track.pitches[mask].tolist()):
+      grouped_pitches[start].add(pitch)
+  return sorted((start, frozenset(pitches))
+                for start, pitches in grouped_pitches.items())
+
+
+def _skip_drum_events_before(drum_events, start_step, index=0):
+  """Returns the index of the first grouped drum event at or after a step.
+
+  Args:
+    drum_events: A list of (start, pitches) tuples sorted by start step.
+    start_step: The time step to search from.
+    index: The event index to start searching from. All events before this
+        index must start before `start_step`.
+
+  Returns:
+    The index of the first event in `drum_events` with start step at or after
+    `start_step`, or `len(drum_events)` if there is no such event.
+  """
+  while index < len(drum_events) and drum_events[index][0] < start_step:
+    index += 1
+  return index
+
+
 class DrumTrack(events_lib.SimpleEventSequence):
   """Stores a quantized stream of drum events.
 
@@ -159,38 +198,45 @@ class DrumTrack(events_lib.SimpleEventSequence):
           steps.
     """
     self._reset()
+    steps_per_bar = events_lib.get_steps_per_bar(quantized_sequence)
+    drum_events = _group_drum_notes(quantized_sequence)
+    self._from_grouped_drum_events(
+        drum_events, _skip_drum_events_before(drum_events, start_step),
+        steps_per_bar, quantized_sequence.steps_per_quarter, gap_bars, pad_end)
+
+  def _from_grouped_drum_events(self, drum_events, event_index, steps_per_bar,
+                                steps_per_quarter, gap_bars, pad_end):
+    """Populate self with drums from a sorted list of grouped drum events.
+
+    This does the work of `from_quantized_sequence` on drum notes that have
+    already been grouped and sorted, so that `extract_drum_tracks` can do so
+    only once.
+
+    Args:
+      drum_events: A list of (start, pitches) tuples as returned by
+          `_group_drum_notes`.
+      event_index: Start searching for drums at this index into
+          `drum_events`.
+      steps_per_bar: The integer number of time steps per bar.
+      steps_per_quarter: The number of time steps per quarter note.
+      gap_bars: If this many bars or more follow a non-empty drum event, the
+          drum track is ended.
+      pad_end: If True, the end of the drums will be padded with empty events so
+          that it will end at a bar boundary.
+    """
+    self._reset()
 
     offset = None
-    steps_per_bar_float = quantized_sequence.steps_per_bar()
-    if steps_per_bar_float % 1 != 0:
-      raise events_lib.NonIntegerStepsPerBarException(
-          'There are %f timesteps per bar. Time signature: %d/%d' %
-          (steps_per_bar_float, quantized_sequence.time_signature.numerator,
-           quantized_sequence.time_signature.denominator))
-    self._steps_per_bar = steps_per_bar = int(steps_per_bar_float)
-    self._steps_per_quarter = quantized_sequence.steps_per_quarter
-
-    # Group all drum notes that start at the same step.
-    all_tracks = [note for track in quantized_sequence.tracks
-                  for note in quantized_sequence.tracks[track]
-                  if note.is_drum                 # drums only
-                  and note.velocity               # no zero-velocity notes
-                  and note.start >= start_step]   # after start_step only
-    grouped_notes = collections.defaultdict(list)
-    for note in all_tracks:
-      grouped_notes[note.start].append(note)
-
-    # Sort by note start times.
-    notes = sorted(grouped_notes.items(), key=operator.itemgetter(0))
+    self._steps_per_bar = steps_per_bar
+    self._steps_per_quarter = steps_per_quarter
 
     gap_start_index = 0
 
-    for start, group in notes:
+    for start, pitches in itertools.islice(drum_events, event_index, None):
       if offset is None:
         offset = start - start % steps_per_bar
 
       start_index = start - offset
-      pitches = frozenset(note.pitch for note in group)
 
       # If a gap of `gap` or more steps is found, end the drum track.
       note_distance = start_index - gap_start_index
@@ -336,18 +382,20 @@ def extract_drum_tracks(quantized_sequence,
 
   start = 0
 
+  # Group and sort the drum notes once, then cut all drum tracks in a single
+  # sweep over the grouped drum events.
+  steps_per_bar = events_lib.get_steps_per_bar(quantized_sequence)
+  drum_events = _group_drum_notes(quantized_sequence)
+  event_index = 0
+
   # Quantize the track into a DrumTrack object.
   # If any notes start at the same time, only one is kept.
   while 1:
     drum_track = DrumTrack()
-    try:
-      drum_track.from_quantized_sequence(
-          quantized_sequence,
-          start_step=start,
-          gap_bars=gap_bars,
-          pad_end=pad_end)
-    except events_lib.NonIntegerStepsPerBarException:
-      raise
+    event_index = _skip_drum_events_before(drum_events, start, event_index)
+    drum_track._from_grouped_drum_events(  # pylint: disable=protected-access
+        drum_events, event_index, steps_per_bar,
+        quantized_sequence.steps_per_quarter, gap_bars, pad_end)
     start = drum_track.end_step
     if not drum_track:
       break
@@ -120,6 +120,18 @@ class DrumsLibTest(tf.test.TestCase):
     self.assertEqual(16, drums.start_step)
     self.assertEqual(22, drums.end_step)
 
+  def testFromNotesStartStepSkipsEarlierNotes(self):
+    self.quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 0,
+        [(36, 100, 0, 1), (38, 100, 2, 3), (36, 100, 5, 6)],
+        is_drum=True)
+    drums = drums_lib.DrumTrack()
+    drums.from_quantized_sequence(self.quantized_sequence, start_step=1)
+    expected = [NO_DRUMS, NO_DRUMS, DRUMS(38), NO_DRUMS, NO_DRUMS, DRUMS(36)]
+    self.assertEqual(expected, list(drums))
+    self.assertEqual(0, drums.start_step)
+
   def testSetLength(self):
     events = [DRUMS(60)]
     drums = drums_lib.DrumTrack(events, start_step=9)
@@ -249,6 +261,27 @@ class DrumsLibTest(tf.test.TestCase):
     drum_tracks = sorted([list(drums) for drums in drum_tracks])
     self.assertEqual(expected, drum_tracks)
 
+  def testExtractDrumTracksSameStartAndGaps(self):
+    self.quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 0,
+        [(36, 100, 0, 1), (38, 100, 2, 3), (42, 0, 3, 4), (36, 100, 5, 6),
+         (38, 100, 12, 13), (42, 100, 13, 14)],
+        is_drum=True)
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 1,
+        [(46, 100, 2, 3), (49, 100, 12, 13)],
+        is_drum=True)
+    # Notes starting on the same step are merged across tracks, zero velocity
+    # notes are ignored, and a gap of a bar starts a new drum track.
+    expected = [(0, [DRUMS(36), NO_DRUMS, DRUMS(38, 46), NO_DRUMS, NO_DRUMS,
+                     DRUMS(36)]),
+                (12, [DRUMS(38, 49), DRUMS(42)])]
+    drum_tracks, _ = drums_lib.extract_drum_tracks(
+        self.quantized_sequence, min_bars=0, gap_bars=1)
+    self.assertEqual(
+        expected, [(drums.start_step, list(drums)) for drums in drum_tracks])
+
   def testExtractDrumTracksTooShort(self):
     self.quantized_sequence.steps_per_quarter = 1
     testing_lib.add_quantized_track_to_sequence(
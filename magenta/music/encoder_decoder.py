@@ -30,7 +30,10 @@ During generation, use EventSequenceEncoderDecoder.get_inputs_batch to convert a
 list of event sequences into an inputs batch which can be fed into the model to
 predict what the next event should be for each sequence. Then use
 EventSequenceEncoderDecoder.extend_event_sequences to extend each of those event
-sequences with an event sampled from the softmax output by the model.
+sequences with an event sampled from the softmax output by the model. To avoid
+rescanning each event sequence at every step, keep an encoder state for each
+one (see `get_state`), advance it with `update_state` as events are added, and
+use EventSequenceEncoderDecoder.get_inputs_batch_incremental instead.
 
 OneHotEventSequenceEncoderDecoder is an EventSequenceEncoderDecoder that uses a
 OneHotEncoding of individual events. The input vectors are one-hot encodings of
@@ -41,6 +44,10 @@ LookbackEventSequenceEncoderDecoder is an EventSequenceEncoderDecoder that also
 uses a OneHotEncoding of individual events. However, its input and output
 encodings also consider whether the event sequence is repeating, and the input
 encoding includes binary counters for timekeeping.
+
+Both of these compute the inputs and labels of a whole event sequence with numpy
+array operations (see `inputs_array`, `labels_array`, and `encode_batch`), which
+is how `encode` builds its SequenceExamples.
 """
 
 import abc
@@ -203,6 +210,64 @@ class EventSequenceEncoderDecoder(object):
     """
     pass
 
+  def inputs_array(self, events, num_steps=None):
+    """Returns the input vectors for a prefix of the event sequence as an array.
+
+    The default implementation calls `events_to_input` once per position.
+    Subclasses can override it with a vectorized implementation.
+
+    Args:
+      events: A list-like sequence of events.
+      num_steps: The number of positions to compute input vectors for, starting
+          from the first event. If None, input vectors are computed for every
+          event in `events`.
+
+    Returns:
+      A float32 numpy array of shape [num_steps, self.input_size].
+    """
+    if num_steps is None:
+      num_steps = len(events)
+    inputs = np.zeros((num_steps, self.input_size), dtype=np.float32)
+    for i in range(num_steps):
+      inputs[i] = self.events_to_input(events, i)
+    return inputs
+
+  def labels_array(self, events):
+    """Returns the labels used to train on the event sequence as an array.
+
+    These are the labels for positions [1, len(events)), i.e. the label paired
+    with each input vector in `encode`. The default implementation calls
+    `events_to_label` once per position. Subclasses can override it with a
+    vectorized implementation.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      An int64 numpy array of shape [max(len(events) - 1, 0)].
+    """
+    return np.array([self.events_to_label(events, i)
+                     for i in range(1, len(events))], dtype=np.int64)
+
+  def encode_batch(self, event_sequences):
+    """Returns the full-length input vectors for a batch of event sequences.
+
+    Args:
+      event_sequences: A list of list-like event sequences.
+
+    Returns:
+      A float32 numpy array of shape
+      [len(event_sequences), max_length, self.input_size], where max_length is
+      the length of the longest event sequence. Shorter event sequences are
+      padded with zero vectors at the end.
+    """
+    max_length = max([len(events) for events in event_sequences] + [0])
+    inputs_batch = np.zeros(
+        (len(event_sequences), max_length, self.input_size), dtype=np.float32)
+    for i, events in enumerate(event_sequences):
+      inputs_batch[i, :len(events)] = self.inputs_array(events)
+    return inputs_batch
+
   def encode(self, events):
     """Returns a SequenceExample for the given event sequence.
 
@@ -212,12 +277,11 @@ class EventSequenceEncoderDecoder(object):
     Returns:
       A tf.train.SequenceExample containing inputs and labels.
     """
-    inputs = []
-    labels = []
-    for i in range(len(events) - 1):
-      inputs.append(self.events_to_input(events, i))
-      labels.append(self.events_to_label(events, i + 1))
-    return sequence_example_lib.make_sequence_example(inputs, labels)
+    num_steps = max(len(events) - 1, 0)
+    inputs = self.inputs_array(events, num_steps)
+    labels = self.labels_array(events)
+    return sequence_example_lib.make_sequence_example(
+        inputs.tolist(), labels.tolist())
 
   def get_inputs_batch(self, event_sequences, full_length=False):
     """Returns an inputs batch for the given event sequences.
@@ -239,15 +303,86 @@ class EventSequenceEncoderDecoder(object):
     """
     inputs_batch = []
     for events in event_sequences:
-      inputs = []
       if full_length and len(event_sequences):
-        for i in range(len(events)):
-          inputs.append(self.events_to_input(events, i))
+        inputs = self.inputs_array(events).tolist()
       else:
-        inputs.append(self.events_to_input(events, len(events) - 1))
+        inputs = [self.events_to_input(events, len(events) - 1)]
       inputs_batch.append(inputs)
     return inputs_batch
 
+  def get_initial_state(self):
+    """Returns the encoder state of an empty event sequence.
+
+    An encoder state summarizes an event sequence so that the input vector for
+    its last event can be computed without rescanning the sequence. Extend it
+    one event at a time with `update_state`, and get the input vector for its
+    last event with `state_to_input`. Use `copy.deepcopy` to branch a state
+    along with its event sequence.
+
+    The default implementation needs no state and returns None. Subclasses
+    whose inputs depend on the whole event history should override
+    `get_initial_state`, `update_state`, and `state_to_input`.
+
+    Returns:
+      A new encoder state object.
+    """
+    return None
+
+  def update_state(self, state, event):
+    """Advances an encoder state by a single event.
+
+    Args:
+      state: An encoder state returned by `get_initial_state`, modified in
+          place.
+      event: The next event value.
+    """
+    pass
+
+  def state_to_input(self, state, events):
+    """Returns the input vector for the last event covered by an encoder state.
+
+    Args:
+      state: An encoder state that has been updated with every event in
+          `events`.
+      events: A list-like sequence of events.
+
+    Returns:
+      An input vector, a self.input_size length list of floats.
+    """
+    return self.events_to_input(events, len(events) - 1)
+
+  def get_state(self, events):
+    """Returns the encoder state of the given event sequence.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      An encoder state that has been updated with every event in `events`.
+    """
+    state = self.get_initial_state()
+    for event in events:
+      self.update_state(state, event)
+    return state
+
+  def get_inputs_batch_incremental(self, event_sequences, states):
+    """Returns a last-event inputs batch computed from encoder states.
+
+    This is equivalent to `get_inputs_batch(event_sequences)`, but each input
+    vector is computed from the encoder state of its event sequence instead of
+    from the sequence's full history.
+
+    Args:
+      event_sequences: A list of list-like event sequences.
+      states: A list of encoder states the same length as `event_sequences`,
+          each of which has been updated with every event in its sequence.
+
+    Returns:
+      An inputs batch of shape [len(event_sequences), 1, INPUT_SIZE].
+    """
+    return [[self.state_to_input(state, events)]
+            for events, state in zip(event_sequences, states)]
+
   def extend_event_sequences(self, event_sequences, softmax):
     """Extends the event_sequences by sampling the softmax probabilities.
 
@@ -311,6 +446,26 @@ class OneHotEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
     input_[self._one_hot_encoding.encode_event(events[position])] = 1.0
     return input_
 
+  def inputs_array(self, events, num_steps=None):
+    """Returns the one-hot input vectors for a prefix of the event sequence.
+
+    Args:
+      events: A list-like sequence of events.
+      num_steps: The number of positions to compute input vectors for, starting
+          from the first event. If None, input vectors are computed for every
+          event in `events`.
+
+    Returns:
+      A float32 numpy array of shape [num_steps, self.input_size].
+    """
+    if num_steps is None:
+      num_steps = len(events)
+    indices = [self._one_hot_encoding.encode_event(events[i])
+               for i in range(num_steps)]
+    inputs = np.zeros((num_steps, self.input_size), dtype=np.float32)
+    inputs[np.arange(num_steps), indices] = 1.0
+    return inputs
+
   def events_to_label(self, events, position):
     """Returns the label for the given position in the event sequence.
 
@@ -326,6 +481,18 @@ class OneHotEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
     """
     return self._one_hot_encoding.encode_event(events[position])
 
+  def labels_array(self, events):
+    """Returns the one-hot labels for positions [1, len(events)) as an array.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      An int64 numpy array of shape [max(len(events) - 1, 0)].
+    """
+    return np.array([self._one_hot_encoding.encode_event(events[i])
+                     for i in range(1, len(events))], dtype=np.int64)
+
   def class_index_to_event(self, class_index, events):
     """Returns the event for the given class index.
 
@@ -446,6 +613,118 @@ class LookbackEventSequenceEncoderDecoder(EventSequenceEncoderDecoder):
 
     return input_
 
+  def _encode_events(self, events):
+    """Returns the one-hot encoding index of every event as an int array."""
+    return np.array([self._one_hot_encoding.encode_event(event)
+                     for event in events], dtype=np.int64)
+
+  def _repeat_masks(self, indices, num_steps):
+    """Returns which of the first `num_steps` events repeat each lookback.
+
+    Events are compared by their one-hot encoding index, which is equivalent
+    to comparing the events themselves since the encoding is one-to-one.
+
+    Args:
+      indices: An int array, the one-hot encoding index of every event.
+      num_steps: The number of positions to compute masks for.
+
+    Returns:
+      A list with one boolean numpy array of shape [num_steps] per lookback
+      distance, True at positions whose event equals the event that many steps
+      earlier.
+    """
+    masks = []
+    for lookback_distance in self._lookback_distances:
+      mask = np.zeros(num_steps, dtype=bool)
+      if lookback_distance < num_steps:
+        mask[lookback_distance:] = (
+            indices[lookback_distance:num_steps] ==
+            indices[:num_steps - lookback_distance])
+      masks.append(mask)
+    return masks
+
+  def inputs_array(self, events, num_steps=None):
+    """Returns the input vectors for a prefix of the event sequence.
+
+    Computes the same input vectors as `events_to_input`, using a handful of
+    array operations over the whole sequence instead of one pass per position.
+
+    Args:
+      events: A list-like sequence of events.
+      num_steps: The number of positions to compute input vectors for, starting
+          from the first event. If None, input vectors are computed for every
+          event in `events`.
+
+    Returns:
+      A float32 numpy array of shape [num_steps, self.input_size].
+    """
+    if num_steps is None:
+      num_steps = len(events)
+    indices = self._encode_events(events[:num_steps])
+    default_index = self._one_hot_encoding.encode_event(
+        self._one_hot_encoding.default_event)
+    one_hot_size = self._one_hot_encoding.num_classes
+    positions = np.arange(num_steps)
+
+    inputs = np.zeros((num_steps, self.input_size), dtype=np.float32)
+    offset = 0
+
+    # Last event.
+    inputs[positions, indices] = 1.0
+    offset += one_hot_size
+
+    # Next event if repeating N positions ago.
+    for lookback_distance in self._lookback_distances:
+      lookback_positions = positions - lookback_distance + 1
+      lookback_indices = np.where(
+          lookback_positions < 0, default_index,
+          indices[np.maximum(lookback_positions, 0)])
+      inputs[positions, offset + lookback_indices] = 1.0
+      offset += one_hot_size
+
+    # Binary time counter giving the metric location of the *next* event.
+    n = positions + 1
+    for i in range(self._binary_counter_bits):
+      inputs[:, offset] = np.where((n >> i) & 1, 1.0, -1.0)
+      offset += 1
+
+    # Last event is repeating N bars ago.
+    for mask in self._repeat_masks(indices, num_steps):
+      inputs[mask, offset] = 1.0
+      offset += 1
+
+    assert offset == self.input_size
+
+    return inputs
+
+  def labels_array(self, events):
+    """Returns the labels for positions [1, len(events)) as an array.
+
+    Computes the same labels as `events_to_label` using array operations.
+
+    Args:
+      events: A list-like sequence of events.
+
+    Returns:
+      An int64 numpy array of shape [max(len(events) - 1, 0)].
+    """
+    indices = self._encode_events(events)
+    one_hot_size = self._one_hot_encoding.num_classes
+    labels = indices.copy()
+
+    # More distant repeats take precedence, so they are applied last.
+    for i, mask in enumerate(self._repeat_masks(indices, len(indices))):
+      labels[mask] = one_hot_size + i
+
+    if self._lookback_distances:
+      default_index = self._one_hot_encoding.encode_event(
+          self._one_hot_encoding.default_event)
+      default_mask = indices == default_index
+      default_mask[self._lookback_distances[-1]:] = False
+      labels[default_mask] = one_hot_size + len(self._lookback_distances) - 1
+
+    return labels[1:]
+
   def events_to_label(self, events, position):
     """Returns the label for the given position in the event sequence.
 
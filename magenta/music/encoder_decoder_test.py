@@ -14,6 +14,7 @@
 """Tests for encoder_decoder."""
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 
 from magenta.common import sequence_example_lib
@@ -106,6 +107,36 @@ class OneHotEventSequenceEncoderDecoderTest(tf.test.TestCase):
         expected_last_event_inputs_batch,
         self.enc.get_inputs_batch(event_sequences))
 
+  def testGetInputsBatchIncremental(self):
+    event_sequences = [[0, 1, 0, 2, 0], [0, 1, 2]]
+    states = [self.enc.get_state(events) for events in event_sequences]
+    self.assertListEqual(
+        self.enc.get_inputs_batch(event_sequences),
+        self.enc.get_inputs_batch_incremental(event_sequences, states))
+
+  def testInputsArray(self):
+    events = [0, 1, 0, 2, 0]
+    inputs = self.enc.inputs_array(events)
+    self.assertEqual(np.float32, inputs.dtype)
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(5)], inputs)
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(3)],
+        self.enc.inputs_array(events, 3))
+    self.assertAllEqual(
+        [self.enc.events_to_label(events, i) for i in range(1, 5)],
+        self.enc.labels_array(events))
+
+  def testEncodeBatch(self):
+    event_sequences = [[0, 1, 0, 2, 0], [0, 1, 2]]
+    inputs_batch = self.enc.encode_batch(event_sequences)
+    self.assertEqual((2, 5, 3), inputs_batch.shape)
+    self.assertAllEqual(self.enc.get_inputs_batch(event_sequences[:1], True)[0],
+                        inputs_batch[0])
+    self.assertAllEqual(self.enc.get_inputs_batch(event_sequences[1:], True)[0],
+                        inputs_batch[1, :3])
+    self.assertAllEqual(np.zeros((2, 3)), inputs_batch[1, 3:])
+
   def testExtendEventSequences(self):
     events1 = [0]
     events2 = [0]
@@ -184,6 +215,30 @@ class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
     self.assertEqual(0, self.enc.class_index_to_event(3, events[:5]))
     self.assertEqual(2, self.enc.class_index_to_event(4, events[:5]))
 
+  def testInputsArray(self):
+    events = [0, 1, 0, 2, 0, 0, 1, 1, 2]
+    inputs = self.enc.inputs_array(events)
+    self.assertEqual(np.float32, inputs.dtype)
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(len(events))],
+        inputs)
+    self.assertAllEqual(
+        [self.enc.events_to_input(events, i) for i in range(4)],
+        self.enc.inputs_array(events, 4))
+    self.assertAllEqual(
+        [self.enc.events_to_label(events, i) for i in range(1, len(events))],
+        self.enc.labels_array(events))
+
+  def testEncode(self):
+    events = [0, 1, 0, 2, 0, 0, 1, 1]
+    expected_inputs = [self.enc.events_to_input(events, i)
+                       for i in range(len(events) - 1)]
+    expected_labels = [self.enc.events_to_label(events, i)
+                       for i in range(1, len(events))]
+    expected_sequence_example = sequence_example_lib.make_sequence_example(
+        expected_inputs, expected_labels)
+    self.assertEqual(expected_sequence_example, self.enc.encode(events))
+
   def testEmptyLookback(self):
     enc = encoder_decoder.LookbackEventSequenceEncoderDecoder(
         TrivialOneHotEncoding(3), [], 2)
@@ -209,6 +264,11 @@ class LookbackEventSequenceEncoderDecoderTest(tf.test.TestCase):
     self.assertEqual(2, enc.events_to_label(events, 3))
     self.assertEqual(0, enc.events_to_label(events, 4))
 
+    self.assertAllEqual(
+        [enc.events_to_input(events, i) for i in range(5)],
+        enc.inputs_array(events))
+    self.assertAllEqual([1, 0, 2, 0], enc.labels_array(events))
+
     self.assertEqual(0, self.enc.class_index_to_event(0, events[:1]))
     self.assertEqual(1, self.enc.class_index_to_event(1, events[:1]))
     self.assertEqual(2, self.enc.class_index_to_event(2, events[:1]))
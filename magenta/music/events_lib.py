@@ -16,6 +16,10 @@
 The abstract `EventSequence` class is an interface for a sequence of musical
 events. The `SimpleEventSequence` class is a basic implementation of this
 interface.
+
+The `SharedPrefixEventSequence` class is a lightweight list-like sequence of
+events whose copies share storage for their common prefix, for generation
+code that branches sequences many times.
 """
 
 import abc
@@ -34,6 +38,29 @@ class NonIntegerStepsPerBarException(Exception):
   pass
 
 
+def get_steps_per_bar(quantized_sequence):
+  """Returns the integer number of steps per bar of a QuantizedSequence.
+
+  Args:
+    quantized_sequence: A sequences_lib.QuantizedSequence instance.
+
+  Returns:
+    The number of time steps per bar, an integer.
+
+  Raises:
+    NonIntegerStepsPerBarException: If `quantized_sequence`'s bar length
+        (derived from its time signature) is not an integer number of time
+        steps.
+  """
+  steps_per_bar_float = quantized_sequence.steps_per_bar()
+  if steps_per_bar_float % 1 != 0:
+    raise NonIntegerStepsPerBarException(
+        'There are %f timesteps per bar. Time signature: %d/%d' %
+        (steps_per_bar_float, quantized_sequence.time_signature.numerator,
+         quantized_sequence.time_signature.denominator))
+  return int(steps_per_bar_float)
+
+
 class EventSequence(object):
   """Stores a quantized stream of events.
 
@@ -281,3 +308,124 @@ class SimpleEventSequence(EventSequence):
     self._end_step *= k
     self._steps_per_bar *= k
     self._steps_per_quarter *= k
+
+
+class _SharedPrefixNode(object):
+  """A single event of a SharedPrefixEventSequence, linked to its prefix."""
+
+  __slots__ = ['event', 'parent', 'length']
+
+  def __init__(self, event, parent):
+    self.event = event
+    self.parent = parent
+    self.length = parent.length + 1 if parent is not None else 1
+
+
+class SharedPrefixEventSequence(object):
+  """A list-like sequence of events whose copies share their common prefix.
+
+  Events are stored as a tree of immutable nodes, each of which points to the
+  node of the previous event. A sequence is just a reference to the node of its
+  last event, so copying a sequence is O(1) and appending to a copy never
+  affects the original. This lets many branches of the same sequence, e.g.
+  during beam search, share their history instead of each holding a full copy
+  of it, and pruned branches are freed as soon as they are unreferenced.
+
+  Indexing walks back from the end of the sequence, so accessing the event `k`
+  positions from the end, or the last `k` events with `last_events` or a slice
+  like `events[-k:]`, costs O(k). This makes the recent events that encoders
+  look at while extending a sequence cheap to access; iterating costs O(n).
+  """
+
+  def __init__(self, events=None):
+    """Construct a SharedPrefixEventSequence.
+
+    Args:
+      events: Iterable of events to instantiate with, or None to create an
+          empty sequence.
+    """
+    self._tip = None
+    if events is not None:
+      for event in events:
+        self.append(event)
+
+  def __iter__(self):
+    """Return an iterator over the events in this SharedPrefixEventSequence.
+
+    Returns:
+      Python iterator over events.
+    """
+    return iter(self.last_events(len(self)))
+
+  def last_events(self, k):
+    """Returns the last `k` events of this sequence.
+
+    This only walks back `k` events from the end of the sequence, so it costs
+    O(k) regardless of the length of the sequence.
+
+    Args:
+      k: The number of events to return. If the sequence has fewer than `k`
+          events, all of its events are returned.
+
+    Returns:
+      A list of the last `k` events, in order.
+    """
+    events = []
+    node = self._tip
+    while node is not None and len(events) < k:
+      events.append(node.event)
+      node = node.parent
+    events.reverse()
+    return events
+
+  def __getitem__(self, i):
+    """Returns the event at the given index, or a list of events for a slice.
+
+    A slice only walks back from the end of the sequence to its first event.
+    """
+    if isinstance(i, slice):
+      start, stop, step = i.indices(len(self))
+      if step < 0:
+        return list(self)[i]
+      return self.last_events(len(self) - start)[:max(stop - start, 0):step]
+    length = len(self)
+    if i < 0:
+      i += length
+    if not 0 <= i < length:
+      raise IndexError('event index out of range: %d' % i)
+    node = self._tip
+    for _ in xrange(length - 1 - i):
+      node = node.parent
+    return node.event
+
+  def __getslice__(self, i, j):
+    """Returns the events in the given slice range."""
+    # Python has already added the length to negative indices.
+    return self[slice(max(i, 0), max(j, 0))]
+
+  def __len__(self):
+    """How many events are in this SharedPrefixEventSequence.
+
+    Returns:
+      Number of events as an integer.
+    """
+    return self._tip.length if self._tip is not None else 0
+
+  def __copy__(self):
+    events = SharedPrefixEventSequence()
+    events._tip = self._tip  # pylint: disable=protected-access
+    return events
+
+  def __deepcopy__(self, unused_memo=None):
+    # Nodes are never modified, so a shallow copy is already independent.
+    return self.__copy__()
+
+  def append(self, event):
+    """Appends event to the end of this sequence only.
+
+    Other sequences sharing a prefix with this one are not affected.
+
+    Args:
+      event: The event to append to the end.
+    """
+    self._tip = _SharedPrefixNode(event, self._tip)
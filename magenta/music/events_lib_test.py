@@ -89,6 +89,46 @@ class EventsLibTest(tf.test.TestCase):
     events.increase_resolution(2, fill_event=0)
     self.assertListEqual([1, 0, 0, 0, 1, 0, 0, 0], list(events))
 
+  def testSharedPrefixEventSequence(self):
+    events = events_lib.SharedPrefixEventSequence([1, 2, 3])
+    self.assertEqual(3, len(events))
+    self.assertListEqual([1, 2, 3], list(events))
+    self.assertEqual(1, events[0])
+    self.assertEqual(3, events[-1])
+    self.assertEqual(2, events[-2])
+    self.assertListEqual([2, 3], events[1:])
+    with self.assertRaises(IndexError):
+      _ = events[3]
+
+    branch_1 = copy.copy(events)
+    branch_2 = copy.deepcopy(events)
+    branch_1.append(4)
+    branch_2.append(5)
+    branch_2.append(6)
+    self.assertListEqual([1, 2, 3], list(events))
+    self.assertListEqual([1, 2, 3, 4], list(branch_1))
+    self.assertListEqual([1, 2, 3, 5, 6], list(branch_2))
+    self.assertEqual(5, len(branch_2))
+    self.assertEqual(5, branch_2[-2])
+
+    empty = events_lib.SharedPrefixEventSequence()
+    self.assertEqual(0, len(empty))
+    self.assertListEqual([], list(empty))
+    self.assertListEqual([], empty.last_events(2))
+
+  def testSharedPrefixEventSequenceSlicing(self):
+    event_list = range(10)
+    events = events_lib.SharedPrefixEventSequence(event_list)
+    for k in [0, 1, 3, 10, 12]:
+      self.assertListEqual(event_list[max(len(event_list) - k, 0):],
+                           events.last_events(k))
+    for start in [None, -12, -3, 0, 2, 9, 10, 12]:
+      for stop in [None, -12, -3, 0, 5, 10, 12]:
+        for step in [None, 1, 2, -1, -2]:
+          self.assertListEqual(event_list[start:stop:step],
+                               events[start:stop:step])
+        self.assertListEqual(event_list[start:stop], events[start:stop])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -219,6 +219,29 @@ class LeadSheet(events_lib.EventSequence):
     self._melody.transpose(transpose_amount, min_note, max_note)
     self._chords.transpose(transpose_amount)
 
+  def transpositions(self, transpose_amounts, min_note=0, max_note=128):
+    """Returns transposed copies of this LeadSheet.
+
+    Equivalent to deep copying this LeadSheet and calling `transpose` on each
+    copy for each amount, but uses `Melody.transpositions` and
+    `ChordProgression.transpositions` to transpose all copies at once.
+
+    Args:
+      transpose_amounts: A list of the numbers of half steps to transpose this
+          LeadSheet by, one per copy.
+      min_note: Minimum pitch (inclusive) that the resulting notes will take on.
+      max_note: Maximum pitch (exclusive) that the resulting notes will take on.
+
+    Returns:
+      A python list of LeadSheet instances, one for each amount in
+      `transpose_amounts`.
+    """
+    melodies = self._melody.transpositions(transpose_amounts, min_note,
+                                           max_note)
+    chord_progressions = self._chords.transpositions(transpose_amounts)
+    return [type(self)(melody, chords)
+            for melody, chords in zip(melodies, chord_progressions)]
+
   def squash(self, min_note, max_note, transpose_to_key):
     """Transpose and octave shift the notes and chords in this LeadSheet.
 
@@ -54,6 +54,23 @@ class LeadSheetsLibTest(tf.test.TestCase):
     self.assertEqual(expected_melody, lead_sheet.melody)
     self.assertEqual(expected_chords, lead_sheet.chords)
 
+  def testTranspositions(self):
+    # Transpositions should agree with transposing copies of the lead sheet.
+    melody_events = [12 * 5 + 4, NO_EVENT, 12 * 5 + 5,
+                     NOTE_OFF, 12 * 6, NO_EVENT]
+    chord_events = [NO_CHORD, 'C', 'F', 'Dm', 'D', 'G']
+    lead_sheet = lead_sheets_lib.LeadSheet(
+        melodies_lib.Melody(melody_events),
+        chords_lib.ChordProgression(chord_events))
+    amounts = [-5, 0, 3]
+    lead_sheets = lead_sheet.transpositions(amounts, min_note=12 * 5,
+                                            max_note=12 * 7)
+    self.assertEqual(len(amounts), len(lead_sheets))
+    for amount, transposed_lead_sheet in zip(amounts, lead_sheets):
+      expected = copy.deepcopy(lead_sheet)
+      expected.transpose(amount, min_note=12 * 5, max_note=12 * 7)
+      self.assertEqual(expected, transposed_lead_sheet)
+
   def testSquash(self):
     # LeadSheet squash should agree with melody squash & chords transpose.
     melody_events = [12 * 5, NO_EVENT, 12 * 5 + 2,
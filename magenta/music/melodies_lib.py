@@ -21,6 +21,7 @@ midi_io.sequence_proto_to_midi_file to write that NoteSequence to a midi file.
 """
 
 import copy
+import itertools
 
 # internal imports
 import numpy as np
@@ -47,6 +48,47 @@ STANDARD_PPQ = constants.STANDARD_PPQ
 NOTE_KEYS = constants.NOTE_KEYS
 
 
+def _sort_track_notes(track, filter_drums):
+  """Returns the notes of a track that can be part of a melody, sorted.
+
+  Zero velocity notes, and drum notes if `filter_drums` is True, are removed.
+  The remaining notes are sorted by start time, and secondarily by pitch
+  descending.
+
+  Args:
+    track: A sequences_lib.QuantizedTrack.
+    filter_drums: If True, notes for which `is_drum` is True are removed.
+
+  Returns:
+    A sorted list of sequences_lib.QuantizedSequence.Note tuples.
+  """
+  mask = track.velocities != 0
+  if filter_drums:
+    mask &= ~track.is_drums
+  indices = np.flatnonzero(mask)
+  # np.lexsort is stable and sorts by its last key first.
+  order = np.lexsort((-track.pitches[indices], track.starts[indices]))
+  return track.take(indices[order])
+
+
+def _skip_notes_before(notes, start_step, index=0):
+  """Returns the index of the first sorted note starting at or after a step.
+
+  Args:
+    notes: A list of notes sorted by start time.
+    start_step: The time step to search from.
+    index: The note index to start searching from. All notes before this index
+        must start before `start_step`.
+
+  Returns:
+    The index of the first note in `notes` with start time at or after
+    `start_step`, or `len(notes)` if there is no such note.
+  """
+  while index < len(notes) and notes[index].start < start_step:
+    index += 1
+  return index
+
+
 class PolyphonicMelodyException(Exception):
   pass
 
@@ -284,25 +326,49 @@ class Melody(events_lib.SimpleEventSequence):
           and `ignore_polyphonic_notes` is False.
     """
     self._reset()
+    steps_per_bar = events_lib.get_steps_per_bar(quantized_sequence)
+    notes = _sort_track_notes(quantized_sequence.tracks[track],
+                              filter_drums)
+    self._from_sorted_notes(
+        notes, _skip_notes_before(notes, start_step), steps_per_bar,
+        quantized_sequence.steps_per_quarter, gap_bars,
+        ignore_polyphonic_notes, pad_end, filter_drums)
+
+  def _from_sorted_notes(self, notes, note_index, steps_per_bar,
+                         steps_per_quarter, gap_bars, ignore_polyphonic_notes,
+                         pad_end, filter_drums):
+    """Populate self with a melody from a sorted list of notes.
+
+    This does the work of `from_quantized_sequence` on a track that has already
+    been sorted, so that `extract_melodies` can sort each track only once.
+
+    Args:
+      notes: A list of notes from a single track, sorted by start time and
+          secondarily by pitch descending.
+      note_index: Start searching for a melody at this index into `notes`.
+      steps_per_bar: The integer number of time steps per bar.
+      steps_per_quarter: The number of time steps per quarter note.
+      gap_bars: If this many bars or more follow a NOTE_OFF event, the melody
+          is ended.
+      ignore_polyphonic_notes: If True, the highest pitch is used in the melody
+          when multiple notes start at the same time. If False,
+          PolyphonicMelodyException will be raised if multiple notes start at
+          the same time.
+      pad_end: If True, the end of the melody will be padded with NO_EVENTs so
+          that it will end at a bar boundary.
+      filter_drums: If True, notes for which `is_drum` is True will be ignored.
+
+    Raises:
+      PolyphonicMelodyException: If any of the notes start on the same step
+          and `ignore_polyphonic_notes` is False.
+    """
+    self._reset()
 
     offset = None
-    steps_per_bar_float = quantized_sequence.steps_per_bar()
-    if steps_per_bar_float % 1 != 0:
-      raise events_lib.NonIntegerStepsPerBarException(
-          'There are %f timesteps per bar. Time signature: %d/%d' %
-          (steps_per_bar_float, quantized_sequence.time_signature.numerator,
-           quantized_sequence.time_signature.denominator))
-    self._steps_per_bar = steps_per_bar = int(steps_per_bar_float)
-    self._steps_per_quarter = quantized_sequence.steps_per_quarter
-
-    # Sort track by note start times, and secondarily by pitch descending.
-    notes = sorted(quantized_sequence.tracks[track],
-                   key=lambda note: (note.start, -note.pitch))
-
-    for note in notes:
-      if note.start < start_step:
-        continue
+    self._steps_per_bar = steps_per_bar
+    self._steps_per_quarter = steps_per_quarter
 
+    for note in itertools.islice(notes, note_index, None):
       if filter_drums and note.is_drum:
         continue
 
@@ -450,6 +516,44 @@ class Melody(events_lib.SimpleEventSequence):
           self._events[i] = (max_note - NOTES_PER_OCTAVE +
                              (self._events[i] - max_note) % NOTES_PER_OCTAVE)
 
+  def transpositions(self, transpose_amounts, min_note=0, max_note=128):
+    """Returns transposed copies of this Melody.
+
+    Equivalent to deep copying this Melody and calling `transpose` on each copy
+    for each amount, but all transpositions are computed at once with array
+    operations.
+
+    Args:
+      transpose_amounts: A list of the numbers of half steps to transpose this
+          Melody by, one per copy.
+      min_note: Minimum pitch (inclusive) that the resulting notes will take on.
+      max_note: Maximum pitch (exclusive) that the resulting notes will take on.
+
+    Returns:
+      A python list of Melody instances, one for each amount in
+      `transpose_amounts`.
+    """
+    events = np.array(self._events, dtype=np.int64)
+    # One row per transposition.
+    pitches = events + np.array(transpose_amounts, dtype=np.int64)[:, None]
+    pitches = np.where(
+        pitches < min_note,
+        min_note + (pitches - min_note) % NOTES_PER_OCTAVE,
+        np.where(
+            pitches >= max_note,
+            max_note - NOTES_PER_OCTAVE +
+            (pitches - max_note) % NOTES_PER_OCTAVE,
+            pitches))
+    # Special events below MIN_MIDI_PITCH are not changed.
+    transposed_events = np.where(events >= MIN_MIDI_PITCH, pitches, events)
+
+    melodies = []
+    for row in transposed_events:
+      melody = copy.copy(self)
+      melody._events = row.tolist()  # pylint: disable=protected-access
+      melodies.append(melody)
+    return melodies
+
   def squash(self, min_note, max_note, transpose_to_key=None):
     """Transpose and octave shift the notes in this Melody.
 
@@ -599,22 +703,26 @@ def extract_melodies(quantized_sequence,
       'melody_lengths_in_bars',
       [0, 1, 10, 20, 30, 40, 50, 100, 200, 500, min_bars // 2, min_bars,
        min_bars + 1, min_bars - 1])
+  steps_per_bar = events_lib.get_steps_per_bar(quantized_sequence)
   for track in quantized_sequence.tracks:
     start = 0
 
+    # Sort the track once, then cut all of its melodies in a single sweep over
+    # the sorted notes.
+    notes = _sort_track_notes(quantized_sequence.tracks[track],
+                              filter_drums)
+    note_index = 0
+
     # Quantize the track into a Melody object.
     # If any notes start at the same time, only one is kept.
     while 1:
       melody = Melody()
+      note_index = _skip_notes_before(notes, start, note_index)
       try:
-        melody.from_quantized_sequence(
-            quantized_sequence,
-            track=track,
-            start_step=start,
-            gap_bars=gap_bars,
-            ignore_polyphonic_notes=ignore_polyphonic_notes,
-            pad_end=pad_end,
-            filter_drums=filter_drums)
+        melody._from_sorted_notes(  # pylint: disable=protected-access
+            notes, note_index, steps_per_bar,
+            quantized_sequence.steps_per_quarter, gap_bars,
+            ignore_polyphonic_notes, pad_end, filter_drums)
       except PolyphonicMelodyException:
         stats['polyphonic_tracks_discarded'].increment()
         break  # Look for monophonic melodies in other tracks.
@@ -13,6 +13,7 @@
 # limitations under the License.
 """Tests for melodies_lib."""
 
+import copy
 import os
 
 # internal imports
@@ -111,6 +112,21 @@ class MelodiesLibTest(tf.test.TestCase):
     expected = [12 * 5 + 11, 12 * 5, 12 * 5 + 11, NOTE_OFF, 12 * 5, NO_EVENT]
     self.assertEqual(expected, list(melody))
 
+  def testTranspositions(self):
+    # Transpositions should agree with transposing copies of the melody.
+    events = [12 * 5 + 4, NO_EVENT, 12 * 5 + 5, NOTE_OFF, 12 * 6, NO_EVENT,
+              12 * 4 + 11]
+    melody = melodies_lib.Melody(events, start_step=16)
+    amounts = [-5, 0, 7, 19]
+    melodies = melody.transpositions(amounts, min_note=12 * 5,
+                                     max_note=12 * 7)
+    self.assertEqual(len(amounts), len(melodies))
+    for amount, transposed_melody in zip(amounts, melodies):
+      expected = copy.deepcopy(melody)
+      expected.transpose(amount, min_note=12 * 5, max_note=12 * 7)
+      self.assertEqual(expected, transposed_melody)
+    self.assertEqual(events, list(melody))
+
   def testSquash(self):
     # Melody in C, transposed to C, and squashed to 1 octave.
     events = [12 * 5, NO_EVENT, 12 * 5 + 2, NOTE_OFF, 12 * 6 + 4, NO_EVENT]
@@ -289,6 +305,18 @@ class MelodiesLibTest(tf.test.TestCase):
     self.assertEqual(16, melody.start_step)
     self.assertEqual(27, melody.end_step)
 
+  def testFromNotesStartStepSkipsEarlierNotes(self):
+    self.quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 0,
+        [(60, 100, 0, 3), (62, 100, 2, 6), (64, 100, 8, 9), (65, 100, 9, 10)])
+    melody = melodies_lib.Melody()
+    # The note at step 2 is still sounding at step 4, but starts before it.
+    melody.from_quantized_sequence(self.quantized_sequence, start_step=4,
+                                   track=0, gap_bars=1)
+    self.assertEqual([64, 65], list(melody))
+    self.assertEqual(8, melody.start_step)
+
   def testSetLength(self):
     events = [60]
     melody = melodies_lib.Melody(events, start_step=9)
@@ -434,6 +462,46 @@ class MelodiesLibTest(tf.test.TestCase):
     melodies = sorted([list(melody) for melody in melodies])
     self.assertEqual(expected, melodies)
 
+  def testExtractMelodiesSameStartPolyphony(self):
+    self.quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 0,
+        [(60, 100, 0, 2), (62, 100, 2, 5), (72, 100, 10, 11),
+         (67, 100, 10, 12), (64, 100, 12, 14)])
+
+    # The highest of the notes starting on the same step is kept.
+    melodies, _ = melodies_lib.extract_melodies(
+        self.quantized_sequence, min_bars=1, gap_bars=1, min_unique_pitches=2,
+        ignore_polyphonic_notes=True)
+    self.assertEqual(
+        [(0, [60, NO_EVENT, 62, NO_EVENT, NO_EVENT]),
+         (8, [NO_EVENT, NO_EVENT, 72, NOTE_OFF, 64, NO_EVENT])],
+        [(melody.start_step, list(melody)) for melody in melodies])
+
+    # Otherwise the polyphonic melody and the rest of its track are discarded,
+    # but melodies before it are kept.
+    melodies, stats = melodies_lib.extract_melodies(
+        self.quantized_sequence, min_bars=1, gap_bars=1, min_unique_pitches=2,
+        ignore_polyphonic_notes=False)
+    self.assertEqual([[60, NO_EVENT, 62, NO_EVENT, NO_EVENT]],
+                     [list(melody) for melody in melodies])
+    stats_dict = dict([(stat.name, stat) for stat in stats])
+    self.assertEqual(1, stats_dict['polyphonic_tracks_discarded'].count)
+
+  def testExtractMelodiesGaps(self):
+    self.quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_track_to_sequence(
+        self.quantized_sequence, 0,
+        [(60, 100, 0, 2), (62, 100, 5, 7), (64, 100, 11, 13),
+         (65, 100, 13, 14)])
+    # A gap of less than a bar continues the melody, a gap of a bar ends it.
+    melodies, _ = melodies_lib.extract_melodies(
+        self.quantized_sequence, min_bars=0, gap_bars=1, min_unique_pitches=1)
+    self.assertEqual(
+        [(0, [60, NO_EVENT, NOTE_OFF, NO_EVENT, NO_EVENT, 62, NO_EVENT]),
+         (8, [NO_EVENT, NO_EVENT, NO_EVENT, 64, NO_EVENT, 65])],
+        [(melody.start_step, list(melody)) for melody in melodies])
+
   def testExtractMelodiesMelodyTooShort(self):
     self.quantized_sequence.steps_per_quarter = 1
     testing_lib.add_quantized_track_to_sequence(
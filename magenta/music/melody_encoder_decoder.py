@@ -25,9 +25,10 @@ use by melody models.
 import collections
 
 # internal imports
+import numpy as np
+
 from magenta.music import constants
 from magenta.music import encoder_decoder
-from magenta.music import melodies_lib
 
 NUM_SPECIAL_MELODY_EVENTS = constants.NUM_SPECIAL_MELODY_EVENTS
 MELODY_NOTE_OFF = constants.MELODY_NOTE_OFF
@@ -36,6 +37,7 @@ MIN_MIDI_PITCH = constants.MIN_MIDI_PITCH
 MAX_MIDI_PITCH = constants.MAX_MIDI_PITCH
 NOTES_PER_OCTAVE = constants.NOTES_PER_OCTAVE
 DEFAULT_STEPS_PER_BAR = constants.DEFAULT_STEPS_PER_BAR
+NOTE_KEYS = constants.NOTE_KEYS
 
 DEFAULT_LOOKBACK_DISTANCES = encoder_decoder.DEFAULT_LOOKBACK_DISTANCES
 
@@ -127,6 +129,41 @@ class MelodyOneHotEncoding(encoder_decoder.OneHotEncoding):
     return index - NUM_SPECIAL_MELODY_EVENTS + self._min_note
 
 
+class _KeyMelodyEncoderState(object):
+  """The running state of a melody prefix used by KeyMelodyEncoderDecoder.
+
+  Attributes:
+    num_events: The number of melody events seen so far.
+    current_note: The pitch of the currently playing note, or None if silence
+        is playing.
+    is_attack: Whether the last event was the note-on event of the currently
+        playing note.
+    is_ascending: Whether the melody is ascending (True) or descending (False),
+        or None if there have not yet been two distinct notes.
+    last_3_notes: A deque of the last three distinct note pitches.
+    key_histogram: A list of 12 ints, the number of notes seen so far that
+        fit into each major key.
+  """
+
+  def __init__(self):
+    self.num_events = 0
+    self.current_note = None
+    self.is_attack = False
+    self.is_ascending = None
+    self.last_3_notes = collections.deque(maxlen=3)
+    self.key_histogram = [0] * NOTES_PER_OCTAVE
+
+  def __deepcopy__(self, unused_memo=None):
+    state = _KeyMelodyEncoderState()
+    state.num_events = self.num_events
+    state.current_note = self.current_note
+    state.is_attack = self.is_attack
+    state.is_ascending = self.is_ascending
+    state.last_3_notes = collections.deque(self.last_3_notes, maxlen=3)
+    state.key_histogram = list(self.key_histogram)
+    return state
+
+
 class KeyMelodyEncoderDecoder(encoder_decoder.EventSequenceEncoderDecoder):
   """A MelodyEncoderDecoder that encodes repeated events, time, and key."""
 
@@ -198,33 +235,71 @@ class KeyMelodyEncoderDecoder(encoder_decoder.EventSequenceEncoderDecoder):
     Returns:
       An input vector, an self.input_size length list of floats.
     """
-    current_note = None
-    is_attack = False
-    is_ascending = None
-    last_3_notes = collections.deque(maxlen=3)
-    sub_melody = melodies_lib.Melody(events[:position + 1])
-    for note in sub_melody:
-      if note == MELODY_NO_EVENT:
-        is_attack = False
-      elif note == MELODY_NOTE_OFF:
-        current_note = None
-      else:
-        is_attack = True
-        current_note = note
-        if last_3_notes:
-          if note > last_3_notes[-1]:
-            is_ascending = True
-          if note < last_3_notes[-1]:
-            is_ascending = False
-        if note in last_3_notes:
-          last_3_notes.remove(note)
-        last_3_notes.append(note)
+    state = self.get_initial_state()
+    for event in events[:position + 1]:
+      self.update_state(state, event)
+    return self.state_to_input(state, events)
+
+  def get_initial_state(self):
+    """Returns the encoder state of an empty melody.
+
+    The encoder state summarizes a melody prefix, so the input for each new
+    event in a generation loop costs O(1) instead of rescanning the whole
+    melody as `events_to_input` does.
+
+    Returns:
+      A new encoder state object.
+    """
+    return _KeyMelodyEncoderState()
+
+  def update_state(self, state, event):
+    """Advances the encoder state by a single melody event.
+
+    Args:
+      state: An encoder state returned by `get_initial_state`, modified in
+          place.
+      event: The next magenta.music.Melody event value.
+    """
+    state.num_events += 1
+    if event == MELODY_NO_EVENT:
+      state.is_attack = False
+    elif event == MELODY_NOTE_OFF:
+      state.current_note = None
+    else:
+      state.is_attack = True
+      state.current_note = event
+      last_3_notes = state.last_3_notes
+      if last_3_notes:
+        if event > last_3_notes[-1]:
+          state.is_ascending = True
+        if event < last_3_notes[-1]:
+          state.is_ascending = False
+      if event in last_3_notes:
+        last_3_notes.remove(event)
+      last_3_notes.append(event)
+      for key in NOTE_KEYS[event % NOTES_PER_OCTAVE]:
+        state.key_histogram[key] += 1
+
+  def state_to_input(self, state, events):
+    """Returns the input vector for the last event covered by an encoder state.
+
+    Args:
+      state: An encoder state that has been updated with the first
+          `state.num_events` events of `events`.
+      events: A magenta.music.Melody object, or list of melody events. Only
+          the events at lookback distances from the state's last event are
+          read.
+    Returns:
+      An input vector, an self.input_size length list of floats. See
+      `events_to_input` for the meaning of each index.
+    """
+    position = state.num_events - 1
 
     input_ = [0.0] * self.input_size
     offset = 0
-    if current_note:
+    if state.current_note:
       # The pitch of current note if a note is playing.
-      input_[offset + current_note - self._min_note] = 1.0
+      input_[offset + state.current_note - self._min_note] = 1.0
       # A note is playing.
       input_[offset + self._note_range] = 1.0
     else:
@@ -233,13 +308,13 @@ class KeyMelodyEncoderDecoder(encoder_decoder.EventSequenceEncoderDecoder):
     offset += self._note_range + 2
 
     # The current event is the note-on event of the currently playing note.
-    if is_attack:
+    if state.is_attack:
       input_[offset] = 1.0
     offset += 1
 
     # Whether the melody is currently ascending or descending.
-    if is_ascending is not None:
-      input_[offset] = 1.0 if is_ascending else -1.0
+    if state.is_ascending is not None:
+      input_[offset] = 1.0 if state.is_ascending else -1.0
     offset += 1
 
     # Last event is repeating N bars ago.
@@ -251,29 +326,30 @@ class KeyMelodyEncoderDecoder(encoder_decoder.EventSequenceEncoderDecoder):
       offset += 1
 
     # Binary time counter giving the metric location of the *next* note.
-    n = len(sub_melody)
+    n = state.num_events
     for i in range(self._binary_counter_bits):
-      input_[offset] = 1.0 if (n / 2 ** i) % 2 else -1.0
+      input_[offset] = 1.0 if (n // 2 ** i) % 2 else -1.0
       offset += 1
 
     # The next event is the start of a bar.
-    if len(sub_melody) % DEFAULT_STEPS_PER_BAR == 0:
+    if n % DEFAULT_STEPS_PER_BAR == 0:
       input_[offset] = 1.0
     offset += 1
 
     # The keys the current melody is in.
-    key_histogram = sub_melody.get_major_key_histogram()
-    max_val = max(key_histogram)
-    for i, key_val in enumerate(key_histogram):
+    max_val = max(state.key_histogram)
+    for key_val in state.key_histogram:
       if key_val == max_val:
         input_[offset] = 1.0
       offset += 1
 
     # The keys the last 3 notes are in.
-    last_3_note_melody = melodies_lib.Melody(list(last_3_notes))
-    key_histogram = last_3_note_melody.get_major_key_histogram()
+    key_histogram = [0] * NOTES_PER_OCTAVE
+    for note in state.last_3_notes:
+      for key in NOTE_KEYS[note % NOTES_PER_OCTAVE]:
+        key_histogram[key] += 1
     max_val = max(key_histogram)
-    for i, key_val in enumerate(key_histogram):
+    for key_val in key_histogram:
       if key_val == max_val:
         input_[offset] = 1.0
       offset += 1
@@ -282,6 +358,29 @@ class KeyMelodyEncoderDecoder(encoder_decoder.EventSequenceEncoderDecoder):
 
     return input_
 
+  def inputs_array(self, events, num_steps=None):
+    """Returns the input vectors for a prefix of the melody as an array.
+
+    Computes all of the input vectors in a single pass over the melody, rather
+    than rescanning the melody prefix for each one.
+
+    Args:
+      events: A magenta.music.Melody object.
+      num_steps: The number of positions to compute input vectors for, starting
+          from the first event. If None, input vectors are computed for every
+          event in `events`.
+    Returns:
+      A float32 numpy array of shape [num_steps, self.input_size].
+    """
+    if num_steps is None:
+      num_steps = len(events)
+    inputs = np.zeros((num_steps, self.input_size), dtype=np.float32)
+    state = self.get_initial_state()
+    for i in range(num_steps):
+      self.update_state(state, events[i])
+      inputs[i] = self.state_to_input(state, events)
+    return inputs
+
   def events_to_label(self, events, position):
     """Returns the label for the given position in the melody.
 
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for melody_encoder_decoder."""
 
+import copy
+
 # internal imports
 import tensorflow as tf
 
@@ -643,6 +645,59 @@ class KeyMelodyEncoderDecoderTest(tf.test.TestCase):
         [expected_inputs[-1:], expected_inputs[-1:]],
         med.get_inputs_batch(melodies))
 
+  def testEncodeMatchesEventsToInput(self):
+    med = melody_encoder_decoder.KeyMelodyEncoderDecoder(48, 84)
+    melody_events = ([48, NO_EVENT, 49, 83, NOTE_OFF] + [NO_EVENT] * 11 +
+                     [48, NOTE_OFF] + [NO_EVENT] * 14 +
+                     [60, 62, 64, 62, NOTE_OFF, 60, NO_EVENT, 71, 48])
+    melody = melodies_lib.Melody(melody_events)
+
+    expected_inputs = [med.events_to_input(melody, i)
+                       for i in range(len(melody) - 1)]
+    expected_labels = [med.events_to_label(melody, i + 1)
+                       for i in range(len(melody) - 1)]
+    expected_sequence_example = sequence_example_lib.make_sequence_example(
+        expected_inputs, expected_labels)
+    self.assertEqual(expected_sequence_example, med.encode(melody))
+
+  def testIncrementalState(self):
+    med = melody_encoder_decoder.KeyMelodyEncoderDecoder(48, 84)
+    melody_events = ([48, NO_EVENT, 49, 83, NOTE_OFF] + [NO_EVENT] * 11 +
+                     [48, NOTE_OFF, 52, 55, 52, NO_EVENT, 60])
+    melody = melodies_lib.Melody(melody_events)
+
+    state = med.get_initial_state()
+    for i, event in enumerate(melody_events):
+      med.update_state(state, event)
+      self.assertListEqual(med.events_to_input(melody, i),
+                           med.state_to_input(state, melody))
+
+    # Branching a state leaves the original unchanged.
+    branched_state = copy.deepcopy(state)
+    med.update_state(branched_state, 64)
+    self.assertListEqual(med.events_to_input(melody, len(melody) - 1),
+                         med.state_to_input(state, melody))
+    melody.append(64)
+    self.assertListEqual(med.events_to_input(melody, len(melody) - 1),
+                         med.state_to_input(branched_state, melody))
+
+  def testGetInputsBatchIncremental(self):
+    med = melody_encoder_decoder.KeyMelodyEncoderDecoder(48, 84)
+    melodies = [
+        melodies_lib.Melody([48, NO_EVENT, 49, 83, NOTE_OFF, 52, 55]),
+        melodies_lib.Melody([60, NO_EVENT, 62, 60] + [NO_EVENT] * 12 + [62])]
+    states = [med.get_state(melody) for melody in melodies]
+    self.assertListEqual(med.get_inputs_batch(melodies),
+                         med.get_inputs_batch_incremental(melodies, states))
+
+    # Extending a melody and its state one event at a time keeps them in sync.
+    for event in [64, NO_EVENT, NOTE_OFF, 60]:
+      for melody, state in zip(melodies, states):
+        melody.append(event)
+        med.update_state(state, event)
+      self.assertListEqual(med.get_inputs_batch(melodies),
+                           med.get_inputs_batch_incremental(melodies, states))
+
 
 if __name__ == '__main__':
   tf.test.main()
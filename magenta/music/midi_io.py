@@ -16,6 +16,7 @@
 Input and output wrappers for converting between MIDI and other formats.
 """
 
+import bisect
 from collections import defaultdict
 import sys
 # pylint: disable=g-import-not-at-top
@@ -26,6 +27,7 @@ else:
 
 
 # internal imports
+import mido
 import pretty_midi
 import tensorflow as tf
 
@@ -39,6 +41,15 @@ from magenta.protobuf import music_pb2
 _PRETTY_MIDI_MAJOR_TO_MINOR_OFFSET = 12
 
 
+# The largest tick pretty_midi accepts. MIDI files with later events are
+# likely corrupt.
+_MAX_TICK = 1e7
+
+# The pitch class of each key signature root as named by mido.
+_KEY_ROOT_PITCH_CLASSES = {
+    'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+
 class MIDIConversionError(Exception):
   pass
 
@@ -170,6 +181,238 @@ def midi_to_sequence_proto(midi_data):
   return sequence
 
 
+class _TempoMap(object):
+  """Converts MIDI ticks to seconds using the tempo changes on track 0.
+
+  Times are computed exactly as pretty_midi computes its tick-to-time array,
+  but only for the ticks that are looked up.
+  """
+
+  def __init__(self, midi_file):
+    resolution = midi_file.ticks_per_beat
+    self.tick_scales = [(0, 60.0 / (120.0 * resolution))]
+    tick = 0
+    for event in midi_file.tracks[0]:
+      tick += event.time
+      if event.type == 'set_tempo':
+        tick_scale = 60.0 / ((6e7 / event.tempo) * resolution)
+        if tick == 0:
+          self.tick_scales = [(0, tick_scale)]
+        elif tick_scale != self.tick_scales[-1][1]:
+          self.tick_scales.append((tick, tick_scale))
+
+    self._ticks = [tick for tick, _ in self.tick_scales]
+    self._start_times = [0.0]
+    for (start_tick, tick_scale), (end_tick, _) in zip(
+        self.tick_scales[:-1], self.tick_scales[1:]):
+      self._start_times.append(
+          self._start_times[-1] + tick_scale * (end_tick - start_tick))
+
+  def time(self, tick):
+    """Returns the time in seconds of `tick`."""
+    index = bisect.bisect_right(self._ticks, tick) - 1
+    start_tick, tick_scale = self.tick_scales[index]
+    return self._start_times[index] + tick_scale * (tick - start_tick)
+
+
+def _key_name_to_key_number(key_name):
+  """Converts a mido key signature name like 'F#m' to a pretty_midi key number.
+
+  Args:
+    key_name: The key signature name.
+
+  Returns:
+    The pitch class of the key plus 12 if the key is minor.
+
+  Raises:
+    MIDIConversionError: If `key_name` is not a valid key signature.
+  """
+  if not key_name or key_name[0] not in _KEY_ROOT_PITCH_CLASSES:
+    raise MIDIConversionError('Invalid key signature %s' % key_name)
+  key_number = _KEY_ROOT_PITCH_CLASSES[key_name[0]]
+  mode = key_name[1:]
+  if mode[:1] == '#':
+    key_number += 1
+    mode = mode[1:]
+  elif mode[:1] == 'b':
+    key_number -= 1
+    mode = mode[1:]
+  if mode not in ('', 'm'):
+    raise MIDIConversionError('Invalid key signature %s' % key_name)
+  return key_number % 12 + (12 if mode == 'm' else 0)
+
+
+def midi_to_sequence_proto_fast(midi_data):
+  """Convert MIDI file contents to a tensorflow.magenta.NoteSequence proto.
+
+  Produces the same NoteSequence as `midi_to_sequence_proto`, but reads the
+  MIDI tracks with mido and writes the proto fields directly instead of
+  building a pretty_midi.PrettyMIDI object first. Ticks are converted to
+  seconds with a single pass over the tempo changes, rather than a table with
+  an entry for every tick.
+
+  Args:
+    midi_data: A string containing the contents of a MIDI file.
+
+  Returns:
+    A tensorflow.magenta.NoteSequence proto.
+
+  Raises:
+    MIDIConversionError: The MIDI data could not be decoded.
+  """
+  # pylint: disable=bare-except
+  try:
+    midi_file = mido.MidiFile(file=StringIO(midi_data))
+    max_tick = max(sum(event.time for event in track)
+                   for track in midi_file.tracks) + 1
+  except:
+    raise MIDIConversionError('Midi decoding error %s: %s' %
+                              (sys.exc_info()[0], sys.exc_info()[1]))
+  # pylint: enable=bare-except
+  # Like pretty_midi, fail on files with an empty track.
+  if not all(midi_file.tracks):
+    raise MIDIConversionError('Midi decoding error: MIDI file has an empty '
+                              'track')
+  if max_tick > _MAX_TICK:
+    raise MIDIConversionError(
+        'Midi decoding error: MIDI file has a largest tick of %d, it is likely '
+        'corrupt' % max_tick)
+
+  tempo_map = _TempoMap(midi_file)
+
+  sequence = music_pb2.NoteSequence()
+
+  # Populate header.
+  sequence.ticks_per_quarter = midi_file.ticks_per_beat
+  sequence.source_info.parser = music_pb2.NoteSequence.SourceInfo.PRETTY_MIDI
+  sequence.source_info.encoding_type = (
+      music_pb2.NoteSequence.SourceInfo.MIDI)
+
+  # Populate time signatures and key signatures, which like tempo changes are
+  # only read from track 0.
+  tick = 0
+  for event in midi_file.tracks[0]:
+    tick += event.time
+    if event.type == 'time_signature':
+      time_signature = sequence.time_signatures.add()
+      time_signature.time = tempo_map.time(tick)
+      time_signature.numerator = event.numerator
+      try:
+        # Denominator can be too large for int32.
+        time_signature.denominator = event.denominator
+      except ValueError:
+        raise MIDIConversionError('Invalid time signature denominator %d' %
+                                  event.denominator)
+    elif event.type == 'key_signature':
+      key_number = _key_name_to_key_number(event.key)
+      key_signature = sequence.key_signatures.add()
+      key_signature.time = tempo_map.time(tick)
+      key_signature.key = key_number % 12
+      if key_number < 12:
+        key_signature.mode = key_signature.MAJOR
+      else:
+        key_signature.mode = key_signature.MINOR
+
+  # Populate tempo changes.
+  for tick, tick_scale in tempo_map.tick_scales:
+    tempo = sequence.tempos.add()
+    tempo.time = tempo_map.time(tick)
+    tempo.qpm = 60.0 / (tick_scale * midi_file.ticks_per_beat)
+
+  # Gather the events of each instrument. Like pretty_midi, an instrument is
+  # created for each (program, channel, track) when its first note ends, in
+  # that order. Pitch bends and control changes before then are held by a
+  # "straggler" for the (channel, track), whose event lists are shared with
+  # the instruments later created for it. Events are stored as tuples
+  # (notes, pitch_bends, control_changes) of lists.
+  instruments = []
+  instrument_events = {}
+  stragglers = {}
+
+  def get_events(program, channel, track, create_new):
+    if (program, channel, track) in instrument_events:
+      return instrument_events[(program, channel, track)]
+    if not create_new and (channel, track) in stragglers:
+      return stragglers[(channel, track)]
+    if create_new:
+      if (channel, track) in stragglers:
+        _, pitch_bends, control_changes = stragglers[(channel, track)]
+      else:
+        pitch_bends, control_changes = [], []
+      events = ([], pitch_bends, control_changes)
+      instrument_events[(program, channel, track)] = events
+      instruments.append((program, channel == 9, events))
+    else:
+      events = ([], [], [])
+      stragglers[(channel, track)] = events
+    return events
+
+  for track_index, track in enumerate(midi_file.tracks):
+    note_ons = defaultdict(list)
+    programs = [0] * 16
+    tick = 0
+    for event in track:
+      tick += event.time
+      if event.type == 'program_change':
+        programs[event.channel] = event.program
+      elif event.type == 'note_on' and event.velocity > 0:
+        note_ons[(event.channel, event.note)].append(
+            (tempo_map.time(tick), event.velocity))
+      elif event.type == 'note_off' or event.type == 'note_on':
+        key = (event.channel, event.note)
+        if key in note_ons:
+          end = tempo_map.time(tick)
+          program = programs[event.channel]
+          for start, velocity in note_ons.pop(key):
+            notes, _, _ = get_events(program, event.channel, track_index, True)
+            notes.append((start, end, event.note, velocity))
+      elif event.type == 'pitchwheel':
+        _, pitch_bends, _ = get_events(
+            programs[event.channel], event.channel, track_index, False)
+        pitch_bends.append((tempo_map.time(tick), event.pitch))
+      elif event.type == 'control_change':
+        _, _, control_changes = get_events(
+            programs[event.channel], event.channel, track_index, False)
+        control_changes.append(
+            (tempo_map.time(tick), event.control, event.value))
+
+  # Populate notes, then pitch bends, then control changes, each in instrument
+  # order. Also set the sequence.total_time as the max end time in the notes.
+  for num_instrument, (program, is_drum, events) in enumerate(instruments):
+    for start, end, pitch, velocity in events[0]:
+      if not sequence.total_time or end > sequence.total_time:
+        sequence.total_time = end
+      note = sequence.notes.add()
+      note.instrument = num_instrument
+      note.program = program
+      note.start_time = start
+      note.end_time = end
+      note.pitch = pitch
+      note.velocity = velocity
+      note.is_drum = is_drum
+
+  for num_instrument, (program, is_drum, events) in enumerate(instruments):
+    for time, bend in events[1]:
+      pitch_bend = sequence.pitch_bends.add()
+      pitch_bend.instrument = num_instrument
+      pitch_bend.program = program
+      pitch_bend.time = time
+      pitch_bend.bend = bend
+      pitch_bend.is_drum = is_drum
+
+  for num_instrument, (program, is_drum, events) in enumerate(instruments):
+    for time, control_number, control_value in events[2]:
+      control_change = sequence.control_changes.add()
+      control_change.instrument = num_instrument
+      control_change.program = program
+      control_change.time = time
+      control_change.control_number = control_number
+      control_change.control_value = control_value
+      control_change.is_drum = is_drum
+
+  return sequence
+
+
 def sequence_proto_to_pretty_midi(sequence):
   """Convert tensorflow.magenta.NoteSequence proto to a PrettyMIDI.
 
@@ -246,6 +246,49 @@ class MidiIoTest(tf.test.TestCase):
   def testEventOrdering(self):
     self.CheckReadWriteMidi(self.midi_event_order_filename)
 
+  def testFastParserMatchesPrettyMidi(self):
+    for filename in [self.midi_simple_filename, self.midi_complex_filename,
+                     self.midi_is_drum_filename,
+                     self.midi_event_order_filename]:
+      with tf.gfile.Open(filename, 'r') as f:
+        midi_data = f.read()
+      self.assertProtoEquals(
+          midi_io.midi_to_sequence_proto(midi_data),
+          midi_io.midi_to_sequence_proto_fast(midi_data))
+
+  def testFastParserTempoChanges(self):
+    midi_file = mido.MidiFile(ticks_per_beat=100)
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage('set_tempo', tempo=500000, time=0))
+    track.append(mido.MetaMessage('key_signature', key='F#m', time=0))
+    track.append(mido.MetaMessage('set_tempo', tempo=1000000, time=200))
+    # A pitch bend before the first note is kept with the instrument.
+    track.append(mido.Message('pitchwheel', pitch=100, time=0))
+    track.append(mido.Message('note_on', note=60, velocity=90, time=0))
+    track.append(mido.Message('note_off', note=60, time=100))
+    midi_file.tracks.append(track)
+    with tempfile.NamedTemporaryFile(prefix='MidiFastParserTest') as temp_file:
+      midi_file.save(temp_file.name)
+      with tf.gfile.Open(temp_file.name, 'r') as f:
+        midi_data = f.read()
+
+    sequence_proto = midi_io.midi_to_sequence_proto_fast(midi_data)
+    self.assertProtoEquals(midi_io.midi_to_sequence_proto(midi_data),
+                           sequence_proto)
+    self.assertEqual([0.0, 1.0], [tempo.time for tempo in sequence_proto.tempos])
+    self.assertEqual([120.0, 60.0],
+                     [tempo.qpm for tempo in sequence_proto.tempos])
+    self.assertEqual(6, sequence_proto.key_signatures[0].key)
+    self.assertEqual(music_pb2.NoteSequence.KeySignature.MINOR,
+                     sequence_proto.key_signatures[0].mode)
+    self.assertEqual(1.0, sequence_proto.notes[0].start_time)
+    self.assertEqual(2.0, sequence_proto.notes[0].end_time)
+    self.assertEqual(1, len(sequence_proto.pitch_bends))
+
+  def testFastParserInvalidData(self):
+    with self.assertRaises(midi_io.MIDIConversionError):
+      midi_io.midi_to_sequence_proto_fast('not a midi file')
+
 
 if __name__ == '__main__':
   tf.test.main()
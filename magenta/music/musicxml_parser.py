@@ -48,6 +48,62 @@ class PitchStepParseException(MusicXMLParseException):
   pass
 
 
+def _get_score_source(filename):
+  """Given a MusicXML file, return a source the score can be parsed from.
+
+  If the file is compressed (ends in .mxl), the MusicXML file within it is
+  located and opened without uncompressing the whole archive.
+
+  Args:
+    filename: The path of a MusicXML file.
+
+  Returns:
+    `filename` for an uncompressed file, or a file object for the MusicXML file
+    within a compressed file.
+
+  Raises:
+    MusicXMLParseException: If a compressed file does not contain exactly one
+        MusicXML file.
+  """
+  if not filename.endswith('.mxl'):
+    return filename
+
+  # Compressed MXL file.
+  mxl_file = ZipFile(filename)
+
+  # A compressed MXL file may contain multiple files, but only one
+  # MusicXML file. Read the META-INF/container.xml file inside of the
+  # MXL file to locate the MusicXML file within the MXL file
+  # http://www.musicxml.com/tutorial/compressed-mxl-files/zip-archive-structure/
+
+  # Raise a MusicXMLParseException if multiple MusicXML files found
+  namelist = mxl_file.namelist()
+  container_file = [x for x in namelist if x == 'META-INF/container.xml']
+  compressed_file_name = ''
+
+  try:
+    container = ET.fromstring(mxl_file.read(container_file[0]))
+    for rootfile_tag in container.findall('./rootfiles/rootfile'):
+      if 'media-type' in rootfile_tag.attrib:
+        if rootfile_tag.attrib['media-type'] == MUSICXML_MIME_TYPE:
+          if not compressed_file_name:
+            compressed_file_name = rootfile_tag.attrib['full-path']
+          else:
+            raise MusicXMLParseException(
+                'Multiple MusicXML files found in compressed archive')
+      else:
+        # No media-type attribute, so assume this is the MusicXML file
+        if not compressed_file_name:
+          compressed_file_name = rootfile_tag.attrib['full-path']
+        else:
+          raise MusicXMLParseException(
+              'Multiple MusicXML files found in compressed archive')
+  except ET.ParseError as e:
+    raise MusicXMLParseException(e)
+
+  return mxl_file.open(compressed_file_name)
+
+
 class MusicXMLParserState(object):
   """Maintains internal state of the MusicXML parser."""
 
@@ -111,6 +167,7 @@ class MusicXMLDocument(object):
     self._state = MusicXMLParserState()
     # Total time in seconds
     self.total_time_secs = 0
+    self._signatures = _SignatureIndex(self._state)
     self._parse()
 
   @staticmethod
@@ -126,54 +183,14 @@ class MusicXMLDocument(object):
     Returns:
       The score as an xml.etree.ElementTree.
     """
-    score = None
-    if filename.endswith('.mxl'):
-      # Compressed MXL file. Uncompress in memory.
-      filename = ZipFile(filename)
-
-      # A compressed MXL file may contain multiple files, but only one
-      # MusicXML file. Read the META-INF/container.xml file inside of the
-      # MXL file to locate the MusicXML file within the MXL file
-      # http://www.musicxml.com/tutorial/compressed-mxl-files/zip-archive-structure/
-
-      # Raise a MusicXMLParseException if multiple MusicXML files found
-      namelist = filename.namelist()
-      container_file = [x for x in namelist if x == 'META-INF/container.xml']
-      compressed_file_name = ''
-
-      try:
-        container = ET.fromstring(filename.read(container_file[0]))
-        for rootfile_tag in container.findall('./rootfiles/rootfile'):
-          if 'media-type' in rootfile_tag.attrib:
-            if rootfile_tag.attrib['media-type'] == MUSICXML_MIME_TYPE:
-              if not compressed_file_name:
-                compressed_file_name = rootfile_tag.attrib['full-path']
-              else:
-                raise MusicXMLParseException(
-                    'Multiple MusicXML files found in compressed archive')
-          else:
-            # No media-type attribute, so assume this is the MusicXML file
-            if not compressed_file_name:
-              compressed_file_name = rootfile_tag.attrib['full-path']
-            else:
-              raise MusicXMLParseException(
-                  'Multiple MusicXML files found in compressed archive')
-      except ET.ParseError as e:
-        raise MusicXMLParseException(e)
-
-      try:
-        score = ET.fromstring(filename.read(compressed_file_name))
-      except ET.ParseError as e:
-        raise MusicXMLParseException(e)
-    else:
-      # Uncompressed XML file.
-      try:
-        tree = ET.parse(filename)
-        score = tree.getroot()
-      except ET.ParseError as e:
-        raise MusicXMLParseException(e)
+    try:
+      return ET.parse(_get_score_source(filename)).getroot()
+    except ET.ParseError as e:
+      raise MusicXMLParseException(e)
 
-    return score
+  def iter_parts(self):
+    """Returns an iterator over the parsed parts of this score."""
+    return iter(self.parts)
 
   def _parse(self):
     """Parse the uncompressed MusicXML document."""
@@ -189,7 +206,7 @@ class MusicXMLDocument(object):
     for score_part_index, child in enumerate(self._score.findall('part')):
       part = Part(child, self._score_parts, self._state)
       self.parts.append(part)
-      score_part_index += 1
+      self._signatures.add_part(part, is_first_part=score_part_index == 0)
       if self._state.time_position > self.total_time_secs:
         self.total_time_secs = self._state.time_position
 
@@ -211,15 +228,7 @@ class MusicXMLDocument(object):
     Returns:
       A list of all TimeSignature objects used in this score.
     """
-    time_signatures = []
-    for part in self.parts:
-      for measure in part.measures:
-        if measure.time_signature is not None:
-          if measure.time_signature not in time_signatures:
-            # Prevent duplicate time signatures
-            time_signatures.append(measure.time_signature)
-
-    return time_signatures
+    return self._signatures.get_time_signatures()
 
   def get_key_signatures(self):
     """Return a list of all the key signatures used in this score.
@@ -243,21 +252,7 @@ class MusicXMLDocument(object):
     Returns:
       A list of all KeySignature objects used in this score.
     """
-    key_signatures = []
-    for part in self.parts:
-      for measure in part.measures:
-        if measure.key_signature is not None:
-          if measure.key_signature not in key_signatures:
-            # Prevent duplicate key signatures
-            key_signatures.append(measure.key_signature)
-
-    if not key_signatures:
-      # If there are no key signatures, add C major at the beginning
-      key_signature = KeySignature(self._state)
-      key_signature.time_position = 0
-      key_signatures.append(key_signature)
-
-    return key_signatures
+    return self._signatures.get_key_signatures()
 
   def get_tempos(self):
     """Return a list of all tempos in this score.
@@ -267,21 +262,198 @@ class MusicXMLDocument(object):
     Returns:
       A list of all Tempo objects used in this score.
     """
-    tempos = []
+    return self._signatures.get_tempos()
+
+
+class StreamingMusicXMLDocument(object):
+  """A MusicXML Document that is parsed incrementally.
+
+  Like MusicXMLDocument, but the file is read with `iterparse` as the parts
+  are iterated over with `iter_parts`. Each measure is parsed as soon as its
+  <measure> element ends, and its XML is then discarded, so only about one
+  measure of the score is held in memory at a time.
+
+  `get_time_signatures`, `get_key_signatures`, `get_tempos`, and
+  `total_time_secs` cover the measures iterated over so far, so they are only
+  complete once every part has been iterated over. A document can only be
+  iterated over once.
+  """
+
+  def __init__(self, filename):
+    self._source = _get_score_source(filename)
+    # ScoreParts indexed by id.
+    self._score_parts = {}
+    self.midi_resolution = constants.STANDARD_PPQ
+    self._state = MusicXMLParserState()
+    # Total time in seconds
+    self.total_time_secs = 0
+    self._num_parts = 0
+    self._signatures = _SignatureIndex(self._state)
+
+  def _iterparse(self):
+    """Yields (event, element) pairs from the score, raising parse errors."""
+    try:
+      for event, element in ET.iterparse(self._source, ('start', 'end')):
+        yield event, element
+    except ET.ParseError as e:
+      raise MusicXMLParseException(e)
+
+  def iter_parts(self):
+    """Parses the score and yields its parts.
+
+    Yields:
+      A StreamingPart for each <part> element. Its `measures` attribute is an
+      iterator over the measures of the part, which are parsed as they are
+      iterated over. Measures not iterated over before the next part is
+      requested are parsed and discarded.
+    """
+    events = self._iterparse()
+    xml_score = None
+    for event, element in events:
+      if xml_score is None:
+        xml_score = element
+      if event == 'end' and element.tag == 'score-part':
+        score_part = ScorePart(element)
+        self._score_parts[score_part.id] = score_part
+      elif event == 'start' and element.tag == 'part':
+        part = StreamingPart(element.attrib['id'], self._score_parts,
+                             self._state)
+        part.measures = self._iter_measures(events, xml_score, element, part)
+        yield part
+        for _ in part.measures:
+          pass
+
+  def _iter_measures(self, events, xml_score, xml_part, part):
+    """Parses and yields the measures of a part as they are read.
 
-    if self.parts:
-      part = self.parts[0]  # Use only first part
-      for measure in part.measures:
-        for tempo in measure.tempos:
-          tempos.append(tempo)
+    Args:
+      events: The iterator of (event, element) pairs of the score, positioned
+          just after the start of `xml_part`.
+      xml_score: The root element of the score.
+      xml_part: The <part> element.
+      part: The StreamingPart of `xml_part`.
+
+    Yields:
+      A Measure for each <measure> element of the part.
+    """
+    is_first_part = self._num_parts == 0
+    self._num_parts += 1
+    for event, element in events:
+      if event != 'end':
+        continue
+      if element.tag == 'measure':
+        measure = Measure(element, self._state)
+        part.index_measure(measure)
+        self._signatures.add_measure(measure, is_first_part)
+        yield measure
+        # Discard the XML of the measure.
+        xml_part.remove(element)
+      elif element is xml_part:
+        if self._state.time_position > self.total_time_secs:
+          self.total_time_secs = self._state.time_position
+        xml_score.remove(xml_part)
+        return
 
+  def get_time_signatures(self):
+    """Return a list of the time signatures read so far.
+
+    See `MusicXMLDocument.get_time_signatures`.
+
+    Returns:
+      A list of TimeSignature objects.
+    """
+    return self._signatures.get_time_signatures()
+
+  def get_key_signatures(self):
+    """Return a list of the key signatures read so far.
+
+    See `MusicXMLDocument.get_key_signatures`.
+
+    Returns:
+      A list of KeySignature objects.
+    """
+    return self._signatures.get_key_signatures()
+
+  def get_tempos(self):
+    """Return a list of the tempos of the first part read so far.
+
+    See `MusicXMLDocument.get_tempos`.
+
+    Returns:
+      A list of Tempo objects.
+    """
+    return self._signatures.get_tempos()
+
+
+class _SignatureIndex(object):
+  """The time signatures, key signatures, and tempos of a score.
+
+  Signatures are deduplicated with a set as measures are added, so indexing a
+  score is linear in its number of measures, and the lists are built only once
+  however many times they are requested.
+  """
+
+  def __init__(self, state):
+    self._state = state
+    self._time_signatures = []
+    self._time_signature_set = set()
+    self._key_signatures = []
+    self._key_signature_set = set()
+    self._tempos = []
+
+  def add_part(self, part, is_first_part):
+    """Adds the signatures of a parsed Part."""
+    for time_signature in part.time_signatures:
+      self._add_time_signature(time_signature)
+    for key_signature in part.key_signatures:
+      self._add_key_signature(key_signature)
+    if is_first_part:
+      self._tempos.extend(part.tempos)
+
+  def add_measure(self, measure, is_first_part):
+    """Adds the signatures of a parsed Measure."""
+    if measure.time_signature is not None:
+      self._add_time_signature(measure.time_signature)
+    if measure.key_signature is not None:
+      self._add_key_signature(measure.key_signature)
+    if is_first_part:
+      self._tempos.extend(measure.tempos)
+
+  def _add_time_signature(self, time_signature):
+    # Prevent duplicate time signatures
+    if time_signature not in self._time_signature_set:
+      self._time_signature_set.add(time_signature)
+      self._time_signatures.append(time_signature)
+
+  def _add_key_signature(self, key_signature):
+    # Prevent duplicate key signatures
+    if key_signature not in self._key_signature_set:
+      self._key_signature_set.add(key_signature)
+      self._key_signatures.append(key_signature)
+
+  def get_time_signatures(self):
+    """Returns a list of the unique time signatures, in order of appearance."""
+    return list(self._time_signatures)
+
+  def get_key_signatures(self):
+    """Returns a list of the unique key signatures, or C major if none."""
+    key_signatures = list(self._key_signatures)
+    if not key_signatures:
+      # If there are no key signatures, add C major at the beginning
+      key_signature = KeySignature(self._state)
+      key_signature.time_position = 0
+      key_signatures.append(key_signature)
+    return key_signatures
+
+  def get_tempos(self):
+    """Returns a list of the tempos of the first part, or 120 qpm if none."""
+    tempos = list(self._tempos)
     # If no tempos, add a default of 120 at beginning
     if not tempos:
       tempo = Tempo(self._state)
       tempo.qpm = self._state.qpm
       tempo.time_position = 0
       tempos.append(tempo)
-
     return tempos
 
 
@@ -330,18 +502,43 @@ class ScorePart(object):
 
 
 class Part(object):
-  """Internal represention of a MusicXML <part> element."""
+  """Internal represention of a MusicXML <part> element.
+
+  Besides its measures, a part holds the time signatures, key signatures, and
+  tempos of its measures in time order.
+  """
 
   def __init__(self, xml_part, score_parts, state):
     self.id = ''
     self.score_part = None
     self.measures = []
+    self.time_signatures = []
+    self.key_signatures = []
+    self.tempos = []
     self._state = state
     self._parse(xml_part, score_parts)
 
   def _parse(self, xml_part, score_parts):
     """Parse the <part> element."""
     self.id = xml_part.attrib['id']
+    self._start_part(score_parts)
+
+    xml_measures = xml_part.findall('measure')
+    for child in xml_measures:
+      measure = Measure(child, self._state)
+      self.measures.append(measure)
+      self.index_measure(measure)
+
+  def index_measure(self, measure):
+    """Adds the signatures and tempos of a measure of this part."""
+    if measure.time_signature is not None:
+      self.time_signatures.append(measure.time_signature)
+    if measure.key_signature is not None:
+      self.key_signatures.append(measure.key_signature)
+    self.tempos.extend(measure.tempos)
+
+  def _start_part(self, score_parts):
+    """Looks up the ScorePart of this part and resets the parser state."""
     if self.id in score_parts:
       self.score_part = score_parts[self.id]
     else:
@@ -355,16 +552,30 @@ class Part(object):
     self._state.midi_program = self.score_part.midi_program
     self._state.transpose = 0
 
-    xml_measures = xml_part.findall('measure')
-    for child in xml_measures:
-      measure = Measure(child, self._state)
-      self.measures.append(measure)
-
   def __str__(self):
     part_str = 'Part: ' + self.score_part.part_name
     return part_str
 
 
+class StreamingPart(Part):
+  """A MusicXML <part> element whose measures are parsed as they are read.
+
+  Created by `StreamingMusicXMLDocument.iter_parts`, which sets `measures` to
+  an iterator over the measures of the part.
+  """
+
+  def __init__(self, part_id, score_parts, state):
+    # pylint: disable=super-init-not-called
+    self.id = part_id
+    self.score_part = None
+    self.measures = iter([])
+    self.time_signatures = []
+    self.key_signatures = []
+    self.tempos = []
+    self._state = state
+    self._start_part(score_parts)
+
+
 class Measure(object):
   """Internal represention of the MusicXML <measure> element."""
 
@@ -746,6 +957,12 @@ class TimeSignature(object):
     isequal = isequal and (self.time_position == other.time_position)
     return isequal
 
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((self.numerator, self.denominator, self.time_position))
+
 
 class KeySignature(object):
   """Internal representation of a MusicXML key signature."""
@@ -789,6 +1006,12 @@ class KeySignature(object):
     isequal = isequal and (self.time_position == other.time_position)
     return isequal
 
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((self.key, self.mode, self.time_position))
+
 
 class Tempo(object):
   """Internal representation of a MusicXML tempo."""
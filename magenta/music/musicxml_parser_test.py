@@ -282,6 +282,32 @@ class MusicXMLParserTest(tf.test.TestCase):
     """Test the rhythm durations MusicXML file."""
     self.checkmusicxmltosequence(self.rhythm_durations_filename)
 
+  def checkstreamingmusicxmltosequence(self, filename):
+    """Test that streaming conversion matches full document conversion."""
+    expected_proto = musicxml_reader.musicxml_to_sequence_proto(
+        musicxml_parser.MusicXMLDocument(filename))
+    streaming_proto = musicxml_reader.musicxml_to_sequence_proto(
+        musicxml_parser.StreamingMusicXMLDocument(filename))
+    self.assertProtoEquals(expected_proto, streaming_proto)
+
+  def teststreamingmusicxmltosequence(self):
+    """Test the streaming parser on uncompressed and compressed files."""
+    self.checkstreamingmusicxmltosequence(self.flute_scale_filename)
+    self.checkstreamingmusicxmltosequence(self.clarinet_scale_filename)
+    self.checkstreamingmusicxmltosequence(self.band_score_filename)
+    self.checkstreamingmusicxmltosequence(self.rhythm_durations_filename)
+    self.checkstreamingmusicxmltosequence(self.compressed_filename)
+    self.checkstreamingmusicxmltosequence(
+        self.multiple_rootfile_compressed_filename)
+
+  def teststreamingmusicxmlfiletosequence(self):
+    """Test the streaming option of musicxml_file_to_sequence_proto."""
+    expected_proto = musicxml_reader.musicxml_file_to_sequence_proto(
+        self.band_score_filename)
+    streaming_proto = musicxml_reader.musicxml_file_to_sequence_proto(
+        self.band_score_filename, streaming=True)
+    self.assertProtoEquals(expected_proto, streaming_proto)
+
   def testFluteScale(self):
     """Verify properties of the flute scale."""
     ns = musicxml_reader.musicxml_file_to_sequence_proto(
@@ -606,6 +632,20 @@ class MusicXMLParserTest(tf.test.TestCase):
         key=lambda note: (note.part, note.voice, note.start_time))
     self.assertProtoEquals(expected_ns, ns)
 
+  def test_signature_index(self):
+    """Verify that signatures are indexed per part and deduplicated."""
+    musicxml = musicxml_parser.MusicXMLDocument(self.st_anne_filename)
+    self.assertEqual(2, len(musicxml.parts))
+    for part in musicxml.parts:
+      self.assertEqual(1, len(part.time_signatures))
+      self.assertEqual(1, len(part.key_signatures))
+    self.assertEqual(musicxml.parts[0].time_signatures[0],
+                     musicxml.parts[1].time_signatures[0])
+    self.assertEqual(hash(musicxml.parts[0].time_signatures[0]),
+                     hash(musicxml.parts[1].time_signatures[0]))
+    self.assertEqual(1, len(musicxml.get_time_signatures()))
+    self.assertEqual(1, len(musicxml.get_key_signatures()))
+
   def test_empty_part_name(self):
     """Verify that a part with an empty name can be parsed."""
 
@@ -35,7 +35,8 @@ def musicxml_to_sequence_proto(musicxml_document):
 
   Args:
     musicxml_document: A parsed MusicXML file.
-        This file has been parsed by class MusicXMLDocument
+        This file has been parsed by class MusicXMLDocument, or is parsed
+        while it is converted by class StreamingMusicXMLDocument.
 
   Returns:
     A tensorflow.magenta.NoteSequence proto.
@@ -56,6 +57,39 @@ def musicxml_to_sequence_proto(musicxml_document):
   # Populate header.
   sequence.ticks_per_quarter = musicxml_document.midi_resolution
 
+  # Populate notes from each MusicXML part across all voices
+  # Unlike MIDI import, notes are not sorted
+  for part_index, musicxml_part in enumerate(musicxml_document.iter_parts()):
+    part_info = sequence.part_infos.add()
+    part_info.part = part_index
+    part_info.name = musicxml_part.score_part.part_name
+
+    for musicxml_measure in musicxml_part.measures:
+      for musicxml_note in musicxml_measure.notes:
+        if not musicxml_note.is_rest:
+          note = sequence.notes.add()
+          note.part = part_index
+          note.voice = musicxml_note.voice
+          note.instrument = musicxml_note.midi_channel
+          note.program = musicxml_note.midi_program
+          note.start_time = musicxml_note.note_duration.time_position
+
+          # Fix negative time errors from incorrect MusicXML
+          if note.start_time < 0:
+            note.start_time = 0
+
+          note.end_time = note.start_time + musicxml_note.note_duration.seconds
+          note.pitch = musicxml_note.pitch[1]  # Index 1 = MIDI pitch number
+          note.velocity = musicxml_note.velocity
+
+          durationratio = musicxml_note.note_duration.duration_ratio()
+          note.numerator = durationratio.numerator
+          note.denominator = durationratio.denominator
+
+  # The time signatures, key signatures, tempos, and total time of a streaming
+  # document are only known once all of its parts have been read.
+  sequence.total_time = musicxml_document.total_time_secs
+
   # Populate time signatures.
   musicxml_time_signatures = musicxml_document.get_time_signatures()
   for musicxml_time_signature in musicxml_time_signatures:
@@ -85,44 +119,17 @@ def musicxml_to_sequence_proto(musicxml_document):
     tempo.time = musicxml_tempo.time_position
     tempo.qpm = musicxml_tempo.qpm
 
-  # Populate notes from each MusicXML part across all voices
-  # Unlike MIDI import, notes are not sorted
-  sequence.total_time = musicxml_document.total_time_secs
-  for part_index, musicxml_part in enumerate(musicxml_document.parts):
-    part_info = sequence.part_infos.add()
-    part_info.part = part_index
-    part_info.name = musicxml_part.score_part.part_name
-
-    for musicxml_measure in musicxml_part.measures:
-      for musicxml_note in musicxml_measure.notes:
-        if not musicxml_note.is_rest:
-          note = sequence.notes.add()
-          note.part = part_index
-          note.voice = musicxml_note.voice
-          note.instrument = musicxml_note.midi_channel
-          note.program = musicxml_note.midi_program
-          note.start_time = musicxml_note.note_duration.time_position
-
-          # Fix negative time errors from incorrect MusicXML
-          if note.start_time < 0:
-            note.start_time = 0
-
-          note.end_time = note.start_time + musicxml_note.note_duration.seconds
-          note.pitch = musicxml_note.pitch[1]  # Index 1 = MIDI pitch number
-          note.velocity = musicxml_note.velocity
-
-          durationratio = musicxml_note.note_duration.duration_ratio()
-          note.numerator = durationratio.numerator
-          note.denominator = durationratio.denominator
-
   return sequence
 
 
-def musicxml_file_to_sequence_proto(musicxml_file):
+def musicxml_file_to_sequence_proto(musicxml_file, streaming=False):
   """Converts a MusicXML file to a tensorflow.magenta.NoteSequence proto.
 
   Args:
     musicxml_file: A string path to a MusicXML file.
+    streaming: If True, the file is parsed measure by measure while the
+        NoteSequence is filled, instead of being loaded into memory first. This
+        uses much less memory for large scores.
 
   Returns:
     A tensorflow.magenta.Sequence proto.
@@ -131,6 +138,10 @@ def musicxml_file_to_sequence_proto(musicxml_file):
     MusicXMLConversionError: Invalid musicxml_file.
   """
   try:
+    if streaming:
+      musicxml_document = musicxml_parser.StreamingMusicXMLDocument(
+          musicxml_file)
+      return musicxml_to_sequence_proto(musicxml_document)
     musicxml_document = musicxml_parser.MusicXMLDocument(musicxml_file)
   except musicxml_parser.MusicXMLParseException as e:
     raise MusicXMLConversionError(e)
@@ -101,6 +101,28 @@ class BaseSequenceGenerator(object):
     """
     pass
 
+  def _generate_multiple(self, input_sequence, generator_options,
+                         num_outputs):
+    """Implementation for generating several sequences from the same request.
+
+    The default implementation calls `_generate` once per output. Subclasses
+    can override this method to generate all of the outputs together, which
+    is usually much faster.
+
+    The implementation can assume that _initialize has been called before this
+    method is called.
+
+    Args:
+      input_sequence: An input NoteSequence to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation.
+      num_outputs: The integer number of sequences to generate.
+    Returns:
+      A list of `num_outputs` generated NoteSequence protos.
+    """
+    return [self._generate(input_sequence, generator_options)
+            for _ in range(num_outputs)]
+
   def initialize(self):
     """Builds the TF graph and loads the checkpoint.
 
@@ -187,6 +209,24 @@ class BaseSequenceGenerator(object):
     self.initialize()
     return self._generate(input_sequence, generator_options)
 
+  def generate_multiple(self, input_sequence, generator_options, num_outputs):
+    """Generates several sequences from the model based on the same request.
+
+    Also initializes the TF graph if not yet initialized.
+
+    Args:
+      input_sequence: An input NoteSequence to base the generation on.
+      generator_options: A GeneratorOptions proto with options to use for
+          generation.
+      num_outputs: The integer number of sequences to generate.
+
+    Returns:
+      A list of `num_outputs` generated NoteSequence protos.
+    """
+    self.initialize()
+    return self._generate_multiple(input_sequence, generator_options,
+                                   num_outputs)
+
   def create_bundle_file(self, bundle_file):
     """Writes a generator_pb2.GeneratorBundle file in the specified location.
 
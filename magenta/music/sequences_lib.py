@@ -15,6 +15,10 @@
 
 import collections
 import copy
+
+# internal imports
+import numpy as np
+
 from magenta.protobuf import music_pb2
 
 # Set the quantization cutoff.
@@ -76,6 +80,198 @@ def is_power_of_2(x):
   return x and not x & (x - 1)
 
 
+class QuantizedTrack(object):
+  """The notes of a single track of a QuantizedSequence, stored by column.
+
+  Each note attribute is stored in its own NumPy array, which takes several
+  times less memory than a list of note tuples and lets extraction code select
+  notes with masks and sort them with `np.lexsort`. For compatibility, the
+  track also behaves like a list of `QuantizedSequence.Note` tuples: iterating
+  over or indexing the track creates Note tuples on the fly, and notes can be
+  appended to it.
+
+  Attributes:
+    pitches: An int32 array of note pitches.
+    velocities: An int32 array of note velocities.
+    starts: An int64 array of quantized note start steps.
+    ends: An int64 array of quantized note end steps.
+    instruments: An int32 array of note instrument numbers.
+    programs: An int32 array of note program numbers.
+    is_drums: A bool array of whether each note is a drum note.
+  """
+
+  # Column names and dtypes, in the field order of QuantizedSequence.Note.
+  _COLUMNS = [
+      ('pitches', np.int32),
+      ('velocities', np.int32),
+      ('starts', np.int64),
+      ('ends', np.int64),
+      ('instruments', np.int32),
+      ('programs', np.int32),
+      ('is_drums', np.bool_),
+  ]
+
+  def __init__(self, notes=None):
+    """Construct a QuantizedTrack.
+
+    Args:
+      notes: An iterable of QuantizedSequence.Note tuples to instantiate with,
+          or None to create an empty track.
+    """
+    notes = list(notes) if notes is not None else []
+    self._size = len(notes)
+    self._columns = {}
+    for i, (name, dtype) in enumerate(self._COLUMNS):
+      self._columns[name] = np.array([note[i] for note in notes], dtype=dtype)
+
+  @classmethod
+  def from_arrays(cls, pitches, velocities, starts, ends, instruments,
+                  programs, is_drums):
+    """Constructs a QuantizedTrack from note attribute arrays.
+
+    All arrays must have the same length, one entry per note. The arrays are
+    copied.
+
+    Args:
+      pitches: An array of note pitches.
+      velocities: An array of note velocities.
+      starts: An array of quantized note start steps.
+      ends: An array of quantized note end steps.
+      instruments: An array of note instrument numbers.
+      programs: An array of note program numbers.
+      is_drums: An array of whether each note is a drum note.
+
+    Returns:
+      A new QuantizedTrack.
+    """
+    track = cls()
+    arrays = [pitches, velocities, starts, ends, instruments, programs,
+              is_drums]
+    track._size = len(pitches)  # pylint: disable=protected-access
+    for (name, dtype), array in zip(cls._COLUMNS, arrays):
+      track._columns[name] = np.array(  # pylint: disable=protected-access
+          array, dtype=dtype)
+    return track
+
+  @property
+  def pitches(self):
+    return self._columns['pitches'][:self._size]
+
+  @property
+  def velocities(self):
+    return self._columns['velocities'][:self._size]
+
+  @property
+  def starts(self):
+    return self._columns['starts'][:self._size]
+
+  @property
+  def ends(self):
+    return self._columns['ends'][:self._size]
+
+  @property
+  def instruments(self):
+    return self._columns['instruments'][:self._size]
+
+  @property
+  def programs(self):
+    return self._columns['programs'][:self._size]
+
+  @property
+  def is_drums(self):
+    return self._columns['is_drums'][:self._size]
+
+  def __len__(self):
+    return self._size
+
+  def __iter__(self):
+    """Return an iterator over the notes in this track as Note tuples."""
+    return iter(self.take(np.arange(self._size)))
+
+  def __getitem__(self, i):
+    """Returns the Note tuple at the given index, or a list for a slice."""
+    if isinstance(i, slice):
+      return self.take(np.arange(self._size)[i])
+    if i < 0:
+      i += self._size
+    if not 0 <= i < self._size:
+      raise IndexError('note index out of range: %d' % i)
+    return self.take([i])[0]
+
+  def __eq__(self, other):
+    if isinstance(other, QuantizedTrack):
+      return all(np.array_equal(getattr(self, name), getattr(other, name))
+                 for name, _ in self._COLUMNS)
+    return list(self) == list(other)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __deepcopy__(self, unused_memo=None):
+    return QuantizedTrack.from_arrays(
+        *[getattr(self, name) for name, _ in self._COLUMNS])
+
+  def take(self, indices):
+    """Returns the notes at the given indices as a list of Note tuples.
+
+    Args:
+      indices: A sequence or integer array of note indices, e.g. from
+          `np.flatnonzero` of a mask over the columns or from `np.lexsort`.
+
+    Returns:
+      A list of QuantizedSequence.Note tuples, in the order of `indices`.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    columns = [getattr(self, name)[indices].tolist()
+               for name, _ in self._COLUMNS]
+    return [QuantizedSequence.Note._make(fields) for fields in zip(*columns)]
+
+  def append(self, note):
+    """Appends a QuantizedSequence.Note tuple to the end of the track.
+
+    Args:
+      note: The QuantizedSequence.Note to append.
+    """
+    capacity = len(self._columns['pitches'])
+    if self._size == capacity:
+      # Grow geometrically so that appending is amortized O(1).
+      new_capacity = max(2 * capacity, 8)
+      for name, dtype in self._COLUMNS:
+        column = np.zeros(new_capacity, dtype=dtype)
+        column[:self._size] = self._columns[name][:self._size]
+        self._columns[name] = column
+    for i, (name, _) in enumerate(self._COLUMNS):
+      self._columns[name][self._size] = note[i]
+    self._size += 1
+
+
+def _note_set(track):
+  """Returns the set of notes in a QuantizedTrack as plain tuples.
+
+  Plain tuples compare equal to the corresponding Note tuples, but are much
+  cheaper to create.
+
+  Args:
+    track: A QuantizedTrack.
+
+  Returns:
+    A set of (pitch, velocity, start, end, instrument, program, is_drum) tuples.
+  """
+  return set(zip(track.pitches.tolist(), track.velocities.tolist(),
+                 track.starts.tolist(), track.ends.tolist(),
+                 track.instruments.tolist(), track.programs.tolist(),
+                 track.is_drums.tolist()))
+
+
+class _QuantizedTrackDict(dict):
+  """A dict of QuantizedTracks that converts lists of notes on assignment."""
+
+  def __setitem__(self, key, notes):
+    if not isinstance(notes, QuantizedTrack):
+      notes = QuantizedTrack(notes)
+    super(_QuantizedTrackDict, self).__setitem__(key, notes)
+
+
 class QuantizedSequence(object):
   """Holds notes and chords which have been quantized to time steps.
 
@@ -86,7 +282,9 @@ class QuantizedSequence(object):
   Notes stored in this object are not guaranteed to be sorted by time.
 
   Attributes:
-    tracks: A dictionary mapping track number to list of Note tuples. Track
+    tracks: A dictionary mapping track number to a QuantizedTrack, which stores
+        the notes by column and can be used as a list of Note tuples. Lists of
+        Note tuples assigned to it are converted to QuantizedTracks. Track
         number is taken from the instrument number of each NoteSequence note.
     chords: A list of ChordSymbol tuples.
     qpm: Quarters per minute. This is needed to recover tempo if converting back
@@ -113,6 +311,16 @@ class QuantizedSequence(object):
   def __init__(self):
     self._reset()
 
+  @property
+  def tracks(self):
+    return self._tracks
+
+  @tracks.setter
+  def tracks(self, tracks):
+    self._tracks = _QuantizedTrackDict()
+    for track, notes in tracks.items():
+      self._tracks[track] = notes
+
   def _reset(self):
     self.tracks = {}
     self.chords = []
@@ -188,33 +396,43 @@ class QuantizedSequence(object):
 
     self.total_steps = quantize(note_sequence.total_time * steps_per_second)
 
-    for note in note_sequence.notes:
-      # Quantize the start and end times of the note.
-      start_step = quantize(note.start_time * steps_per_second)
-      end_step = quantize(note.end_time * steps_per_second)
-      if end_step == start_step:
-        end_step += 1
+    # Read the notes into columns, then quantize all of them at once.
+    fields = [(note.pitch, note.velocity, note.start_time, note.end_time,
+               note.instrument, note.program, note.is_drum)
+              for note in note_sequence.notes]
+    if fields:
+      (pitches, velocities, start_times, end_times, instruments, programs,
+       is_drums) = [np.array(column) for column in zip(*fields)]
+
+      # Quantize the start and end times of the notes, truncating towards zero
+      # like `quantize`.
+      start_steps = np.trunc(
+          start_times * steps_per_second + (1 - QUANTIZE_CUTOFF)).astype(
+              np.int64)
+      end_steps = np.trunc(
+          end_times * steps_per_second + (1 - QUANTIZE_CUTOFF)).astype(
+              np.int64)
+      end_steps[end_steps == start_steps] += 1
 
       # Do not allow notes to start or end in negative time.
-      if start_step < 0 or end_step < 0:
+      negative = np.flatnonzero((start_steps < 0) | (end_steps < 0))
+      if negative.size:
         raise NegativeTimeException(
             'Got negative note time: start_step = %s, end_step = %s' %
-            (start_step, end_step))
+            (start_steps[negative[0]], end_steps[negative[0]]))
 
       # Extend quantized sequence if necessary.
-      if end_step > self.total_steps:
-        self.total_steps = end_step
-
-      if note.instrument not in self.tracks:
-        self.tracks[note.instrument] = []
-      self.tracks[note.instrument].append(
-          QuantizedSequence.Note(pitch=note.pitch,
-                                 velocity=note.velocity,
-                                 start=start_step,
-                                 end=end_step,
-                                 instrument=note.instrument,
-                                 program=note.program,
-                                 is_drum=note.is_drum))
+      self.total_steps = max(self.total_steps, int(end_steps.max()))
+
+      # Add the tracks in order of each instrument's first note, like adding
+      # the notes one at a time does, so that iterating over `tracks` yields
+      # the same order.
+      _, first_indices = np.unique(instruments, return_index=True)
+      for instrument in instruments[np.sort(first_indices)].tolist():
+        mask = instruments == instrument
+        self.tracks[instrument] = QuantizedTrack.from_arrays(
+            pitches[mask], velocities[mask], start_steps[mask],
+            end_steps[mask], instruments[mask], programs[mask], is_drums[mask])
 
     # Also add chord symbol annotations to the quantized sequence.
     for annotation in note_sequence.text_annotations:
@@ -232,7 +450,7 @@ class QuantizedSequence(object):
       return False
     for track in self.tracks:
       if (track not in other.tracks or
-          set(self.tracks[track]) != set(other.tracks[track])):
+          _note_set(self.tracks[track]) != _note_set(other.tracks[track])):
         return False
     return (
         self.qpm == other.qpm and
@@ -243,7 +461,8 @@ class QuantizedSequence(object):
 
   def __deepcopy__(self, unused_memo=None):
     new_copy = type(self)()
-    new_copy.tracks = copy.deepcopy(self.tracks)
+    new_copy.tracks = dict((track, copy.deepcopy(notes))
+                           for track, notes in self.tracks.items())
     new_copy.chords = copy.deepcopy(self.chords)
     new_copy.qpm = self.qpm
     new_copy.time_signature = self.time_signature
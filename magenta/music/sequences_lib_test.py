@@ -202,6 +202,22 @@ class SequencesLibTest(tf.test.TestCase):
     quantized.from_note_sequence(self.note_sequence, self.steps_per_quarter)
     self.assertEqual(self.expected_quantized_sequence, quantized)
 
+  def testTrackOrder(self):
+    # Instruments 0, 8, and 16 collide in a small dict, so the order of the
+    # tracks depends on the order they were added in.
+    for instrument in [8, 0, 16]:
+      testing_lib.add_track_to_sequence(
+          self.note_sequence, instrument, [(12, 100, 1.0, 4.0)])
+    testing_lib.add_track_to_sequence(
+        self.note_sequence, 0, [(19, 100, 2.0, 3.0)])
+    quantized = sequences_lib.QuantizedSequence()
+    quantized.from_note_sequence(self.note_sequence, self.steps_per_quarter)
+
+    expected_tracks = {}
+    for instrument in [8, 0, 16]:
+      expected_tracks[instrument] = None
+    self.assertEqual(list(expected_tracks), list(quantized.tracks))
+
   def testStepsPerBar(self):
     quantized = sequences_lib.QuantizedSequence()
     quantized.from_note_sequence(self.note_sequence, self.steps_per_quarter)
@@ -250,6 +266,47 @@ class SequencesLibTest(tf.test.TestCase):
 
     self.assertNotEqual(quantized, quantized_copy)
 
+  def testQuantizedTrackColumns(self):
+    testing_lib.add_track_to_sequence(
+        self.note_sequence, 0,
+        [(12, 100, 0.01, 10.0), (11, 55, 0.22, 0.50), (40, 45, 2.50, 3.50)])
+    testing_lib.add_track_to_sequence(
+        self.note_sequence, 1, [(36, 90, 1.0, 1.25)], is_drum=True)
+    quantized = sequences_lib.QuantizedSequence()
+    quantized.from_note_sequence(self.note_sequence, self.steps_per_quarter)
+
+    track = quantized.tracks[0]
+    self.assertTrue(isinstance(track, sequences_lib.QuantizedTrack))
+    self.assertEqual(3, len(track))
+    self.assertListEqual([12, 11, 40], track.pitches.tolist())
+    self.assertListEqual([100, 55, 45], track.velocities.tolist())
+    self.assertListEqual([0, 1, 10], track.starts.tolist())
+    self.assertListEqual([40, 2, 14], track.ends.tolist())
+    self.assertListEqual([False, False, False], track.is_drums.tolist())
+    self.assertListEqual([True], quantized.tracks[1].is_drums.tolist())
+
+    # The track can still be used as a list of Note tuples.
+    expected_note = sequences_lib.QuantizedSequence.Note(
+        pitch=11, velocity=55, start=1, end=2, instrument=0, program=0,
+        is_drum=False)
+    self.assertEqual(expected_note, track[1])
+    self.assertEqual(expected_note, list(track)[1])
+    self.assertListEqual([expected_note], track.take([1]))
+
+    track.append(expected_note._replace(pitch=50))
+    self.assertEqual(4, len(track))
+    self.assertEqual(50, track[-1].pitch)
+
+  def testQuantizedTrackFromList(self):
+    quantized = sequences_lib.QuantizedSequence()
+    note = sequences_lib.QuantizedSequence.Note(
+        pitch=60, velocity=100, start=2, end=4, instrument=3, program=0,
+        is_drum=False)
+    quantized.tracks[3] = [note]
+    self.assertTrue(
+        isinstance(quantized.tracks[3], sequences_lib.QuantizedTrack))
+    self.assertListEqual([note], list(quantized.tracks[3]))
+
 
 if __name__ == '__main__':
   tf.test.main()
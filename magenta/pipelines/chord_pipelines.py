@@ -25,7 +25,11 @@ from magenta.pipelines import statistics
 
 
 class ChordsExtractor(pipeline.Pipeline):
-  """Extracts a chord progression from a QuantizedSequence."""
+  """Extracts a chord progression from a QuantizedSequence.
+
+  Hits, misses, and evictions of the shared chord symbol cache during
+  extraction are counted in shared counters.
+  """
 
   def __init__(self, max_steps=512, all_transpositions=False, name=None):
     super(ChordsExtractor, self).__init__(
@@ -36,6 +40,8 @@ class ChordsExtractor(pipeline.Pipeline):
     self._all_transpositions = all_transpositions
 
   def transform(self, quantized_sequence):
+    cache = chord_symbols_lib.get_shared_cache()
+    cache_counts = (cache.hits, cache.misses, cache.evictions)
     try:
       chord_progressions, stats = chords_lib.extract_chords(
           quantized_sequence, max_steps=self._max_steps,
@@ -53,4 +59,9 @@ class ChordsExtractor(pipeline.Pipeline):
       chord_progressions = []
       stats = [statistics.Counter('chord_symbol_exception', 1)]
     self._set_stats(stats)
+    for name, count, previous_count in zip(
+        ['chord_symbol_cache_hits', 'chord_symbol_cache_misses',
+         'chord_symbol_cache_evictions'],
+        [cache.hits, cache.misses, cache.evictions], cache_counts):
+      self._get_shared_counter(name).increment(count - previous_count)
     return chord_progressions
@@ -53,6 +53,21 @@ class ChordPipelinesTest(tf.test.TestCase):
     self._unit_transform_test(unit, quantized_sequence,
                               expected_chord_progressions)
 
+  def testChordsExtractorCacheStats(self):
+    quantized_sequence = sequences_lib.QuantizedSequence()
+    quantized_sequence.steps_per_quarter = 1
+    testing_lib.add_quantized_chords_to_sequence(
+        quantized_sequence, [('C', 2), ('Am', 4), ('F', 5)])
+    quantized_sequence.total_steps = 8
+    unit = chord_pipelines.ChordsExtractor(all_transpositions=True)
+    unit.transform(quantized_sequence)
+    unit.reset_shared_stats()
+    unit.transform(quantized_sequence)
+
+    # The second extraction finds every transposed chord in the cache.
+    counts = dict((stat.name, stat.count) for stat in unit.get_shared_stats())
+    self.assertLess(0, counts['ChordsExtractor_chord_symbol_cache_hits'])
+    self.assertEqual(0, counts['ChordsExtractor_chord_symbol_cache_misses'])
 
 if __name__ == '__main__':
   tf.test.main()
@@ -29,10 +29,13 @@ type signature: Something that can be returned from Pipeline's `output_type`
 """
 
 
+import collections
 import itertools
+import time
 
 # internal imports
 from magenta.pipelines import pipeline
+from magenta.pipelines import statistics
 
 
 class Output(object):
@@ -119,6 +122,122 @@ def _all_are_type(elements, target_type):
   return all(isinstance(elem, target_type) for elem in elements)
 
 
+# Validation levels, which control how much of each unit's output `DAGPipeline`
+# checks against the unit's `output_type`. VALIDATION_FULL checks every output,
+# VALIDATION_SAMPLED checks the outputs of one in every
+# `validation_sample_interval` calls to each unit's `transform`, and
+# VALIDATION_OFF checks nothing.
+VALIDATION_FULL = 'full'
+VALIDATION_SAMPLED = 'sampled'
+VALIDATION_OFF = 'off'
+
+DEFAULT_VALIDATION_SAMPLE_INTERVAL = 100
+
+
+def _get_source(subordinate):
+  """Returns the (unit, key) source of objects for the given subordinate.
+
+  Args:
+    subordinate: A Pipeline, Key, or Input instance.
+
+  Returns:
+    A (unit, key) tuple where `unit` is a Pipeline or Input instance, and `key`
+    is the name of the unit output the objects come from, or None if they are
+    all of the unit's outputs.
+  """
+  if isinstance(subordinate, pipeline.Key):
+    return subordinate.unit, subordinate.key
+  return subordinate, None
+
+
+def _get_source_outputs(results, source):
+  """Returns the computed outputs for a (unit, key) source.
+
+  Args:
+    results: A dictionary mapping each unit that has run to its joined outputs.
+    source: A (unit, key) tuple, as returned by `_get_source`.
+
+  Returns:
+    A list of objects.
+  """
+  unit, key = source
+  outputs = results[unit]
+  if key is None or not outputs:
+    # If there are no outputs, `outputs` is an empty list rather than a dict.
+    return outputs
+  return outputs[key]
+
+
+def _join_outputs(outputs, output_keys):
+  """Joins the outputs of many calls to a unit's `transform` without checks.
+
+  Args:
+    outputs: A list of lists, or list of dicts which map string names to
+        lists.
+    output_keys: The names in the unit's dictionary `output_type`, or None if
+        the `output_type` is not a dictionary.
+
+  Returns:
+    If `output_keys` is None, a single list of outputs. Otherwise a single
+    dictionary mapping each name to a list of outputs.
+  """
+  if output_keys is None:
+    joined = []
+    for output_list in outputs:
+      joined.extend(output_list)
+    return joined
+  joined = dict([(key, []) for key in output_keys])
+  for output_dict in outputs:
+    for key in output_keys:
+      joined[key].extend(output_dict[key])
+  return joined
+
+
+class _ExecutionStep(object):
+  """A unit of a `DAGPipeline`, compiled for fast execution.
+
+  Attributes:
+    unit: The Pipeline or Output instance.
+    is_output: True if `unit` is an Output instance.
+    input_names: The names in the unit's dictionary input, or None if the unit
+        takes a single input.
+    sources: The (unit, key) sources of the unit's inputs, one for each name in
+        `input_names`, or a single source if the unit takes a single input.
+    output_keys: The names in the unit's dictionary `output_type`, or None if
+        the `output_type` is not a dictionary.
+    num_validations: The number of calls to the unit's `transform` considered
+        for sampled validation so far.
+    timing: When instrumenting, the unit's shared
+        `statistics.TimingHistogram` of `transform` durations, otherwise None.
+    timing_quantiles: When instrumenting, the unit's shared
+        `statistics.QuantileSketch` of `transform` durations, otherwise None.
+    num_outputs: When instrumenting, the unit's shared `statistics.Counter` of
+        produced objects, otherwise None.
+    num_output_bytes: When instrumenting, the unit's shared
+        `statistics.Counter` of produced protocol buffer bytes, otherwise None.
+  """
+
+  def __init__(self, unit, dependency):
+    self.unit = unit
+    self.is_output = isinstance(unit, Output)
+    if isinstance(dependency, dict):
+      self.input_names = list(dependency.keys())
+      self.sources = [_get_source(dependency[name])
+                      for name in self.input_names]
+    else:
+      self.input_names = None
+      self.sources = [_get_source(dependency)]
+    if not self.is_output and isinstance(unit.output_type, dict):
+      self.output_keys = list(unit.output_type.keys())
+    else:
+      self.output_keys = None
+    self.num_validations = 0
+    self.timing = None
+    self.timing_quantiles = None
+    self.num_outputs = None
+    self.num_output_bytes = None
+
+
 class InvalidDAGException(Exception):
   """Thrown when the DAG dictionary is not well formatted.
 
@@ -194,9 +313,39 @@ class DAGPipeline(pipeline.Pipeline):
   for details.
 
   Use DAGPipeline to compose multiple smaller pipelines together.
+
+  `transform` runs each unit on all of its inputs before running the next
+  unit, so the outputs of every unit are held in memory at once.
+  `transform_iter` instead streams each object through the rest of the DAG as
+  soon as it is produced, yielding outputs as they reach an `Output`. Only the
+  inputs of units that take a dictionary input are held until all of their
+  dependencies have run, since those units are run on every combination of
+  their inputs.
+
+  By default every object produced by every unit is checked against the unit's
+  `output_type`. Once a DAG is known to be correct, pass
+  `validation=VALIDATION_SAMPLED` to only check the outputs of one in every
+  `validation_sample_interval` calls to each unit, or `validation=VALIDATION_OFF`
+  to skip the checks.
+
+  If constructed with `instrument=True`, DAGPipeline also keeps shared
+  statistics for every unit in the graph, so that the slowest units can be
+  found. Like shared counters, they are updated in place, accumulate over every
+  call to `transform` and `transform_iter`, and are returned by
+  `get_shared_stats`:
+    <unit>_transform_seconds: A `statistics.TimingHistogram` of the time taken
+        by each call to the unit's `transform`. Its count is the number of
+        calls, which is also the number of inputs the unit consumed.
+    <unit>_transform_seconds_quantiles: A `statistics.QuantileSketch` of the
+        same times, for their median and tail percentiles.
+    <unit>_outputs: A `statistics.Counter` of the objects the unit produced.
+    <unit>_output_bytes: A `statistics.Counter` of the serialized size of the
+        protocol buffers the unit produced. Other outputs are not counted.
   """
 
-  def __init__(self, dag, pipeline_name='DAGPipeline'):
+  def __init__(self, dag, pipeline_name='DAGPipeline', instrument=False,
+               validation=VALIDATION_FULL,
+               validation_sample_interval=DEFAULT_VALIDATION_SAMPLE_INTERVAL):
     """Constructs a DAGPipeline.
 
     A DAG (direct acyclic graph) is given which fully specifies what the
@@ -206,8 +355,18 @@ class DAGPipeline(pipeline.Pipeline):
       dag: A dictionary mapping `Pipeline` or `Output` instances to any of
          `Pipeline`, `Key`, `Input`. `dag` defines a directed acyclic graph.
       pipeline_name: String name of this Pipeline object.
+      instrument: If True, per-unit timing and throughput statistics are
+          reported by `get_stats`.
+      validation: How much of each unit's output is checked against its
+          `output_type`. One of VALIDATION_FULL, VALIDATION_SAMPLED, or
+          VALIDATION_OFF.
+      validation_sample_interval: When `validation` is VALIDATION_SAMPLED, the
+          outputs of one in every this many calls to each unit's `transform`
+          are checked.
 
     Raises:
+      ValueError: If `validation` is not a valid validation level, or
+          `validation_sample_interval` is less than 1.
       InvalidDAGException: If each key value pair in the `dag` dictionary is
           not of the form (Pipeline or Output): (Pipeline, Key, or Input).
       TypeMismatchException: The type signature of each key and value in `dag`
@@ -225,6 +384,15 @@ class DAGPipeline(pipeline.Pipeline):
       BadTopologyException: If there there is a directed cycle in `dag`.
       Exception: Misc. exceptions.
     """
+    if validation not in (VALIDATION_FULL, VALIDATION_SAMPLED, VALIDATION_OFF):
+      raise ValueError('Invalid validation level: %s' % validation)
+    if validation_sample_interval < 1:
+      raise ValueError('validation_sample_interval must be at least 1. Got %d.'
+                       % validation_sample_interval)
+    self.instrument = instrument
+    self.validation = validation
+    self.validation_sample_interval = validation_sample_interval
+
     # Expand DAG shorthand.
     self.dag = dict(self._expand_dag_shorthands(dag))
 
@@ -374,6 +542,40 @@ class DAGPipeline(pipeline.Pipeline):
     call_list.reverse()
     assert call_list[0] == self.input
 
+    # Compile the call list into an execution plan, so that the DAG does not
+    # need to be inspected again for every input.
+    self._plan = [_ExecutionStep(unit, self.dag[unit])
+                  for unit in call_list[1:]]
+
+    # Precompute how objects flow through the DAG for `transform_iter`.
+    # `self._routes` maps the source of an object, (unit, key) where key is None
+    # unless the unit has a dictionary output, to the list of (step, name)
+    # destinations it feeds. The name is None unless the destination takes a
+    # dictionary input. Those destinations are collected in
+    # `self._dict_input_steps` in topological order.
+    self._routes = collections.defaultdict(list)
+    self._dict_input_steps = []
+    for step in self._plan:
+      if step.input_names is None:
+        self._routes[step.sources[0]].append((step, None))
+      else:
+        self._dict_input_steps.append(step)
+        for name, source in zip(step.input_names, step.sources):
+          self._routes[source].append((step, name))
+
+    if self.instrument:
+      for step in self._plan:
+        if not step.is_output:
+          unit_name = step.unit.name
+          step.timing = self._get_shared_stat(
+              unit_name + '_transform_seconds', statistics.TimingHistogram)
+          step.timing_quantiles = self._get_shared_stat(
+              unit_name + '_transform_seconds_quantiles',
+              statistics.QuantileSketch)
+          step.num_outputs = self._get_shared_counter(unit_name + '_outputs')
+          step.num_output_bytes = self._get_shared_counter(
+              unit_name + '_output_bytes')
+
   def _expand_dag_shorthands(self, dag):
     """Expand DAG shorthand.
 
@@ -477,105 +679,247 @@ class DAGPipeline(pipeline.Pipeline):
       depend on implementation. Each output name corresponds to an output
       collection. See get_output_names method.
     """
-    def stats_accumulator(unit, unit_inputs, cumulative_stats):
+    def stats_accumulator(step, unit_inputs, cumulative_stats):
+      unit = step.unit
       for single_input in unit_inputs:
-        results_ = unit.transform(single_input)
+        if not self.instrument:
+          results_ = unit.transform(single_input)
+        else:
+          start_time = time.time()
+          results_ = unit.transform(single_input)
+          self._record_transform_seconds(step, time.time() - start_time)
         stats = unit.get_stats()
         cumulative_stats.extend(stats)
         yield results_
 
     stats = []
     results = {self.input: [input_object]}
-    for unit in self.call_list[1:]:
-      # Compute transformation.
-
-      if isinstance(unit, Output):
-        unit_outputs = self._get_outputs_as_signature(self.dag[unit], results)
+    for step in self._plan:
+      unit = step.unit
+      if step.input_names is None:
+        unit_inputs = _get_source_outputs(results, step.sources[0])
       else:
-        unit_inputs = self._get_inputs_for_unit(unit, results)
-        if not unit_inputs:
-          # If this unit has no inputs don't run it.
-          results[unit] = []
-          continue
-
-        unjoined_outputs = list(
-            stats_accumulator(unit, unit_inputs, stats))
-        unit_outputs = self._join_lists_or_dicts(unjoined_outputs, unit)
+        # Run the unit on every combination of its inputs.
+        unit_inputs = [
+            dict(zip(step.input_names, values))
+            for values in itertools.product(
+                *[_get_source_outputs(results, source)
+                  for source in step.sources])]
+
+      if step.is_output:
+        results[unit] = unit_inputs
+        continue
+      if not unit_inputs:
+        # If this unit has no inputs don't run it.
+        results[unit] = []
+        continue
+
+      # Compute transformation.
+      unjoined_outputs = list(stats_accumulator(step, unit_inputs, stats))
+      self._validate_outputs(step, unjoined_outputs)
+      unit_outputs = _join_outputs(unjoined_outputs, step.output_keys)
+      if self.instrument:
+        self._record_unit_outputs(step, unit_outputs)
       results[unit] = unit_outputs
 
     self._set_stats(stats)
     return dict([(output.name, results[output]) for output in self.outputs])
 
-  def _get_outputs_as_signature(self, dependency, outputs):
-    """Returns a list or dict which matches the type signature of dependency.
+  def transform_iter(self, input_object):
+    """Runs the DAG on the given input, yielding outputs as they are produced.
+
+    Objects are streamed through the DAG depth first: each output of a unit is
+    run through every unit that depends on it before the next output is
+    considered. Only the output list of a single `transform` call per unit is
+    held at a time, except for units that take a dictionary input. Their
+    inputs are collected until every unit they depend on has finished, and
+    they are then run on every combination of those inputs.
+
+    Statistics are available from `get_stats` once the generator is exhausted.
+    The statistics of each unit are merged by name as they are produced.
 
     Args:
-      dependency: Input, Key, Pipeline instance, or dictionary mapping names to
-          those values.
-      outputs: A database of computed unit outputs. A dictionary mapping
-          Pipeline to list of objects.
+      input_object: Any object. The required type depends on implementation.
 
-    Returns:
-      A list or dictionary of computed unit outputs which matches the type
-      signature of the given dependency.
+    Yields:
+      (name, output) tuples, where `name` is the name of the output collection
+      `output` belongs to. The same objects as returned by `transform` are
+      produced, but possibly in a different order.
     """
-    def _get_outputs_for_key(unit_or_key, outputs):
-      if isinstance(unit_or_key, pipeline.Key):
-        if not outputs[unit_or_key.unit]:
-          # If there are no outputs, just return nothing.
-          return outputs[unit_or_key.unit]
-        assert isinstance(outputs[unit_or_key.unit], dict)
-        return outputs[unit_or_key.unit][unit_or_key.key]
-      assert isinstance(unit_or_key, (pipeline.Pipeline, Input))
-      return outputs[unit_or_key]
-    if isinstance(dependency, dict):
-      return dict([(name, _get_outputs_for_key(unit_or_key, outputs))
-                   for name, unit_or_key in dependency.items()])
-    return _get_outputs_for_key(dependency, outputs)
+    stats = statistics.StatisticsAccumulator()
+    dict_inputs = dict(
+        [(step.unit, dict([(name, []) for name in step.input_names]))
+         for step in self._dict_input_steps])
+
+    for output in self._stream_outputs(self.input, None, [input_object],
+                                       stats, dict_inputs):
+      yield output
+
+    # Run the units that take dictionary inputs, in topological order so that
+    # everything they depend on has already run.
+    for step in self._dict_input_steps:
+      unit_dict_inputs = dict_inputs.pop(step.unit)
+      for values in itertools.product(
+          *[unit_dict_inputs[name] for name in step.input_names]):
+        for output in self._stream_unit(
+            step, dict(zip(step.input_names, values)), stats, dict_inputs):
+          yield output
+
+    self._set_stats(stats.get_statistics())
+
+  def _stream_unit(self, step, single_input, stats, dict_inputs):
+    """Runs a unit on one input and streams its outputs through the DAG.
+
+    Args:
+      step: The `_ExecutionStep` of the `Pipeline` to run.
+      single_input: The input object, or dictionary of input objects, for
+          `unit.transform`.
+      stats: A `statistics.StatisticsAccumulator` that the statistics of each
+          unit are merged into.
+      dict_inputs: A dictionary mapping each unit that takes a dictionary input
+          and has not run yet to a dictionary mapping input names to the list
+          of objects collected for that input.
 
-  def _get_inputs_for_unit(self, unit, results,
-                           list_operation=itertools.product):
-    """Creates valid inputs for the given unit from the outputs in `results`.
+    Yields:
+      (name, output) tuples, for each object that reaches an `Output`.
+    """
+    unit = step.unit
+    if not self.instrument:
+      unit_outputs = unit.transform(single_input)
+    else:
+      start_time = time.time()
+      unit_outputs = unit.transform(single_input)
+      self._record_transform_seconds(step, time.time() - start_time)
+    stats.add_all(unit.get_stats())
+    self._validate_outputs(step, [unit_outputs])
+    if self.instrument:
+      self._record_unit_outputs(step, unit_outputs)
+    if step.output_keys is not None:
+      for key in step.output_keys:
+        for output in self._stream_outputs(unit, key, unit_outputs[key], stats,
+                                           dict_inputs):
+          yield output
+    else:
+      for output in self._stream_outputs(unit, None, unit_outputs, stats,
+                                         dict_inputs):
+        yield output
+
+  def _stream_outputs(self, source, key, objects, stats, dict_inputs):
+    """Streams objects produced by a unit to the units that depend on them.
 
     Args:
-      unit: The `Pipeline` to create inputs for.
-      results: A database of computed unit outputs. A dictionary mapping
-          Pipeline to list of objects.
-      list_operation: A function that maps lists of inputs to a single list of
-          tuples, where each tuple is an input. This is used when `unit` takes
-          a dictionary as input. Each tuple is used as the values for a
-          dictionary input. This can be thought of as taking a sort of
-          transpose of a ragged 2D array.
-          The default is `itertools.product` which takes the cartesian product
-          of the input lists.
+      source: The `Pipeline` or `Input` that produced `objects`.
+      key: The output name of `source` that `objects` belong to, or None if
+          `source` does not have a dictionary output.
+      objects: A list of objects produced by `source`.
+      stats: A `statistics.StatisticsAccumulator` that the statistics of each
+          unit are merged into.
+      dict_inputs: A dictionary mapping each unit that takes a dictionary input
+          and has not run yet to a dictionary mapping input names to the list
+          of objects collected for that input.
+
+    Yields:
+      (name, output) tuples, for each object that reaches an `Output`.
+    """
+    routes = self._routes[(source, key)]
+    for obj in objects:
+      for step, name in routes:
+        if step.is_output:
+          yield step.unit.name, obj
+        elif name is None:
+          for output in self._stream_unit(step, obj, stats, dict_inputs):
+            yield output
+        else:
+          dict_inputs[step.unit][name].append(obj)
+
+  def get_shared_stats(self):
+    """Returns the shared counters of this pipeline and of each unit.
 
     Returns:
-      If `unit` takes a single input, a list of objects.
-      If `unit` takes a dictionary input, a list of dictionaries each mapping
-      string name to object.
+      A list of `Statistic` objects. The names of unit counters are prefixed
+      with both the unit name and this pipeline's name.
     """
-    previous_outputs = self._get_outputs_as_signature(self.dag[unit], results)
+    stats = super(DAGPipeline, self).get_shared_stats()
+    for step in self._plan:
+      if not step.is_output:
+        stats.extend(self._prepend_name(stat)
+                     for stat in step.unit.get_shared_stats())
+    return stats
+
+  def reset_shared_stats(self):
+    """Resets the shared counters of this pipeline and of each unit."""
+    super(DAGPipeline, self).reset_shared_stats()
+    for step in self._plan:
+      if not step.is_output:
+        step.unit.reset_shared_stats()
+
+  def _record_transform_seconds(self, step, seconds):
+    """Records the duration of a call to a unit's `transform`.
 
-    if isinstance(previous_outputs, dict):
-      names = list(previous_outputs.keys())
-      lists = [previous_outputs[name] for name in names]
-      stack = list_operation(*lists)
-      return [dict(zip(names, values)) for values in stack]
-    else:
-      return previous_outputs
+    Args:
+      step: The `_ExecutionStep` of the unit that was run.
+      seconds: The duration of the call in seconds.
+    """
+    step.timing.increment(seconds)
+    step.timing_quantiles.increment(seconds)
 
-  def _join_lists_or_dicts(self, outputs, unit):
-    """Joins many lists or dicts of outputs into a single list or dict.
+  def _record_unit_outputs(self, step, unit_outputs):
+    """Counts the objects, and protocol buffer bytes, produced by a unit.
 
-    This function also validates that the outputs are correct for the given
-    Pipeline.
+    Args:
+      step: The `_ExecutionStep` of the unit that was run.
+      unit_outputs: The joined outputs of the unit, a list or a dictionary
+          mapping names to lists.
+    """
+    if isinstance(unit_outputs, dict):
+      outputs = itertools.chain.from_iterable(unit_outputs.values())
+    else:
+      outputs = unit_outputs
+    num_outputs = 0
+    num_output_bytes = 0
+    for output in outputs:
+      num_outputs += 1
+      if hasattr(output, 'ByteSize'):
+        num_output_bytes += output.ByteSize()
+    step.num_outputs.increment(num_outputs)
+    step.num_output_bytes.increment(num_output_bytes)
+
+  def _validate_outputs(self, step, outputs):
+    """Checks unit outputs according to the validation level.
 
-    If `outputs` is a list of lists, the lists are concated and the type of
-    each object must match `unit.output_type`.
+    Args:
+      step: The `_ExecutionStep` of the unit that produced `outputs`.
+      outputs: A list with the return value of each call to the unit's
+          `transform`.
 
-    If `output` is a list of dicts (mapping string names to lists), each
-    key has its lists concated across all the dicts. The keys and types
-    are validated against `unit.output_type`.
+    Raises:
+      InvalidTransformOutputException: If a checked output does not match the
+          type signature given by the unit's `output_type`.
+    """
+    if self.validation == VALIDATION_OFF:
+      return
+    if self.validation == VALIDATION_FULL:
+      self._check_lists_or_dicts(outputs, step.unit)
+      return
+    sampled_outputs = []
+    for output in outputs:
+      if step.num_validations % self.validation_sample_interval == 0:
+        sampled_outputs.append(output)
+      step.num_validations += 1
+    if sampled_outputs:
+      self._check_lists_or_dicts(sampled_outputs, step.unit)
+
+  def _check_lists_or_dicts(self, outputs, unit):
+    """Validates that many lists or dicts of outputs are correct for a unit.
+
+    If `outputs` is a list of lists, the type of each object must match
+    `unit.output_type`.
+
+    If `outputs` is a list of dicts (mapping string names to lists), the keys
+    and types are validated against `unit.output_type`.
+
+    The outputs are only checked. Callers join them with `_join_outputs`, so
+    they are not concatenated twice.
 
     Args:
       outputs: A list of lists, or list of dicts which map string names to
@@ -583,25 +927,18 @@ class DAGPipeline(pipeline.Pipeline):
       unit: A Pipeline which every output in `outputs` will be validated
           against. `unit` must produce the outputs it says it will produce.
 
-    Returns:
-      If `outputs` is a list of lists, a single list of outputs.
-      If `outputs` is a list of dicts, a single dictionary mapping string names
-      to lists of outputs.
-
     Raises:
       InvalidTransformOutputException: If anything in `outputs` does not match
       the type signature given by `unit.output_type`.
     """
-    if not outputs:
-      return []
     if isinstance(unit.output_type, dict):
-      concated = dict([(key, list()) for key in unit.output_type.keys()])
+      output_keys = set(unit.output_type.keys())
       for d in outputs:
         if not isinstance(d, dict):
           raise InvalidTransformOutputException(
               'Expected dictionary output for %s with output type %s but '
               'instead got type %s' % (unit, unit.output_type, type(d)))
-        if set(d.keys()) != set(unit.output_type.keys()):
+        if set(d.keys()) != output_keys:
           raise InvalidTransformOutputException(
               'Got dictionary output with incorrect keys for %s. Got %s. '
               'Expected %s' % (unit, d.keys(), unit.output_type.keys()))
@@ -614,9 +951,7 @@ class DAGPipeline(pipeline.Pipeline):
                 'Some outputs from %s for key %s are not of expected type %s. '
                 'Got types %s' % (unit, k, unit.output_type[k],
                                   [type(inst) for inst in val]))
-          concated[k] += val
     else:
-      concated = []
       for l in outputs:
         if not isinstance(l, list):
           raise InvalidTransformOutputException(
@@ -626,5 +961,3 @@ class DAGPipeline(pipeline.Pipeline):
           raise InvalidTransformOutputException(
               'Some outputs from %s are not of expected type %s. Got types %s'
               % (unit, unit.output_type, [type(inst) for inst in l]))
-        concated += l
-    return concated
@@ -22,6 +22,7 @@ import tensorflow as tf
 from magenta.pipelines import dag_pipeline
 from magenta.pipelines import pipeline
 from magenta.pipelines import statistics
+from magenta.protobuf import music_pb2
 
 
 Type0 = collections.namedtuple('Type0', ['x', 'y', 'z'])
@@ -443,6 +444,186 @@ class DAGPipelineTest(tf.test.TestCase):
         else:
           self.assertEqual(stat.count, 1)
 
+      # `transform_iter` merges the statistics of each unit by name.
+      list(p.transform_iter(Type0(x, y, z)))
+      self.assertEqual(
+          [('DAGPipelineName_UnitQ_output_count', z),
+           ('DAGPipelineName_UnitR_input_count', z)],
+          sorted((stat.name, stat.count) for stat in p.get_stats()))
+
+  def testInstrumentation(self):
+
+    class UnitQ(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, {'a': Type1, 'b': Type2})
+
+      def transform(self, input_object):
+        return {'a': [Type1(x=input_object.x + i, y=input_object.y)
+                      for i in range(input_object.z)],
+                'b': [Type2(z=input_object.z)]}
+
+    class UnitR(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type1, Type1)
+
+      def transform(self, input_object):
+        self._set_stats([statistics.Counter('input_count', 1)])
+        return [input_object]
+
+    q, r = UnitQ(), UnitR()
+    dag = {q: dag_pipeline.Input(q.input_type),
+           r: q['a'],
+           dag_pipeline.Output('a'): r,
+           dag_pipeline.Output('b'): q['b']}
+
+    p = dag_pipeline.DAGPipeline(dag, 'DAGPipelineName')
+    p.transform(Type0(1, 2, 3))
+    self.assertEqual(['DAGPipelineName_UnitR_input_count'] * 3,
+                     [stat.name for stat in p.get_stats()])
+
+    p = dag_pipeline.DAGPipeline(dag, 'DAGPipelineName', instrument=True)
+    p.transform(Type0(1, 2, 3))
+    self.assertEqual(['DAGPipelineName_UnitR_input_count'] * 3,
+                     [stat.name for stat in p.get_stats()])
+    stats = dict((stat.name, stat) for stat in p.get_shared_stats())
+    self.assertEqual(
+        set(['DAGPipelineName_UnitQ_transform_seconds',
+             'DAGPipelineName_UnitQ_transform_seconds_quantiles',
+             'DAGPipelineName_UnitQ_outputs',
+             'DAGPipelineName_UnitQ_output_bytes',
+             'DAGPipelineName_UnitR_transform_seconds',
+             'DAGPipelineName_UnitR_transform_seconds_quantiles',
+             'DAGPipelineName_UnitR_outputs',
+             'DAGPipelineName_UnitR_output_bytes']),
+        set(stats))
+    self.assertTrue(isinstance(stats['DAGPipelineName_UnitQ_transform_seconds'],
+                               statistics.TimingHistogram))
+    self.assertEqual(1, stats['DAGPipelineName_UnitQ_transform_seconds'].count)
+    self.assertEqual(4, stats['DAGPipelineName_UnitQ_outputs'].count)
+    self.assertEqual(3, stats['DAGPipelineName_UnitR_transform_seconds'].count)
+    self.assertEqual(
+        3, stats['DAGPipelineName_UnitR_transform_seconds_quantiles'].count)
+    self.assertEqual(3, stats['DAGPipelineName_UnitR_outputs'].count)
+    # Namedtuples are not protocol buffers, so their size is not counted.
+    self.assertEqual(0, stats['DAGPipelineName_UnitR_output_bytes'].count)
+
+    # The statistics accumulate over calls to `transform` and `transform_iter`.
+    list(p.transform_iter(Type0(1, 2, 3)))
+    stats = dict((stat.name, stat) for stat in p.get_shared_stats())
+    self.assertEqual(2, stats['DAGPipelineName_UnitQ_transform_seconds'].count)
+    self.assertEqual(8, stats['DAGPipelineName_UnitQ_outputs'].count)
+    self.assertEqual(6, stats['DAGPipelineName_UnitR_transform_seconds'].count)
+    self.assertEqual(
+        6, stats['DAGPipelineName_UnitR_transform_seconds_quantiles'].count)
+
+    p.reset_shared_stats()
+    self.assertEqual(
+        [0] * 8, [stat.count for stat in p.get_shared_stats()])
+
+  def testInstrumentationCountsProtoBytes(self):
+
+    class UnitQ(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, music_pb2.NoteSequence)
+
+      def transform(self, input_object):
+        return [music_pb2.NoteSequence(id='a' * input_object.x)]
+
+    q = UnitQ()
+    dag = {q: dag_pipeline.Input(q.input_type),
+           dag_pipeline.Output('output'): q}
+    p = dag_pipeline.DAGPipeline(dag, 'DAGPipelineName', instrument=True)
+    p.transform(Type0(5, 0, 0))
+    stats = dict((stat.name, stat) for stat in p.get_shared_stats())
+    self.assertEqual(
+        music_pb2.NoteSequence(id='aaaaa').ByteSize(),
+        stats['DAGPipelineName_UnitQ_output_bytes'].count)
+
+  def assertTransformIterMatchesTransform(self, p, input_object):
+    expected = p.transform(input_object)
+    expected_stats = sorted(
+        stat.name for stat in statistics.merge_statistics(p.get_stats()))
+    streamed = dict([(name, []) for name in expected])
+    for name, output in p.transform_iter(input_object):
+      streamed[name].append(output)
+    self.assertEqual(
+        dict([(name, sorted(outputs)) for name, outputs in expected.items()]),
+        dict([(name, sorted(outputs)) for name, outputs in streamed.items()]))
+    self.assertEqual(
+        expected_stats,
+        sorted(stat.name for stat in statistics.merge_statistics(
+            p.get_stats())))
+
+  def testTransformIter(self):
+    a, b, c, d = UnitA(), UnitB(), UnitC(), UnitD()
+    dag = {a: dag_pipeline.Input(Type0),
+           b: a['t1'],
+           c: {'A_data': a['t2'], 'B_data': b},
+           d: {'0': c['regular_data'], '1': b, '2': c['special_data']},
+           dag_pipeline.Output('abcdz'): d,
+           dag_pipeline.Output('t1'): a['t1']}
+    p = dag_pipeline.DAGPipeline(dag)
+    for input_object in [Type0(1, 2, 3), Type0(-1, -2, -3), Type0(3, -3, 2)]:
+      self.assertTransformIterMatchesTransform(p, input_object)
+
+    class UnitQ(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, {'t1': Type1, 't2': Type2})
+
+      def transform(self, input_object):
+        self._set_stats([statistics.Counter('output_count', input_object.z)])
+        t1 = [Type1(x=input_object.x + i, y=input_object.y + i)
+              for i in range(input_object.z)]
+        t2 = [Type2(z=input_object.z)]
+        return {'t1': t1, 't2': t2}
+
+    q, b, c = UnitQ(), UnitB(), UnitC()
+    dag = {q: dag_pipeline.Input(Type0),
+           b: q['t1'],
+           c: {'A_data': q['t2'], 'B_data': b},
+           dag_pipeline.Output(): c}
+    p = dag_pipeline.DAGPipeline(dag, instrument=True)
+    for input_object in [Type0(1, 2, 3), Type0(1, 2, 0)]:
+      self.assertTransformIterMatchesTransform(p, input_object)
+
+  def testTransformIterIsDepthFirst(self):
+    calls = []
+
+    class UnitQ(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, Type1)
+
+      def transform(self, input_object):
+        calls.append('q')
+        return [Type1(x=input_object.x + i, y=input_object.y)
+                for i in range(input_object.z)]
+
+    class UnitR(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type1, Type1)
+
+      def transform(self, input_object):
+        calls.append('r')
+        return [input_object]
+
+    q, r = UnitQ(), UnitR()
+    dag = {q: dag_pipeline.Input(Type0),
+           r: q,
+           dag_pipeline.Output('output'): r}
+    p = dag_pipeline.DAGPipeline(dag)
+    outputs = p.transform_iter(Type0(0, 0, 3))
+    self.assertEqual(('output', Type1(0, 0)), next(outputs))
+    self.assertEqual(['q', 'r'], calls)
+    self.assertEqual(('output', Type1(1, 0)), next(outputs))
+    self.assertEqual(['q', 'r', 'r'], calls)
+    self.assertEqual([('output', Type1(2, 0))], list(outputs))
+
   def testInvalidDAGException(self):
     class UnitQ(pipeline.Pipeline):
 
@@ -835,6 +1016,98 @@ class DAGPipelineTest(tf.test.TestCase):
       with self.assertRaises(dag_pipeline.InvalidTransformOutputException):
         p.transform(Type0(1, 2, 3))
 
+  def testValidationLevels(self):
+    class UnitSplit(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, Type1)
+
+      def transform(self, input_object):
+        return [Type1(x, input_object.y) for x in range(5)]
+
+    class UnitSometimesBad(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type1, Type2)
+
+      def transform(self, input_object):
+        if input_object.x == 2:
+          return [Type1(input_object.x, input_object.y)]
+        return [Type2(input_object.x)]
+
+    def make_dag_pipeline(**kwargs):
+      split = UnitSplit()
+      bad = UnitSometimesBad()
+      dag = {split: dag_pipeline.Input(Type0),
+             bad: split,
+             dag_pipeline.Output('output'): bad}
+      return dag_pipeline.DAGPipeline(dag, **kwargs)
+
+    p = make_dag_pipeline()
+    with self.assertRaises(dag_pipeline.InvalidTransformOutputException):
+      p.transform(Type0(1, 2, 3))
+    with self.assertRaises(dag_pipeline.InvalidTransformOutputException):
+      list(p.transform_iter(Type0(1, 2, 3)))
+
+    p = make_dag_pipeline(validation=dag_pipeline.VALIDATION_OFF)
+    self.assertEqual(
+        [Type2(0), Type2(1), Type1(2, 2), Type2(3), Type2(4)],
+        p.transform(Type0(1, 2, 3))['output'])
+
+    # Calls 0, 2 and 4 to UnitSometimesBad are checked. Call 2 is bad.
+    p = make_dag_pipeline(validation=dag_pipeline.VALIDATION_SAMPLED,
+                          validation_sample_interval=2)
+    with self.assertRaises(dag_pipeline.InvalidTransformOutputException):
+      p.transform(Type0(1, 2, 3))
+
+    # Calls 0 and 3 are checked in the first transform, and calls 6 and 9
+    # (counting from the first transform) in the second. Call 7 is bad.
+    p = make_dag_pipeline(validation=dag_pipeline.VALIDATION_SAMPLED,
+                          validation_sample_interval=3)
+    self.assertEqual(5, len(p.transform(Type0(1, 2, 3))['output']))
+    self.assertEqual(5, len(list(p.transform_iter(Type0(1, 2, 3)))))
+
+    # Call 7 is checked, in the second transform.
+    p = make_dag_pipeline(validation=dag_pipeline.VALIDATION_SAMPLED,
+                          validation_sample_interval=7)
+    self.assertEqual(5, len(p.transform(Type0(1, 2, 3))['output']))
+    with self.assertRaises(dag_pipeline.InvalidTransformOutputException):
+      list(p.transform_iter(Type0(1, 2, 3)))
+
+  def testInvalidValidationLevel(self):
+    dag = {dag_pipeline.Output('output'): dag_pipeline.Input(Type0)}
+    with self.assertRaises(ValueError):
+      dag_pipeline.DAGPipeline(dag, validation='sometimes')
+    with self.assertRaises(ValueError):
+      dag_pipeline.DAGPipeline(dag, validation=dag_pipeline.VALIDATION_SAMPLED,
+                               validation_sample_interval=0)
+
+  def testSharedStats(self):
+    class UnitQ(pipeline.Pipeline):
+
+      def __init__(self):
+        pipeline.Pipeline.__init__(self, Type0, Type1)
+
+      def transform(self, input_object):
+        self._get_shared_counter('inputs').increment()
+        return [Type1(input_object.x, input_object.y)]
+
+    q = UnitQ()
+    dag = {q: dag_pipeline.Input(Type0),
+           dag_pipeline.Output('output'): q}
+    p = dag_pipeline.DAGPipeline(dag)
+    p.transform(Type0(1, 2, 3))
+    list(p.transform_iter(Type0(1, 2, 3)))
+    self.assertEqual(
+        [('DAGPipeline_UnitQ_inputs', 2)],
+        [(stat.name, stat.count) for stat in p.get_shared_stats()])
+    self.assertEqual([], p.get_stats())
+
+    p.reset_shared_stats()
+    self.assertEqual(
+        [('DAGPipeline_UnitQ_inputs', 0)],
+        [(stat.name, stat.count) for stat in p.get_shared_stats()])
+
   def testInvalidStatisticsException(self):
     class UnitQ(pipeline.Pipeline):
 
@@ -0,0 +1,275 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Exports statistics and gauges in the Prometheus text format.
+
+A `MetricsExporter` publishes the statistics of a long running job, such as a
+pipeline run or model training, so that they can be scraped by a monitoring
+system instead of read from the logs. Metrics are served over HTTP, written to
+a file that is periodically replaced (e.g. for the node exporter's textfile
+collector), or both.
+
+Statistics are rendered to text when they are published, so the exporter never
+reads objects that the job is still updating, and serving a scrape only copies
+a string.
+"""
+
+import BaseHTTPServer
+import math
+import os
+import re
+import threading
+import time
+
+# internal imports
+import tensorflow as tf
+
+from magenta.pipelines import statistics
+
+# Content type of the Prometheus text exposition format.
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# Quantiles exported for each `statistics.QuantileSketch`.
+SKETCH_QUANTILES = [0.5, 0.9, 0.99]
+
+
+def _sanitize_name(name):
+  """Returns `name` with characters not allowed in metric names replaced."""
+  name = re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+  if re.match(r'[0-9]', name):
+    name = '_' + name
+  return name
+
+
+def _format_value(value):
+  """Formats a sample value."""
+  if isinstance(value, (int, long)):
+    return str(value)
+  value = float(value)
+  if math.isnan(value):
+    return 'NaN'
+  if math.isinf(value):
+    return '+Inf' if value > 0 else '-Inf'
+  return repr(value)
+
+
+def _format_labels(labels):
+  """Formats a dictionary of labels as `{name="value",...}`."""
+  if not labels:
+    return ''
+  return '{%s}' % ','.join(
+      '%s="%s"' % (_sanitize_name(name),
+                   str(value).replace('\\', r'\\').replace('"', r'\"')
+                   .replace('\n', r'\n'))
+      for name, value in sorted(labels.items()))
+
+
+def _histogram_lines(name, histogram, total=None):
+  """Returns Prometheus histogram lines for a `statistics.Histogram`."""
+  lines = ['# TYPE %s histogram' % name]
+  cumulative_count = 0
+  # Each bucket upper bound is the lower bound of the next bucket.
+  for lower, upper in zip(histogram.buckets, histogram.buckets[1:]):
+    cumulative_count += histogram.counters[lower]
+    lines.append('%s_bucket{le="%s"} %d' % (name, _format_value(upper),
+                                            cumulative_count))
+  cumulative_count += histogram.counters[histogram.buckets[-1]]
+  lines.append('%s_bucket{le="+Inf"} %d' % (name, cumulative_count))
+  if total is not None:
+    lines.append('%s_sum %s' % (name, _format_value(total)))
+  lines.append('%s_count %d' % (name, cumulative_count))
+  return lines
+
+
+def statistics_to_prometheus(stats, namespace='magenta'):
+  """Renders statistics in the Prometheus text format.
+
+  A `statistics.Counter` becomes a counter named `<namespace>_<name>_total`, a
+  `statistics.Histogram` becomes a histogram, with a `_sum` for a
+  `statistics.TimingHistogram`, and a `statistics.QuantileSketch` becomes a
+  summary with the quantiles in `SKETCH_QUANTILES`. Other statistics are not
+  exported. Characters that are not allowed in metric names are replaced with
+  underscores.
+
+  Args:
+    stats: A list of `Statistic` objects. Each name should appear only once,
+        e.g. the output of `statistics.merge_statistics`.
+    namespace: A string prepended to every metric name.
+
+  Returns:
+    The metrics as a string, one line per sample.
+  """
+  lines = []
+  for stat in stats:
+    name = _sanitize_name('%s_%s' % (namespace, stat.name))
+    if isinstance(stat, statistics.Counter):
+      lines.append('# TYPE %s_total counter' % name)
+      lines.append('%s_total %s' % (name, _format_value(stat.count)))
+    elif isinstance(stat, statistics.TimingHistogram):
+      lines.extend(_histogram_lines(name, stat, stat.total_seconds))
+    elif isinstance(stat, statistics.Histogram):
+      lines.extend(_histogram_lines(name, stat))
+    elif isinstance(stat, statistics.QuantileSketch):
+      lines.append('# TYPE %s summary' % name)
+      for quantile, value in zip(SKETCH_QUANTILES,
+                                 stat.get_quantiles(SKETCH_QUANTILES)):
+        lines.append('%s{quantile="%s"} %s' % (
+            name, quantile,
+            _format_value(float('nan') if value is None else value)))
+      lines.append('%s_count %d' % (name, stat.count))
+  return ''.join(line + '\n' for line in lines)
+
+
+class MetricsExporter(object):
+  """Publishes metrics in the Prometheus text format.
+
+  Statistics are published with `set_statistics`, which replaces all
+  previously published statistics, and single values with `set_gauge`. If
+  `port` is given, the metrics are served over HTTP at any path. If
+  `output_file` is given, the metrics are written to it at most once every
+  `refresh_secs` seconds, and when the exporter is closed. The file is replaced
+  atomically, so readers never see a partial file.
+
+  Producers can call `update_due` to avoid building statistics that would not
+  be published yet.
+  """
+
+  def __init__(self, port=None, output_file=None, namespace='magenta',
+               refresh_secs=10.0, host=''):
+    """Constructs a `MetricsExporter` and starts serving if `port` is given.
+
+    Args:
+      port: The port to serve metrics on over HTTP, or None. If 0, a free port
+          is chosen and can be read from the `port` attribute.
+      output_file: The path of a file to write metrics to, or None.
+      namespace: A string prepended to every metric name.
+      refresh_secs: The minimum number of seconds between updates of
+          `output_file`, and the interval reported by `update_due`.
+      host: The host name or address to serve metrics on. By default metrics
+          are served on all interfaces.
+
+    Raises:
+      ValueError: If neither `port` nor `output_file` is given.
+    """
+    if port is None and not output_file:
+      raise ValueError('At least one of port and output_file must be given.')
+    self.namespace = namespace
+    self.output_file = output_file
+    self.refresh_secs = refresh_secs
+    self._lock = threading.Lock()
+    self._statistics_text = ''
+    self._gauges = {}
+    self._last_update_time = None
+    self._last_write_time = None
+
+    self._server = None
+    self.port = None
+    if port is not None:
+      self._server = BaseHTTPServer.HTTPServer(
+          (host, port), _make_request_handler(self))
+      self.port = self._server.server_address[1]
+      thread = threading.Thread(target=self._server.serve_forever)
+      thread.daemon = True
+      thread.start()
+      tf.logging.info('Serving metrics on port %d.', self.port)
+
+  def update_due(self):
+    """Returns True if `refresh_secs` have passed since the last update."""
+    return (self._last_update_time is None or
+            time.time() - self._last_update_time >= self.refresh_secs)
+
+  def set_statistics(self, stats):
+    """Publishes statistics, replacing those published before.
+
+    Args:
+      stats: A list of `Statistic` objects. Each name should appear only once.
+    """
+    text = statistics_to_prometheus(stats, self.namespace)
+    with self._lock:
+      self._statistics_text = text
+    self._last_update_time = time.time()
+    self._maybe_write_file()
+
+  def set_gauge(self, name, value, labels=None):
+    """Publishes the current value of a gauge.
+
+    Args:
+      name: The name of the gauge. `namespace` is prepended to it.
+      value: A number.
+      labels: An optional dictionary mapping label names to values, which
+          distinguishes gauges with the same name.
+    """
+    name = _sanitize_name('%s_%s' % (self.namespace, name))
+    with self._lock:
+      self._gauges[(name, _format_labels(labels))] = value
+    self._maybe_write_file()
+
+  def render(self):
+    """Returns all published metrics in the Prometheus text format."""
+    with self._lock:
+      lines = []
+      last_name = None
+      for (name, labels), value in sorted(self._gauges.items()):
+        if name != last_name:
+          lines.append('# TYPE %s gauge' % name)
+          last_name = name
+        lines.append('%s%s %s' % (name, labels, _format_value(value)))
+      return self._statistics_text + ''.join(line + '\n' for line in lines)
+
+  def _maybe_write_file(self, force=False):
+    """Writes the metrics to `output_file` if it is time to."""
+    if not self.output_file:
+      return
+    now = time.time()
+    if (not force and self._last_write_time is not None and
+        now - self._last_write_time < self.refresh_secs):
+      return
+    self._last_write_time = now
+    temp_path = '%s.tmp%d' % (self.output_file, os.getpid())
+    with tf.gfile.Open(temp_path, 'w') as f:
+      f.write(self.render())
+    tf.gfile.Rename(temp_path, self.output_file, overwrite=True)
+
+  def close(self):
+    """Writes the final metrics to `output_file` and stops serving."""
+    self._maybe_write_file(force=True)
+    if self._server is not None:
+      self._server.shutdown()
+      self._server.server_close()
+      self._server = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *unused_args):
+    self.close()
+
+
+def _make_request_handler(exporter):
+  """Returns a request handler class that serves `exporter`'s metrics."""
+
+  class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):  # pylint: disable=invalid-name
+      body = exporter.render()
+      self.send_response(200)
+      self.send_header('Content-Type', CONTENT_TYPE)
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, *unused_args):
+      # Scrapes are frequent, don't log each one.
+      pass
+
+  return MetricsRequestHandler
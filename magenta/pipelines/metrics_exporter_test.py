@@ -0,0 +1,114 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for metrics_exporter."""
+
+import os
+import tempfile
+import urllib2
+
+# internal imports
+import tensorflow as tf
+
+from magenta.pipelines import metrics_exporter
+from magenta.pipelines import statistics
+
+
+class MetricsExporterTest(tf.test.TestCase):
+
+  def testStatisticsToPrometheus(self):
+    counter = statistics.Counter('Pipeline_melodies-discarded', 3)
+    histogram = statistics.Histogram('lengths', [0, 10])
+    histogram.increment(5)
+    histogram.increment(20, 2)
+    timing = statistics.TimingHistogram('seconds', [0, 1])
+    timing.increment(0.5)
+    sketch = statistics.QuantileSketch('sizes')
+    for value in range(1, 101):
+      sketch.increment(value)
+    empty_sketch = statistics.QuantileSketch('empty')
+
+    self.assertEqual(
+        '# TYPE magenta_Pipeline_melodies_discarded_total counter\n'
+        'magenta_Pipeline_melodies_discarded_total 3\n'
+        '# TYPE magenta_lengths histogram\n'
+        'magenta_lengths_bucket{le="0"} 0\n'
+        'magenta_lengths_bucket{le="10"} 1\n'
+        'magenta_lengths_bucket{le="+Inf"} 3\n'
+        'magenta_lengths_count 3\n'
+        '# TYPE magenta_seconds histogram\n'
+        'magenta_seconds_bucket{le="0"} 0\n'
+        'magenta_seconds_bucket{le="1"} 1\n'
+        'magenta_seconds_bucket{le="+Inf"} 1\n'
+        'magenta_seconds_sum 0.5\n'
+        'magenta_seconds_count 1\n'
+        '# TYPE magenta_sizes summary\n'
+        'magenta_sizes{quantile="0.5"} 50\n'
+        'magenta_sizes{quantile="0.9"} 90\n'
+        'magenta_sizes{quantile="0.99"} 99\n'
+        'magenta_sizes_count 100\n'
+        '# TYPE magenta_empty summary\n'
+        'magenta_empty{quantile="0.5"} NaN\n'
+        'magenta_empty{quantile="0.9"} NaN\n'
+        'magenta_empty{quantile="0.99"} NaN\n'
+        'magenta_empty_count 0\n',
+        metrics_exporter.statistics_to_prometheus(
+            [counter, histogram, timing, sketch, empty_sketch]))
+
+  def testOutputFile(self):
+    output_file = os.path.join(
+        tempfile.mkdtemp(dir=self.get_temp_dir()), 'metrics.prom')
+    exporter = metrics_exporter.MetricsExporter(
+        output_file=output_file, namespace='job', refresh_secs=1000)
+    self.assertTrue(exporter.update_due())
+    exporter.set_statistics([statistics.Counter('inputs', 1)])
+    self.assertFalse(exporter.update_due())
+    with open(output_file) as f:
+      self.assertEqual('# TYPE job_inputs_total counter\n'
+                       'job_inputs_total 1\n', f.read())
+
+    # The file is not rewritten until `refresh_secs` have passed.
+    exporter.set_gauge('queue_fill', 0.25, {'queue': 'examples'})
+    exporter.set_gauge('queue_fill', 0.5, {'queue': 'batches'})
+    exporter.set_gauge('step', 7)
+    with open(output_file) as f:
+      self.assertEqual('# TYPE job_inputs_total counter\n'
+                       'job_inputs_total 1\n', f.read())
+
+    exporter.close()
+    with open(output_file) as f:
+      self.assertEqual('# TYPE job_inputs_total counter\n'
+                       'job_inputs_total 1\n'
+                       '# TYPE job_queue_fill gauge\n'
+                       'job_queue_fill{queue="batches"} 0.5\n'
+                       'job_queue_fill{queue="examples"} 0.25\n'
+                       '# TYPE job_step gauge\n'
+                       'job_step 7\n', f.read())
+    self.assertEqual(['metrics.prom'],
+                     os.listdir(os.path.dirname(output_file)))
+
+  def testServeHTTP(self):
+    with metrics_exporter.MetricsExporter(port=0, host='localhost') as exporter:
+      exporter.set_statistics([statistics.Counter('inputs', 5)])
+      response = urllib2.urlopen('http://localhost:%d/metrics' % exporter.port)
+      self.assertEqual(metrics_exporter.CONTENT_TYPE,
+                       response.info().getheader('Content-Type'))
+      self.assertEqual(exporter.render(), response.read())
+
+  def testNoDestination(self):
+    with self.assertRaises(ValueError):
+      metrics_exporter.MetricsExporter()
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -15,11 +15,17 @@
 
 import abc
 import inspect
+import multiprocessing
 import os.path
+import random
+import time
+import traceback
 
 # internal imports
+import numpy as np
 import tensorflow as tf
 
+from magenta.common import tfrecord_lib
 from magenta.pipelines import statistics
 
 
@@ -69,7 +75,7 @@ class Key(object):
 
 def _guarantee_dict(given, default_name):
   if not isinstance(given, dict):
-    return {default_name: dict}
+    return {default_name: given}
   return given
 
 
@@ -119,6 +125,12 @@ class Pipeline(object):
 
   `Pipeline` implementers should call `_set_stats` from within `transform` to
   set the statistics that will be returned by the next call to `get_stats`.
+
+  Counts that are updated on every call to `transform` can instead be kept in
+  shared counters, obtained with `_get_shared_counter`, or other shared
+  statistics, obtained with `_get_shared_stat`. These are created once and
+  incremented in place, so no `Statistic` objects are allocated per input.
+  Their running totals are returned by `get_shared_stats`.
   """
 
   __metaclass__ = abc.ABCMeta
@@ -162,6 +174,7 @@ class Pipeline(object):
     self._input_type = input_type
     self._output_type = output_type
     self._stats = []
+    self._shared_stats = {}
 
   def __getitem__(self, key):
     return Key(self, key)
@@ -217,6 +230,30 @@ class Pipeline(object):
     """
     pass
 
+  def transform_iter(self, input_object):
+    """Runs the pipeline on the given input, yielding outputs one at a time.
+
+    The default implementation calls `transform` and yields each object it
+    returns. Pipelines that can produce outputs incrementally, such as
+    `DAGPipeline`, override this so that outputs can be consumed before the
+    whole input has been processed.
+
+    Statistics are available from `get_stats` once the generator is exhausted.
+
+    Args:
+      input_object: An object or dictionary mapping names to objects.
+          The object types must match `input_type`.
+
+    Yields:
+      (name, output) tuples, where `name` is a key of `output_type_as_dict`
+      and `output` is an object of the type it maps to.
+    """
+    outputs = _guarantee_dict(self.transform(input_object),
+                              self.output_type_as_dict.keys()[0])
+    for name, output_list in outputs.items():
+      for output in output_list:
+        yield name, output
+
   def _set_stats(self, stats):
     """Overwrites the current statistics returned by `get_stats`.
 
@@ -254,6 +291,60 @@ class Pipeline(object):
     """
     return list(self._stats)
 
+  def _get_shared_counter(self, name):
+    """Returns the shared counter with the given name, creating it if needed.
+
+    Implementers of Pipeline can increment shared counters from within
+    `transform`. Unlike statistics passed to `_set_stats`, which only describe
+    the last call to `transform`, a shared counter accumulates over all calls.
+
+    Args:
+      name: String name of the counter. `self.name` is prepended to it by
+          `get_shared_stats`.
+
+    Returns:
+      A `statistics.Counter` owned by this pipeline.
+    """
+    return self._get_shared_stat(name, statistics.Counter)
+
+  def _get_shared_stat(self, name, stat_class):
+    """Returns the shared statistic with the given name, creating it if needed.
+
+    Like `_get_shared_counter`, but for any `Statistic` that supports `reset`,
+    such as a `statistics.TimingHistogram`.
+
+    Args:
+      name: String name of the statistic. `self.name` is prepended to it by
+          `get_shared_stats`.
+      stat_class: A callable that takes `name` and returns a new `Statistic`.
+          Only called the first time `name` is requested.
+
+    Returns:
+      A `Statistic` owned by this pipeline.
+    """
+    stat = self._shared_stats.get(name)
+    if stat is None:
+      stat = stat_class(name)
+      self._shared_stats[name] = stat
+    return stat
+
+  def get_shared_stats(self):
+    """Returns the running totals of this pipeline's shared statistics.
+
+    The counts cover every call to `transform` since the pipeline was
+    constructed or `reset_shared_stats` was last called. Pipeline runners
+    combine these with the statistics from `get_stats` when logging.
+
+    Returns:
+      A list of `Statistic` objects.
+    """
+    return [self._prepend_name(stat) for stat in self._shared_stats.values()]
+
+  def reset_shared_stats(self):
+    """Resets this pipeline's shared statistics in place."""
+    for stat in self._shared_stats.values():
+      stat.reset()
+
 
 def file_iterator(root_dir, extension=None, recurse=True):
   """Generator that iterates over all files in the given directory.
@@ -296,21 +387,121 @@ def tf_record_iterator(tfrecord_file, proto):
   """Generator that iterates over protocol buffers in a TFRecord file.
 
   Args:
-    tfrecord_file: Path to a TFRecord file containing protocol buffers.
+    tfrecord_file: Path to a TFRecord file containing protocol buffers, or a
+        glob pattern matching several such files, e.g. the shards of a sharded
+        dataset. GZIP and ZLIB compressed shards are read based on their file
+        name extension.
     proto: A protocol buffer class. This type will be used to deserialize the
         protos from the TFRecord file. This will be the output type.
 
   Yields:
     Instances of the given `proto` class from the TFRecord file.
   """
-  for raw_bytes in tf.python_io.tf_record_iterator(tfrecord_file):
+  for raw_bytes in tfrecord_lib.tf_record_iterator(tfrecord_file):
     yield proto.FromString(raw_bytes)
 
 
+def _assert_serializable_output_type(pipeline):
+  """Raises ValueError if any of `pipeline`'s output types can't be written."""
+  if isinstance(pipeline.output_type, dict):
+    for name, type_ in pipeline.output_type.items():
+      if not hasattr(type_, 'SerializeToString'):
+        raise ValueError(
+            'Pipeline output "%s" does not have method SerializeToString. '
+            'Output type = %s' % (name, pipeline.output_type))
+  else:
+    if not hasattr(pipeline.output_type, 'SerializeToString'):
+      raise ValueError(
+          'Pipeline output type %s does not have method SerializeToString.'
+          % pipeline.output_type)
+
+
+def _open_output_writers(output_names, output_dir, output_file_base,
+                         max_records_per_shard=None, max_bytes_per_shard=None,
+                         compression=None):
+  """Opens a record writer in `output_dir` for each dataset name.
+
+  If none of the sharding or compression options are given, each dataset is
+  written to a single `<name>.tfrecord` file. Otherwise each dataset is written
+  to shards by a `tfrecord_lib.ShardedTFRecordWriter`.
+
+  Args:
+    output_names: A list of dataset names.
+    output_dir: Path to directory where datasets will be written. If the
+        directory does not exist, it will be created.
+    output_file_base: An optional string prefix for all dataset file names.
+    max_records_per_shard: Maximum number of records in each shard, or None.
+    max_bytes_per_shard: Maximum number of uncompressed bytes in each shard, or
+        None.
+    compression: 'GZIP', 'ZLIB', or None for no compression.
+
+  Returns:
+    A dictionary mapping dataset names to writers, each with `write` and
+    `close` methods.
+  """
+  if not tf.gfile.Exists(output_dir):
+    tf.gfile.MakeDirs(output_dir)
+
+  if output_file_base is None:
+    path_bases = [os.path.join(output_dir, name) for name in output_names]
+  else:
+    path_bases = [os.path.join(output_dir, '%s_%s' % (output_file_base, name))
+                  for name in output_names]
+
+  if (max_records_per_shard is None and max_bytes_per_shard is None and
+      compression is None):
+    return dict([(name, tf.python_io.TFRecordWriter(path_base + '.tfrecord'))
+                 for name, path_base in zip(output_names, path_bases)])
+
+  return dict([(name, tfrecord_lib.ShardedTFRecordWriter(
+      path_base, max_records_per_shard, max_bytes_per_shard, compression))
+               for name, path_base in zip(output_names, path_bases)])
+
+
+def _get_run_stats(stats, pipeline):
+  """Returns the statistics of a pipeline run so far.
+
+  Args:
+    stats: A `statistics.StatisticsAccumulator` holding the statistics returned
+        by `pipeline.get_stats` after each input.
+    pipeline: The Pipeline instance being run.
+
+  Returns:
+    A list of `Statistic` objects, including the pipeline's shared counters.
+  """
+  shared_stats = pipeline.get_shared_stats()
+  if not shared_stats:
+    return stats.get_statistics()
+  run_stats = stats.copy()
+  run_stats.add_all(shared_stats)
+  return run_stats.get_statistics()
+
+
+def _publish_run_stats(metrics_exporter, run_name, stats, total_inputs,
+                       total_outputs):
+  """Publishes the statistics of a pipeline run to a metrics exporter.
+
+  Args:
+    metrics_exporter: A `metrics_exporter.MetricsExporter` instance.
+    run_name: A string prefix for the input and output counts.
+    stats: A list of `Statistic` objects.
+    total_inputs: The number of inputs processed so far.
+    total_outputs: The number of outputs produced so far.
+  """
+  metrics_exporter.set_statistics(
+      [statistics.Counter(run_name + '_inputs', total_inputs),
+       statistics.Counter(run_name + '_outputs', total_outputs)] + stats)
+
+
 def run_pipeline_serial(pipeline,
                         input_iterator,
                         output_dir,
-                        output_file_base=None):
+                        output_file_base=None,
+                        max_records_per_shard=None,
+                        max_bytes_per_shard=None,
+                        compression=None,
+                        streaming=False,
+                        metrics_exporter=None):
   """Runs the a pipeline on a data source and writes to a directory.
 
   Run the the pipeline on each input from the iterator one at a time.
@@ -321,6 +512,32 @@ def run_pipeline_serial(pipeline,
   The output type or types given by `pipeline.output_type` must be protocol
   buffers or objects that have a SerializeToString method.
 
+  Sharded output: If any of `max_records_per_shard`, `max_bytes_per_shard`, or
+  `compression` is given, each dataset is instead written to shards named
+  `<name>-00000-of-000NN.tfrecord` (with a `.gz` or `.zlib` suffix when
+  compressed), rolling over to a new shard when a limit is reached, along with
+  a `<name>.manifest.json` file listing the shards. Shards and the manifest
+  left in `output_dir` by an earlier run of the same dataset are deleted first.
+  A glob such as `<name>-*.tfrecord`, or `<name>-*.tfrecord.gz` and
+  `<name>-*.tfrecord.zlib` for compressed shards, can then be passed to
+  `tf_record_iterator` or the training readers.
+
+  The pipeline's statistics are logged every 500 inputs and when the run
+  completes, together with a `statistics.TimingHistogram` of the time taken by
+  each call to `pipeline.transform`. Construct a `DAGPipeline` with
+  `instrument=True` to also log the time taken by each of its units.
+
+  Streaming: If `streaming` is True, outputs are produced by
+  `pipeline.transform_iter` and written as soon as they are produced, instead
+  of after `pipeline.transform` has finished with each input. For a
+  `DAGPipeline` this bounds the memory used by intermediate results. The
+  timing histogram then also includes the time taken to write the outputs.
+
+  Metrics: If `metrics_exporter` is given, the statistics, including the number
+  of inputs processed and outputs produced, are also published to it as they
+  are produced, at most once every `metrics_exporter.refresh_secs` seconds, and
+  when the run completes.
+
   Args:
     pipeline: A Pipeline instance. `pipeline.output_type` must be a protocol
         buffer or a dictionary mapping names to protocol buffers.
@@ -331,61 +548,250 @@ def run_pipeline_serial(pipeline,
         directory does not exist, it will be created.
     output_file_base: An optional string prefix for all datasets output by this
         run. The prefix will also be followed by an underscore.
+    max_records_per_shard: If given, each dataset is split into shards of at
+        most this many records. See `Sharded output` above.
+    max_bytes_per_shard: If given, each dataset is split into shards of at most
+        this many (uncompressed) bytes.
+    compression: 'GZIP' or 'ZLIB' to compress the dataset files, or None.
+    streaming: If True, write outputs as soon as they are produced. See
+        `Streaming` above.
+    metrics_exporter: An optional `metrics_exporter.MetricsExporter` instance
+        to publish statistics to. See `Metrics` above.
 
   Raises:
     ValueError: If any of `pipeline`'s output types do not have a
         SerializeToString method.
   """
-  if isinstance(pipeline.output_type, dict):
-    for name, type_ in pipeline.output_type.items():
-      if not hasattr(type_, 'SerializeToString'):
-        raise ValueError(
-            'Pipeline output "%s" does not have method SerializeToString. '
-            'Output type = %s' % (name, pipeline.output_type))
-  else:
-    if not hasattr(pipeline.output_type, 'SerializeToString'):
-      raise ValueError(
-          'Pipeline output type %s does not have method SerializeToString.'
-          % pipeline.output_type)
-
-  if not tf.gfile.Exists(output_dir):
-    tf.gfile.MakeDirs(output_dir)
+  _assert_serializable_output_type(pipeline)
 
   output_names = pipeline.output_type_as_dict.keys()
-
-  if output_file_base is None:
-    output_paths = [os.path.join(output_dir, name + '.tfrecord')
-                    for name in output_names]
-  else:
-    output_paths = [os.path.join(output_dir,
-                                 '%s_%s.tfrecord' % (output_file_base, name))
-                    for name in output_names]
-
-  writers = dict([(name, tf.python_io.TFRecordWriter(path))
-                  for name, path in zip(output_names, output_paths)])
+  writers = _open_output_writers(
+      output_names, output_dir, output_file_base, max_records_per_shard,
+      max_bytes_per_shard, compression)
 
   total_inputs = 0
   total_outputs = 0
-  stats = []
+  transform_timing = statistics.TimingHistogram(
+      'run_pipeline_serial_transform_seconds')
+  stats = statistics.StatisticsAccumulator([transform_timing])
   for input_ in input_iterator:
     total_inputs += 1
-    for name, outputs in _guarantee_dict(pipeline.transform(input_),
-                                         output_names[0]).items():
-      for output in outputs:
+    start_time = time.time()
+    if streaming:
+      for name, output in pipeline.transform_iter(input_):
         writers[name].write(output.SerializeToString())
         total_outputs += 1
-    stats = statistics.merge_statistics(stats + pipeline.get_stats())
+      transform_timing.increment(time.time() - start_time)
+    else:
+      pipeline_outputs = pipeline.transform(input_)
+      transform_timing.increment(time.time() - start_time)
+      for name, outputs in _guarantee_dict(pipeline_outputs,
+                                           output_names[0]).items():
+        for output in outputs:
+          writers[name].write(output.SerializeToString())
+          total_outputs += 1
+    stats.add_all(pipeline.get_stats())
     if total_inputs % 500 == 0:
       tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
                       total_inputs, total_outputs)
-      statistics.log_statistics_list(stats, tf.logging.info)
+      statistics.log_statistics_list(_get_run_stats(stats, pipeline),
+                                     tf.logging.info)
+    if metrics_exporter is not None and metrics_exporter.update_due():
+      _publish_run_stats(metrics_exporter, 'run_pipeline_serial',
+                         _get_run_stats(stats, pipeline), total_inputs,
+                         total_outputs)
+  for writer in writers.values():
+    writer.close()
+  tf.logging.info('\n\nCompleted.\n')
+  tf.logging.info('Processed %d inputs total. Produced %d outputs.',
+                  total_inputs, total_outputs)
+  statistics.log_statistics_list(_get_run_stats(stats, pipeline),
+                                 tf.logging.info)
+  if metrics_exporter is not None:
+    _publish_run_stats(metrics_exporter, 'run_pipeline_serial',
+                       _get_run_stats(stats, pipeline), total_inputs,
+                       total_outputs)
+
+
+# The pipeline instance used by each `run_pipeline_parallel` worker process.
+# It is set once per process by `_init_parallel_worker` so that the pipeline is
+# only pickled when the pool starts, not once per input.
+_worker_pipeline = None
+
+
+def _init_parallel_worker(pipeline, initializer=None, initargs=()):
+  """Initializes a `run_pipeline_parallel` worker process."""
+  global _worker_pipeline
+  _worker_pipeline = pipeline
+  # Forked workers inherit the parent's random state. Reseed so that pipelines
+  # which sample randomly (e.g. RandomPartition) don't make the same choices in
+  # every process.
+  random.seed()
+  np.random.seed()
+  if initializer is not None:
+    initializer(*initargs)
+
+
+def _transform_serialized(input_):
+  """Runs the worker pipeline on a single input.
+
+  Outputs are serialized inside the worker so only strings are sent back to
+  the parent process.
+
+  Args:
+    input_: An input object for the worker pipeline.
+
+  Returns:
+    A tuple (outputs, stats, error). `outputs` is a dictionary mapping dataset
+    names to lists of serialized outputs, `stats` is the list of `Statistic`
+    objects produced by the transform, including the increments of the
+    pipeline's shared counters and a `statistics.TimingHistogram` holding the
+    time taken by the transform, and `error` is None on success or a string
+    describing the exception raised while transforming `input_`.
+  """
+  try:
+    transform_timing = statistics.TimingHistogram(
+        'run_pipeline_parallel_transform_seconds')
+    start_time = time.time()
+    pipeline_outputs = _worker_pipeline.transform(input_)
+    transform_timing.increment(time.time() - start_time)
+    outputs = _guarantee_dict(
+        pipeline_outputs, _worker_pipeline.output_type_as_dict.keys()[0])
+    serialized = dict([(name, [output.SerializeToString()
+                               for output in output_list])
+                       for name, output_list in outputs.items()])
+    stats = _worker_pipeline.get_stats()
+    stats.append(transform_timing)
+    shared_stats = _worker_pipeline.get_shared_stats()
+    if shared_stats:
+      # Send only the increments since the last input, so that the parent can
+      # merge them like any other statistics.
+      stats.extend(shared_stats)
+      _worker_pipeline.reset_shared_stats()
+    return serialized, stats, None
+  except Exception:  # pylint: disable=broad-except
+    return {}, [], traceback.format_exc()
+
+
+def run_pipeline_parallel(pipeline,
+                          input_iterator,
+                          output_dir,
+                          output_file_base=None,
+                          num_processes=None,
+                          ordered=False,
+                          chunksize=1,
+                          max_records_per_shard=None,
+                          max_bytes_per_shard=None,
+                          compression=None,
+                          metrics_exporter=None,
+                          initializer=None,
+                          initargs=()):
+  """Runs a pipeline on a data source over a pool of processes.
+
+  Like `run_pipeline_serial`, but `pipeline.transform` is called in
+  `num_processes` worker processes. Each worker serializes its outputs and
+  sends them back along with the statistics from its transform and a
+  `statistics.TimingHistogram` of the time taken by the transform. Outputs are
+  written to the same per-dataset TFRecord files (or shards) as
+  `run_pipeline_serial`, and statistics are merged with a
+  `statistics.StatisticsAccumulator`.
+
+  An input whose transform raises an exception is logged and counted, but does
+  not stop the run.
+
+  `pipeline` and every item of `input_iterator` must be picklable.
+
+  Args:
+    pipeline: A Pipeline instance. `pipeline.output_type` must be a protocol
+        buffer or a dictionary mapping names to protocol buffers.
+    input_iterator: Iterates over the input data. Items returned by it are fed
+        to the pipeline's `transform` method in a worker process.
+    output_dir: Path to directory where datasets will be written. Each dataset
+        is a file whose name contains the pipeline's dataset name. If the
+        directory does not exist, it will be created.
+    output_file_base: An optional string prefix for all datasets output by this
+        run. The prefix will also be followed by an underscore.
+    num_processes: Number of worker processes. If None, the number of CPUs is
+        used.
+    ordered: If True, outputs are written in the order of their inputs. If
+        False (default), outputs are written as soon as any worker finishes,
+        which keeps the workers busier.
+    chunksize: Number of inputs sent to a worker at a time. Larger values
+        reduce inter-process overhead when individual inputs are small.
+    max_records_per_shard: If given, each dataset is split into shards of at
+        most this many records. See `run_pipeline_serial`.
+    max_bytes_per_shard: If given, each dataset is split into shards of at most
+        this many (uncompressed) bytes.
+    compression: 'GZIP' or 'ZLIB' to compress the dataset files, or None.
+    metrics_exporter: An optional `metrics_exporter.MetricsExporter` instance
+        to publish statistics to. See `run_pipeline_serial`.
+    initializer: An optional function called with `initargs` once in each
+        worker process before it transforms any inputs, e.g.
+        `chord_symbols_lib.load_shared_cache` to start each worker with a warm
+        chord symbol cache.
+    initargs: A tuple of arguments for `initializer`. They must be picklable.
+
+  Raises:
+    ValueError: If any of `pipeline`'s output types do not have a
+        SerializeToString method.
+  """
+  _assert_serializable_output_type(pipeline)
+
+  output_names = pipeline.output_type_as_dict.keys()
+  writers = _open_output_writers(
+      output_names, output_dir, output_file_base, max_records_per_shard,
+      max_bytes_per_shard, compression)
+
+  pool = multiprocessing.Pool(num_processes, _init_parallel_worker,
+                              (pipeline, initializer, initargs))
+  try:
+    if ordered:
+      results = pool.imap(_transform_serialized, input_iterator, chunksize)
+    else:
+      results = pool.imap_unordered(
+          _transform_serialized, input_iterator, chunksize)
+
+    total_inputs = 0
+    total_outputs = 0
+    failed_inputs = statistics.Counter('run_pipeline_parallel_failed_inputs')
+    stats = statistics.StatisticsAccumulator([
+        failed_inputs,
+        statistics.TimingHistogram('run_pipeline_parallel_transform_seconds')])
+    for serialized_outputs, input_stats, error in results:
+      total_inputs += 1
+      if error is not None:
+        tf.logging.error('Pipeline failed on an input:\n%s', error)
+        failed_inputs.increment()
+      for name, outputs in serialized_outputs.items():
+        for output in outputs:
+          writers[name].write(output)
+          total_outputs += 1
+      stats.add_all(input_stats)
+      if total_inputs % 500 == 0:
+        tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
+                        total_inputs, total_outputs)
+        statistics.log_statistics_list(stats.get_statistics(), tf.logging.info)
+      if metrics_exporter is not None and metrics_exporter.update_due():
+        _publish_run_stats(metrics_exporter, 'run_pipeline_parallel',
+                           stats.get_statistics(), total_inputs, total_outputs)
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+    for writer in writers.values():
+      writer.close()
   tf.logging.info('\n\nCompleted.\n')
   tf.logging.info('Processed %d inputs total. Produced %d outputs.',
                   total_inputs, total_outputs)
-  statistics.log_statistics_list(stats, tf.logging.info)
+  statistics.log_statistics_list(stats.get_statistics(), tf.logging.info)
+  if metrics_exporter is not None:
+    _publish_run_stats(metrics_exporter, 'run_pipeline_parallel',
+                       stats.get_statistics(), total_inputs, total_outputs)
 
 
-def load_pipeline(pipeline, input_iterator):
+def load_pipeline(pipeline, input_iterator, streaming=False):
   """Runs a pipeline saving the output into memory.
 
   Use this instead of `run_pipeline_serial` to build a dataset on the fly
@@ -395,6 +801,9 @@ def load_pipeline(pipeline, input_iterator):
     pipeline: A Pipeline instance.
     input_iterator: Iterates over the input data. Items returned by it are fed
         directly into the pipeline's `transform` method.
+    streaming: If True, outputs are produced by `pipeline.transform_iter`, so
+        that a `DAGPipeline` does not hold all of its intermediate results in
+        memory at once.
 
   Returns:
     The aggregated return values of pipeline.transform. Specifically a
@@ -405,21 +814,28 @@ def load_pipeline(pipeline, input_iterator):
       [(name, []) for name in pipeline.output_type_as_dict])
   total_inputs = 0
   total_outputs = 0
-  stats = []
+  stats = statistics.StatisticsAccumulator()
   for input_object in input_iterator:
     total_inputs += 1
-    outputs = _guarantee_dict(pipeline.transform(input_object),
-                              aggregated_outputs.keys()[0])
-    for name, output_list in outputs.items():
-      aggregated_outputs[name].extend(output_list)
-      total_outputs += len(output_list)
-    stats = statistics.merge_statistics(stats + pipeline.get_stats())
+    if streaming:
+      for name, output in pipeline.transform_iter(input_object):
+        aggregated_outputs[name].append(output)
+        total_outputs += 1
+    else:
+      outputs = _guarantee_dict(pipeline.transform(input_object),
+                                aggregated_outputs.keys()[0])
+      for name, output_list in outputs.items():
+        aggregated_outputs[name].extend(output_list)
+        total_outputs += len(output_list)
+    stats.add_all(pipeline.get_stats())
     if total_inputs % 500 == 0:
       tf.logging.info('Processed %d inputs so far. Produced %d outputs.',
                       total_inputs, total_outputs)
-      statistics.log_statistics_list(stats, tf.logging.info)
+      statistics.log_statistics_list(_get_run_stats(stats, pipeline),
+                                     tf.logging.info)
   tf.logging.info('\n\nCompleted.\n')
   tf.logging.info('Processed %d inputs total. Produced %d outputs.',
                   total_inputs, total_outputs)
-  statistics.log_statistics_list(stats, tf.logging.info)
+  statistics.log_statistics_list(_get_run_stats(stats, pipeline),
+                                 tf.logging.info)
   return aggregated_outputs
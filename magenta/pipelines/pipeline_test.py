@@ -20,6 +20,7 @@ import tempfile
 import tensorflow as tf
 
 from magenta.common import testing_lib
+from magenta.pipelines import metrics_exporter
 from magenta.pipelines import pipeline
 from magenta.pipelines import statistics
 
@@ -43,6 +44,30 @@ class MockPipeline(pipeline.Pipeline):
         'dataset_2': [MockStringProto(input_object + '_C')]}
 
 
+class MockFailingPipeline(MockPipeline):
+
+  def transform(self, input_object):
+    if input_object == 'fail':
+      raise ValueError('Failed on purpose.')
+    return super(MockFailingPipeline, self).transform(input_object)
+
+
+# Set in worker processes by the initializer passed to `run_pipeline_parallel`.
+_worker_suffix = ''
+
+
+def _set_worker_suffix(suffix):
+  global _worker_suffix
+  _worker_suffix = suffix
+
+
+class MockWorkerSuffixPipeline(MockPipeline):
+
+  def transform(self, input_object):
+    return super(MockWorkerSuffixPipeline, self).transform(
+        input_object + _worker_suffix)
+
+
 class PipelineTest(tf.test.TestCase):
 
   def testFileIteratorRecursive(self):
@@ -105,9 +130,33 @@ class PipelineTest(tf.test.TestCase):
 
   def testRunPipelineSerial(self):
     strings = ['abcdefg', 'helloworld!', 'qwerty']
+    for streaming in [False, True]:
+      root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+      pipeline.run_pipeline_serial(
+          MockPipeline(), iter(strings), root_dir, streaming=streaming)
+
+      dataset_1_dir = os.path.join(root_dir, 'dataset_1.tfrecord')
+      dataset_2_dir = os.path.join(root_dir, 'dataset_2.tfrecord')
+      self.assertTrue(tf.gfile.Exists(dataset_1_dir))
+      self.assertTrue(tf.gfile.Exists(dataset_2_dir))
+
+      dataset_1_reader = tf.python_io.tf_record_iterator(dataset_1_dir)
+      self.assertEqual(
+          set(['serialized:%s_A' % s for s in strings] +
+              ['serialized:%s_B' % s for s in strings]),
+          set(dataset_1_reader))
+
+      dataset_2_reader = tf.python_io.tf_record_iterator(dataset_2_dir)
+      self.assertEqual(
+          set(['serialized:%s_C' % s for s in strings]),
+          set(dataset_2_reader))
+
+  def testRunPipelineParallel(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty', 'fail', 'zxcvb']
     root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
-    pipeline.run_pipeline_serial(
-        MockPipeline(), iter(strings), root_dir)
+    pipeline.run_pipeline_parallel(
+        MockFailingPipeline(), iter(strings), root_dir, num_processes=2)
+    strings.remove('fail')
 
     dataset_1_dir = os.path.join(root_dir, 'dataset_1.tfrecord')
     dataset_2_dir = os.path.join(root_dir, 'dataset_2.tfrecord')
@@ -125,17 +174,110 @@ class PipelineTest(tf.test.TestCase):
         set(['serialized:%s_C' % s for s in strings]),
         set(dataset_2_reader))
 
-  def testPipelineIterator(self):
-    strings = ['abcdefg', 'helloworld!', 'qwerty']
-    result = pipeline.load_pipeline(MockPipeline(), iter(strings))
+  def testRunPipelineParallelOrdered(self):
+    strings = ['s%d' % i for i in range(20)]
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    pipeline.run_pipeline_parallel(
+        MockPipeline(), iter(strings), root_dir, output_file_base='ordered',
+        num_processes=3, ordered=True)
 
+    dataset_2_reader = tf.python_io.tf_record_iterator(
+        os.path.join(root_dir, 'ordered_dataset_2.tfrecord'))
     self.assertEqual(
-        set([MockStringProto(s + '_A') for s in strings] +
-            [MockStringProto(s + '_B') for s in strings]),
-        set(result['dataset_1']))
+        ['serialized:%s_C' % s for s in strings],
+        list(dataset_2_reader))
+
+  def testRunPipelineParallelInitializer(self):
+    strings = ['s%d' % i for i in range(5)]
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    pipeline.run_pipeline_parallel(
+        MockWorkerSuffixPipeline(), iter(strings), root_dir, num_processes=2,
+        initializer=_set_worker_suffix, initargs=('_init',))
+
+    dataset_2_reader = tf.python_io.tf_record_iterator(
+        os.path.join(root_dir, 'dataset_2.tfrecord'))
+    self.assertEqual(
+        set(['serialized:%s_init_C' % s for s in strings]),
+        set(dataset_2_reader))
+
+  def testRunPipelineSerialSharded(self):
+    strings = ['s%d' % i for i in range(5)]
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    pipeline.run_pipeline_serial(
+        MockPipeline(), iter(strings), root_dir, max_records_per_shard=4,
+        compression='GZIP')
+
+    self.assertEqual(
+        ['dataset_1-00000-of-00003.tfrecord.gz',
+         'dataset_1-00001-of-00003.tfrecord.gz',
+         'dataset_1-00002-of-00003.tfrecord.gz'],
+        sorted(os.path.basename(path) for path in tf.gfile.Glob(
+            os.path.join(root_dir, 'dataset_1-*'))))
+    self.assertTrue(tf.gfile.Exists(
+        os.path.join(root_dir, 'dataset_1.manifest.json')))
+
+    dataset_2_reader = pipeline.tf_record_iterator(
+        os.path.join(root_dir, 'dataset_2-*.tfrecord.gz'), MockStringProto)
+    self.assertEqual(
+        [MockStringProto('serialized:%s_C' % s) for s in strings],
+        list(dataset_2_reader))
+
+  def testRunPipelineSerialWithMetricsExporter(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty']
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    metrics_file = os.path.join(root_dir, 'metrics.prom')
+    exporter = metrics_exporter.MetricsExporter(output_file=metrics_file)
+    pipeline.run_pipeline_serial(
+        MockPipeline(), iter(strings), root_dir,
+        metrics_exporter=exporter)
+    exporter.close()
+
+    with open(metrics_file) as f:
+      metrics = f.read()
+    self.assertIn('magenta_run_pipeline_serial_inputs_total 3\n', metrics)
+    self.assertIn('magenta_run_pipeline_serial_outputs_total 9\n', metrics)
+    self.assertIn(
+        'magenta_run_pipeline_serial_transform_seconds_count 3\n', metrics)
+
+  def testRunPipelineParallelWithMetricsExporter(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty', 'fail']
+    root_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    metrics_file = os.path.join(root_dir, 'metrics.prom')
+    exporter = metrics_exporter.MetricsExporter(output_file=metrics_file)
+    pipeline.run_pipeline_parallel(
+        MockFailingPipeline(), iter(strings), root_dir, num_processes=2,
+        metrics_exporter=exporter)
+    exporter.close()
+
+    with open(metrics_file) as f:
+      metrics = f.read()
+    self.assertIn('magenta_run_pipeline_parallel_inputs_total 4\n', metrics)
+    self.assertIn(
+        'magenta_run_pipeline_parallel_failed_inputs_total 1\n', metrics)
+    # Like `run_pipeline_serial`, every successful transform is timed.
+    self.assertIn(
+        'magenta_run_pipeline_parallel_transform_seconds_count 3\n', metrics)
+
+  def testPipelineIterator(self):
+    strings = ['abcdefg', 'helloworld!', 'qwerty']
+    for streaming in [False, True]:
+      result = pipeline.load_pipeline(MockPipeline(), iter(strings),
+                                      streaming=streaming)
+
+      self.assertEqual(
+          set([MockStringProto(s + '_A') for s in strings] +
+              [MockStringProto(s + '_B') for s in strings]),
+          set(result['dataset_1']))
+      self.assertEqual(
+          set([MockStringProto(s + '_C') for s in strings]),
+          set(result['dataset_2']))
+
+  def testTransformIter(self):
     self.assertEqual(
-        set([MockStringProto(s + '_C') for s in strings]),
-        set(result['dataset_2']))
+        set([('dataset_1', MockStringProto('abc_A')),
+             ('dataset_1', MockStringProto('abc_B')),
+             ('dataset_2', MockStringProto('abc_C'))]),
+        set(MockPipeline().transform_iter('abc')))
 
   def testPipelineKey(self):
     # This happens if Key() is used on a pipeline with out a dictionary output,
@@ -228,6 +370,65 @@ class PipelineTest(tf.test.TestCase):
         set([('TestPipeline123_counter_1', 5),
              ('TestPipeline123_counter_2', 10)]))
 
+  def testSharedCounters(self):
+
+    class TestPipeline123(pipeline.Pipeline):
+
+      def __init__(self):
+        super(TestPipeline123, self).__init__(str, str)
+
+      def transform(self, input_object):
+        self._get_shared_counter('inputs').increment()
+        self._get_shared_counter('characters').increment(len(input_object))
+        return [input_object]
+
+    pipe = TestPipeline123()
+    self.assertEqual([], pipe.get_shared_stats())
+    pipe.transform('hello')
+    counter = pipe._get_shared_counter('inputs')
+    pipe.transform('hi')
+    self.assertIs(counter, pipe._get_shared_counter('inputs'))
+    self.assertEqual([], pipe.get_stats())
+    self.assertEqual(
+        set([(stat.name, stat.count) for stat in pipe.get_shared_stats()]),
+        set([('TestPipeline123_inputs', 2),
+             ('TestPipeline123_characters', 7)]))
+
+    pipe.reset_shared_stats()
+    pipe.transform('abc')
+    self.assertEqual(
+        set([(stat.name, stat.count) for stat in pipe.get_shared_stats()]),
+        set([('TestPipeline123_inputs', 1),
+             ('TestPipeline123_characters', 3)]))
+
+  def testSharedStat(self):
+
+    class TestPipeline123(pipeline.Pipeline):
+
+      def __init__(self):
+        super(TestPipeline123, self).__init__(str, str)
+
+      def transform(self, input_object):
+        self._get_shared_stat(
+            'lengths', statistics.QuantileSketch).increment(len(input_object))
+        return [input_object]
+
+    pipe = TestPipeline123()
+    pipe.transform('hello')
+    sketch = pipe._get_shared_stat('lengths', statistics.QuantileSketch)
+    pipe.transform('hi')
+    self.assertIs(sketch, pipe._get_shared_stat('lengths',
+                                                statistics.QuantileSketch))
+    stats = pipe.get_shared_stats()
+    self.assertEqual(['TestPipeline123_lengths'], [stat.name for stat in stats])
+    self.assertEqual(2, stats[0].count)
+    self.assertEqual(5, stats[0].max)
+
+    pipe.reset_shared_stats()
+    self.assertIs(sketch, pipe._get_shared_stat('lengths',
+                                                statistics.QuantileSketch))
+    self.assertEqual(0, pipe.get_shared_stats()[0].count)
+
   def testInvalidStatisticsException(self):
 
     class TestPipeline1(pipeline.Pipeline):
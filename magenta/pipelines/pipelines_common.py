@@ -19,6 +19,8 @@ import random
 import numpy as np
 import tensorflow as tf
 
+from magenta.music import chord_symbols_lib
+from magenta.music import chords_lib
 from magenta.music import sequences_lib
 from magenta.pipelines import pipeline
 from magenta.pipelines import statistics
@@ -83,3 +85,54 @@ class RandomPartition(pipeline.Pipeline):
 
   def _make_stats(self, increment_partition=None):
     return [statistics.Counter(increment_partition + '_count', 1)]
+
+
+class TranspositionPipeline(pipeline.Pipeline):
+  """Creates transposed copies of melodies, chord progressions, or lead sheets.
+
+  Each input is transposed by every amount in `transposition_range` at once
+  with its `transpositions` method, for data augmentation.
+  """
+
+  def __init__(self, type_, transposition_range=range(-6, 6), min_note=None,
+               max_note=None, name=None):
+    """Creates a TranspositionPipeline.
+
+    Args:
+      type_: The input and output type, one of Melody, ChordProgression, or
+          LeadSheet.
+      transposition_range: A list of the numbers of half steps to transpose
+          each input by, one per output.
+      min_note: If given, minimum pitch (inclusive) of transposed notes. Only
+          used for melodies and lead sheets.
+      max_note: If given, maximum pitch (exclusive) of transposed notes. Only
+          used for melodies and lead sheets.
+      name: Pipeline name.
+
+    Raises:
+      ValueError: If `min_note` or `max_note` is given for chord progressions.
+    """
+    super(TranspositionPipeline, self).__init__(
+        input_type=type_, output_type=type_, name=name)
+    if (issubclass(type_, chords_lib.ChordProgression) and
+        (min_note is not None or max_note is not None)):
+      raise ValueError('min_note and max_note cannot be used to transpose '
+                       'chord progressions.')
+    self._transposition_range = list(transposition_range)
+    self._note_range_kwargs = {}
+    if min_note is not None:
+      self._note_range_kwargs['min_note'] = min_note
+    if max_note is not None:
+      self._note_range_kwargs['max_note'] = max_note
+
+  def transform(self, input_object):
+    try:
+      transposed = input_object.transpositions(self._transposition_range,
+                                               **self._note_range_kwargs)
+    except chord_symbols_lib.ChordSymbolException as detail:
+      tf.logging.warning('Skipped input: %s', detail)
+      self._set_stats([statistics.Counter('chord_symbol_exception', 1)])
+      return []
+    self._set_stats([statistics.Counter('transpositions_generated',
+                                        len(transposed))])
+    return transposed
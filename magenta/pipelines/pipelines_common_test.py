@@ -17,6 +17,8 @@
 import tensorflow as tf
 
 from magenta.common import testing_lib as common_testing_lib
+from magenta.music import chords_lib
+from magenta.music import melodies_lib
 from magenta.music import sequences_lib
 from magenta.music import testing_lib
 from magenta.pipelines import pipelines_common
@@ -78,5 +80,33 @@ class PipelineUnitsCommonTest(tf.test.TestCase):
       self.assertEqual(results[choices[i]], [s])
 
 
+  def testTranspositionPipeline(self):
+    chords = chords_lib.ChordProgression(['C', 'G7', chords_lib.NO_CHORD])
+    unit = pipelines_common.TranspositionPipeline(
+        chords_lib.ChordProgression, transposition_range=[-2, 0, 5])
+    expected_outputs = [
+        chords_lib.ChordProgression(['B-', 'F7', chords_lib.NO_CHORD]),
+        chords_lib.ChordProgression(['C', 'G7', chords_lib.NO_CHORD]),
+        chords_lib.ChordProgression(['F', 'C7', chords_lib.NO_CHORD])]
+    self._unit_transform_test(unit, chords, expected_outputs)
+
+    melody = melodies_lib.Melody([60, -2, 62, -1, 71])
+    unit = pipelines_common.TranspositionPipeline(
+        melodies_lib.Melody, transposition_range=[2], min_note=60,
+        max_note=72)
+    self._unit_transform_test(
+        unit, melody, [melodies_lib.Melody([62, -2, 64, -1, 61])])
+
+  def testTranspositionPipelineUnknownChordSymbol(self):
+    chords = chords_lib.ChordProgression(['C', 'P#13'])
+    unit = pipelines_common.TranspositionPipeline(chords_lib.ChordProgression)
+    self._unit_transform_test(unit, chords, [])
+
+  def testTranspositionPipelineChordsNoteRange(self):
+    with self.assertRaises(ValueError):
+      pipelines_common.TranspositionPipeline(
+          chords_lib.ChordProgression, min_note=60, max_note=72)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -15,7 +15,10 @@
 
 import abc
 import bisect
+import collections
 import copy
+import math
+import random
 
 # internal imports
 import tensorflow as tf
@@ -91,6 +94,18 @@ class Statistic(object):
     """Returns a new copy of `self`."""
     pass
 
+  def reset(self):
+    """Clears everything recorded by this instance, keeping its settings.
+
+    Lets a long lived `Statistic`, such as a `Pipeline` shared statistic, be
+    reused instead of reallocated.
+
+    Raises:
+      NotImplementedError: If the subclass does not support resetting.
+    """
+    raise NotImplementedError(
+        '%s cannot be reset' % self.__class__.__name__)
+
   def merge_from(self, other):
     if not isinstance(other, Statistic):
       raise MergeStatisticsException(
@@ -153,6 +168,70 @@ def log_statistics_list(stats_list, logger_fn=tf.logging.info):
     logger_fn(str(stat))
 
 
+class StatisticsAccumulator(object):
+  """Aggregates statistics by name as they are produced.
+
+  Unlike `merge_statistics`, which builds a new name map each time it is
+  called, an accumulator keeps its name map between calls. Adding a `Statistic`
+  is a single dictionary lookup followed by an in-place `merge_from`, so
+  statistics can be aggregated after every input of a long pipeline run.
+
+  The accumulator takes ownership of the first `Statistic` added with each name
+  and merges later statistics with that name into it. Callers should not
+  modify a `Statistic` after adding it.
+  """
+
+  def __init__(self, stats=None):
+    """Constructs a `StatisticsAccumulator`.
+
+    Args:
+      stats: An optional iterable of `Statistic` objects to start with.
+    """
+    self._stats = collections.OrderedDict()
+    if stats is not None:
+      self.add_all(stats)
+
+  def add(self, stat):
+    """Merges a `Statistic` into the statistic of the same name.
+
+    Args:
+      stat: A `Statistic` object.
+
+    Raises:
+      MergeStatisticsException: If `stat` cannot be merged into the statistic
+          with the same name.
+    """
+    existing = self._stats.get(stat.name)
+    if existing is None:
+      self._stats[stat.name] = stat
+    else:
+      existing.merge_from(stat)
+
+  def add_all(self, stats):
+    """Merges each `Statistic` in an iterable. See `add`.
+
+    Args:
+      stats: An iterable of `Statistic` objects.
+    """
+    for stat in stats:
+      self.add(stat)
+
+  def get(self, name):
+    """Returns the aggregated `Statistic` with the given name, or None."""
+    return self._stats.get(name)
+
+  def get_statistics(self):
+    """Returns a list of the aggregated statistics, one for each name."""
+    return list(self._stats.values())
+
+  def copy(self):
+    """Returns a new accumulator holding copies of the aggregated statistics."""
+    return StatisticsAccumulator(stat.copy() for stat in self._stats.values())
+
+  def __len__(self):
+    return len(self._stats)
+
+
 class Counter(Statistic):
   """Holds a count.
 
@@ -177,6 +256,9 @@ class Counter(Statistic):
     """
     self.count += inc
 
+  def reset(self):
+    self.count = 0
+
   def _merge_from(self, other):
     """Adds the count of another Counter into this instance."""
     if not isinstance(other, Counter):
@@ -249,6 +331,10 @@ class Histogram(Statistic):
     bucket_lower = self._find_le(value)
     self.counters[bucket_lower] += inc
 
+  def reset(self):
+    for bucket_lower in self.buckets:
+      self.counters[bucket_lower] = 0
+
   def _merge_from(self, other):
     """Adds the counts of another Histogram into this instance.
 
@@ -280,4 +366,287 @@ class Histogram(Statistic):
          if self.verbose_pretty_print or self.counters[lower]])
 
   def copy(self):
-    return copy.copy(self)
+    return copy.deepcopy(self)
+
+
+# Default bucket lower bounds, in seconds, for `TimingHistogram`.
+DEFAULT_TIMING_BUCKETS = [0, 0.0001, 0.001, 0.01, 0.1, 1, 10]
+
+
+class TimingHistogram(Histogram):
+  """A histogram of durations that also tracks their total and count.
+
+  Use `TimingHistogram` to measure how long an operation takes, for example
+  each call to a `Pipeline`'s `transform`. Besides the count in each duration
+  range, the total time and number of timed operations are kept so that the
+  mean duration and throughput can be reported.
+  """
+
+  def __init__(self, name, buckets=None, verbose_pretty_print=False):
+    """Initializes the timing histogram.
+
+    Args:
+      name: String name of this histogram.
+      buckets: The inclusive lower bounds, in seconds, of the duration ranges
+          the histogram counts over. See `Histogram`. Defaults to
+          `DEFAULT_TIMING_BUCKETS`.
+      verbose_pretty_print: If True, self.pretty_print will print the count for
+          every bucket. If False, only buckets with positive counts will be
+          printed.
+    """
+    super(TimingHistogram, self).__init__(
+        name, buckets if buckets is not None else DEFAULT_TIMING_BUCKETS,
+        verbose_pretty_print)
+    self.total_seconds = 0.0
+    self.count = 0
+
+  def increment(self, value, inc=1):
+    """Records a duration.
+
+    Args:
+      value: The duration in seconds.
+      inc: An integer. How many times the duration occurred.
+    """
+    super(TimingHistogram, self).increment(value, inc)
+    self.total_seconds += value * inc
+    self.count += inc
+
+  def reset(self):
+    super(TimingHistogram, self).reset()
+    self.total_seconds = 0.0
+    self.count = 0
+
+  def _merge_from(self, other):
+    """Adds the counts and total time of another TimingHistogram.
+
+    Args:
+      other: Another TimingHistogram instance with the same buckets as this
+          instance.
+
+    Raises:
+      MergeStatisticsException: If `other` is not a TimingHistogram or the
+          buckets are not the same.
+    """
+    if not isinstance(other, TimingHistogram):
+      raise MergeStatisticsException(
+          'Cannot merge %s into TimingHistogram' % other.__class__.__name__)
+    super(TimingHistogram, self)._merge_from(other)
+    self.total_seconds += other.total_seconds
+    self.count += other.count
+
+  def _pretty_print(self, name):
+    if self.count:
+      summary = '%d calls, %.3f seconds total, %.3f ms mean, %.1f per sec' % (
+          self.count, self.total_seconds,
+          1000 * self.total_seconds / self.count,
+          self.count / max(self.total_seconds, 1e-9))
+    else:
+      summary = '0 calls'
+    # Replace the histogram's header line with one that includes the summary.
+    bucket_lines = super(TimingHistogram, self)._pretty_print(name).split(
+        '\n')[1:]
+    return '\n'.join(['%s: %s' % (name, summary)] +
+                     [line for line in bucket_lines if line])
+
+  def copy(self):
+    return copy.deepcopy(self)
+
+
+# Default size parameter of `QuantileSketch`. The sketch keeps roughly 3 * k
+# values, and its quantiles are typically within 1% of the requested rank.
+DEFAULT_QUANTILE_SKETCH_K = 200
+
+
+class QuantileSketch(Statistic):
+  """Approximates the distribution of a stream of values in bounded memory.
+
+  Unlike `Histogram`, a `QuantileSketch` does not need ranges chosen in
+  advance. Use it for values whose scale is not known ahead of time, such as
+  melody lengths or the time taken by each call to `transform`, and read
+  quantiles like the median or the 99th percentile from it.
+
+  This is a KLL sketch (Karnin, Lang and Liberty, "Optimal Quantile
+  Approximation in Streams", 2016). Values are appended to the lowest of a
+  stack of compactors. When the sketch holds more values than its capacity,
+  the lowest compactor that is full is sorted and every other value, starting
+  at a random offset, is promoted to the compactor above, where each value
+  stands for twice as many values as in the compactor below. Updates take
+  amortized constant time, memory is proportional to `k`, and two sketches are
+  merged by concatenating their compactors level by level, so sketches built in
+  different processes can be combined with `merge_statistics`.
+  """
+
+  def __init__(self, name, k=DEFAULT_QUANTILE_SKETCH_K):
+    """Constructs a `QuantileSketch`.
+
+    Args:
+      name: String name of this sketch.
+      k: Size parameter. Larger values of `k` give more accurate quantiles at
+          the cost of more memory. Only sketches with the same `k` can be
+          merged.
+
+    Raises:
+      ValueError: If `k` is less than 2.
+    """
+    super(QuantileSketch, self).__init__(name)
+    if k < 2:
+      raise ValueError('k must be at least 2. Got %d.' % k)
+    self.k = k
+    self.reset()
+
+  def reset(self):
+    self.count = 0
+    self.min = None
+    self.max = None
+    # `self._compactors[level]` holds values that each stand for 2**level
+    # values.
+    self._compactors = [[]]
+    self._size = 0
+    self._max_size = self._get_max_size()
+
+  def _get_capacity(self, level):
+    """Returns the number of values the compactor at `level` can hold."""
+    depth = len(self._compactors) - level - 1
+    return int(math.ceil(self.k * (2.0 / 3.0) ** depth)) + 1
+
+  def _get_max_size(self):
+    """Returns the number of values the sketch can hold before compacting."""
+    return sum(self._get_capacity(level)
+               for level in range(len(self._compactors)))
+
+  def increment(self, value, inc=1):
+    """Adds a value to the sketch.
+
+    Args:
+      value: Any number.
+      inc: A positive integer. How many times to add `value`.
+
+    Raises:
+      ValueError: If `inc` is less than 1.
+    """
+    if inc < 1:
+      raise ValueError('inc must be at least 1. Got %d.' % inc)
+    if self.min is None or value < self.min:
+      self.min = value
+    if self.max is None or value > self.max:
+      self.max = value
+    self.count += inc
+    if inc == 1:
+      self._compactors[0].append(value)
+      self._size += 1
+    else:
+      # Add one value to the level of each bit of `inc`, so that adding a value
+      # many times takes memory logarithmic in `inc`.
+      level = 0
+      while inc:
+        if inc & 1:
+          while len(self._compactors) <= level:
+            self._compactors.append([])
+          self._compactors[level].append(value)
+          self._size += 1
+        inc >>= 1
+        level += 1
+      self._max_size = self._get_max_size()
+    if self._size >= self._max_size:
+      self._compress()
+
+  def _compress(self):
+    """Compacts full compactors until the sketch is within its capacity."""
+    while self._size >= self._max_size:
+      for level, compactor in enumerate(self._compactors):
+        if len(compactor) < self._get_capacity(level):
+          continue
+        if level + 1 == len(self._compactors):
+          self._compactors.append([])
+          self._max_size = self._get_max_size()
+        compactor.sort()
+        # Keep back one value if there is an odd number, so that the total
+        # weight of the sketch is unchanged.
+        kept = [compactor.pop()] if len(compactor) % 2 else []
+        promoted = compactor[random.randint(0, 1)::2]
+        self._compactors[level + 1].extend(promoted)
+        self._size -= len(compactor) - len(promoted)
+        compactor[:] = kept
+        break
+
+  def get_quantiles(self, quantiles):
+    """Returns approximate values at the given quantiles.
+
+    Args:
+      quantiles: A list of numbers between 0 and 1. For example, 0.5 is the
+          median.
+
+    Returns:
+      A list with the approximate value at each of `quantiles`, or a list of
+      None if the sketch is empty. Quantile 0 is the exact minimum and quantile
+      1 the exact maximum.
+    """
+    if not self.count:
+      return [None] * len(quantiles)
+    weighted_values = sorted(
+        (value, 2 ** level)
+        for level, compactor in enumerate(self._compactors)
+        for value in compactor)
+    total_weight = sum(weight for _, weight in weighted_values)
+    results = []
+    for quantile in quantiles:
+      if quantile <= 0:
+        results.append(self.min)
+        continue
+      if quantile >= 1:
+        results.append(self.max)
+        continue
+      target_weight = quantile * total_weight
+      cumulative_weight = 0
+      for value, weight in weighted_values:
+        cumulative_weight += weight
+        if cumulative_weight >= target_weight:
+          results.append(value)
+          break
+    return results
+
+  def get_quantile(self, quantile):
+    """Returns the approximate value at a quantile. See `get_quantiles`."""
+    return self.get_quantiles([quantile])[0]
+
+  def _merge_from(self, other):
+    """Merges the values of another QuantileSketch into this instance.
+
+    Args:
+      other: Another QuantileSketch instance with the same `k`.
+
+    Raises:
+      MergeStatisticsException: If `other` is not a QuantileSketch or its `k`
+          is different.
+    """
+    if not isinstance(other, QuantileSketch):
+      raise MergeStatisticsException(
+          'Cannot merge %s into QuantileSketch' % other.__class__.__name__)
+    if self.k != other.k:
+      raise MergeStatisticsException(
+          'QuantileSketch sizes do not match. Expected k=%d, got k=%d'
+          % (self.k, other.k))
+    if not other.count:
+      return
+    while len(self._compactors) < len(other._compactors):
+      self._compactors.append([])
+    for level, compactor in enumerate(other._compactors):
+      self._compactors[level].extend(compactor)
+    if self.min is None or other.min < self.min:
+      self.min = other.min
+    if self.max is None or other.max > self.max:
+      self.max = other.max
+    self.count += other.count
+    self._size += other._size
+    self._max_size = self._get_max_size()
+    self._compress()
+
+  def _pretty_print(self, name):
+    if not self.count:
+      return '%s: 0 values' % name
+    p50, p90, p99 = self.get_quantiles([0.5, 0.9, 0.99])
+    return '%s: %d values, min %g, p50 %g, p90 %g, p99 %g, max %g' % (
+        name, self.count, self.min, p50, p90, p99, self.max)
+
+  def copy(self):
+    return copy.deepcopy(self)
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for statistics."""
 
+import random
+
 # internal imports
 import tensorflow as tf
 
@@ -91,6 +93,150 @@ class StatisticsTest(tf.test.TestCase):
                      {float('-inf'): 6, 1: 1, 2: 13, 10: 3})
     self.assertEqual(histo_copy.name, 'name_123')
 
+  def testTimingHistogram(self):
+    timing = statistics.TimingHistogram('name_123', [0, 1, 10])
+    self.assertEqual(str(timing), 'name_123: 0 calls')
+    timing.increment(0.5)
+    timing.increment(2.0, 2)
+    self.assertEqual(timing.counters, {float('-inf'): 0, 0: 1, 1: 2, 10: 0})
+    self.assertEqual(timing.count, 3)
+    self.assertAlmostEqual(timing.total_seconds, 4.5)
+
+    timing_2 = statistics.TimingHistogram('name_123', [0, 1, 10])
+    timing_2.increment(20.0)
+    timing.merge_from(timing_2)
+    self.assertEqual(timing.counters, {float('-inf'): 0, 0: 1, 1: 2, 10: 1})
+    self.assertEqual(timing.count, 4)
+    self.assertAlmostEqual(timing.total_seconds, 24.5)
+
+    with self.assertRaises(statistics.MergeStatisticsException):
+      timing.merge_from(statistics.Histogram('name_123', [0, 1, 10]))
+
+    self.assertEqual(
+        str(timing),
+        'name_123: 4 calls, 24.500 seconds total, 6125.000 ms mean, '
+        '0.2 per sec\n  [0,1): 1\n  [1,10): 2\n  [10,inf): 1')
+
+    timing_copy = timing.copy()
+    timing_copy.increment(0.5)
+    self.assertEqual(timing.count, 4)
+    self.assertEqual(timing.counters[0], 1)
+    self.assertEqual(timing_copy.count, 5)
+    self.assertEqual(
+        statistics.TimingHistogram('name').buckets,
+        [float('-inf')] + statistics.DEFAULT_TIMING_BUCKETS)
+
+  def testQuantileSketch(self):
+    random.seed(0)
+    sketch = statistics.QuantileSketch('name_123', k=100)
+    self.assertEqual(str(sketch), 'name_123: 0 values')
+    self.assertIsNone(sketch.get_quantile(0.5))
+
+    values = range(10000)
+    random.shuffle(values)
+    for value in values:
+      sketch.increment(value)
+    self.assertEqual(10000, sketch.count)
+    self.assertEqual(0, sketch.get_quantile(0))
+    self.assertEqual(9999, sketch.get_quantile(1))
+    p50, p90, p99 = sketch.get_quantiles([0.5, 0.9, 0.99])
+    self.assertAlmostEqual(5000, p50, delta=200)
+    self.assertAlmostEqual(9000, p90, delta=200)
+    self.assertAlmostEqual(9900, p99, delta=200)
+    # Memory is bounded by the size parameter, not the number of values.
+    self.assertLess(sketch._size, 4 * 100)
+    self.assertTrue(str(sketch).startswith(
+        'name_123: 10000 values, min 0, p50 '))
+
+    sketch_copy = sketch.copy()
+    sketch_copy.increment(-1)
+    self.assertEqual(0, sketch.min)
+    self.assertEqual(10000, sketch.count)
+
+    with self.assertRaises(statistics.MergeStatisticsException):
+      sketch.merge_from(statistics.QuantileSketch('name_123', k=50))
+    with self.assertRaises(statistics.MergeStatisticsException):
+      sketch.merge_from(statistics.Counter('name_123'))
+    with self.assertRaises(ValueError):
+      statistics.QuantileSketch('name_123', k=1)
+
+  def testQuantileSketchMerge(self):
+    random.seed(0)
+    sketches = [statistics.QuantileSketch('name_123', k=100) for _ in range(4)]
+    for value in range(20000):
+      sketches[value % 4].increment(value)
+    merged = statistics.merge_statistics(sketches)
+    self.assertEqual(1, len(merged))
+    self.assertEqual(20000, merged[0].count)
+    self.assertEqual(0, merged[0].min)
+    self.assertEqual(19999, merged[0].max)
+    self.assertAlmostEqual(10000, merged[0].get_quantile(0.5), delta=400)
+    self.assertAlmostEqual(19800, merged[0].get_quantile(0.99), delta=400)
+    self.assertLess(merged[0]._size, 4 * 100)
+
+  def testQuantileSketchIncrementMany(self):
+    sketch = statistics.QuantileSketch('name_123', k=100)
+    sketch.increment(5, 1000)
+    sketch.increment(1, 10)
+    self.assertEqual(1010, sketch.count)
+    self.assertEqual(1, sketch.get_quantile(0.005))
+    self.assertEqual(5, sketch.get_quantile(0.5))
+    self.assertLess(sketch._size, 20)
+
+    with self.assertRaises(ValueError):
+      sketch.increment(7, 0)
+    with self.assertRaises(ValueError):
+      sketch.increment(7, -1)
+    self.assertEqual(1010, sketch.count)
+    self.assertEqual(5, sketch.max)
+
+  def testReset(self):
+    counter = statistics.Counter('counter', 5)
+    histogram = statistics.Histogram('histogram', [0, 1])
+    histogram.increment(0.5)
+    timing = statistics.TimingHistogram('timing', [0, 1])
+    timing.increment(2.0)
+    sketch = statistics.QuantileSketch('sketch', k=10)
+    for value in range(100):
+      sketch.increment(value)
+
+    for stat in [counter, histogram, timing, sketch]:
+      stat.reset()
+    self.assertEqual(0, counter.count)
+    self.assertEqual({float('-inf'): 0, 0: 0, 1: 0}, histogram.counters)
+    self.assertEqual({float('-inf'): 0, 0: 0, 1: 0}, timing.counters)
+    self.assertEqual(0, timing.count)
+    self.assertEqual(0.0, timing.total_seconds)
+    self.assertEqual(0, sketch.count)
+    self.assertIsNone(sketch.get_quantile(0.5))
+    self.assertEqual(10, sketch.k)
+
+    sketch.increment(3)
+    self.assertEqual(3, sketch.get_quantile(0.5))
+
+  def testStatisticsAccumulator(self):
+    counter = statistics.Counter('counter', 1)
+    accumulator = statistics.StatisticsAccumulator([counter])
+    accumulator.add(statistics.Counter('counter', 2))
+    accumulator.add_all([statistics.Counter('counter', 3),
+                         statistics.Histogram('histo', [0, 10])])
+    self.assertEqual(2, len(accumulator))
+    self.assertIs(counter, accumulator.get('counter'))
+    self.assertEqual(6, counter.count)
+    self.assertIsNone(accumulator.get('unknown'))
+    self.assertEqual(['counter', 'histo'],
+                     [stat.name for stat in accumulator.get_statistics()])
+
+    accumulator_copy = accumulator.copy()
+    accumulator_copy.add(statistics.Counter('counter', 4))
+    accumulator_copy.get('histo').increment(5)
+    self.assertEqual(6, counter.count)
+    self.assertEqual(0, accumulator.get('histo').counters[0])
+    self.assertEqual(10, accumulator_copy.get('counter').count)
+
+    with self.assertRaises(statistics.MergeStatisticsException):
+      accumulator.add(statistics.Histogram('counter', [0, 10]))
+
   def testMergeDifferentNames(self):
     counter_1 = statistics.Counter('counter_1')
     counter_2 = statistics.Counter('counter_2')
@@ -0,0 +1,615 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for the music conversion, extraction, and encoding code.
+
+Each benchmark runs one stage of the data pipeline over deterministic synthetic
+inputs and reports its throughput in items per second along with its peak
+resident set size. Every benchmark runs in a fresh process, so its peak resident
+set size is not inflated by the benchmarks that ran before it. Results can be
+saved as JSON and compared against a stored baseline so that performance
+regressions are caught.
+"""
+
+import collections
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+# internal imports
+import tensorflow as tf
+
+from magenta.models.melody_rnn import melody_rnn_model
+from magenta.models.melody_rnn import melody_rnn_pipeline
+from magenta.music import chords_encoder_decoder
+from magenta.music import chords_lib
+from magenta.music import drums_encoder_decoder
+from magenta.music import drums_lib
+from magenta.music import encoder_decoder
+from magenta.music import lead_sheets_lib
+from magenta.music import melodies_lib
+from magenta.music import melody_encoder_decoder
+from magenta.music import midi_io
+from magenta.music import musicxml_parser
+from magenta.music import musicxml_reader
+from magenta.music import sequences_lib
+from magenta.protobuf import music_pb2
+
+# Version of the results format, stored with the results so that baselines
+# written by an incompatible version are rejected. Version 2 runs every
+# benchmark in its own process.
+RESULTS_VERSION = 2
+
+DEFAULT_STEPS_PER_QUARTER = 4
+
+# Synthetic sequences are in 4/4 at 120 qpm, so a sixteenth note is 0.125
+# seconds long.
+_QPM = 120.0
+_STEP_SECONDS = 60.0 / _QPM / DEFAULT_STEPS_PER_QUARTER
+_STEPS_PER_BAR = 4 * DEFAULT_STEPS_PER_QUARTER
+
+# Melody notes are drawn from a C major scale, two octaves from middle C.
+_MELODY_PITCHES = [60, 62, 64, 65, 67, 69, 71, 72, 74, 76, 77, 79, 81, 83]
+_MELODY_DURATIONS = [1, 2, 2, 4, 4, 8]
+_REST_PROBABILITY = 0.05
+
+# One bar of drums: (step, pitch) for kick, snare, and closed hi-hat.
+_DRUM_PATTERN = ([(0, 36), (8, 36), (4, 38), (12, 38)] +
+                 [(step, 42) for step in range(0, _STEPS_PER_BAR, 2)])
+_DRUM_VELOCITY = 100
+
+# Chords, one per bar, are limited to major and minor triads so that every
+# chord encoder can encode them.
+_CHORD_FIGURES = ['C', 'Am', 'F', 'G', 'Dm', 'Em', 'E', 'B-']
+
+_MUSICXML_STEPS = ['C', 'C', 'D', 'D', 'E', 'F', 'F', 'G', 'G', 'A', 'A', 'B']
+_MUSICXML_ALTERS = [0, 1, 0, 1, 0, 0, 1, 0, 1, 0, 1, 0]
+
+
+class BenchmarkException(Exception):
+  pass
+
+
+def _melody_notes(rng, num_notes):
+  """Returns (pitch, velocity, start_step, end_step) tuples for a melody."""
+  notes = []
+  step = 0
+  while len(notes) < num_notes:
+    duration = rng.choice(_MELODY_DURATIONS)
+    if rng.random() >= _REST_PROBABILITY:
+      notes.append((rng.choice(_MELODY_PITCHES), rng.randint(64, 127),
+                    step, step + duration))
+    step += duration
+  return notes
+
+
+def synthetic_note_sequence(num_notes, seed=0):
+  """Returns a deterministic synthetic NoteSequence.
+
+  The sequence has a melody with `num_notes` notes, a drum track spanning the
+  melody, and one chord symbol per bar, in 4/4 at 120 qpm. The same arguments
+  always produce the same sequence.
+
+  Args:
+    num_notes: The number of melody notes.
+    seed: The seed for the random number generator used to pick the notes.
+
+  Returns:
+    A music_pb2.NoteSequence proto.
+  """
+  rng = random.Random(seed)
+  sequence = music_pb2.NoteSequence()
+  sequence.id = 'synthetic_%d_%d' % (seed, num_notes)
+  sequence.ticks_per_quarter = 220
+  sequence.tempos.add(qpm=_QPM)
+  sequence.time_signatures.add(numerator=4, denominator=4)
+
+  def add_note(instrument, pitch, velocity, start_step, end_step, is_drum):
+    note = sequence.notes.add()
+    note.instrument = instrument
+    note.pitch = pitch
+    note.velocity = velocity
+    note.start_time = start_step * _STEP_SECONDS
+    note.end_time = end_step * _STEP_SECONDS
+    note.is_drum = is_drum
+    sequence.total_time = max(sequence.total_time, note.end_time)
+
+  melody = _melody_notes(rng, num_notes)
+  for pitch, velocity, start_step, end_step in melody:
+    add_note(0, pitch, velocity, start_step, end_step, False)
+
+  total_steps = melody[-1][3] if melody else 0
+  num_bars = (total_steps + _STEPS_PER_BAR - 1) // _STEPS_PER_BAR
+  for bar in range(num_bars):
+    bar_step = bar * _STEPS_PER_BAR
+    for step, pitch in _DRUM_PATTERN:
+      add_note(9, pitch, _DRUM_VELOCITY, bar_step + step, bar_step + step + 1,
+               True)
+    annotation = sequence.text_annotations.add()
+    annotation.time = bar_step * _STEP_SECONDS
+    annotation.text = rng.choice(_CHORD_FIGURES)
+    annotation.annotation_type = (
+        music_pb2.NoteSequence.TextAnnotation.CHORD_SYMBOL)
+
+  return sequence
+
+
+def synthetic_note_sequences(num_sequences, notes_per_sequence, seed=0):
+  """Returns a list of deterministic synthetic NoteSequences.
+
+  Args:
+    num_sequences: The number of sequences.
+    notes_per_sequence: The number of melody notes in each sequence.
+    seed: The base seed. Sequence `i` is generated with seed `seed + i`.
+
+  Returns:
+    A list of music_pb2.NoteSequence protos.
+  """
+  return [synthetic_note_sequence(notes_per_sequence, seed + i)
+          for i in range(num_sequences)]
+
+
+def synthetic_musicxml(num_notes, seed=0):
+  """Returns the contents of a deterministic synthetic MusicXML file.
+
+  The score has a single part holding a melody with `num_notes` notes, in 4/4
+  at 120 qpm. Notes never cross a barline.
+
+  Args:
+    num_notes: The number of notes.
+    seed: The seed for the random number generator used to pick the notes.
+
+  Returns:
+    The MusicXML document as a string.
+  """
+  rng = random.Random(seed)
+  lines = [
+      '<?xml version="1.0" encoding="UTF-8"?>',
+      '<score-partwise version="3.0">',
+      '<part-list><score-part id="P1"><part-name>Melody</part-name>'
+      '</score-part></part-list>',
+      '<part id="P1">',
+  ]
+  measure_number = 1
+  measure_steps = 0
+  lines.append(
+      '<measure number="1"><attributes><divisions>%d</divisions>'
+      '<key><fifths>0</fifths><mode>major</mode></key>'
+      '<time><beats>4</beats><beat-type>4</beat-type></time></attributes>'
+      '<direction><sound tempo="%d"/></direction>' % (
+          DEFAULT_STEPS_PER_QUARTER, _QPM))
+  for _ in range(num_notes):
+    duration = min(rng.choice(_MELODY_DURATIONS),
+                   _STEPS_PER_BAR - measure_steps)
+    pitch = rng.choice(_MELODY_PITCHES) + rng.choice([0, 0, 0, 1])
+    lines.append(
+        '<note><pitch><step>%s</step><alter>%d</alter><octave>%d</octave>'
+        '</pitch><duration>%d</duration><voice>1</voice></note>' % (
+            _MUSICXML_STEPS[pitch % 12], _MUSICXML_ALTERS[pitch % 12],
+            pitch // 12 - 1, duration))
+    measure_steps += duration
+    if measure_steps == _STEPS_PER_BAR:
+      measure_number += 1
+      measure_steps = 0
+      lines.append('</measure><measure number="%d">' % measure_number)
+  if measure_steps:
+    lines.append('<note><rest/><duration>%d</duration><voice>1</voice>'
+                 '</note>' % (_STEPS_PER_BAR - measure_steps))
+  lines.extend(['</measure>', '</part>', '</score-partwise>'])
+  return '\n'.join(lines)
+
+
+def peak_rss_kb():
+  """Returns the peak resident set size of this process in kilobytes."""
+  peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # ru_maxrss is in bytes on OS X and in kilobytes elsewhere.
+  if sys.platform == 'darwin':
+    peak_rss //= 1024
+  return peak_rss
+
+
+def time_benchmark(fn, inputs, repeats=3):
+  """Times a function over a list of inputs.
+
+  `fn` is called once for every input, and this is repeated `repeats` times.
+  The fastest repetition is reported, as it is the one least disturbed by
+  other activity on the machine.
+
+  Args:
+    fn: The function to time. It is called with a single input.
+    inputs: A list of inputs.
+    repeats: The number of times to run `fn` over all the inputs.
+
+  Returns:
+    A dictionary with the number of items processed in each repetition, the
+    seconds taken by the fastest repetition, the resulting items per second,
+    and the peak resident set size of the process in kilobytes afterwards.
+
+  Raises:
+    ValueError: If `repeats` is less than 1.
+  """
+  if repeats < 1:
+    raise ValueError('repeats must be at least 1. repeats is %d.' % repeats)
+  best_seconds = None
+  for _ in range(repeats):
+    start_time = time.time()
+    for input_ in inputs:
+      fn(input_)
+    seconds = time.time() - start_time
+    if best_seconds is None or seconds < best_seconds:
+      best_seconds = seconds
+  # Avoid dividing by zero on very coarse clocks.
+  best_seconds = max(best_seconds, 1e-9)
+  return {
+      'items': len(inputs),
+      'seconds': best_seconds,
+      'items_per_sec': len(inputs) / best_seconds,
+      'peak_rss_kb': peak_rss_kb(),
+  }
+
+
+def _quantize(note_sequence):
+  quantized_sequence = sequences_lib.QuantizedSequence()
+  quantized_sequence.from_note_sequence(
+      note_sequence, DEFAULT_STEPS_PER_QUARTER)
+  return quantized_sequence
+
+
+def _melodies(quantized_sequences):
+  melodies = []
+  for quantized_sequence in quantized_sequences:
+    melodies.extend(melodies_lib.extract_melodies(
+        quantized_sequence, ignore_polyphonic_notes=False)[0])
+  for melody in melodies:
+    melody.squash(melody_rnn_model.DEFAULT_MIN_NOTE,
+                  melody_rnn_model.DEFAULT_MAX_NOTE, 0)
+  return melodies
+
+
+def _drum_tracks(quantized_sequences):
+  drum_tracks = []
+  for quantized_sequence in quantized_sequences:
+    drum_tracks.extend(drums_lib.extract_drum_tracks(quantized_sequence)[0])
+  return drum_tracks
+
+
+def _chord_progressions(quantized_sequences):
+  chord_progressions = []
+  for quantized_sequence in quantized_sequences:
+    chord_progressions.extend(chords_lib.extract_chords(quantized_sequence)[0])
+  return chord_progressions
+
+
+def _melody_encoder_benchmark(encoder_decoder_fn):
+  def setup(context):
+    encoder = encoder_decoder_fn(melody_rnn_model.DEFAULT_MIN_NOTE,
+                                 melody_rnn_model.DEFAULT_MAX_NOTE)
+    return encoder.encode, context.melodies
+  return setup
+
+
+class _BenchmarkContext(object):
+  """Lazily built inputs shared by the benchmarks.
+
+  Each input is built on first use, outside of the timed region, from the
+  synthetic NoteSequences.
+  """
+
+  def __init__(self, note_sequences, notes_per_sequence, seed):
+    self.note_sequences = note_sequences
+    self._notes_per_sequence = notes_per_sequence
+    self._seed = seed
+    self._cache = {}
+    self._temp_dir = None
+
+  def _get(self, name, build_fn):
+    if name not in self._cache:
+      self._cache[name] = build_fn()
+    return self._cache[name]
+
+  @property
+  def quantized_sequences(self):
+    return self._get('quantized_sequences',
+                     lambda: [_quantize(ns) for ns in self.note_sequences])
+
+  @property
+  def melodies(self):
+    return self._get('melodies',
+                     lambda: _melodies(self.quantized_sequences))
+
+  @property
+  def drum_tracks(self):
+    return self._get('drum_tracks',
+                     lambda: _drum_tracks(self.quantized_sequences))
+
+  @property
+  def chord_progressions(self):
+    return self._get('chord_progressions',
+                     lambda: _chord_progressions(self.quantized_sequences))
+
+  def _temp_path(self, filename):
+    if self._temp_dir is None:
+      self._temp_dir = tempfile.mkdtemp()
+    return os.path.join(self._temp_dir, filename)
+
+  @property
+  def midi_data(self):
+    def build():
+      midi_data = []
+      for i, note_sequence in enumerate(self.note_sequences):
+        path = self._temp_path('%d.mid' % i)
+        midi_io.sequence_proto_to_midi_file(note_sequence, path)
+        with open(path, 'rb') as f:
+          midi_data.append(f.read())
+      return midi_data
+    return self._get('midi_data', build)
+
+  @property
+  def musicxml_files(self):
+    def build():
+      musicxml_files = []
+      for i in range(len(self.note_sequences)):
+        path = self._temp_path('%d.xml' % i)
+        with open(path, 'w') as f:
+          f.write(synthetic_musicxml(self._notes_per_sequence, self._seed + i))
+        musicxml_files.append(path)
+      return musicxml_files
+    return self._get('musicxml_files', build)
+
+  def close(self):
+    if self._temp_dir is not None:
+      shutil.rmtree(self._temp_dir)
+      self._temp_dir = None
+
+
+def _melody_rnn_create_dataset_setup(context):
+  dag = melody_rnn_pipeline.get_pipeline(
+      melody_rnn_model.default_configs['basic_rnn'])
+  return dag.transform, context.note_sequences
+
+
+# Ordered mapping from benchmark name to a setup function. Each setup function
+# takes a _BenchmarkContext and returns a (function, inputs) tuple to time.
+BENCHMARKS = collections.OrderedDict([
+    ('quantize_note_sequence',
+     lambda context: (_quantize, context.note_sequences)),
+    ('extract_melodies',
+     lambda context: (melodies_lib.extract_melodies,
+                      context.quantized_sequences)),
+    ('extract_drum_tracks',
+     lambda context: (drums_lib.extract_drum_tracks,
+                      context.quantized_sequences)),
+    ('extract_lead_sheet_fragments',
+     lambda context: (lead_sheets_lib.extract_lead_sheet_fragments,
+                      context.quantized_sequences)),
+    ('encode_melody_one_hot',
+     _melody_encoder_benchmark(
+         lambda min_note, max_note:
+         encoder_decoder.OneHotEventSequenceEncoderDecoder(
+             melody_encoder_decoder.MelodyOneHotEncoding(min_note, max_note)))),
+    ('encode_melody_lookback',
+     _melody_encoder_benchmark(
+         lambda min_note, max_note:
+         encoder_decoder.LookbackEventSequenceEncoderDecoder(
+             melody_encoder_decoder.MelodyOneHotEncoding(min_note, max_note)))),
+    ('encode_melody_key',
+     _melody_encoder_benchmark(melody_encoder_decoder.KeyMelodyEncoderDecoder)),
+    ('encode_drums_one_hot',
+     lambda context: (encoder_decoder.OneHotEventSequenceEncoderDecoder(
+         drums_encoder_decoder.MultiDrumOneHotEncoding()).encode,
+                      context.drum_tracks)),
+    ('encode_chords_one_hot',
+     lambda context: (encoder_decoder.OneHotEventSequenceEncoderDecoder(
+         chords_encoder_decoder.MajorMinorChordOneHotEncoding()).encode,
+                      context.chord_progressions)),
+    ('midi_to_sequence_proto',
+     lambda context: (midi_io.midi_to_sequence_proto, context.midi_data)),
+    ('midi_to_sequence_proto_fast',
+     lambda context: (midi_io.midi_to_sequence_proto_fast, context.midi_data)),
+    ('musicxml_to_sequence_proto',
+     lambda context: (
+         lambda path: musicxml_reader.musicxml_to_sequence_proto(
+             musicxml_parser.MusicXMLDocument(path)),
+         context.musicxml_files)),
+    ('musicxml_to_sequence_proto_streaming',
+     lambda context: (
+         lambda path: musicxml_reader.musicxml_file_to_sequence_proto(
+             path, streaming=True),
+         context.musicxml_files)),
+    ('melody_rnn_create_dataset', _melody_rnn_create_dataset_setup),
+])
+
+
+def _run_benchmark(name, num_sequences, notes_per_sequence, seed, repeats,
+                   connection):
+  """Runs a single benchmark and sends its results over `connection`.
+
+  This is the target of the process each benchmark runs in. The inputs are
+  generated in the process too, so that the peak resident set size only
+  reflects this benchmark. If the benchmark fails, the formatted traceback is
+  sent instead of the results.
+  """
+  try:
+    note_sequences = synthetic_note_sequences(
+        num_sequences, notes_per_sequence, seed)
+    context = _BenchmarkContext(note_sequences, notes_per_sequence, seed)
+    try:
+      fn, inputs = BENCHMARKS[name](context)
+      connection.send(time_benchmark(fn, inputs, repeats))
+    finally:
+      context.close()
+  except Exception:  # pylint: disable=broad-except
+    connection.send(traceback.format_exc())
+  finally:
+    connection.close()
+
+
+def run_benchmark_in_process(name, num_sequences=10, notes_per_sequence=256,
+                             seed=0, repeats=3):
+  """Runs a benchmark in a fresh process.
+
+  `ru_maxrss` only ever grows over the life of a process, so a benchmark run
+  after a more memory hungry one would report that benchmark's peak. Running
+  each benchmark in its own process keeps their peak resident set sizes apart.
+
+  Args:
+    name: The name of the benchmark to run, from `BENCHMARKS`.
+    num_sequences: The number of synthetic NoteSequences to generate.
+    notes_per_sequence: The number of melody notes in each NoteSequence.
+    seed: The seed used to generate the NoteSequences.
+    repeats: The number of times the benchmark is repeated.
+
+  Returns:
+    The timing results of the benchmark, as returned by `time_benchmark`.
+
+  Raises:
+    BenchmarkException: If the benchmark failed, or its process exited without
+        sending results.
+  """
+  receive_connection, send_connection = multiprocessing.Pipe(duplex=False)
+  process = multiprocessing.Process(
+      target=_run_benchmark,
+      args=(name, num_sequences, notes_per_sequence, seed, repeats,
+            send_connection))
+  process.start()
+  send_connection.close()
+  try:
+    result = receive_connection.recv()
+  except EOFError:
+    result = None
+  finally:
+    receive_connection.close()
+    process.join()
+  if result is None:
+    raise BenchmarkException(
+        'Benchmark %s exited with code %s without sending results.' % (
+            name, process.exitcode))
+  if not isinstance(result, dict):
+    raise BenchmarkException('Benchmark %s failed:\n%s' % (name, result))
+  return result
+
+
+def run_benchmarks(benchmark_names=None, num_sequences=10,
+                   notes_per_sequence=256, seed=0, repeats=3):
+  """Runs benchmarks over synthetic NoteSequences.
+
+  Each benchmark is run in a fresh process with `run_benchmark_in_process`.
+
+  Args:
+    benchmark_names: A list of names of benchmarks to run, from `BENCHMARKS`.
+        If None, all benchmarks are run.
+    num_sequences: The number of synthetic NoteSequences to generate.
+    notes_per_sequence: The number of melody notes in each NoteSequence.
+    seed: The seed used to generate the NoteSequences.
+    repeats: The number of times each benchmark is repeated.
+
+  Returns:
+    A results dictionary, holding the benchmark configuration under 'config'
+    and a dictionary mapping benchmark name to its timing results, as returned
+    by `time_benchmark`, under 'benchmarks'.
+
+  Raises:
+    BenchmarkException: If an unknown benchmark name is given, or a benchmark
+        failed.
+  """
+  if benchmark_names is None:
+    benchmark_names = BENCHMARKS.keys()
+  unknown_names = [name for name in benchmark_names if name not in BENCHMARKS]
+  if unknown_names:
+    raise BenchmarkException(
+        'Unknown benchmarks %s. Must be among %s.' % (
+            unknown_names, BENCHMARKS.keys()))
+
+  results = collections.OrderedDict()
+  for name in benchmark_names:
+    results[name] = run_benchmark_in_process(
+        name, num_sequences, notes_per_sequence, seed, repeats)
+    tf.logging.info('%s: %d items, %.1f items/sec, peak RSS %d KB', name,
+                    results[name]['items'], results[name]['items_per_sec'],
+                    results[name]['peak_rss_kb'])
+
+  return {
+      'version': RESULTS_VERSION,
+      'config': {
+          'num_sequences': num_sequences,
+          'notes_per_sequence': notes_per_sequence,
+          'seed': seed,
+          'repeats': repeats,
+      },
+      'benchmarks': results,
+  }
+
+
+def save_results(results, path):
+  """Writes benchmark results to a JSON file."""
+  with tf.gfile.Open(path, 'w') as f:
+    json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+  """Reads benchmark results from a JSON file."""
+  with tf.gfile.Open(path, 'r') as f:
+    return json.load(f)
+
+
+def compare_to_baseline(results, baseline, tolerance=0.1):
+  """Compares benchmark results against a baseline.
+
+  A benchmark has regressed if its throughput fell, or its peak resident set
+  size grew, by more than `tolerance` relative to the baseline. Benchmarks
+  missing from either side are not compared.
+
+  Args:
+    results: A results dictionary, as returned by `run_benchmarks`.
+    baseline: A results dictionary to compare against.
+    tolerance: The allowed relative change, as a fraction.
+
+  Returns:
+    A list of strings describing each regression. Empty if nothing regressed.
+
+  Raises:
+    BenchmarkException: If the results were produced with a different results
+        version or benchmark configuration than the baseline.
+  """
+  if results.get('version') != baseline.get('version'):
+    raise BenchmarkException(
+        'Results version %s does not match baseline version %s.' % (
+            results.get('version'), baseline.get('version')))
+  if results['config'] != baseline['config']:
+    raise BenchmarkException(
+        'Benchmark config %s does not match baseline config %s.' % (
+            results['config'], baseline['config']))
+
+  regressions = []
+  for name, result in results['benchmarks'].items():
+    if name not in baseline['benchmarks']:
+      continue
+    baseline_result = baseline['benchmarks'][name]
+    min_items_per_sec = baseline_result['items_per_sec'] * (1 - tolerance)
+    if result['items_per_sec'] < min_items_per_sec:
+      regressions.append(
+          '%s: %.1f items/sec, below baseline %.1f items/sec' % (
+              name, result['items_per_sec'], baseline_result['items_per_sec']))
+    max_peak_rss_kb = baseline_result['peak_rss_kb'] * (1 + tolerance)
+    if result['peak_rss_kb'] > max_peak_rss_kb:
+      regressions.append(
+          '%s: peak RSS %d KB, above baseline %d KB' % (
+              name, result['peak_rss_kb'], baseline_result['peak_rss_kb']))
+  return regressions
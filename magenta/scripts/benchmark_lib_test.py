@@ -0,0 +1,174 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for benchmark_lib."""
+
+import os
+import tempfile
+
+# internal imports
+import tensorflow as tf
+
+from magenta.music import musicxml_parser
+from magenta.music import musicxml_reader
+from magenta.scripts import benchmark_lib
+
+
+def _allocate(size):
+  return len(bytearray(size))
+
+
+def _fail(unused_input):
+  raise ValueError('benchmark failure')
+
+
+class BenchmarkLibTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.benchmarks = benchmark_lib.BENCHMARKS.copy()
+
+  def tearDown(self):
+    benchmark_lib.BENCHMARKS.clear()
+    benchmark_lib.BENCHMARKS.update(self.benchmarks)
+
+  def testSyntheticNoteSequenceIsDeterministic(self):
+    sequence = benchmark_lib.synthetic_note_sequence(64, seed=3)
+    self.assertEqual(sequence, benchmark_lib.synthetic_note_sequence(64, seed=3))
+    self.assertNotEqual(
+        sequence, benchmark_lib.synthetic_note_sequence(64, seed=4))
+    melody_notes = [note for note in sequence.notes if not note.is_drum]
+    self.assertEqual(64, len(melody_notes))
+    self.assertTrue(any(note.is_drum for note in sequence.notes))
+    self.assertTrue(sequence.text_annotations)
+
+  def testSyntheticNoteSequences(self):
+    sequences = benchmark_lib.synthetic_note_sequences(3, 16, seed=5)
+    self.assertEqual(3, len(sequences))
+    self.assertEqual(benchmark_lib.synthetic_note_sequence(16, seed=7),
+                     sequences[2])
+
+  def testSyntheticMusicXML(self):
+    path = os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()), 'test.xml')
+    with open(path, 'w') as f:
+      f.write(benchmark_lib.synthetic_musicxml(50, seed=1))
+    sequence = musicxml_reader.musicxml_to_sequence_proto(
+        musicxml_parser.MusicXMLDocument(path))
+    self.assertEqual(50, len(sequence.notes))
+    self.assertEqual(1, len(sequence.time_signatures))
+    self.assertEqual(120.0, sequence.tempos[0].qpm)
+
+  def testTimeBenchmark(self):
+    calls = []
+    result = benchmark_lib.time_benchmark(calls.append, [1, 2, 3], repeats=2)
+    self.assertEqual([1, 2, 3, 1, 2, 3], calls)
+    self.assertEqual(3, result['items'])
+    self.assertGreater(result['items_per_sec'], 0)
+    self.assertGreater(result['peak_rss_kb'], 0)
+    with self.assertRaises(ValueError):
+      benchmark_lib.time_benchmark(calls.append, [1], repeats=0)
+
+  def testRunBenchmarks(self):
+    results = benchmark_lib.run_benchmarks(
+        benchmark_names=['quantize_note_sequence', 'extract_melodies',
+                         'encode_melody_one_hot', 'midi_to_sequence_proto_fast',
+                         'musicxml_to_sequence_proto',
+                         'musicxml_to_sequence_proto_streaming',
+                         'melody_rnn_create_dataset'],
+        num_sequences=2, notes_per_sequence=128, repeats=1)
+    self.assertEqual(
+        ['quantize_note_sequence', 'extract_melodies', 'encode_melody_one_hot',
+         'midi_to_sequence_proto_fast', 'musicxml_to_sequence_proto',
+         'musicxml_to_sequence_proto_streaming', 'melody_rnn_create_dataset'],
+        list(results['benchmarks']))
+    self.assertEqual(2, results['benchmarks']['quantize_note_sequence']['items'])
+    self.assertEqual(
+        2, results['benchmarks']['midi_to_sequence_proto_fast']['items'])
+    self.assertEqual(
+        2, results['benchmarks']['musicxml_to_sequence_proto_streaming'][
+            'items'])
+    self.assertGreater(
+        results['benchmarks']['encode_melody_one_hot']['items'], 0)
+
+  def testRunBenchmarksSeparatesPeakRSS(self):
+    benchmark_lib.BENCHMARKS['large'] = (
+        lambda context: (_allocate, [256 << 20]))
+    benchmark_lib.BENCHMARKS['small'] = lambda context: (_allocate, [1])
+    results = benchmark_lib.run_benchmarks(
+        benchmark_names=['large', 'small'], num_sequences=1,
+        notes_per_sequence=16, repeats=1)
+    # The small benchmark runs in a fresh process, so it does not report the
+    # peak of the large one.
+    self.assertGreater(
+        results['benchmarks']['large']['peak_rss_kb'],
+        results['benchmarks']['small']['peak_rss_kb'] + (128 << 10))
+
+  def testRunFailingBenchmark(self):
+    benchmark_lib.BENCHMARKS['failing'] = lambda context: (_fail, [1])
+    with self.assertRaisesRegexp(benchmark_lib.BenchmarkException,
+                                 'benchmark failure'):
+      benchmark_lib.run_benchmark_in_process(
+          'failing', num_sequences=1, notes_per_sequence=16, repeats=1)
+
+  def testRunUnknownBenchmark(self):
+    with self.assertRaises(benchmark_lib.BenchmarkException):
+      benchmark_lib.run_benchmarks(benchmark_names=['unknown'])
+
+  def testSaveAndLoadResults(self):
+    results = benchmark_lib.run_benchmarks(
+        benchmark_names=['quantize_note_sequence'], num_sequences=1,
+        notes_per_sequence=16, repeats=1)
+    path = os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()), 'out.json')
+    benchmark_lib.save_results(results, path)
+    self.assertEqual(results, benchmark_lib.load_results(path))
+
+  def testCompareToBaseline(self):
+    config = {'num_sequences': 1}
+    baseline = {
+        'version': benchmark_lib.RESULTS_VERSION,
+        'config': config,
+        'benchmarks': {
+            'fast': {'items_per_sec': 100.0, 'peak_rss_kb': 1000},
+            'small': {'items_per_sec': 100.0, 'peak_rss_kb': 1000},
+            'removed': {'items_per_sec': 100.0, 'peak_rss_kb': 1000},
+        },
+    }
+    results = {
+        'version': benchmark_lib.RESULTS_VERSION,
+        'config': config,
+        'benchmarks': {
+            'fast': {'items_per_sec': 80.0, 'peak_rss_kb': 1050},
+            'small': {'items_per_sec': 95.0, 'peak_rss_kb': 1200},
+            'added': {'items_per_sec': 1.0, 'peak_rss_kb': 1000000},
+        },
+    }
+    regressions = benchmark_lib.compare_to_baseline(
+        results, baseline, tolerance=0.1)
+    self.assertEqual(2, len(regressions))
+    self.assertTrue(regressions[0].startswith('fast:') or
+                    regressions[1].startswith('fast:'))
+    self.assertTrue(regressions[0].startswith('small:') or
+                    regressions[1].startswith('small:'))
+    self.assertEqual(
+        [], benchmark_lib.compare_to_baseline(results, baseline, tolerance=0.5))
+
+  def testCompareToBaselineWithDifferentConfig(self):
+    baseline = {'version': benchmark_lib.RESULTS_VERSION,
+                'config': {'num_sequences': 1}, 'benchmarks': {}}
+    results = {'version': benchmark_lib.RESULTS_VERSION,
+               'config': {'num_sequences': 2}, 'benchmarks': {}}
+    with self.assertRaises(benchmark_lib.BenchmarkException):
+      benchmark_lib.compare_to_baseline(results, baseline)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,170 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An on-disk cache of music files converted to NoteSequence protos.
+
+Entries are keyed by a hash of the file contents together with the converter
+version, so a file that has not changed since it was last converted does not
+need to be parsed again, wherever it is stored. The cache itself must be on a
+local filesystem.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+# internal imports
+from magenta.pipelines import statistics
+from magenta.version import __version__
+
+# Bump this whenever a change to the converters changes their output, so that
+# stale cache entries are not used.
+CONVERTER_VERSION = 1
+
+
+class ConversionCache(object):
+  """A content-addressed cache of serialized NoteSequence protos.
+
+  Each entry is a file under `cache_dir` named by its key. Reading an entry
+  updates its modification time, so `evict` removes the least recently used
+  entries first. Because this relies on modification times and atomic renames,
+  `cache_dir` must be on a local filesystem.
+
+  Cache hits, misses, and evictions are counted in `statistics.Counter`
+  objects returned by `get_stats`.
+  """
+
+  def __init__(self, cache_dir, max_bytes=None, max_age_secs=None):
+    """Constructs a ConversionCache.
+
+    Args:
+      cache_dir: Path to the directory holding the cache entries, on a local
+          filesystem. If the directory does not exist, it will be created.
+      max_bytes: If given, `evict` removes the least recently used entries
+          until the cache holds at most this many bytes.
+      max_age_secs: If given, `evict` removes entries that have not been used
+          for more than this many seconds.
+    """
+    self._cache_dir = cache_dir
+    self._max_bytes = max_bytes
+    self._max_age_secs = max_age_secs
+    if not os.path.isdir(cache_dir):
+      os.makedirs(cache_dir)
+    self._hits = statistics.Counter('conversion_cache_hits')
+    self._misses = statistics.Counter('conversion_cache_misses')
+    self._evictions = statistics.Counter('conversion_cache_evictions')
+
+  def key(self, contents, source_type):
+    """Returns the cache key for the contents of a music file.
+
+    Args:
+      contents: The raw bytes of the file, a string.
+      source_type: The source type as a string (e.g. "midi" or "musicxml").
+
+    Returns:
+      The key as a hex string.
+    """
+    fingerprint = hashlib.sha1(
+        '%s:%s:%d:' % (source_type, __version__, CONVERTER_VERSION))
+    fingerprint.update(contents)
+    return fingerprint.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self._cache_dir, key[:2], key)
+
+  def get(self, key):
+    """Returns the serialized NoteSequence cached under `key`, or None."""
+    path = self._path(key)
+    try:
+      with open(path, 'rb') as f:
+        serialized = f.read()
+    except IOError:
+      self._misses.increment()
+      return None
+    try:
+      os.utime(path, None)
+    except OSError:
+      # The entry was evicted by another process after it was read.
+      pass
+    self._hits.increment()
+    return serialized
+
+  def put(self, key, serialized):
+    """Caches a serialized NoteSequence under `key`.
+
+    The entry is written to a temporary file and renamed into place, so
+    concurrent readers never see a partial entry.
+
+    Args:
+      key: The cache key, as returned by `key`.
+      serialized: The serialized NoteSequence, a string.
+    """
+    path = self._path(key)
+    entry_dir = os.path.dirname(path)
+    if not os.path.isdir(entry_dir):
+      try:
+        os.makedirs(entry_dir)
+      except OSError:
+        # Another process created the directory first.
+        pass
+    fd, temp_path = tempfile.mkstemp(dir=entry_dir)
+    with os.fdopen(fd, 'wb') as f:
+      f.write(serialized)
+    os.rename(temp_path, path)
+
+  def evict(self):
+    """Removes entries that are too old or exceed the cache size.
+
+    Returns:
+      The number of entries removed.
+    """
+    entries = []
+    for entry_dir, _, filenames in os.walk(self._cache_dir):
+      for filename in filenames:
+        path = os.path.join(entry_dir, filename)
+        try:
+          entry_stat = os.stat(path)
+        except OSError:
+          # The entry was removed by another process after the walk.
+          continue
+        entries.append((entry_stat.st_mtime, entry_stat.st_size, path))
+    # Most recently used first.
+    entries.sort(reverse=True)
+
+    now = time.time()
+    total_bytes = 0
+    num_evicted = 0
+    for mtime, size, path in entries:
+      total_bytes += size
+      if ((self._max_age_secs is not None and
+           now - mtime > self._max_age_secs) or
+          (self._max_bytes is not None and total_bytes > self._max_bytes)):
+        total_bytes -= size
+        try:
+          os.remove(path)
+        except OSError:
+          # The entry was removed by another process after the walk.
+          continue
+        num_evicted += 1
+    self._evictions.increment(num_evicted)
+    return num_evicted
+
+  def get_stats(self):
+    """Returns the hit, miss, and eviction counts as `Statistic` objects."""
+    return [self._hits.copy(), self._misses.copy(), self._evictions.copy()]
+
+  def reset_stats(self):
+    """Resets the hit, miss, and eviction counts to zero."""
+    for stat in (self._hits, self._misses, self._evictions):
+      stat.count = 0
@@ -0,0 +1,101 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for conversion_cache."""
+
+import os
+import tempfile
+import time
+
+# internal imports
+import tensorflow as tf
+
+from magenta.scripts import conversion_cache
+
+
+class ConversionCacheTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.cache_dir = os.path.join(
+        tempfile.mkdtemp(dir=self.get_temp_dir()), 'cache')
+
+  def getStatsDict(self, cache):
+    return dict((stat.name, stat.count) for stat in cache.get_stats())
+
+  def testKey(self):
+    cache = conversion_cache.ConversionCache(self.cache_dir)
+    self.assertEqual(cache.key('abc', 'midi'), cache.key('abc', 'midi'))
+    self.assertNotEqual(cache.key('abc', 'midi'), cache.key('abd', 'midi'))
+    self.assertNotEqual(cache.key('abc', 'midi'), cache.key('abc', 'musicxml'))
+
+  def testGetAndPut(self):
+    cache = conversion_cache.ConversionCache(self.cache_dir)
+    key = cache.key('contents', 'midi')
+    self.assertEqual(None, cache.get(key))
+    cache.put(key, 'serialized')
+    self.assertEqual('serialized', cache.get(key))
+    self.assertEqual(
+        {'conversion_cache_hits': 1, 'conversion_cache_misses': 1,
+         'conversion_cache_evictions': 0},
+        self.getStatsDict(cache))
+
+  def testEvictMaxBytes(self):
+    cache = conversion_cache.ConversionCache(self.cache_dir, max_bytes=25)
+    keys = [cache.key(str(i), 'midi') for i in range(3)]
+    for i, key in enumerate(keys):
+      cache.put(key, '%010d' % i)
+      os.utime(cache._path(key), (1000 + i, 1000 + i))
+    # Using the oldest entry makes it the most recently used.
+    cache.get(keys[0])
+
+    self.assertEqual(1, cache.evict())
+    self.assertEqual(None, cache.get(keys[1]))
+    self.assertEqual('%010d' % 2, cache.get(keys[2]))
+    self.assertEqual(1, self.getStatsDict(cache)['conversion_cache_evictions'])
+
+  def testEvictMaxAge(self):
+    cache = conversion_cache.ConversionCache(self.cache_dir, max_age_secs=60)
+    old_key = cache.key('old', 'midi')
+    new_key = cache.key('new', 'midi')
+    cache.put(old_key, 'old')
+    cache.put(new_key, 'new')
+    old_time = time.time() - 120
+    os.utime(cache._path(old_key), (old_time, old_time))
+
+    self.assertEqual(1, cache.evict())
+    self.assertEqual(None, cache.get(old_key))
+    self.assertEqual('new', cache.get(new_key))
+
+  def testEvictSkipsVanishedEntries(self):
+    cache = conversion_cache.ConversionCache(self.cache_dir, max_bytes=0)
+    keys = [cache.key(str(i), 'midi') for i in range(2)]
+    for key in keys:
+      cache.put(key, 'serialized')
+
+    # Simulate another process removing an entry after the walk.
+    walk = os.walk
+    def walk_and_remove(top):
+      os.walk = walk
+      entries = list(walk(top))
+      os.remove(cache._path(keys[0]))
+      return entries
+    os.walk = walk_and_remove
+    try:
+      self.assertEqual(1, cache.evict())
+    finally:
+      os.walk = walk
+    self.assertEqual(None, cache.get(keys[1]))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -22,16 +22,30 @@ Example usage:
     --input_dir=/path/to/input/dir \
     --output_file=/path/to/tfrecord/file \
     --recursive
+
+With --num_processes greater than 1, files are converted by a pool of worker
+processes and written to shards `<output_file>-00000-of-000NN.tfrecord`, etc.
+A manifest of the shards and the files they cover is kept in
+`<output_file>.manifest.json`, so an interrupted conversion picks up where it
+left off when run again.
+
+With --cache_dir, converted files are cached by content, so files that have
+not changed since a previous run are not parsed again.
 """
 
+import multiprocessing
 import os
 
 # internal imports
 import tensorflow as tf
 
+from magenta.common import tfrecord_lib
 from magenta.music import midi_io
 from magenta.music import musicxml_reader
 from magenta.music import note_sequence_io
+from magenta.pipelines import statistics
+from magenta.protobuf import music_pb2
+from magenta.scripts import conversion_cache
 
 FLAGS = tf.app.flags.FLAGS
 
@@ -42,12 +56,32 @@ tf.app.flags.DEFINE_string('output_file', None,
                            'if it already exists.')
 tf.app.flags.DEFINE_bool('recursive', False,
                          'Whether or not to recurse into subdirectories.')
+tf.app.flags.DEFINE_integer('num_processes', 1,
+                            'Number of worker processes used to convert files. '
+                            'If greater than 1, the output is sharded and the '
+                            'conversion can be resumed.')
+tf.app.flags.DEFINE_integer('files_per_shard', 1000,
+                            'Number of input files converted into each output '
+                            'shard when --num_processes is greater than 1. '
+                            'Progress is checkpointed after each shard.')
+tf.app.flags.DEFINE_string('cache_dir', None,
+                           'Optional directory in which to cache converted '
+                           'files by content, so unchanged files are not '
+                           'parsed again by later runs.')
+tf.app.flags.DEFINE_integer('cache_max_bytes', 0,
+                            'If greater than 0, the least recently used cache '
+                            'entries are evicted at the end of the run until '
+                            'the cache holds at most this many bytes.')
+tf.app.flags.DEFINE_float('cache_max_age_days', 0,
+                          'If greater than 0, cache entries not used for this '
+                          'many days are evicted at the end of the run.')
 tf.app.flags.DEFINE_string('log', 'INFO',
                            'The threshold for what messages will be logged '
                            'DEBUG, INFO, WARN, ERROR, or FATAL.')
 
 
-def convert_directory(root_dir, sub_dir, sequence_writer, recursive=False):
+def convert_directory(root_dir, sub_dir, sequence_writer, recursive=False,
+                      cache=None):
   """Converts files to NoteSequences and writes to `sequence_writer`.
 
   Input files found in the specified directory specified by the combination of
@@ -64,6 +98,8 @@ def convert_directory(root_dir, sub_dir, sequence_writer, recursive=False):
         NoteSequence protos to.
     recursive: A boolean specifying whether or not recursively convert files
         contained in subdirectories of the specified directory.
+    cache: An optional ConversionCache used to look up and store converted
+        files.
 
   Returns:
     The number of NoteSequence protos written as an integer.
@@ -81,14 +117,7 @@ def convert_directory(root_dir, sub_dir, sequence_writer, recursive=False):
         recurse_sub_dirs.append(os.path.join(sub_dir, file_in_dir))
       continue
 
-    if full_file_path.endswith('.mid') or full_file_path.endswith('.midi'):
-      sequence = convert_midi(root_dir, sub_dir, full_file_path)
-    elif full_file_path.endswith('.xml') or full_file_path.endswith('.mxl'):
-      sequence = convert_musicxml(root_dir, sub_dir, full_file_path)
-    else:
-      tf.logging.info('Unable to find a converter for file %s', full_file_path)
-      sequence = None
-
+    sequence = convert_file(root_dir, sub_dir, full_file_path, cache)
     if sequence is None:
       sequences_skipped += 1
       continue
@@ -100,30 +129,73 @@ def convert_directory(root_dir, sub_dir, sequence_writer, recursive=False):
   tf.logging.info('Could not parse %d files.', sequences_skipped)
   for recurse_sub_dir in recurse_sub_dirs:
     sequences_written += convert_directory(
-        root_dir, recurse_sub_dir, sequence_writer, recursive)
+        root_dir, recurse_sub_dir, sequence_writer, recursive, cache)
   return sequences_written
 
 
-def convert_midi(root_dir, sub_dir, full_file_path):
-  """Converts a midi file to a sequence proto.
+def convert_file(root_dir, sub_dir, full_file_path, cache=None):
+  """Converts a midi or musicxml file to a sequence proto.
 
   Args:
     root_dir: A string specifying the root directory for the files being
         converted.
     sub_dir: The directory being converted currently.
     full_file_path: the full path to the file to convert.
+    cache: An optional ConversionCache used to look up and store the converted
+        file.
 
   Returns:
     Either a NoteSequence proto or None if the file could not be converted.
   """
-  try:
-    sequence = midi_io.midi_to_sequence_proto(
-        tf.gfile.FastGFile(full_file_path).read())
-  except midi_io.MIDIConversionError as e:
-    tf.logging.warning(
-        'Could not parse MIDI file %s. It will be skipped. Error was: %s',
-        full_file_path, e)
+  if full_file_path.endswith('.mid') or full_file_path.endswith('.midi'):
+    return convert_midi(root_dir, sub_dir, full_file_path, cache)
+  elif full_file_path.endswith('.xml') or full_file_path.endswith('.mxl'):
+    return convert_musicxml(root_dir, sub_dir, full_file_path, cache)
+  else:
+    tf.logging.info('Unable to find a converter for file %s', full_file_path)
     return None
+
+
+def _lookup_cache(cache, contents, source_type):
+  """Returns a tuple (key, sequence) for a file in `cache`.
+
+  `key` is None if `cache` is None, and `sequence` is None on a cache miss.
+  """
+  if cache is None:
+    return None, None
+  key = cache.key(contents, source_type)
+  serialized = cache.get(key)
+  if serialized is None:
+    return key, None
+  return key, music_pb2.NoteSequence.FromString(serialized)
+
+
+def convert_midi(root_dir, sub_dir, full_file_path, cache=None):
+  """Converts a midi file to a sequence proto.
+
+  Args:
+    root_dir: A string specifying the root directory for the files being
+        converted.
+    sub_dir: The directory being converted currently.
+    full_file_path: the full path to the file to convert.
+    cache: An optional ConversionCache used to look up and store the converted
+        file.
+
+  Returns:
+    Either a NoteSequence proto or None if the file could not be converted.
+  """
+  contents = tf.gfile.FastGFile(full_file_path).read()
+  key, sequence = _lookup_cache(cache, contents, 'midi')
+  if sequence is None:
+    try:
+      sequence = midi_io.midi_to_sequence_proto_fast(contents)
+    except midi_io.MIDIConversionError as e:
+      tf.logging.warning(
+          'Could not parse MIDI file %s. It will be skipped. Error was: %s',
+          full_file_path, e)
+      return None
+    if key is not None:
+      cache.put(key, sequence.SerializeToString())
   sequence.collection_name = os.path.basename(root_dir)
   sequence.filename = os.path.join(sub_dir, os.path.basename(full_file_path))
   sequence.id = note_sequence_io.generate_note_sequence_id(
@@ -131,7 +203,7 @@ def convert_midi(root_dir, sub_dir, full_file_path):
   return sequence
 
 
-def convert_musicxml(root_dir, sub_dir, full_file_path):
+def convert_musicxml(root_dir, sub_dir, full_file_path, cache=None):
   """Converts a musicxml file to a sequence proto.
 
   Args:
@@ -139,17 +211,27 @@ def convert_musicxml(root_dir, sub_dir, full_file_path):
         converted.
     sub_dir: The directory being converted currently.
     full_file_path: the full path to the file to convert.
+    cache: An optional ConversionCache used to look up and store the converted
+        file.
 
   Returns:
     Either a NoteSequence proto or None if the file could not be converted.
   """
-  try:
-    sequence = musicxml_reader.musicxml_file_to_sequence_proto(full_file_path)
-  except musicxml_reader.MusicXMLConversionError as e:
-    tf.logging.warning(
-        'Could not parse MusicXML file %s. It will be skipped. Error was: %s',
-        full_file_path, e)
-    return None
+  key, sequence = None, None
+  if cache is not None:
+    key, sequence = _lookup_cache(
+        cache, tf.gfile.FastGFile(full_file_path, 'rb').read(), 'musicxml')
+  if sequence is None:
+    try:
+      sequence = musicxml_reader.musicxml_file_to_sequence_proto(
+          full_file_path, streaming=True)
+    except musicxml_reader.MusicXMLConversionError as e:
+      tf.logging.warning(
+          'Could not parse MusicXML file %s. It will be skipped. Error was: %s',
+          full_file_path, e)
+      return None
+    if key is not None:
+      cache.put(key, sequence.SerializeToString())
   sequence.collection_name = os.path.basename(root_dir)
   sequence.filename = os.path.join(sub_dir, os.path.basename(full_file_path))
   sequence.id = note_sequence_io.generate_note_sequence_id(
@@ -157,6 +239,190 @@ def convert_musicxml(root_dir, sub_dir, full_file_path):
   return sequence
 
 
+def list_files(root_dir, sub_dir='', recursive=False):
+  """Lists the files under a directory to be converted.
+
+  Args:
+    root_dir: A string specifying a root directory.
+    sub_dir: A string specifying a path to a directory under `root_dir` in which
+        to list files.
+    recursive: A boolean specifying whether or not to list files contained in
+        subdirectories of the specified directory.
+
+  Yields:
+    Tuples (sub_dir, full_file_path) for each file, where `sub_dir` is the
+    directory containing the file relative to `root_dir`.
+  """
+  dir_to_list = os.path.join(root_dir, sub_dir)
+  recurse_sub_dirs = []
+  for file_in_dir in tf.gfile.ListDirectory(dir_to_list):
+    full_file_path = os.path.join(dir_to_list, file_in_dir)
+    if tf.gfile.IsDirectory(full_file_path):
+      if recursive:
+        recurse_sub_dirs.append(os.path.join(sub_dir, file_in_dir))
+      continue
+    yield sub_dir, full_file_path
+  for recurse_sub_dir in recurse_sub_dirs:
+    for sub_dir_and_path in list_files(root_dir, recurse_sub_dir, recursive):
+      yield sub_dir_and_path
+
+
+# The conversion cache of a `convert_directory_parallel` worker process. It is
+# set once per process by `_init_parallel_worker` so that the cache is only
+# pickled when the pool starts, not once per file.
+_worker_cache = None
+
+
+def _init_parallel_worker(cache):
+  """Initializes a `convert_directory_parallel` worker process."""
+  global _worker_cache
+  _worker_cache = cache
+
+
+def _convert_file_serialized(args):
+  """Converts a file in a worker process of `convert_directory_parallel`.
+
+  Args:
+    args: A tuple (root_dir, sub_dir, full_file_path) as passed to
+        `convert_file`.
+
+  Returns:
+    A tuple (filename, serialized, stats) where `filename` is the path to the
+    file relative to `root_dir`, `serialized` is the serialized NoteSequence, or
+    None if the file could not be converted, and `stats` is a list of cache
+    statistics for the file.
+  """
+  root_dir, sub_dir, full_file_path = args
+  try:
+    sequence = convert_file(root_dir, sub_dir, full_file_path, _worker_cache)
+  except Exception as e:  # pylint: disable=broad-except
+    tf.logging.warning(
+        'Could not convert file %s. It will be skipped. Error was: %s',
+        full_file_path, e)
+    sequence = None
+  filename = os.path.join(sub_dir, os.path.basename(full_file_path))
+  stats = []
+  if _worker_cache is not None:
+    # Send only the counts for this file, so that the parent can merge them
+    # like any other statistics.
+    stats = _worker_cache.get_stats()
+    _worker_cache.reset_stats()
+  return (filename,
+          sequence.SerializeToString() if sequence is not None else None,
+          stats)
+
+
+def _finish_shard(output_file, temp_path, shard, shards, num_shards):
+  """Renames a completed shard into place and records it in the manifest.
+
+  Args:
+    output_file: Path prefix of the output TFRecord shards.
+    temp_path: Path the shard was written to.
+    shard: A dictionary with the shard's record and byte counts and the list
+        of its input files.
+    shards: The list of previously completed shards. `shard` is appended.
+    num_shards: The total number of shards.
+  """
+  path = tfrecord_lib.get_shard_path(output_file, len(shards), num_shards)
+  tf.gfile.Rename(temp_path, path, overwrite=True)
+  shard['path'] = os.path.basename(path)
+  shards.append(shard)
+  tfrecord_lib.write_manifest(output_file, shards)
+
+
+def convert_directory_parallel(root_dir, output_file, recursive=False,
+                               num_processes=None, files_per_shard=1000,
+                               cache=None):
+  """Converts files to NoteSequences in parallel and writes sharded output.
+
+  Files are converted by `num_processes` worker processes and written to shards
+  named `<output_file>-00000-of-000NN.tfrecord`, each covering
+  `files_per_shard` input files. When a shard is complete, it is recorded
+  along with its input files in the `tfrecord_lib` manifest,
+  `<output_file>.manifest.json`. Files listed in an existing manifest are
+  skipped, so calling this again after a crash resumes the conversion; a shard
+  that was only partly written is rewritten. Shards from earlier calls are
+  renamed to match the new total number of shards.
+
+  Args:
+    root_dir: A string specifying a root directory.
+    output_file: Path prefix of the output TFRecord shards.
+    recursive: A boolean specifying whether or not recursively convert files
+        contained in subdirectories of `root_dir`.
+    num_processes: Number of worker processes. If None, the number of CPUs is
+        used.
+    files_per_shard: Number of input files converted into each shard.
+    cache: An optional ConversionCache used by the workers to look up and store
+        converted files.
+
+  Returns:
+    A tuple (sequences_written, stats), the number of NoteSequence protos
+    written by this call as an integer and a list of cache statistics merged
+    from all workers.
+  """
+  manifest = tfrecord_lib.read_manifest(output_file)
+  shards = manifest['shards'] if manifest is not None else []
+  converted_files = set(filename for shard in shards
+                        for filename in shard['files'])
+  if converted_files:
+    tf.logging.info('Resuming conversion. Skipping %d converted files.',
+                    len(converted_files))
+  files_to_convert = [
+      (root_dir, sub_dir, full_file_path)
+      for sub_dir, full_file_path in list_files(root_dir, '', recursive)
+      if (os.path.join(sub_dir, os.path.basename(full_file_path)) not in
+          converted_files)]
+  num_shards = len(shards) + (
+      (len(files_to_convert) + files_per_shard - 1) // files_per_shard)
+
+  output_dir = os.path.dirname(output_file)
+  for index, shard in enumerate(shards):
+    path = tfrecord_lib.get_shard_path(output_file, index, num_shards)
+    if os.path.basename(path) != shard['path']:
+      tf.gfile.Rename(os.path.join(output_dir, shard['path']), path,
+                      overwrite=True)
+      shard['path'] = os.path.basename(path)
+      tfrecord_lib.write_manifest(output_file, shards)
+
+  sequences_written = 0
+  sequences_skipped = 0
+  stats = []
+  writer = None
+  pool = multiprocessing.Pool(num_processes, _init_parallel_worker, (cache,))
+  try:
+    for filename, serialized, file_stats in pool.imap_unordered(
+        _convert_file_serialized, files_to_convert):
+      stats = statistics.merge_statistics(stats + file_stats)
+      if writer is None:
+        temp_path = '%s-%05d.tmp' % (output_file, len(shards))
+        writer = tf.python_io.TFRecordWriter(temp_path)
+        shard = {'num_records': 0, 'num_bytes': 0, 'files': []}
+      if serialized is None:
+        sequences_skipped += 1
+      else:
+        writer.write(serialized)
+        shard['num_records'] += 1
+        shard['num_bytes'] += tfrecord_lib.get_record_bytes(serialized)
+        sequences_written += 1
+      shard['files'].append(filename)
+      if len(shard['files']) >= files_per_shard:
+        writer.close()
+        writer = None
+        _finish_shard(output_file, temp_path, shard, shards, num_shards)
+        tf.logging.info('Converted %d files so far.', sequences_written)
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  if writer is not None:
+    writer.close()
+    _finish_shard(output_file, temp_path, shard, shards, num_shards)
+  tf.logging.info('Could not parse %d files.', sequences_skipped)
+  return sequences_written, stats
+
+
 def main(unused_argv):
   tf.logging.set_verbosity(FLAGS.log)
 
@@ -173,12 +439,34 @@ def main(unused_argv):
   if not os.path.exists(os.path.dirname(output_file)):
     os.makedirs(os.path.dirname(output_file))
 
-  with note_sequence_io.NoteSequenceRecordWriter(
-      output_file) as sequence_writer:
-    sequences_written = convert_directory(input_dir, '', sequence_writer,
-                                          FLAGS.recursive)
-    tf.logging.info("Wrote %d NoteSequence protos to '%s'", sequences_written,
+  cache = None
+  if FLAGS.cache_dir:
+    cache = conversion_cache.ConversionCache(
+        os.path.expanduser(FLAGS.cache_dir),
+        max_bytes=FLAGS.cache_max_bytes or None,
+        max_age_secs=FLAGS.cache_max_age_days * 24 * 60 * 60 or None)
+
+  if FLAGS.num_processes > 1:
+    sequences_written, stats = convert_directory_parallel(
+        input_dir, output_file, FLAGS.recursive, FLAGS.num_processes,
+        FLAGS.files_per_shard, cache)
+    tf.logging.info("Wrote %d NoteSequence protos to '%s-*'", sequences_written,
                     output_file)
+  else:
+    with note_sequence_io.NoteSequenceRecordWriter(
+        output_file) as sequence_writer:
+      sequences_written = convert_directory(input_dir, '', sequence_writer,
+                                            FLAGS.recursive, cache)
+      tf.logging.info("Wrote %d NoteSequence protos to '%s'", sequences_written,
+                      output_file)
+    stats = cache.get_stats() if cache is not None else []
+
+  if cache is not None:
+    cache.evict()
+    stats = statistics.merge_statistics(
+        stats + [stat for stat in cache.get_stats()
+                 if stat.name == 'conversion_cache_evictions'])
+    statistics.log_statistics_list(stats)
 
 
 def console_entry_point():
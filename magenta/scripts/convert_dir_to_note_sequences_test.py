@@ -19,7 +19,9 @@ import tempfile
 # internal imports
 import tensorflow as tf
 
+from magenta.common import tfrecord_lib
 from magenta.music import note_sequence_io
+from magenta.scripts import conversion_cache
 from magenta.scripts import convert_dir_to_note_sequences
 
 
@@ -92,6 +94,103 @@ class ConvertMidiDirToSequencesTest(tf.test.TestCase):
 
     self.assertEquals(expected_filenames, actual_filenames)
 
+  def runParallelTest(self, output_file, cache=None):
+    """Runs a parallel conversion and returns the filenames and statistics."""
+    _, stats = convert_dir_to_note_sequences.convert_directory_parallel(
+        self.root_dir, output_file, recursive=True, num_processes=2,
+        files_per_shard=4, cache=cache)
+    actual_filenames = []
+    for shard in tf.gfile.Glob(output_file + '-*-of-*.tfrecord'):
+      for sequence in note_sequence_io.note_sequence_record_iterator(shard):
+        self.assertEquals(os.path.basename(self.root_dir),
+                          sequence.collection_name)
+        self.assertNotEquals(0, len(sequence.notes))
+        actual_filenames.append(sequence.filename)
+    return actual_filenames, stats
+
+  def testConvertMidiDirToSequencesParallel(self):
+    output_file = os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()),
+                               'notesequences.tfrecord')
+    actual_filenames, _ = self.runParallelTest(output_file)
+
+    self.assertEquals(
+        ['midi_1.mid', 'midi_2.mid', 'sub_1/midi_3.mid', 'sub_1/sub/midi_5.mid',
+         'sub_2/midi_3.mid', 'sub_2/midi_4.mid'],
+        sorted(actual_filenames))
+    # Six MIDI files and one unparseable file in two shards.
+    self.assertEquals(
+        ['notesequences.tfrecord-00000-of-00002.tfrecord',
+         'notesequences.tfrecord-00001-of-00002.tfrecord',
+         'notesequences.tfrecord.manifest.json'],
+        sorted(os.listdir(os.path.dirname(output_file))))
+    manifest = tfrecord_lib.read_manifest(output_file)
+    self.assertEquals(6, manifest['num_records'])
+    self.assertEquals(
+        [4, 3], [len(shard['files']) for shard in manifest['shards']])
+
+  def testConvertMidiDirToSequencesParallelResume(self):
+    output_file = os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()),
+                               'notesequences.tfrecord')
+    # A previous run converted two files into one shard before it stopped.
+    tf.python_io.TFRecordWriter(
+        tfrecord_lib.get_shard_path(output_file, 0, 1)).close()
+    tfrecord_lib.write_manifest(output_file, [
+        {'path': 'notesequences.tfrecord-00000-of-00001.tfrecord',
+         'num_records': 2, 'num_bytes': 0,
+         'files': ['midi_1.mid', 'sub_2/midi_4.mid']}])
+    actual_filenames, _ = self.runParallelTest(output_file)
+
+    self.assertEquals(
+        ['midi_2.mid', 'sub_1/midi_3.mid', 'sub_1/sub/midi_5.mid',
+         'sub_2/midi_3.mid'],
+        sorted(actual_filenames))
+    # The earlier shard is renamed to match the new total number of shards.
+    self.assertEquals(
+        ['notesequences.tfrecord-00000-of-00003.tfrecord',
+         'notesequences.tfrecord-00001-of-00003.tfrecord',
+         'notesequences.tfrecord-00002-of-00003.tfrecord'],
+        [shard['path']
+         for shard in tfrecord_lib.read_manifest(output_file)['shards']])
+    self.assertFalse(tf.gfile.Exists(
+        tfrecord_lib.get_shard_path(output_file, 0, 1)))
+    self.assertTrue(tf.gfile.Exists(
+        tfrecord_lib.get_shard_path(output_file, 0, 3)))
+
+  def testConvertMidiDirToSequencesParallelWithCache(self):
+    output_file = os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()),
+                               'notesequences.tfrecord')
+    cache = conversion_cache.ConversionCache(
+        os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()), 'cache'))
+    actual_filenames, stats = self.runParallelTest(output_file, cache)
+
+    self.assertEquals(6, len(actual_filenames))
+    # Each MIDI file is looked up in the cache once, by one of the workers.
+    counts = dict((stat.name, stat.count) for stat in stats)
+    self.assertEquals(
+        6, counts['conversion_cache_hits'] + counts['conversion_cache_misses'])
+
+  def testConvertMidiWithCache(self):
+    cache = conversion_cache.ConversionCache(
+        os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()), 'cache'))
+    midi_path = os.path.join(self.root_dir, 'midi_1.mid')
+    sequence = convert_dir_to_note_sequences.convert_midi(
+        self.root_dir, '', midi_path, cache)
+    # midi_3.mid has the same contents, so it is read from the cache.
+    cached_sequence = convert_dir_to_note_sequences.convert_midi(
+        self.root_dir, 'sub_1', os.path.join(self.root_dir, 'sub_1/midi_3.mid'),
+        cache)
+
+    self.assertEquals(
+        dict((stat.name, stat.count) for stat in cache.get_stats()),
+        {'conversion_cache_hits': 1, 'conversion_cache_misses': 1,
+         'conversion_cache_evictions': 0})
+    self.assertEquals(list(sequence.notes), list(cached_sequence.notes))
+    self.assertEquals('sub_1/midi_3.mid', cached_sequence.filename)
+    self.assertEquals(
+        note_sequence_io.generate_note_sequence_id(
+            'sub_1/midi_3.mid', os.path.basename(self.root_dir), 'midi'),
+        cached_sequence.id)
+
   def testConvertMidiDirToSequences_NoRecurse(self):
     self.runTest('', recursive=False)
     self.runTest('sub_1', recursive=False)
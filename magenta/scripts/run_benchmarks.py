@@ -0,0 +1,103 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Runs benchmarks of the data pipeline and compares them to a baseline.
+
+Example usage:
+  $ bazel run //magenta/scripts:run_benchmarks -- \
+    --output_json=/tmp/benchmarks.json
+
+  $ bazel run //magenta/scripts:run_benchmarks -- \
+    --baseline_json=/tmp/benchmarks.json --tolerance=0.2
+
+Exits with a non-zero status if any benchmark regressed relative to the
+baseline.
+"""
+
+import os
+import sys
+
+# internal imports
+import tensorflow as tf
+
+from magenta.scripts import benchmark_lib
+
+FLAGS = tf.app.flags.FLAGS
+
+tf.app.flags.DEFINE_string('benchmarks', '',
+                           'Comma-separated names of the benchmarks to run. '
+                           'Leave empty to run all benchmarks.')
+tf.app.flags.DEFINE_integer('num_sequences', 10,
+                            'Number of synthetic NoteSequences to benchmark '
+                            'with.')
+tf.app.flags.DEFINE_integer('notes_per_sequence', 256,
+                            'Number of melody notes in each synthetic '
+                            'NoteSequence.')
+tf.app.flags.DEFINE_integer('seed', 0,
+                            'Seed used to generate the synthetic '
+                            'NoteSequences.')
+tf.app.flags.DEFINE_integer('repeats', 3,
+                            'Number of times each benchmark is repeated. The '
+                            'fastest repetition is reported.')
+tf.app.flags.DEFINE_string('output_json', None,
+                           'If given, the results are written to this JSON '
+                           'file.')
+tf.app.flags.DEFINE_string('baseline_json', None,
+                           'If given, the results are compared against the '
+                           'baseline results in this JSON file.')
+tf.app.flags.DEFINE_float('tolerance', 0.1,
+                          'Allowed relative change in throughput and peak '
+                          'memory before a benchmark is considered to have '
+                          'regressed.')
+tf.app.flags.DEFINE_string('log', 'INFO',
+                           'The threshold for what messages will be logged '
+                           'DEBUG, INFO, WARN, ERROR, or FATAL.')
+
+
+def main(unused_argv):
+  tf.logging.set_verbosity(FLAGS.log)
+
+  benchmark_names = None
+  if FLAGS.benchmarks:
+    benchmark_names = FLAGS.benchmarks.split(',')
+
+  results = benchmark_lib.run_benchmarks(
+      benchmark_names=benchmark_names,
+      num_sequences=FLAGS.num_sequences,
+      notes_per_sequence=FLAGS.notes_per_sequence,
+      seed=FLAGS.seed,
+      repeats=FLAGS.repeats)
+
+  if FLAGS.output_json:
+    output_json = os.path.expanduser(FLAGS.output_json)
+    benchmark_lib.save_results(results, output_json)
+    tf.logging.info("Wrote benchmark results to '%s'", output_json)
+
+  if FLAGS.baseline_json:
+    baseline = benchmark_lib.load_results(
+        os.path.expanduser(FLAGS.baseline_json))
+    regressions = benchmark_lib.compare_to_baseline(
+        results, baseline, FLAGS.tolerance)
+    for regression in regressions:
+      tf.logging.error('Regression in %s', regression)
+    if regressions:
+      sys.exit(1)
+    tf.logging.info('No regressions relative to the baseline.')
+
+
+def console_entry_point():
+  tf.app.run(main)
+
+
+if __name__ == '__main__':
+  console_entry_point()